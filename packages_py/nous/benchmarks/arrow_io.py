@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Arrow IPC hand-off of the semantic model vs the JSON wire format.
+
+Builds a SemanticModel from a synthetic environment, exports it as Arrow IPC
+and times: decoding the same facts from JSON, mapping the Arrow files (and
+the heap memory that takes), and importing the export into a new model.
+
+Usage (from packages_py/nous):
+    python -m benchmarks.arrow_io [--facts 200000]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from benchmarks.record_memory import make_payload
+from src.models import arrow_io
+from src.models.records import Fact
+from src.models.semantic_model import SemanticModel
+
+
+def timed(label: str, run):
+    started = time.perf_counter()
+    result = run()
+    print(f"{label}: {(time.perf_counter() - started) * 1000:,.0f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=200_000)
+    args = parser.parse_args()
+
+    payload = make_payload(args.facts)
+    model = SemanticModel()
+    model.replace_records(Fact.from_wire(f) for f in json.loads(payload)["facts"])
+    print(f"facts: {args.facts:,} ({len(payload) / 1e6:,.0f} MB JSON)")
+
+    timed("JSON decode", lambda: [Fact.from_wire(f) for f in json.loads(payload)["facts"]])
+    with tempfile.TemporaryDirectory() as directory:
+        written = timed("Arrow export", lambda: arrow_io.export(model, directory))
+        print(f"  {written[arrow_io.FACTS_FILE] / 1e6:,.0f} MB facts.arrow")
+
+        allocated = pa.total_allocated_bytes()
+        facts = timed("Arrow map", lambda: arrow_io.read_facts(directory))
+        print(f"  {(pa.total_allocated_bytes() - allocated) / 1e6:,.1f} MB allocated for {facts.nbytes / 1e6:,.0f} MB of columns")
+        timed("  column sum (rh_object_uid)", lambda: pc.sum(facts.column('rh_object_uid')))
+
+        timed("Arrow import into a model", lambda: arrow_io.load(SemanticModel(), directory))
+
+
+if __name__ == "__main__":
+    main()
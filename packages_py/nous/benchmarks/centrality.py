@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Cost of PageRank and degree centrality over the fact graph.
+
+Builds a FactTable from a synthetic environment and times the first scoring,
+rescoring after a small change (warm-started from the previous PageRank),
+and ranking entities by relevance to a selected one.
+
+Usage (from packages_py/nous):
+    python -m benchmarks.centrality [--facts 100000]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.record_memory import make_payload
+from src.models.centrality import CentralityIndex
+from src.models.fact_table import FactTable
+from src.models.records import Fact
+
+
+def timed(label: str, run):
+    started = time.perf_counter()
+    result = run()
+    print(f"{label}: {(time.perf_counter() - started) * 1000:,.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    facts = [Fact.from_wire(f) for f in json.loads(make_payload(args.facts + 100))["facts"]]
+    table = FactTable()
+    table.add(facts[:args.facts])
+    table.edges()  # build the adjacency up front
+    index = CentralityIndex()
+
+    scores = timed("cold scores", lambda: index.scores(table))
+    print(f"  {len(scores.nodes):,} entities, {scores.iterations} iterations")
+    timed("cached scores", lambda: index.scores(table))
+
+    table.add(facts[args.facts:])
+    table.edges()
+    scores = timed("after 100 new facts (warm start)", lambda: index.scores(table))
+    print(f"  {scores.iterations} iterations")
+
+    selected = int(scores.nodes[len(scores.nodes) // 2])
+    timed("ranked, top 200 around an entity", lambda: index.ranked(table, selected, limit=200))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Per-turn context size and diff cost, full environment vs deltas.
+
+Loads a synthetic environment, then changes a few facts per turn and
+compares the characters of the full relationships rendering each turn
+would re-send with the changes message delta mode sends instead, and
+times the snapshot diff.
+
+Usage (from packages_py/nous):
+    python -m benchmarks.context_deltas [--facts 20000] [--churn 3] [--turns 10]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.record_memory import make_payload
+from src.agent.context_deltas import EnvironmentDeltas
+from src.models.semantic_model import SemanticModel
+
+
+async def run(args):
+    facts = json.loads(make_payload(args.facts + args.churn * args.turns))["facts"]
+    model = SemanticModel()
+    await model.addFacts(facts[:args.facts], load_models=False)
+
+    deltas, messages = EnvironmentDeltas(max_changes=args.facts), []
+    full_chars = delta_chars = 0
+    diff_seconds = 0.0
+    for turn in range(args.turns + 1):
+        if turn:
+            start = args.facts + (turn - 1) * args.churn
+            await model.addFacts(facts[start:start + args.churn], load_models=False)
+            await model.removeFacts([facts[turn]["fact_uid"]])
+        messages.append({"role": "user", "content": "question"})
+        started = time.perf_counter()
+        prepared = deltas.prepare(model, model.snapshot(), messages, lambda selected: model.format_relationships(), "")
+        diff_seconds += time.perf_counter() - started
+        deltas.commit(prepared, messages)
+        messages.append({"role": "assistant", "content": "answer"})
+        if turn:
+            full_chars += len(model.format_relationships())
+            delta_chars += len(prepared.delta["content"])
+
+    print(f"{args.facts:,} facts, {args.churn} added and 1 removed per turn, {args.turns} turns")
+    print(f"full context per turn:   {full_chars / args.turns:,.0f} chars")
+    print(f"changes message per turn: {delta_chars / args.turns:,.0f} chars")
+    print(f"prepare (diff + format) per turn: {diff_seconds / (args.turns + 1) * 1000:,.2f} ms (first turn renders the base)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=20_000)
+    parser.add_argument("--churn", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
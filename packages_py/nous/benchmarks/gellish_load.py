@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Throughput of the streaming Gellish table loader.
+
+Writes a synthetic environment as a Gellish TSV export, then times each
+stage: reading rows, normalizing them into Fact records, and indexing them
+into a SemanticModel, for the csv path and (with pyarrow) the columnar one.
+Peak traced memory of the streaming stages shows that parsing does not hold
+the file.
+
+Usage (from packages_py/nous):
+    python -m benchmarks.gellish_load [--facts 500000] [--batch-size 50000]
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+from benchmarks.record_memory import make_payload
+from src.models import gellish
+from src.models.semantic_model import SemanticModel
+
+
+def write_table(path: str, count: int) -> None:
+    columns = [(column, field) for column, field in gellish.COLUMNS.items()]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow([column for column, _ in columns])
+        for fact in json.loads(make_payload(count))["facts"]:
+            writer.writerow([fact.get(field, "") for _, field in columns])
+
+
+def timed(label: str, count: int, run) -> None:
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+    print(f"{label}: {seconds:.2f} s, {count / seconds:,.0f} facts/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "environment.tsv")
+        write_table(path, args.facts)
+        print(f"facts: {args.facts:,} ({os.path.getsize(path) / 1e6:,.0f} MB TSV)")
+
+        timed("read", args.facts, lambda: deque(gellish.read_rows(path)[1], maxlen=0))
+        timed("read + normalize", args.facts, lambda: deque(gellish.iter_facts(path), maxlen=0))
+
+        tracemalloc.start()
+        deque(gellish.batched(gellish.iter_facts(path), args.batch_size), maxlen=0)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"streaming peak memory: {peak / 1e6:,.1f} MB (batch size {args.batch_size:,})")
+
+        model = SemanticModel()
+        stats = asyncio.run(gellish.load(model, path, batch_size=args.batch_size, columnar=False))
+        print(f"read + normalize + index: {stats['seconds']:.2f} s, {stats['facts_per_second']:,} facts/s")
+
+        if gellish.pa is None:
+            print("columnar: skipped (pyarrow not installed)")
+            return
+        block_size = args.batch_size * gellish.ROW_BYTES
+        timed("columnar read + normalize", args.facts,
+              lambda: deque(gellish.iter_fact_columns(path, block_size=block_size), maxlen=0))
+        model = SemanticModel()
+        stats = asyncio.run(gellish.load(model, path, batch_size=args.batch_size, columnar=True))
+        print(f"columnar read + normalize + index: {stats['seconds']:.2f} s, {stats['facts_per_second']:,} facts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Cost of counting a prompt's tokens, cold and from the fragment cache.
+
+Renders the relationships of a synthetic environment and counts them with
+an empty cache, again unchanged, and after a few facts were added (only the
+new lines reach the tokenizer).
+
+Usage (from packages_py/nous):
+    python -m benchmarks.prompt_tokens [--facts 20000] [--tokenizer estimate]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.record_memory import make_payload
+from src.llm.tokens import TokenCounter, tokenizer_from_config
+from src.models.semantic_model import SemanticModel
+
+
+def timed(label: str, run):
+    started = time.perf_counter()
+    result = run()
+    print(f"{label}: {(time.perf_counter() - started) * 1000:,.1f} ms")
+    return result
+
+
+async def run(args):
+    facts = json.loads(make_payload(args.facts + 10))["facts"]
+    model = SemanticModel()
+    await model.addFacts(facts[:args.facts], load_models=False)
+    name, tokenizer = tokenizer_from_config(args.tokenizer)
+    counter = TokenCounter(tokenizer, name)
+
+    text = model.format_relationships()
+    tokens = timed("cold count", lambda: counter.count(text))
+    print(f"  {tokens:,} tokens ({name}) in {len(text):,} chars")
+    timed("unchanged, cached", lambda: counter.count(text))
+    await model.addFacts(facts[args.facts:], load_models=False)
+    text = model.format_relationships()
+    timed("after 10 new facts", lambda: counter.count(text))
+    print(f"  cache: {counter.get_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=20_000)
+    parser.add_argument("--tokenizer", default="estimate")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
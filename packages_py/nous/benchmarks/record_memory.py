@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Memory per fact: wire dicts vs compact Fact records.
+
+Generates a synthetic environment with realistic repetition (kinds named in
+many facts, a handful of relation types, collections and authors), decodes it
+from JSON the way Socket.IO payloads arrive, and measures the retained bytes
+per fact with tracemalloc.
+
+Usage (from packages_py/nous):
+    python -m benchmarks.record_memory [--facts 200000]
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from src.models.records import Fact
+
+RELATIONS = [(1146, "is a specialization of"), (1225, "is classified as a"), (1190, "is a part of"),
+             (5644, "is related to"), (1981, "is a synonym of")]
+COLLECTIONS = [(900000 + i, f"Collection {i}") for i in range(20)]
+AUTHORS = ["Andries van Renssen", "Relica Import", "System"]
+
+
+def make_payload(count: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    kinds = max(10, count // 5)
+    facts = []
+    for i in range(count):
+        lh, rh = rng.randrange(kinds), rng.randrange(kinds)
+        rel_uid, rel_name = rng.choice(RELATIONS)
+        collection_uid, collection_name = rng.choice(COLLECTIONS)
+        facts.append({
+            "fact_uid": 1_000_000 + i,
+            "lh_object_uid": 2_000_000 + lh,
+            "lh_object_name": f"kind {lh}",
+            "rel_type_uid": rel_uid,
+            "rel_type_name": rel_name,
+            "rh_object_uid": 2_000_000 + rh,
+            "rh_object_name": f"kind {rh}",
+            "full_definition": f"a kind {lh} that is specific for case {i}",
+            "partial_definition": "",
+            "collection_uid": collection_uid,
+            "collection_name": collection_name,
+            "author": rng.choice(AUTHORS),
+            "reference": "ISO 15926",
+            "language": "English",
+            "language_uid": 910036,
+            "approval_status": "accepted",
+            "effective_from": "2020-01-01",
+            "latest_update": "2024-06-01",
+        })
+    return json.dumps({"facts": facts})
+
+
+def measure(payload: str, convert) -> float:
+    gc.collect()
+    tracemalloc.start()
+    facts = json.loads(payload)["facts"]
+    facts = convert(facts)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_fact = retained / len(facts)
+    del facts
+    return per_fact
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=200_000)
+    args = parser.parse_args()
+
+    payload = make_payload(args.facts)
+    as_dicts = measure(payload, lambda facts: facts)
+    as_records = measure(payload, lambda facts: [Fact.from_wire(f) for f in facts])
+
+    print(f"facts:             {args.facts:,}")
+    print(f"dict bytes/fact:   {as_dicts:,.0f}")
+    print(f"record bytes/fact: {as_records:,.0f}")
+    print(f"saving:            {1 - as_records / as_dicts:.0%}")
+
+
+if __name__ == "__main__":
+    main()
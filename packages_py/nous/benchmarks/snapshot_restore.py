@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Warm restart: time to restore the semantic model from an on-disk snapshot.
+
+Builds a SemanticModel from a synthetic environment (as if downloaded from
+Aperture), writes a snapshot and restores it into a fresh model.
+
+Usage (from packages_py/nous):
+    python -m benchmarks.snapshot_restore [--facts 100000]
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.record_memory import make_payload
+from src.models import persistence
+from src.models.semantic_model import SemanticModel
+
+
+def offline_model() -> SemanticModel:
+    model = SemanticModel()
+
+    async def no_models(facts):
+        return None
+
+    model.loadModelsForFacts = no_models
+    return model
+
+
+async def run(count: int):
+    facts = json.loads(make_payload(count))["facts"]
+    model = offline_model()
+    started = time.perf_counter()
+    await model.addFacts(facts)
+    build = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "semantic_model.snap"
+        started = time.perf_counter()
+        size = persistence.save(model, path)
+        save = time.perf_counter() - started
+
+        # What the periodic writer does on the event loop; pickling and writing run in a thread
+        started = time.perf_counter()
+        persistence.capture(model)
+        capture = time.perf_counter() - started
+
+        restored = offline_model()
+        started = time.perf_counter()
+        persistence.load(restored, path)
+        load = time.perf_counter() - started
+
+    print(f"facts:           {count:,}")
+    print(f"build from wire: {build * 1000:,.0f} ms")
+    print(f"snapshot write:  {save * 1000:,.0f} ms ({size / 1e6:.1f} MB)")
+    print(f"writer capture:  {capture * 1000:,.0f} ms (on the event loop)")
+    print(f"snapshot load:   {load * 1000:,.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.facts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Latency of k-hop subgraph extraction from the local fact adjacency.
+
+Builds a FactTable from a synthetic environment and times subgraph queries
+around random entities, for 1 to 3 hops with and without a node cap.
+
+Usage (from packages_py/nous):
+    python -m benchmarks.subgraph [--facts 100000] [--queries 1000]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.record_memory import make_payload
+from src.models.fact_table import FactTable
+from src.models.records import Fact
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    table = FactTable()
+    table.add(Fact.from_wire(f) for f in json.loads(make_payload(args.facts))["facts"])
+    table.subgraph([0])  # build the adjacency up front
+    entities = sorted(set(table.column('lh_object_uid').tolist()))
+    rng = random.Random(1)
+    seeds = [rng.choice(entities) for _ in range(args.queries)]
+
+    print(f"facts: {len(table):,}")
+    for hops, max_nodes in ((1, None), (2, None), (2, 200), (3, 200)):
+        sizes = []
+        started = time.perf_counter()
+        for seed in seeds:
+            nodes, rows = table.subgraph([seed], hops=hops, max_nodes=max_nodes)
+            sizes.append(len(rows))
+        per_query = (time.perf_counter() - started) / len(seeds)
+        print(
+            f"{hops} hop(s), max_nodes={max_nodes}: {per_query * 1e6:,.0f} µs/query "
+            f"(avg {sum(sizes) / len(sizes):,.0f} facts)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Size of tool observations, one line per fact vs the compact encoding.
+
+Takes the facts around the best connected entities of a synthetic
+environment (what loadRelations returns for a hub) and compares the
+characters and estimated tokens of the verbose rendering with the compact
+one, for the whole result and for its first page.
+
+Usage (from packages_py/nous):
+    python -m benchmarks.tool_output [--facts 20000] [--hubs 5]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.record_memory import make_payload
+from src.agent.tool_output import encode_facts
+from src.agent.tools import facts_to_related_entities_str, facts_to_relations_str
+from src.llm.tokens import estimate
+from src.models.fact_table import FactTable
+from src.models.records import Fact
+
+
+def verbose(facts) -> str:
+    """The tools' output before the compact encoding"""
+    return (
+        f"\tRelated Entities (uid:name):\n{facts_to_related_entities_str(facts)}\n"
+        f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
+        f"{facts_to_relations_str(facts)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facts", type=int, default=20_000)
+    parser.add_argument("--hubs", type=int, default=5)
+    args = parser.parse_args()
+
+    table = FactTable()
+    table.add([Fact.from_wire(f) for f in json.loads(make_payload(args.facts))["facts"]])
+    degrees = table.degrees()
+    for uid in sorted(degrees, key=degrees.get, reverse=True)[:args.hubs]:
+        facts = table.facts(table.neighbor_rows(uid))
+        old = verbose(facts)
+        started = time.perf_counter()
+        whole = encode_facts(facts, max_facts=len(facts), max_chars=10**9)
+        elapsed = (time.perf_counter() - started) * 1000
+        page = encode_facts(facts)
+        print(f"entity {uid}: {len(facts)} facts")
+        print(f"  verbose: {len(old):,} chars, ~{estimate(old):,} tokens")
+        print(f"  compact: {len(whole):,} chars, ~{estimate(whole):,} tokens ({elapsed:.2f} ms)")
+        print(f"  first page: {len(page):,} chars, ~{estimate(page):,} tokens")
+
+
+if __name__ == "__main__":
+    main()
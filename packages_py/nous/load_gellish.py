@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Seed the semantic model offline from Gellish table exports.
+
+Streams one or more Gellish CSV/TSV files into a semantic model, without
+Aperture or Clarity, and optionally writes it as a snapshot for offline work
+and benchmarks (read it back with persistence.load). Seeded snapshots are
+marked with source "gellish" and NOUS does not restore them on startup: its
+Aperture sync would remove every seeded fact missing from the environment.
+
+Usage (from packages_py/nous):
+    python load_gellish.py exports/*.tsv [--snapshot PATH] [--batch-size 50000]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from src.models import gellish, persistence
+from src.models.semantic_model import SemanticModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+", help="Gellish CSV/TSV files")
+    parser.add_argument("--snapshot", help="Snapshot to write (default: none)")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--delimiter", help="Column delimiter (detected by default)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    model = SemanticModel()
+    stats = asyncio.run(gellish.load(model, args.paths, batch_size=args.batch_size, delimiter=args.delimiter))
+    print(
+        f"{stats['facts']:,} facts from {stats['rows']:,} rows ({stats['skipped']:,} skipped) "
+        f"in {stats['seconds']:.1f} s, {stats['facts_per_second'] or 0:,} facts/s"
+    )
+
+    if args.snapshot:
+        size = persistence.save(model, args.snapshot, meta={"source": gellish.SOURCE})
+        print(f"Snapshot written to {args.snapshot} ({size / 1e6:,.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,45 +16,100 @@ from src.clients.clarity import clarity_client
 from src.server import nous_socketio_server
 
 from src.agent.nous_agent import NOUSAgent
+from src.agent.context_deltas import EnvironmentDeltas
+from src.agent.tool_output import ResultPages
+from src.agent.working_set import WorkingSet
+from src.llm.registry import llm_registry
+from src.models.environment_sync import EnvironmentSync
+from src.models import persistence
 from src.models.semantic_model import semantic_model
+from src.models.shared_model import SharedModelPublisher
 from src.proxies.aperture_proxy import ApertureSocketIOProxy
 from src.proxies.archivist_proxy import ArchivistSocketIOProxy
+from src.utils.metrics import metrics
 
 from src.agent.concept_placement import *
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
-messages = []
+# Conversation history per chat session
+conversations = {}
+# Per-session record of the environment already sent to the LLM (NOUS_CONTEXT_DELTAS)
+context_deltas = {}
+# Per-session load tool calls already satisfied (NOUS_WORKING_SET_SIZE)
+working_sets = {}
+# Per-session results of paged tool calls, for their continuation pages
+result_pages = {}
+
+# Keeps the semantic model in step with the default environment
+environment_sync = EnvironmentSync(aperture_client, semantic_model, DEFAULT_ENVIRONMENT_ID)
+metrics.register_provider("environment_sync", environment_sync.get_stats)
+
+# Periodic on-disk snapshots of the semantic model, restored on startup
+snapshot_writer = None
+if NOUS_SNAPSHOT_PATH:
+    snapshot_writer = persistence.SnapshotWriter(
+        semantic_model,
+        NOUS_SNAPSHOT_PATH,
+        interval=NOUS_SNAPSHOT_INTERVAL,
+        meta=lambda: {"environment_id": DEFAULT_ENVIRONMENT_ID, "seq": environment_sync.last_seq},
+    )
+    metrics.register_provider("model_snapshots", snapshot_writer.get_stats)
+
+# Read-only image of the semantic model in shared memory, for worker processes
+shared_model_publisher = None
+if NOUS_SHARED_MODEL_PATH:
+    shared_model_publisher = SharedModelPublisher(
+        semantic_model, NOUS_SHARED_MODEL_PATH, interval=NOUS_SHARED_MODEL_INTERVAL,
+        debounce=NOUS_SHARED_MODEL_DEBOUNCE,
+    )
+    metrics.register_provider("shared_model", shared_model_publisher.get_stats)
+
+
+def restore_snapshot():
+    """Load the last snapshot of the default environment; True if the model was restored"""
+    if snapshot_writer is None:
+        return False
+    # Snapshots seeded offline (load_gellish.py) carry a "source" and are not restored:
+    # the first sync would drop every seeded fact missing from the environment
+    header = persistence.load(
+        semantic_model, NOUS_SNAPSHOT_PATH, match={"environment_id": DEFAULT_ENVIRONMENT_ID, "source": None}
+    )
+    if header is None:
+        return False
+    snapshot_writer.saved_version = header["version"]
+    environment_sync.resume(header["meta"].get("seq"))
+    return True
 
 
 async def main():
     print("RELICA :: NOUS :: STARTING UP....")
 
+    # Serve from the last snapshot right away; Aperture sync below brings it up to date
+    restored = restore_snapshot()
+    if snapshot_writer is not None:
+        snapshot_writer.start()
+    if shared_model_publisher is not None:
+        shared_model_publisher.start()
+
     async def retrieveEnv():
         try:
             # Connect if not already connected
             if not aperture_client.is_connected():
                 await aperture_client.connect()
 
-            result = await aperture_client.retrieve_environment(
-                DEFAULT_ENVIRONMENT_ID, None
-            )
+            # Full download, then incremental updates from Aperture's fact events
+            env = await environment_sync.start()
             print("*******************************************")
-            print(result)
-
-            env = result
-            facts = env.get("facts", [])
-
-            await semantic_model.addFacts(facts)
-            semantic_model.selected_entity = env.get("selected_entity_id")
+            print(env)
 
             return env
         except Exception as e:
             print(f"Error retrieving environment: {e}")
             return None
 
-    async def handle_user_input(user_id, env_id, message, client_id: str):
+    async def handle_user_input(user_id, env_id, message, client_id: str, session_id=None):
         """Handle user input received via WebSocket."""
         logger = logging.getLogger(__name__)
         logger.info(
@@ -68,23 +123,38 @@ async def main():
             await archivist_client.connect()
 
         # 2. Create proxy clients for the agent using the existing Socket.IO connections
-        aperture_proxy = ApertureSocketIOProxy(aperture_client, user_id, env_id)
+        # Facts the tools look up in the model's environment are ingested into it as well
+        aperture_proxy = ApertureSocketIOProxy(
+            aperture_client, user_id, env_id, semantic_model, model_environment_id=DEFAULT_ENVIRONMENT_ID
+        )
         archivist_proxy = ArchivistSocketIOProxy(archivist_client, user_id, env_id)
 
         # 3. Instantiate the NOUSAgent
+        conversation = session_id or f"{user_id}:{env_id}"
         agent = NOUSAgent(
             aperture_client=aperture_proxy,
             archivist_client=archivist_proxy,
             semantic_model=semantic_model,
             user_id=user_id,
             env_id=env_id,
+            working_set=working_sets.setdefault(conversation, WorkingSet()) if NOUS_WORKING_SET_SIZE else None,
+            result_pages=result_pages.setdefault(conversation, ResultPages()),
         )
 
         # 4. Invoke the agent to process the input
         try:
+            # Runs within a session are serialized by the server's chat scheduler,
+            # so the session's history is never appended to concurrently
+            messages = conversations.setdefault(conversation, [])
+            deltas = context_deltas.setdefault(conversation, EnvironmentDeltas()) if NOUS_CONTEXT_DELTAS else None
             # Assuming the agent returns the final answer to send to the user
             messages.append({"role": "user", "content": message})
-            final_answer_raw = await agent.handleInput(messages)
+            try:
+                final_answer_raw = await agent.handleInput(messages, deltas)
+            except asyncio.CancelledError:
+                # Superseded or disconnected - drop the unanswered message from the history
+                messages.pop()
+                raise
             final_answer = (
                 final_answer_raw.strip()
                 if isinstance(final_answer_raw, str)
@@ -110,8 +180,14 @@ async def main():
 
     print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
 
+    def forget_session(session_id):
+        """Drop a session's history and caches once its clients have disconnected"""
+        for sessions in (conversations, context_deltas, working_sets, result_pages):
+            sessions.pop(session_id, None)
+
     # Register async handler with Socket.IO server
     nous_socketio_server.set_nous_handler(handle_user_input)
+    nous_socketio_server.set_session_closed_handler(forget_session)
 
     # Connect to services
     clarity_connected = await clarity_client.connect()
@@ -122,7 +198,11 @@ async def main():
     print(f"Aperture connection status: {aperture_connected}")
 
     # Check connections before retrieving environment
-    if aperture_connected:
+    if aperture_connected and restored:
+        # Already serving the restored model; reconcile with Aperture in the background
+        asyncio.create_task(retrieveEnv())
+        print(">>>>>>>>>> Restored semantic model snapshot, reconciling with Aperture")
+    elif aperture_connected:
         # Call retrieveEnv which uses the singleton client
         env = await retrieveEnv()
         print(f">>>>>>>>>> Retrieved environment - direct socketio: {env is not None}")
@@ -165,6 +245,18 @@ if __name__ == "__main__":
     # Attach Socket.IO to aiohttp app
     nous_socketio_server.sio.attach(app)
 
+    async def on_cleanup(app):
+        # Write a final semantic model snapshot
+        if snapshot_writer is not None:
+            await snapshot_writer.stop()
+        # Withdraw the shared semantic model image
+        if shared_model_publisher is not None:
+            await shared_model_publisher.stop()
+        # Close the pooled LLM HTTP connections
+        await llm_registry.aclose()
+
+    app.on_cleanup.append(on_cleanup)
+
     async def init_app():
         # Start main async function
         asyncio.create_task(main())
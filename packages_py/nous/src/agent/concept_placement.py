@@ -11,15 +11,11 @@ import asyncio
 from typing import Optional, List, Tuple, Literal
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
 
-llm = ChatGroq(
-    model="qwen-qwq-32b",
-    temperature=0.1,
-    top_p=0.95,
-    max_retries=2,
-    reasoning_format="parsed"
-)
+from src.llm.routing import model_router
+from src.models.semantic_model import semantic_model
+from src.llm.scheduler import BULK, llm_call_context
+
 
 # Define the Pydantic model here to avoid circular imports
 class SubtypeSelection(BaseModel):
@@ -46,13 +42,17 @@ async def get_subtypes_with_definitions(uid: int, archivist_proxy) -> List[Tuple
     try:
         print(f"Getting subtypes for UID: {uid}")
         
-        # Get direct subtypes using the proxy
-        subtypes_result = await archivist_proxy.get_subtypes(uid)
-        print(f"Subtypes result: {subtypes_result}")
-        
-        if not subtypes_result or "error" in subtypes_result:
-            print(f"No subtypes found or error: {subtypes_result}")
-            return []
+        # Subtypes looked up before are answered from the local taxonomy index
+        subtypes_result = semantic_model.taxonomy.subtype_facts(uid)
+        if subtypes_result is None:
+            # Get direct subtypes using the proxy
+            subtypes_result = await archivist_proxy.get_subtypes(uid)
+            print(f"Subtypes result: {subtypes_result}")
+            
+            if not subtypes_result or "error" in subtypes_result:
+                print(f"No subtypes found or error: {subtypes_result}")
+                return []
+            semantic_model.taxonomy.learn(subtypes_result, subtypes_of=uid)
             
         # Extract facts from the result
         facts = subtypes_result # subtypes_result.get('facts', [])
@@ -132,12 +132,15 @@ Consider:
 Be conservative - only select a subtype if you're confident it's a good semantic fit.
 """)
 
-        selection_chain = selection_prompt | llm.with_structured_output(SubtypeSelection)
-        result = await selection_chain.ainvoke({
+        inputs = {
             "term": term, 
             "definition": definition,
             "subtypes_context": subtypes_context
-        })
+        }
+        result = await model_router.run(
+            "select_subtype",
+            lambda llm: (selection_prompt | llm.with_structured_output(SubtypeSelection)).ainvoke(inputs),
+        )
         
         # Find the name associated with the selected_uid
         selected_name = next((name for uid, name, desc in subtypes if uid == result.selected_uid), None)
@@ -233,8 +236,12 @@ async def categorizeConceptType(term: str, definition: str = "") -> str:
 """)
 
 
-        categorize_chain = categorization_prompt | llm.with_structured_output(ConceptCategory)
-        result = await categorize_chain.ainvoke({"term": term, "definition": definition})
+        result = await model_router.run(
+            "categorize",
+            lambda llm: (categorization_prompt | llm.with_structured_output(ConceptCategory)).ainvoke(
+                {"term": term, "definition": definition}
+            ),
+        )
         
         return f"Category: {result.category}\nReasoning: {result.reasoning}"
         
@@ -306,14 +313,13 @@ Provide only the definition, starting after the double colon (::).
         
         print(f'userPrompt--->{user_prompt}')
         
-        # Use the namespace llm instead of creating a new client
         messages = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt}
         ]
         
-        # Invoke the llm directly
-        result = await llm.ainvoke(messages)
+        # Invoke the routed llm directly
+        result = await model_router.run("conjure_definition", lambda llm: llm.ainvoke(messages))
         
         return result.content
         
@@ -342,8 +348,10 @@ Provide only the definition, without prefacing with "Definition:" or the term it
 """)
         
         # Create chain with direct text output
-        definition_chain = definition_prompt | llm
-        result = await definition_chain.ainvoke({"term": term})
+        result = await model_router.run(
+            "infer_definition",
+            lambda llm: (definition_prompt | llm).ainvoke({"term": term}),
+        )
         
         return result.content.strip()
         
@@ -352,13 +360,14 @@ Provide only the definition, without prefacing with "Definition:" or the term it
         return f"Error inferring definition: {e}"
 
 
-async def place_concept(term: str, archivist_proxy) -> dict:
+async def place_concept(term: str, archivist_proxy, user_id: Optional[str] = None) -> dict:
     """
     Complete concept placement pipeline: infer definition, categorize, and find optimal placement.
     
     Args:
         term: The concept term to place in the taxonomy
         archivist_proxy: The archivist proxy for taxonomy traversal
+        user_id: The user the placement is run for (for fair LLM scheduling)
         
     Returns:
         Dict containing the placement results with keys:
@@ -369,6 +378,12 @@ async def place_concept(term: str, archivist_proxy) -> dict:
         - placement_uid: The optimal UID for placement
         - error: Error message if any step fails
     """
+    # Placement pipelines run in the bulk lane so they never delay interactive chat
+    with llm_call_context(BULK, user_id=user_id):
+        return await _place_concept(term, archivist_proxy)
+
+
+async def _place_concept(term: str, archivist_proxy) -> dict:
     try:
         print(f"\n{'='*50}")
         print(f"CONCEPT PLACEMENT PIPELINE FOR: {term}")
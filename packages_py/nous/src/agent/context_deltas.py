@@ -0,0 +1,108 @@
+"""
+Environment context for the agent as a stable base plus per-turn changes.
+
+By default every turn renders the whole environment into the system prompt,
+so input tokens grow with the size of the model, and any change invalidates
+the provider's cached prompt prefix. In delta mode a conversation renders
+the environment once (its base) into the system prompt. Each later turn in
+which the facts or the selection changed gets one extra message, placed just
+before the user's message, listing the facts added and removed since the
+previous turn. The system prompt and the earlier history stay byte-identical
+from turn to turn, so they remain a cached prefix, and per-turn input scales
+with churn rather than size.
+
+Once the changes accumulated since the base pass `max_changes`, the next
+turn rebases: the current environment becomes the new base and the change
+messages are dropped from the history.
+"""
+
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from src.config import NOUS_CONTEXT_DELTA_MAX_FACTS
+from src.models.semantic_model import SemanticModel
+from src.models.snapshot import ModelSnapshot, diff
+
+
+class ContextTurn(NamedTuple):
+    environment: str         # base environment for the system prompt
+    selected_entity: Any     # selection in the system prompt (the base's)
+    timestamp: str           # timestamp in the system prompt (the base's)
+    messages: List[dict]     # history for the run, with this turn's changes before the user's message
+    delta: Optional[dict]    # the changes message, if anything changed
+    snapshot: ModelSnapshot  # version the LLM has seen once the turn completes
+    rebased: bool
+    changes: int             # facts changed since the base, this turn's included
+
+
+class EnvironmentDeltas:
+    """What one conversation's LLM has been told about the environment so far"""
+
+    def __init__(self, max_changes: int = NOUS_CONTEXT_DELTA_MAX_FACTS):
+        self.max_changes = max_changes
+        self.base: Optional[ModelSnapshot] = None
+        self.environment = ""
+        self.timestamp = ""
+        self.seen: Optional[ModelSnapshot] = None
+        self.changes = 0
+        # Change messages injected into the history, dropped again on a rebase
+        self._injected: List[dict] = []
+
+    def prepare(self, model: SemanticModel, snapshot: ModelSnapshot, messages: List[dict],
+                render: Callable[[Any], str], timestamp: str, follow_selection: bool = False) -> ContextTurn:
+        """
+        Context for a turn on `snapshot`; nothing is recorded until `commit`.
+
+        Args:
+            model: Formats the changed facts
+            snapshot: The model version the turn runs on
+            messages: Conversation history, ending with the user's message
+            render: Renders the environment for a selected entity (for a new base)
+            timestamp: Current time, for a new base or the changes message
+            follow_selection: Rebase when the selection moves (for contexts cut
+                down to the selected entity's neighbourhood)
+        """
+        rebase = self.base is None or (
+            follow_selection and snapshot.selected_entity != self.base.selected_entity
+        )
+        if not rebase:
+            changes = diff(self.seen, snapshot)
+            total = self.changes + changes.changes
+            rebase = total > self.max_changes
+
+        if rebase:
+            injected = {id(m) for m in self._injected}
+            history = [m for m in messages if id(m) not in injected]
+            return ContextTurn(render(snapshot.selected_entity), snapshot.selected_entity, timestamp,
+                               history, None, snapshot, True, 0)
+
+        delta = None
+        history = list(messages)
+        moved = snapshot.selected_entity != self.seen.selected_entity
+        if changes.changes or moved:
+            lines = ["<environment_changes>", "Changes to the environment since the last turn:"]
+            if changes.changes:
+                lines.append(model.format_changes(changes))
+            if moved:
+                lines.append(f"Selected Entity: {snapshot.selected_entity}")
+            lines += [f"Timestamp: {timestamp}", "</environment_changes>"]
+            delta = {"role": "user", "content": "\n".join(lines)}
+            history.insert(len(history) - 1, delta)
+        return ContextTurn(self.environment, self.base.selected_entity, self.timestamp,
+                           history, delta, snapshot, False, total)
+
+    def commit(self, turn: ContextTurn, messages: List[dict]):
+        """Record a completed turn, keeping its changes message in the history"""
+        if turn.rebased:
+            injected = {id(m) for m in self._injected}
+            messages[:] = [m for m in messages if id(m) not in injected]
+            self._injected = []
+            self.base = turn.snapshot
+            self.environment = turn.environment
+            self.timestamp = turn.timestamp
+        if turn.delta is not None:
+            user = turn.messages[-1]
+            position = next(i for i in range(len(messages) - 1, -1, -1) if messages[i] is user)
+            messages.insert(position, turn.delta)
+            self._injected.append(turn.delta)
+        self.seen = turn.snapshot
+        self.changes = turn.changes
@@ -1,32 +1,33 @@
 import uuid
+import asyncio
+import logging
 
 from datetime import datetime
 
-from rich import print
-from rich.console import Console
-
-console = Console()
-
 from langgraph.prebuilt import create_react_agent
 from langgraph.graph import StateGraph
 
 from typing import Optional, List, Dict, Any, TypedDict, Annotated, Sequence
 
+import numpy as np
+
+from src.config import NOUS_CONTEXT_FULL_FACTS, NOUS_CONTEXT_HOPS, NOUS_CONTEXT_MAX_NODES, NOUS_PROMPT_MAX_TOKENS
+from src.llm.tokens import prompt_counts, token_counter, trim_lines
 from src.utils.event_emitter import EventEmitter
 from src.models.semantic_model import SemanticModel
+from src.agent.context_deltas import EnvironmentDeltas
+from src.agent.tool_output import ResultPages
+from src.agent.working_set import WorkingSet
 from src.agent.tools import create_agent_tools
 
 from langchain_core.messages import AnyMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt.chat_agent_executor import AgentState
 
-def prompt(state: AgentState, config: RunnableConfig) -> list[AnyMessage]:
-    environment = config["configurable"].get("environment", "")
-    selected_entity = config["configurable"].get("selected_entity", 0)
-    user_id = config["configurable"].get("user_id", 0)
-    env_id = config["configurable"].get("env_id", 0)
-    timestamp = config["configurable"].get("timestamp", datetime.now().strftime("%Y-%m-%d %H:%M"))
+logger = logging.getLogger(__name__)
 
+def system_message(environment: str, selected_entity: Any, user_id: Any, env_id: Any, timestamp: str) -> str:
+    """The agent's system prompt: the instructions around the environment, selection and ids"""
     # user_name = config["configurable"].get("user_name")
     # system_msg = f"You are a helpful assistant. Address the user as {user_name}."
     # return [{"role": "system", "content": system_msg}] + state["messages"]def prompt(environment: str, selected_entity: int, user_id: int, env_id: int, timestamp: str):
@@ -203,18 +204,90 @@ Do your best to maintain the level of discourse at the level of a 12th grader.
 # Chat History: {chat_history}
 # Current Query: {input}
 
-    return [{"role": "system", "content": system_msg}] + state["messages"]
+    return system_msg
+
+
+def prompt(state: AgentState, config: RunnableConfig) -> list[AnyMessage]:
+    environment = config["configurable"].get("environment", "")
+    selected_entity = config["configurable"].get("selected_entity", 0)
+    user_id = config["configurable"].get("user_id", 0)
+    env_id = config["configurable"].get("env_id", 0)
+    timestamp = config["configurable"].get("timestamp", datetime.now().strftime("%Y-%m-%d %H:%M"))
+
+    system_msg = system_message(environment, selected_entity, user_id, env_id, timestamp)
+    messages = fit_history(system_msg, environment, state["messages"])
+    return [{"role": "system", "content": system_msg}] + messages
+
+
+# Share of the prompt budget, after the instructions, that the environment may take; the rest is the history's
+ENVIRONMENT_SHARE = 0.5
+
+
+def environment_budget(limit: Optional[int] = None) -> Optional[int]:
+    """Tokens the environment may take in the system prompt under `limit` (default NOUS_PROMPT_MAX_TOKENS); None for no limit"""
+    limit = NOUS_PROMPT_MAX_TOKENS if limit is None else limit
+    if not limit:
+        return None
+    instructions = token_counter.count(system_message("", 0, 0, 0, ""))
+    return max(0, int((limit - instructions) * ENVIRONMENT_SHARE))
+
+
+def _text(message) -> str:
+    content = message.content if hasattr(message, "content") else message.get("content", "")
+    return content if isinstance(content, str) else str(content)
+
+
+def _is_user(message) -> bool:
+    role = getattr(message, "type", None) or (message.get("role") if isinstance(message, dict) else None)
+    return role in ("human", "user")
+
+
+def fit_history(system_msg: str, environment: str, messages: List[Any], limit: Optional[int] = None) -> List[Any]:
+    """
+    Count the prompt's tokens per section and, above `limit` (default
+    NOUS_PROMPT_MAX_TOKENS), drop the oldest turns of the history to fit.
+
+    The system prompt is never cut here, so it stays byte-identical from call
+    to call and turn to turn; the environment was fitted to its share of the
+    budget when the turn started (see NOUSAgent.environment_context). Turns
+    are dropped whole, from a user message up to the next, and the current
+    turn (from the last user message on) is always kept.
+    """
+    limit = NOUS_PROMPT_MAX_TOKENS if limit is None else limit
+    history = [_text(m) for m in messages]
+    sections = {"instructions": system_msg.replace(environment, "", 1), "environment": environment, "history": history}
+    counts = token_counter.sections(sections, limit or None)
+    starts = [i for i, m in enumerate(messages) if _is_user(m)]
+    if not limit or counts["total"] <= limit or len(starts) < 2:
+        return messages
+
+    budget = limit - counts["instructions"] - counts["environment"]
+    keep = starts[-1]
+    used = token_counter.count_all(history[keep:])
+    for start in reversed(starts[:-1]):
+        turn = token_counter.count_all(history[start:keep])
+        if used + turn > budget:
+            break
+        used += turn
+        keep = start
+    sections["history"] = history[keep:]
+    counts = token_counter.sections(sections)
+    logger.info(f"Dropped {keep} history messages to fit the {limit} token prompt budget: {counts}")
+    return messages[keep:]
 
 # Chat History: {chat_history}
 # Current Query: {input}
 # """
 
-from langchain_groq import ChatGroq
+from src.llm.registry import llm_registry
+from src.llm.routing import model_router
+from src.llm.scheduler import INTERACTIVE, llm_call_context
 
 def get_llm():
-    """Get the LLM instance. Called after config is loaded."""
-    return ChatGroq(
-        model="qwen-qwq-32b",
+    """Get the shared LLM instance. Called after config is loaded."""
+    return llm_registry.get(
+        "groq",
+        "qwen-qwq-32b",
         # model="mistral-saba-24b",
         temperature=0.6,
         max_retries=2,
@@ -228,6 +301,8 @@ class NOUSAgent:
                  semantic_model: SemanticModel,
                  user_id,
                  env_id,
+                 working_set: Optional[WorkingSet] = None,
+                 result_pages: Optional[ResultPages] = None,
                  ):
         self.user_id = user_id
         self.env_id= env_id
@@ -242,30 +317,61 @@ class NOUSAgent:
         # self.tool_descriptions = tool_descriptions
         # self.tool_names = tool_names
 
-        t = create_agent_tools(aperture_client, archivist_client)
+        self.tools = create_agent_tools(aperture_client, archivist_client, working_set, result_pages)['tools']
 
-        # Compile the workflow and store it as an instance variable
-        self.app = create_react_agent(
-            # llm,
-            "anthropic:claude-3-7-sonnet-latest",
-            tools=t['tools'],
-            prompt=prompt,
-        )
-        # console.print(self.app.get_graph().draw_ascii()) # Optional: Draw graph for debugging
+        # Compiled workflows per chat model, built when the "agent" route's candidate order first yields it
+        self._apps: Dict[int, Any] = {}
+        self.app = self.get_app(model_router.chat_model("agent"))
+        # print(self.app.get_graph().draw_ascii()) # Optional: Draw graph for debugging
 
         self.conversation_id = str(uuid.uuid4())  # Generate a unique ID for this agent instance
-        console.print(f"NOUS Agent Initialized (ID: {self.conversation_id})")
-
-    async def handleInput(self, messages):
+        logger.info(f"NOUS Agent Initialized (ID: {self.conversation_id})")
+
+    def get_app(self, llm):
+        """The agent workflow compiled for a (shared) chat model, e.g. the "agent" route's fallback chain"""
+        if id(llm) not in self._apps:
+            self._apps[id(llm)] = create_react_agent(llm, tools=self.tools, prompt=prompt)
+        return self._apps[id(llm)]
+
+    def environment_context(self, selected_entity):
+        """
+        Relationships for the prompt: the whole environment, or the selected
+        entity's neighbourhood if it is large. Above the environment's share
+        of the prompt budget (environment_budget), only the facts about the
+        entities most relevant to the selection are kept.
+        """
+        model = self.semantic_model.reader()
+        if not selected_entity or len(model.table) <= NOUS_CONTEXT_FULL_FACTS:
+            rows, text = None, model.format_relationships()
+        else:
+            rows = model.neighborhood_rows(selected_entity, hops=NOUS_CONTEXT_HOPS, max_nodes=NOUS_CONTEXT_MAX_NODES)
+            text = model.format_relationships(rows)
+        budget = environment_budget()
+        if budget is None or token_counter.count(text) <= budget:
+            return text
+
+        # Cut the least relevant facts, then render the rest grouped as usual
+        ranked = model.relevant_rows(selected_entity or None, rows)
+        _, cut = trim_lines("\n".join(model.format_fact(f) for f in model.table.facts(ranked)), budget, token_counter)
+        kept = model.format_relationships(np.sort(ranked[:len(ranked) - cut]))
+        logger.info(f"Cut {cut} less relevant facts to fit the environment's {budget} token budget")
+        return "\n".join(filter(None, [kept, f"... ({cut} less relevant facts omitted to fit the prompt budget)"]))
+
+    async def handleInput(self, messages, deltas: Optional[EnvironmentDeltas] = None):
+        """
+        Run the agent on a conversation ending with the user's message.
+
+        With `deltas` (the conversation's EnvironmentDeltas), the system prompt
+        keeps the environment as first sent and only the changes since the last
+        turn are added to `messages`.
+        """
         # Note: user_id and env_id are now part of self.aperture_client
         # They might still be needed for the initial state if nodes rely on them directly from state
 
         user_input = messages[-1]['content']
 
-        console.print("==================== NOUS AGENT HANDLE INPUT ===================")
-        console.print(f"User ID: {self.user_id}")
-        console.print(f"Env ID: {self.env_id}")
-        console.print(f"User Input: {messages}")
+        logger.info(f"Agent run (ID: {self.conversation_id}, user: {self.user_id}, env: {self.env_id})")
+        logger.debug(f"User input: {messages}")
 
         # p = prompt(
         #     environment=self.semantic_model.format_relationships(),
@@ -279,35 +385,69 @@ class NOUSAgent:
 
         # Stream the response from the LangGraph workflow
         final_state = None
-        console.print("Invoking agent graph...")
+        logger.debug("Invoking agent graph...")
         try:
             # final_state = await self.app.ainvoke(
             #     initial_state,
             #     # config=config # Include config if using checkpointers
             # )
-            final_state = await self.app.ainvoke(
-                {"messages": messages},
-                # {"recursion_limit": 100},
-                config={"configurable": {
-                    "environment": self.semantic_model.format_relationships(),
-                    "selected_entity": self.semantic_model.selectedEntity,
+            # Chat runs take priority over bulk work at the LLM call scheduler. The run is
+            # pinned to `snapshot`: the prompt and every tool read the model as of that
+            # version (moved along by the run's own lookups), whatever else changes it meanwhile.
+            # The sizes of the run's own prompts are collected in `prompts`.
+            snapshot = self.semantic_model.snapshot()
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+            with llm_call_context(INTERACTIVE, user_id=self.user_id), self.semantic_model.pinned(snapshot), \
+                    prompt_counts() as prompts:
+                if deltas is None:
+                    turn = None
+                    run_messages = messages
+                    environment = self.environment_context(snapshot.selected_entity)
+                    selected_entity = snapshot.selected_entity
+                else:
+                    turn = deltas.prepare(
+                        self.semantic_model, snapshot, messages, self.environment_context, timestamp,
+                        follow_selection=len(snapshot.facts) > NOUS_CONTEXT_FULL_FACTS,
+                    )
+                    run_messages = turn.messages
+                    environment, selected_entity, timestamp = turn.environment, turn.selected_entity, turn.timestamp
+                config = {"configurable": {
+                    "environment": environment,
+                    "selected_entity": selected_entity,
                     "user_id": self.user_id,
                     "env_id": self.env_id,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                    "timestamp": timestamp,
                     }}
+                # Each LLM call falls back to the route's next model if the preferred one
+                # errors; the steps already taken (and their tool calls) are not repeated
+                final_state = await self.get_app(model_router.chat_model("agent")).ainvoke(
+                    {"messages": run_messages},
+                    # {"recursion_limit": 100},
+                    config=config,
                 )
+            if turn is not None:
+                deltas.commit(turn, messages)
 
+        except asyncio.CancelledError:
+            # Disconnect or superseding message - in-flight tool calls are cancelled with us
+            logger.info(f"Agent run cancelled (ID: {self.conversation_id})")
+            raise
         except Exception as e:
-            console.print(f"Error invoking agent graph: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error invoking agent graph: {e}")
             # Handle error, maybe return an error message or raise
             return f"An error occurred during agent execution: {e}"
 
-        console.print("Agent graph invocation complete.")
+        if prompts:
+            largest = max(prompts, key=lambda counts: counts["total"])
+            logger.info(
+                f"Agent run complete (ID: {self.conversation_id}): {len(prompts)} prompts counted, "
+                f"last {prompts[-1]}, largest {largest}"
+            )
+        else:
+            logger.info(f"Agent run complete (ID: {self.conversation_id})")
 
         if final_state:
-            console.print("Final State:", final_state["messages"][-1].content)
+            logger.debug(f"Final answer: {final_state['messages'][-1].content}")
             # Extract the final answer from the state
             final_answer = final_state["messages"][-1].content
             return final_answer
@@ -0,0 +1,153 @@
+"""
+Compact encoding of tool results for the agent.
+
+Spelling out every fact as "name (UID: uid) relation (UID: uid) name (UID:
+uid)" repeats each entity's name once per fact it takes part in. Here a
+page of facts is written as:
+
+    Entities (uid: name):
+    2: pump
+    3: machine
+    Facts by relation (lh uid -> rh uid):
+    is a specialization of (1146): 2->3, 4->3
+    is a part of (1190): 10->2
+    Facts 1-2 of 40; call again with cursor=2 for more
+
+Facts are de-duplicated by fact_uid and entities by uid, and each entity's
+name appears once in the legend. Facts are ordered by relation type, so a
+page continues the previous page's relation groups. A page stops at
+`max_facts` facts or before it would pass `max_chars` characters, whichever
+comes first. A cursor (the index of the next fact) lets the agent page
+through the rest.
+
+A cursor indexes one particular ordered result, so the following pages must
+come from that same list rather than a new lookup: a repeat may be answered
+by another source (the local indexes once the facts are ingested, or
+Aperture again) in another order, skipping or repeating facts. ResultPages
+keeps the ordered results of recent calls for their continuations.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from src.config import NOUS_TOOL_OUTPUT_MAX_CHARS, NOUS_TOOL_OUTPUT_MAX_FACTS
+
+
+def unique_facts(facts: Iterable[Any]) -> List[Any]:
+    """Facts without repeats by fact_uid (first seen wins), ordered by relation type"""
+    seen = set()
+    unique = []
+    for fact in facts:
+        fact_uid = fact.get('fact_uid')
+        if fact_uid is not None:
+            if fact_uid in seen:
+                continue
+            seen.add(fact_uid)
+        unique.append(fact)
+    # sorted() is stable, so facts keep their order within a relation type
+    return sorted(unique, key=lambda f: (str(f.get('rel_type_name') or ''), str(f.get('rel_type_uid'))))
+
+
+class ResultPages:
+    """Ordered results of the latest paged tool calls, by key (e.g. (tool, uid)), least recently used dropped first"""
+
+    def __init__(self, max_results: int = 32):
+        self.max_results = max_results
+        self._results: "OrderedDict[Hashable, List[Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def keep(self, key: Hashable, facts: Iterable[Any]) -> List[Any]:
+        """Order a call's result for paging (see unique_facts) and keep it for the following pages"""
+        ordered = unique_facts(facts)
+        self._results[key] = ordered
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return ordered
+
+    def get(self, key: Hashable) -> Optional[List[Any]]:
+        """The result kept for `key`, if any"""
+        facts = self._results.get(key)
+        if facts is not None:
+            self._results.move_to_end(key)
+        return facts
+
+
+def _legend(facts: Iterable[Any]) -> Dict[Any, str]:
+    names: Dict[Any, str] = {}
+    for fact in facts:
+        for side in ('lh', 'rh'):
+            uid = fact.get(f'{side}_object_uid')
+            if uid not in names or not names[uid]:
+                names[uid] = fact.get(f'{side}_object_name') or ''
+    return names
+
+
+def _render(facts: List[Any]) -> str:
+    lines = ["Entities (uid: name):"]
+    lines += [f"{uid}: {name}" if name else f"{uid}" for uid, name in _legend(facts).items()]
+    lines.append("Facts by relation (lh uid -> rh uid):")
+    groups: Dict[Tuple[Any, Any], List[str]] = {}
+    for fact in facts:
+        relation = (fact.get('rel_type_name') or 'unknown relation', fact.get('rel_type_uid'))
+        groups.setdefault(relation, []).append(f"{fact.get('lh_object_uid')}->{fact.get('rh_object_uid')}")
+    lines += [f"{name} ({uid}): {', '.join(pairs)}" for (name, uid), pairs in groups.items()]
+    return "\n".join(lines)
+
+
+def encode_facts(facts: Iterable[Any], cursor: int = 0, max_facts: Optional[int] = None,
+                 max_chars: Optional[int] = None, empty: str = "No facts returned") -> str:
+    """
+    One page of facts in the compact format (see module docstring).
+
+    Args:
+        facts: Fact mappings (wire dicts or records)
+        cursor: Index of the first fact to include, from a previous page
+        max_facts: Facts per page (default NOUS_TOOL_OUTPUT_MAX_FACTS)
+        max_chars: Characters per page (default NOUS_TOOL_OUTPUT_MAX_CHARS)
+        empty: Text for no facts at all
+    """
+    max_facts = NOUS_TOOL_OUTPUT_MAX_FACTS if max_facts is None else max_facts
+    max_chars = NOUS_TOOL_OUTPUT_MAX_CHARS if max_chars is None else max_chars
+    facts = unique_facts(facts)
+    total = len(facts)
+    if total == 0:
+        return empty
+    cursor = max(0, int(cursor or 0))
+    if cursor >= total:
+        return f"No more facts: all {total} were shown (cursor={cursor})"
+
+    end = min(total, cursor + max(1, max_facts))
+    text = _render(facts[cursor:end])
+    if len(text) > max_chars:
+        # Shrink to the longest page that fits (always at least one fact)
+        low, high = cursor + 1, end - 1
+        while low <= high:
+            middle = (low + high) // 2
+            if len(_render(facts[cursor:middle])) <= max_chars:
+                low = middle + 1
+            else:
+                high = middle - 1
+        end = max(cursor + 1, high)
+        text = _render(facts[cursor:end])
+    if cursor == 0 and end == total:
+        return text
+    footer = f"Facts {cursor + 1}-{end} of {total}"
+    if end < total:
+        footer += f"; call again with cursor={end} for more"
+    return f"{text}\n{footer}"
+
+
+def encode_uids(uids: Iterable[Any], names: Optional[Dict[Any, str]] = None,
+                max_items: Optional[int] = None) -> str:
+    """UIDs without repeats (in first-seen order), with their names where known, capped at `max_items`"""
+    max_items = NOUS_TOOL_OUTPUT_MAX_FACTS if max_items is None else max_items
+    names = names or {}
+    unique = list(dict.fromkeys(uids))
+    shown = [f"{uid} ({names[uid]})" if names.get(uid) else f"{uid}" for uid in unique[:max_items]]
+    text = ", ".join(shown)
+    if len(unique) > max_items:
+        text += f" and {len(unique) - max_items} more"
+    return text
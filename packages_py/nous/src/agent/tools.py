@@ -3,15 +3,20 @@
 from rich import print
 
 import asyncio
+import functools
+import shlex
 from typing import Optional, List, Tuple, Literal
 from pydantic import BaseModel, Field
 from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
 
+from src.llm.routing import model_router
+from src.models.query import QueryError
 from src.models.semantic_model import semantic_model
-from src.config import CATEGORY_ROOTS
+from src.config import CATEGORY_ROOTS, NOUS_CONTEXT_MAX_NODES
+from src.utils.metrics import metrics
 from .concept_placement import get_subtypes_with_definitions, select_best_subtype, find_best_placement_recursive
+from .tool_output import ResultPages, encode_facts, encode_uids
 
 # Pydantic models for structured output
 class ConceptCategory(BaseModel):
@@ -50,16 +55,100 @@ def facts_to_metadata_str(facts) -> str:
 
     return "\n".join(metadata)
 
-def create_agent_tools(aperture_proxy,
-                       archivist_proxy):
-    """Creates and returns LangChain tools and related metadata configured with a specific ApertureClientProxy."""
+def facts_to_result_str(facts, cursor: int = 0) -> str:
+    """A page of facts for the agent: entity legend plus triples grouped by relation (see tool_output)"""
+    return encode_facts(facts, cursor)
+
+def parse_query_patterns(query: str) -> List[Tuple]:
+    """Patterns from 'lh rel rh; lh rel rh' text: UIDs (or comma-separated UIDs), quoted names, ?variables, _"""
+    patterns = []
+    for line in query.replace('\n', ';').split(';'):
+        if not line.strip():
+            continue
+        terms = []
+        for token in shlex.split(line):
+            if token.isdigit():
+                terms.append(int(token))
+            elif ',' in token and all(part.strip().isdigit() for part in token.split(',')):
+                terms.append([int(part) for part in token.split(',')])
+            else:
+                terms.append(token)
+        patterns.append(tuple(terms))
+    return patterns
+
+def query_result_str(result) -> str:
+    if not result.rows:
+        return "No matches in the environment"
+    lines = [
+        "- " + ", ".join(
+            f"?{var} = {result.names.get(uid, 'unnamed')} (UID: {uid})"
+            for var, uid in zip(result.variables, row)
+        )
+        for row in result.rows
+    ]
+    return f"\t{len(result.rows)} match(es):\n" + "\n".join(lines)
 
-    # Initialize LLM for concept placement tools
-    llm = ChatGroq(
-        model="qwen-qwq-32b",
-        temperature=0.1,  # Low temperature for consistent classification
-        max_retries=2,
-    )
+def track_tool_call(tool_fn):
+    """Count calls of an async tool, including the ones cancelled mid-flight with their agent run."""
+    @functools.wraps(tool_fn)
+    async def wrapper(*args, **kwargs):
+        metrics.increment("tool_calls")
+        try:
+            return await tool_fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            metrics.increment("tool_calls_cancelled")
+            print(f"Tool '{tool_fn.__name__}' cancelled")
+            raise
+    return wrapper
+
+def create_agent_tools(aperture_proxy,
+                       archivist_proxy,
+                       working_set=None,
+                       result_pages=None):
+    """
+    Creates and returns LangChain tools and related metadata configured with a specific ApertureClientProxy.
+
+    With a `working_set` (the conversation's WorkingSet), load tools repeated
+    for a UID are answered from the facts still loaded since the first call.
+    Calls with a cursor continue the result kept in `result_pages` (the
+    conversation's ResultPages, else one for these tools) by the call that
+    returned the first page, whichever source answered it.
+
+    The tools read the semantic model through `semantic_model.reader()`, so
+    inside a pinned agent run (SemanticModel.pinned) every call sees the
+    version the run started on, plus the run's own lookups.
+    """
+    if result_pages is None:
+        result_pages = ResultPages()
+
+    def paged(tool: str, key, facts, cursor: int = 0) -> str:
+        """A page of a tool's result; the whole ordered result is kept so the following pages continue it"""
+        return facts_to_result_str(result_pages.keep((tool, key), facts), cursor)
+
+    def continued(tool: str, key, cursor: int) -> Optional[str]:
+        """A later page of an earlier call's result, from the kept result rather than a new lookup"""
+        if not cursor:
+            return None
+        facts = result_pages.get((tool, key))
+        return None if facts is None else facts_to_result_str(facts, cursor)
+
+    def recalled(tool: str, uid: int, cursor: int = 0) -> Optional[str]:
+        """Short local answer for a repeat of an earlier `tool(uid)` call, if its facts are still loaded"""
+        if working_set is None:
+            return None
+        facts = working_set.recall(tool, uid, semantic_model.reader())
+        if facts is None:
+            return None
+        if not facts:
+            return f"{tool}({uid}) was already called in this conversation and returned no facts"
+        page = paged(tool, uid, facts, cursor)
+        if cursor:
+            return page
+        return f"{tool}({uid}) was already called in this conversation; its {len(facts)} facts are loaded:\n{page}"
+
+    def remember(tool: str, uid: int, facts):
+        if working_set is not None and isinstance(facts, list):
+            working_set.record(tool, uid, facts, semantic_model)
 
     # --- Concept Placement Tools --- #
     
@@ -93,8 +182,12 @@ Categories:
 Respond with the most appropriate category and brief reasoning.
 """)
             
-            categorize_chain = categorization_prompt | llm.with_structured_output(ConceptCategory)
-            result = await categorize_chain.ainvoke({"term": term, "definition": definition})
+            result = await model_router.run(
+                "categorize",
+                lambda llm: (categorization_prompt | llm.with_structured_output(ConceptCategory)).ainvoke(
+                    {"term": term, "definition": definition}
+                ),
+            )
             
             return f"Category: {result.category}\nReasoning: {result.reasoning}"
             
@@ -121,7 +214,7 @@ Respond with the most appropriate category and brief reasoning.
             
             # Find the best placement using the standalone function
             optimal_uid = await find_best_placement_recursive(
-                term, definition, root_uid, aperture_proxy, llm
+                term, definition, root_uid, archivist_proxy
             )
             
             return f"Optimal placement for '{term}':\nUID: {optimal_uid}\nCategory: {category}\n\nTo get more details about this entity, use getEntityDefinition({optimal_uid})"
@@ -140,6 +233,11 @@ Respond with the most appropriate category and brief reasoning.
         # when calling the actual textSearchLoad method.
         print(f"Tool 'textSearchExact' called with search_term: {search_term}")
         try:
+            # Names already in the environment resolve locally without a search round-trip
+            local_uids = semantic_model.reader().names.exact(search_term)
+            if local_uids:
+                return f"Found entities matching \"{search_term}\": UIDs {encode_uids(local_uids)}"
+
             result = await aperture_proxy.textSearchLoad(search_term)
             print(f"Result from aperture_proxy.textSearchLoad: {result}")
 
@@ -151,10 +249,15 @@ Respond with the most appropriate category and brief reasoning.
 
             # Process the result to return a concise summary or list of UIDs
             uids = [fact['lh_object_uid'] for fact in facts]
+            names = {fact['lh_object_uid']: fact.get('lh_object_name') for fact in facts}
             if not uids:
+                suggestions = semantic_model.reader().names.lookup(search_term, limit=5)
+                if suggestions:
+                    similar = ", ".join(f"{m.name} (UIDs: {m.uids})" for m in suggestions)
+                    return f"No entity found with the name \"{search_term}\". Similar names in the environment: {similar}"
                 return f"No entity found with the name \"{search_term}\""
             else:
-                return f"Found entities matching \"{search_term}\": UIDs {uids}"
+                return f"Found entities matching \"{search_term}\": UIDs {encode_uids(uids, names)}"
 
         except Exception as e:
             # Log the exception for debugging
@@ -172,6 +275,10 @@ Respond with the most appropriate category and brief reasoning.
         # when calling the actual textSearchLoad method.
         print(f"Tool 'uidSearchLoad' called with search_uid: {search_uid}")
         try:
+            local_answer = recalled("uidSearchLoad", search_uid)
+            if local_answer:
+                return local_answer
+
             result = await aperture_proxy.uidSearchLoad(search_uid)
             print(f"Result from aperture_proxy.uidSearchLoad: {result}")
 
@@ -180,13 +287,16 @@ Respond with the most appropriate category and brief reasoning.
 
             environment = result#.get('environment')
             facts = environment.get('facts', [])
+            if "error" not in environment:
+                remember("uidSearchLoad", search_uid, facts)
 
             # Process the result to return a concise summary or list of UIDs
             uids = [fact['lh_object_uid'] for fact in facts]
+            names = {fact['lh_object_uid']: fact.get('lh_object_name') for fact in facts}
             if not uids:
                 return f"No entity found with the name \"{search_uid}\""
             else:
-                return f"Found entities matching \"{search_uid}\": UIDs {uids}"
+                return f"Found entities matching \"{search_uid}\": UIDs {encode_uids(uids, names)}"
 
         except Exception as e:
             # Log the exception for debugging
@@ -197,36 +307,51 @@ Respond with the most appropriate category and brief reasoning.
 
     # --- Specialization Operations --- #
 
-    async def loadDirectSupertypes(uid: int)->str:
+    async def loadDirectSupertypes(uid: int, cursor: int = 0)->str:
         """Use this to retrieve the specialization fact(s) of a kind, it's supertypes. Provide the uid of the kind, and the system will return a string representation of the specialization fact.
             Args:
                 uid: The unique identifier of the kind to retrieve the specialization fact for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         uid = int(uid)
+        page = continued("loadDirectSupertypes", uid, cursor)
+        if page:
+            return page
+        # Supertypes looked up before, all in the environment, are answered from the local taxonomy index
+        local_facts = semantic_model.reader().taxonomy.supertype_facts(uid, environment_only=True)
+        if local_facts is not None:
+            return paged("loadDirectSupertypes", uid, local_facts, cursor)
+
+        local_answer = recalled("loadDirectSupertypes", uid, cursor)
+        if local_answer:
+            return local_answer
+
         # Assumes retrieveSpecializationFact exists on the proxy/client
         result = await aperture_proxy.loadSpecializationFact(uid)
 
         if result is None or ('facts' not in result):
              return "No kind with that uid exists or no facts returned"
 
-        related_str = facts_to_related_entities_str(result["facts"])
-        relationships_str = facts_to_relations_str(result["facts"])
-
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
+        remember("loadDirectSupertypes", uid, result["facts"])
+        semantic_model.taxonomy.learn(result["facts"], supertypes_of=uid)
+        return paged("loadDirectSupertypes", uid, result["facts"], cursor)
 
-    async def getDirectSubtypes(uid: int)->str:
+    async def getDirectSubtypes(uid: int, cursor: int = 0)->str:
         """Use this to get the direct subtypes of a kind. Provide the uid of the kind, and the system will return a string representation of the subtypes. *will not* load to environment
             Args:
                 uid: The unique identifier of the kind to retrieve the subtypes for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         print("GET SUBTYPES", uid)
         uid = int(uid)
+        page = continued("getDirectSubtypes", uid, cursor)
+        if page:
+            return page
+
+        # Subtypes looked up before are answered from the local taxonomy index
+        local_facts = semantic_model.reader().taxonomy.subtype_facts(uid)
+        if local_facts is not None:
+            return paged("getDirectSubtypes", uid, local_facts, cursor)
 
         result = await archivist_proxy.get_subtypes(uid)
 
@@ -235,188 +360,254 @@ Respond with the most appropriate category and brief reasoning.
         # if result is None or ('facts' not in result):
         #     return "No kind with that uid exists or no facts returned"
 
-        related_str = facts_to_related_entities_str(result)
-        relationships_str = facts_to_relations_str(result)
-
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
+        if isinstance(result, list):
+            semantic_model.taxonomy.learn(result, subtypes_of=uid)
+        return paged("getDirectSubtypes", uid, result, cursor)
 
-    async def loadDirectSubtypes(uid: int)->str:
+    async def loadDirectSubtypes(uid: int, cursor: int = 0)->str:
         """Use this to load the direct subtypes of a kind. Provide the uid of the kind, and the system will return a string representation of the subtypes. *and load the subtypes into the environment*
             Args:
                 uid: The unique identifier of the kind to retrieve the subtypes for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         print("LOAD SUBTYPES", uid)
         uid = int(uid)
+        page = continued("loadDirectSubtypes", uid, cursor)
+        if page:
+            return page
+        local_answer = recalled("loadDirectSubtypes", uid, cursor)
+        if local_answer:
+            return local_answer
+
         # Assumes retrieveSubtypes exists on the proxy/client
         result = await aperture_proxy.loadSubtypes(uid)
 
         if result is None or ('facts' not in result):
             return "No kind with that uid exists or no facts returned"
 
-        related_str = facts_to_related_entities_str(result["facts"])
-        relationships_str = facts_to_relations_str(result["facts"])
-
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
+        remember("loadDirectSubtypes", uid, result["facts"])
+        semantic_model.taxonomy.learn(result["facts"], subtypes_of=uid)
+        return paged("loadDirectSubtypes", uid, result["facts"], cursor)
 
 
-    async def loadLineage(uid: int)->str:
+    async def loadLineage(uid: int, cursor: int = 0)->str:
         """Use this to retrieve the specialization hierarchy of a kind, it's lineage. Provide the uid of the kind, and the system will return a string representation of the hierarchy.
             Args:
                 uid: The unique identifier of the kind to retrieve the hierarchy for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         uid = int(uid)
+        page = continued("loadLineage", uid, cursor)
+        if page:
+            return page
+        # A lineage already in the environment up to the root is answered locally
+        local_facts = semantic_model.reader().taxonomy.lineage_facts(uid, environment_only=True)
+        if local_facts:
+            return paged("loadLineage", uid, local_facts, cursor)
+
+        local_answer = recalled("loadLineage", uid, cursor)
+        if local_answer:
+            return local_answer
+
         # Assumes retrieveSpecializationHierarchy exists on the proxy/client
         result = await aperture_proxy.loadSpecializationHierarchy(uid)
 
         if result is None or ('facts' not in result):
             return "No kind with that uid exists or no facts returned"
 
-        related_str = facts_to_related_entities_str(result["facts"])
-        relationships_str = facts_to_relations_str(result["facts"])
-
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
+        remember("loadLineage", uid, result["facts"])
+        semantic_model.taxonomy.learn(result["facts"])
+        return paged("loadLineage", uid, result["facts"], cursor)
 
 
     # --- Classification Operations --- #
 
-    async def loadClassifier(uid: int)->str:
+    async def loadClassifier(uid: int, cursor: int = 0)->str:
         """Use this to retrieve the classification fact(s) of an individual, the relation relating it to it's type and further knowledge about what it fundamentally is. Provide the uid of the individual, and the system will return a string representation of the classification fact(s).
             Args:
                 uid: The unique identifier of the individual to retrieve the classification fact(s) for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         uid = int(uid)
+        page = continued("loadClassifier", uid, cursor)
+        if page:
+            return page
+        # Already in the environment - answer from the local classification index
+        local_facts = semantic_model.reader().classification.classifier_facts(uid, environment_only=True)
+        if local_facts is not None:
+            return paged("loadClassifier", uid, local_facts, cursor)
+
+        local_answer = recalled("loadClassifier", uid, cursor)
+        if local_answer:
+            return local_answer
+
         # Assumes retrieveClassificationFact exists on the proxy/client
         result = await aperture_proxy.loadClassificationFact(uid)
 
         if result is None or ('facts' not in result):
             return "No individual with that uid exists or no facts returned"
 
-        related_str = facts_to_related_entities_str(result["facts"])
-        relationships_str = facts_to_relations_str(result["facts"])
-
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
+        remember("loadClassifier", uid, result["facts"])
+        semantic_model.classification.learn(result["facts"], classifiers_of=uid)
+        return paged("loadClassifier", uid, result["facts"], cursor)
 
 
-    async def loadClassified(uid: int)->str:
+    async def loadClassified(uid: int, cursor: int = 0)->str:
         """Use this to retrieve the classified entities of a kind, the instances. Provide the uid of the kind, and the system will return a string representation of the classified entities.
             Args:
                 uid: The unique identifier of the kind to retrieve the classified entities for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         uid = int(uid)
+        page = continued("loadClassified", uid, cursor)
+        if page:
+            return page
+        # Instances loaded by an earlier call are answered from the local classification index
+        local_facts = semantic_model.reader().classification.classified_facts(uid, environment_only=True)
+        if local_facts is not None:
+            return paged("loadClassified", uid, local_facts, cursor)
+
+        local_answer = recalled("loadClassified", uid, cursor)
+        if local_answer:
+            return local_answer
+
         # Assumes retrieveClassified exists on the proxy/client
         result = await aperture_proxy.loadClassified(uid)
 
         if result is None or ('facts' not in result):
             return "No kind with that uid exists or no facts returned"
 
-        related_str = facts_to_related_entities_str(result["facts"])
-        relationships_str = facts_to_relations_str(result["facts"])
+        remember("loadClassified", uid, result["facts"])
+        semantic_model.classification.learn(result["facts"], classified_of=uid)
+        return paged("loadClassified", uid, result["facts"], cursor)
 
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
+    async def getEnvironmentInstances(uid: int, cursor: int = 0)->str:
+        """Use this to list the individuals in the current environment that are classified as a kind or any of its subtypes. Answers from the loaded environment only (no lookup), so use loadClassified to find instances that are not loaded yet.
+            Args:
+                uid: The unique identifier of the kind to list the instances of
+                cursor: Where to continue a long result from (given at the end of the previous page)
+        """
+        uid = int(uid)
+        page = continued("getEnvironmentInstances", uid, cursor)
+        if page:
+            return page
+        model = semantic_model.reader()
+        facts = model.classification.instance_facts(uid, model.taxonomy, environment_only=True)
+
+        if not facts:
+            return "No instances of that kind or its subtypes are loaded in the environment"
+
+        return paged("getEnvironmentInstances", uid, facts, cursor)
 
 
     # -- Relation Operations  --- #
 
-    async def loadRelations(uid: int)->str:
+    async def loadRelations(uid: int, cursor: int = 0)->str:
         """Use this to retrieve the direct relations an entity is involved in (specialization and classification non inclusive).
         Provide the uid of the kind, and the system will return a string representation of the direct relations.
             Args:
                 uid: The unique identifier of the entity to retrieve the relations for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         uid = int(uid)
+        page = continued("loadRelations", uid, cursor)
+        if page:
+            return page
+        local_answer = recalled("loadRelations", uid, cursor)
+        if local_answer:
+            return local_answer
+
         result = await aperture_proxy.loadAllRelatedFacts(uid)
 
         if result is None or ('facts' not in result):
             return "No kind with that uid exists or no facts returned"
 
-        related_str = facts_to_related_entities_str(result["facts"])
-        relationships_str = facts_to_relations_str(result["facts"])
+        remember("loadRelations", uid, result["facts"])
+        return paged("loadRelations", uid, result["facts"], cursor)
 
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
 
+    async def getNeighborhood(uid: int, hops: int = 2, relation_type_uid: Optional[int] = None, cursor: int = 0)->str:
+        """Use this to get everything within a few hops of an entity in the current environment: the entities it is related to, the entities those are related to, and the facts between them. Answers from the loaded environment only (no lookup), so use loadRelations to load relations that are not loaded yet.
+            Args:
+                uid: The unique identifier of the entity to start from
+                hops: How many relations to follow outwards (1-3, default 2)
+                relation_type_uid: Only follow relations of this type (e.g. 1146 for specialization)
+                cursor: Where to continue a long result from (given at the end of the previous page)
+        """
+        uid = int(uid)
+        hops = max(1, min(int(hops), 3))
+        rel_types = None if relation_type_uid is None else [int(relation_type_uid)]
+        page = continued("getNeighborhood", (uid, hops, relation_type_uid), cursor)
+        if page:
+            return page
+        _, facts = semantic_model.reader().subgraph(uid, hops=hops, rel_types=rel_types, max_nodes=NOUS_CONTEXT_MAX_NODES)
+
+        if not facts:
+            return "No facts involving that entity are loaded in the environment"
+
+        return paged("getNeighborhood", (uid, hops, relation_type_uid), facts, cursor)
 
-    async def loadRoleRequirements(uid: int)->str:
+
+    async def queryFacts(query: str, limit: int = 50)->str:
+        """Use this to ask questions about the facts loaded in the current environment in one step, answered locally. The query is one or more patterns separated by ';', each "left-hand-object relation-type right-hand-object". Each part is a UID, several UIDs separated by commas, a "quoted exact name", a ?variable, or _ for anything. Every pattern must match; a ?variable takes the same value everywhere it is used, and patterns must be linked through shared ?variables.
+        Examples: `?x 1225 ?kind` (every individual and what it is classified as); `?part 1190 "pump"; ?part 1225 ?kind` (the parts of the pump and their kinds); `12345 1146 ?super` (the supertypes of 12345).
+            Args:
+                query: The patterns, separated by ';'
+                limit: Maximum number of matches to return
+        """
+        try:
+            result = semantic_model.reader().query(parse_query_patterns(query), limit=max(1, int(limit)))
+        except (QueryError, ValueError) as e:
+            return f"Invalid query: {e}"
+        return query_result_str(result)
+
+
+    async def loadRoleRequirements(uid: int, cursor: int = 0)->str:
         """Use this to retrieve the role requirements of a relation entity.
         Provide the uid of the relation, and the system will return a string representation of the relations 2 required roles.
             Args:
                 uid: The unique identifier of the relation entity to retrieve the role requirements for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         uid = int(uid)
+        page = continued("loadRoleRequirements", uid, cursor)
+        if page:
+            return page
+        local_answer = recalled("loadRoleRequirements", uid, cursor)
+        if local_answer:
+            return local_answer
+
         result = await aperture_proxy.loadRequiredRoles(uid)
 
         if result is None or ('facts' not in result):
             return "No relation with that uid exists or no facts returned"
 
-        related_str = facts_to_relations_str(result["facts"])
-        relationships_str = facts_to_relations_str(result["facts"])
-
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
+        remember("loadRoleRequirements", uid, result["facts"])
+        return paged("loadRoleRequirements", uid, result["facts"], cursor)
 
 
-    async def loadRolePlayers(uid: int)->str:
+    async def loadRolePlayers(uid: int, cursor: int = 0)->str:
         """Use this to retrieve the role players of a relation entity.
         Provide the uid of the relation, and the system will return a string representation of the entities that can play the roles required by the relation.
             Args:
                 uid: The unique identifier of the relation entity to retrieve the role players for
+                cursor: Where to continue a long result from (given at the end of the previous page)
         """
         uid = int(uid)
+        page = continued("loadRolePlayers", uid, cursor)
+        if page:
+            return page
+        local_answer = recalled("loadRolePlayers", uid, cursor)
+        if local_answer:
+            return local_answer
+
         result = await aperture_proxy.loadRolePlayers(uid)
 
         if result is None or ('facts' not in result):
             return "No relation with that uid exists or no facts returned"
 
-        related_str = facts_to_relations_str(result["facts"])
-        relationships_str = facts_to_relations_str(result["facts"])
-
-        ret =  (
-            f"\tRelated Entities (uid:name):\n"
-            f"{related_str}\n"
-            f"\tRelationships in the following format ([left hand object uid],[relation type uid],[right hand object uid]):\n"
-            f"{relationships_str}"
-        )
-        return ret
+        remember("loadRolePlayers", uid, result["facts"])
+        return paged("loadRolePlayers", uid, result["facts"], cursor)
 
      
     # Active Tools --- #
@@ -568,8 +759,11 @@ Respond with the most appropriate category and brief reasoning.
         # --- Classification Tools ---
         loadClassifier,
         loadClassified,
+        getEnvironmentInstances,
         # --- Relation Tools ---
         loadRelations,
+        getNeighborhood,
+        queryFacts,
         loadRoleRequirements,
         loadRolePlayers,
         # --- Entity Tools ---
@@ -577,5 +771,5 @@ Respond with the most appropriate category and brief reasoning.
         ]
 
     return {
-        "tools": active_tools,
+        "tools": [track_tool_call(t) for t in active_tools],
     }
@@ -0,0 +1,75 @@
+"""
+Per-conversation record of the load tool calls already satisfied.
+
+Agents often repeat a lookup (`loadLineage`, `loadRelations`...) for a UID
+they loaded a few steps or turns earlier. The working set remembers each
+(tool, uid) call with the fact UIDs it returned and the model version at the
+time. A repeat is recalled locally while those facts are all still loaded:
+straight away if the model has not changed since, otherwise after checking
+the fact UIDs against the fact table. Once any of them has been unloaded,
+the entry is dropped and the tool goes back to Aperture.
+
+Entries are kept in least-recently-used order, at most `max_entries`.
+"""
+
+from collections import OrderedDict
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.config import NOUS_WORKING_SET_SIZE
+from src.models.records import Fact
+from src.utils.metrics import metrics
+
+
+class WorkingEntry(NamedTuple):
+    version: int                # model version when the call was satisfied
+    fact_uids: Tuple[Any, ...]  # facts the call returned
+    facts: Tuple[Fact, ...]     # their records in the model at that version
+
+
+class WorkingSet:
+    """(tool, uid) load calls satisfied earlier in one conversation"""
+
+    def __init__(self, max_entries: int = NOUS_WORKING_SET_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Any], WorkingEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def record(self, tool: str, uid: Any, facts: Iterable[Any], model):
+        """Remember that `tool(uid)` returned `facts`, if they are all loaded in `model`"""
+        if self.max_entries <= 0:
+            return
+        fact_uids = tuple(f['fact_uid'] for f in facts)
+        records = tuple(model.table.get(f) for f in fact_uids)
+        if any(r is None for r in records):
+            # Not (or no longer) loaded, so a repeat could not be answered locally
+            return
+        key = (tool, uid)
+        self._entries[key] = WorkingEntry(model.version, fact_uids, records)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def recall(self, tool: str, uid: Any, model) -> Optional[List[Fact]]:
+        """The current facts of an earlier `tool(uid)` call, or None if there was none or some were unloaded"""
+        key = (tool, uid)
+        entry = self._entries.get(key)
+        if entry is None:
+            metrics.increment("working_set_misses")
+            return None
+        if entry.version == model.version:
+            facts = list(entry.facts)
+        else:
+            facts = [model.table.get(f) for f in entry.fact_uids]
+            if any(f is None for f in facts):
+                del self._entries[key]
+                metrics.increment("working_set_stale")
+                return None
+            self._entries[key] = WorkingEntry(model.version, entry.fact_uids, tuple(facts))
+        self._entries.move_to_end(key)
+        metrics.increment("working_set_hits")
+        return facts
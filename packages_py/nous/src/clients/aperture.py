@@ -1,10 +1,16 @@
 import os
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from .base import BaseSocketIOClient
 
 logger = logging.getLogger('aperture-client')
 
+# Events broadcast by Aperture (see websocket-contracts ApertureEvents)
+FACTS_LOADED = 'aperture.facts/loaded'
+FACTS_UNLOADED = 'aperture.facts/unloaded'
+ENTITY_SELECTED = 'aperture.entity/selected'
+ENTITY_DESELECTED = 'aperture.entity/deselected'
+
 class ApertureClient(BaseSocketIOClient):
     """Socket.IO client for Aperture service"""
     
@@ -97,6 +103,24 @@ class ApertureClient(BaseSocketIOClient):
             logger.error(f"Failed to clear environment: {e}")
             return False
     
+    # Event subscriptions
+
+    def on_facts_loaded(self, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Subscribe to facts added to an environment ({facts, userId, environmentId})"""
+        self.subscribe(FACTS_LOADED, handler)
+
+    def on_facts_unloaded(self, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Subscribe to facts removed from an environment ({factUids, modelUids, userId, environmentId})"""
+        self.subscribe(FACTS_UNLOADED, handler)
+
+    def on_entity_selected(self, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Subscribe to entity selection in an environment"""
+        self.subscribe(ENTITY_SELECTED, handler)
+
+    def on_entity_deselected(self, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Subscribe to entity deselection in an environment"""
+        self.subscribe(ENTITY_DESELECTED, handler)
+    
     async def get_user_environments(self, user_id: str) -> List[Dict[str, Any]]:
         """Get all environments for a user"""
         return await self.send_request('aperture.environment/list', {
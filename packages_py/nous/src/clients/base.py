@@ -1,7 +1,7 @@
 import asyncio
 import logging
 import socketio  # python-socketio
-from typing import Any, Dict, Optional, Callable
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -22,6 +22,9 @@ class BaseSocketIOClient:
             engineio_logger=logger
         )
         self.connected = False
+        self._ever_connected = False
+        self._event_handlers: Dict[str, List[Callable[[Any], Awaitable[None]]]] = {}
+        self._reconnect_handlers: List[Callable[[], Awaitable[None]]] = []
         
         # Register standard event handlers
         self.sio.on('connect', self._on_connect)
@@ -47,6 +50,11 @@ class BaseSocketIOClient:
         """Handle connection event"""
         self.connected = True
         logger.info(f"Connected to {self.service_name} service")
+        if self._ever_connected:
+            # Events broadcast while we were away are lost
+            for handler in self._reconnect_handlers:
+                asyncio.create_task(self._run_handler(f"{self.service_name} reconnect", handler))
+        self._ever_connected = True
     
     async def _on_disconnect(self):
         """Handle disconnect event"""
@@ -95,6 +103,28 @@ class BaseSocketIOClient:
         
         await self.sio.emit(event, data)
     
+    def subscribe(self, event: str, handler: Callable[[Any], Awaitable[None]]):
+        """Call `handler(data)` for every `event` broadcast by the service"""
+        if event not in self._event_handlers:
+            self._event_handlers[event] = []
+
+            async def dispatch(data=None):
+                for registered in list(self._event_handlers[event]):
+                    await self._run_handler(event, registered, data)
+
+            self.sio.on(event, dispatch)
+        self._event_handlers[event].append(handler)
+
+    def on_reconnect(self, handler: Callable[[], Awaitable[None]]):
+        """Call `handler()` after the connection is re-established (not on the first connect)"""
+        self._reconnect_handlers.append(handler)
+
+    async def _run_handler(self, name: str, handler: Callable[..., Awaitable[None]], *args):
+        try:
+            await handler(*args)
+        except Exception as e:
+            logger.error(f"{name} handler failed: {e}", exc_info=True)
+    
     def is_connected(self) -> bool:
         """Check if connected to service"""
         return self.connected
\ No newline at end of file
@@ -1,10 +1,13 @@
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from .base import BaseSocketIOClient
 
 logger = logging.getLogger('clarity-client')
 
+MODEL_GET_BATCH = 'clarity.model/get-batch'
+
 class ClarityClient(BaseSocketIOClient):
     """Socket.IO client for Clarity service"""
     
@@ -12,6 +15,84 @@ class ClarityClient(BaseSocketIOClient):
         host = os.getenv('CLARITY_HOST', 'localhost')
         port = int(os.getenv('CLARITY_PORT', '3001'))
         super().__init__('clarity', host, port)
+        # Batched model retrieval: UIDs per request and requests in flight at once
+        self.model_batch_size = int(os.getenv('CLARITY_MODEL_BATCH_SIZE', '100'))
+        self._model_requests = asyncio.Semaphore(int(os.getenv('CLARITY_MODEL_CONCURRENCY', '4')))
+        # UIDs requested and not yet answered, shared by concurrent callers
+        self._models_in_flight: Dict[int, asyncio.Future] = {}
+
+    async def retrieve_models(
+        self,
+        uids: Iterable[Any],
+        on_models: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve the semantic models for a set of entity UIDs.
+
+        The UIDs are requested in chunks of `model_batch_size`, with at most
+        CLARITY_MODEL_CONCURRENCY chunks in flight across all callers. UIDs
+        another call is already fetching are not requested again; this call
+        waits for them instead.
+
+        Args:
+            uids: Entity UIDs
+            on_models: Called with each chunk's models as it arrives (only for
+                the chunks this call requests)
+
+        Returns:
+            The models found, in no particular order
+        """
+        if not self.connected:
+            logger.error(f"Cannot retrieve models: not connected to {self.service_name}")
+            return []
+
+        wanted = list(dict.fromkeys(int(uid) for uid in uids if uid is not None))
+        pending = [self._models_in_flight[uid] for uid in wanted if uid in self._models_in_flight]
+        new = [uid for uid in wanted if uid not in self._models_in_flight]
+        loop = asyncio.get_running_loop()
+        registered = {uid: loop.create_future() for uid in new}
+        self._models_in_flight.update(registered)
+
+        size = max(1, self.model_batch_size)
+        chunks = [new[i:i + size] for i in range(0, len(new), size)]
+        try:
+            fetched = await asyncio.gather(*(self._retrieve_model_chunk(chunk, on_models) for chunk in chunks))
+            # Shielded: cancelling this call must not cancel fetches other callers wait on too
+            shared = await asyncio.gather(*(asyncio.shield(future) for future in pending))
+        finally:
+            # Cancelled before (or while) the chunks ran: release the UIDs so later calls fetch them
+            for uid, future in registered.items():
+                if self._models_in_flight.get(uid) is future:
+                    del self._models_in_flight[uid]
+                if not future.done():
+                    future.set_result(None)
+        return [model for models in fetched for model in models] + [model for model in shared if model]
+
+    async def _retrieve_model_chunk(self, uids: List[int], on_models) -> List[Dict[str, Any]]:
+        models: List[Dict[str, Any]] = []
+        try:
+            async with self._model_requests:
+                data = await self.send_request(MODEL_GET_BATCH, {'uids': uids})
+            # Clarity answers with the list of models; older builds wrap it in {'models': [...]}
+            if isinstance(data, dict):
+                data = data.get('models', [])
+            models = [model for model in data or [] if model]
+            if on_models is not None:
+                on_models(models)
+        except Exception as e:
+            logger.error(f"Failed to retrieve models for {len(uids)} UIDs: {e}")
+        finally:
+            by_uid = {}
+            for model in models:
+                try:
+                    by_uid[int(model['uid'])] = model
+                except (KeyError, TypeError, ValueError):
+                    pass
+            for uid in uids:
+                future = self._models_in_flight.pop(uid, None)
+                if future is not None and not future.done():
+                    future.set_result(by_uid.get(uid))
+        return models
     
     async def transform_model(self, transformation_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """Apply semantic model transformation"""
@@ -23,6 +23,68 @@ CLARITY_URL = os.getenv('CLARITY_URL', 'http://localhost:3001')
 SOCKETIO_CORS_ORIGINS = '*'  # Configure based on your security needs
 SOCKETIO_ASYNC_MODE = 'aiohttp'
 
+# Chat admission control
+NOUS_MAX_CONCURRENT_RUNS = int(os.getenv('NOUS_MAX_CONCURRENT_RUNS', '4'))
+NOUS_MAX_QUEUED_RUNS = int(os.getenv('NOUS_MAX_QUEUED_RUNS', '64'))
+NOUS_MAX_QUEUED_RUNS_PER_USER = int(os.getenv('NOUS_MAX_QUEUED_RUNS_PER_USER', '8'))
+
+# LLM clients
+# Per-model concurrency limits, e.g. "anthropic:claude-3-7-sonnet-latest=4,groq:qwen-qwq-32b=8"
+LLM_DEFAULT_CONCURRENCY = int(os.getenv('LLM_DEFAULT_CONCURRENCY', '8'))
+LLM_CONCURRENCY_LIMITS = {
+    key.strip(): int(value)
+    for key, _, value in (
+        item.rpartition('=') for item in os.getenv('LLM_CONCURRENCY_LIMITS', '').split(',') if item.strip()
+    )
+}
+
+# Per-model rate limits as requests/min and tokens/min, e.g. "groq:qwen-qwq-32b=30/6000"
+LLM_DEFAULT_RPM = float(os.getenv('LLM_DEFAULT_RPM', '50'))
+LLM_DEFAULT_TPM = float(os.getenv('LLM_DEFAULT_TPM', '40000'))
+LLM_RATE_LIMITS = {
+    key.strip(): tuple(float(part) for part in value.split('/', 1))
+    for key, _, value in (
+        item.rpartition('=') for item in os.getenv('LLM_RATE_LIMITS', '').split(',') if item.strip()
+    )
+}
+
+# Agent context: environments with more facts than this are cut down to the
+# selected entity's neighbourhood (hops out, at most so many entities)
+NOUS_CONTEXT_FULL_FACTS = int(os.getenv('NOUS_CONTEXT_FULL_FACTS', '500'))
+NOUS_CONTEXT_HOPS = int(os.getenv('NOUS_CONTEXT_HOPS', '2'))
+NOUS_CONTEXT_MAX_NODES = int(os.getenv('NOUS_CONTEXT_MAX_NODES', '200'))
+
+# Delta mode: send a conversation's environment once, then only the facts changed
+# since the previous turn; rebase after this many accumulated changes
+NOUS_CONTEXT_DELTAS = os.getenv('NOUS_CONTEXT_DELTAS', 'false').lower() in ('1', 'true', 'yes')
+NOUS_CONTEXT_DELTA_MAX_FACTS = int(os.getenv('NOUS_CONTEXT_DELTA_MAX_FACTS', '200'))
+
+# Token accounting: "estimate" (characters / 4) or "tiktoken:<encoding>" (needs tiktoken);
+# agent prompts are kept within NOUS_PROMPT_MAX_TOKENS: the environment to the facts about the most
+# relevant entities, the history to its latest turns (0 disables)
+NOUS_TOKENIZER = os.getenv('NOUS_TOKENIZER', 'estimate')
+NOUS_PROMPT_MAX_TOKENS = int(os.getenv('NOUS_PROMPT_MAX_TOKENS', '0'))
+
+# Load tool calls remembered per conversation, so repeats are answered locally (0 disables)
+NOUS_WORKING_SET_SIZE = int(os.getenv('NOUS_WORKING_SET_SIZE', '256'))
+
+# Tool results are paged for the agent: at most this many facts / characters per page
+NOUS_TOOL_OUTPUT_MAX_FACTS = int(os.getenv('NOUS_TOOL_OUTPUT_MAX_FACTS', '50'))
+NOUS_TOOL_OUTPUT_MAX_CHARS = int(os.getenv('NOUS_TOOL_OUTPUT_MAX_CHARS', '4000'))
+
+# Semantic model snapshots for warm restarts (set NOUS_SNAPSHOT_PATH empty to disable)
+NOUS_SNAPSHOT_PATH = os.getenv(
+    'NOUS_SNAPSHOT_PATH', str(Path(__file__).resolve().parent.parent / 'data' / 'semantic_model.snap')
+)
+NOUS_SNAPSHOT_INTERVAL = float(os.getenv('NOUS_SNAPSHOT_INTERVAL', '60'))
+
+# Publish the semantic model as a memory-mapped image for worker processes, e.g.
+# /dev/shm/nous-model.nous (unset to disable)
+NOUS_SHARED_MODEL_PATH = os.getenv('NOUS_SHARED_MODEL_PATH', '')
+NOUS_SHARED_MODEL_INTERVAL = float(os.getenv('NOUS_SHARED_MODEL_INTERVAL', '5'))
+# Quiet seconds after a change before a new version is published
+NOUS_SHARED_MODEL_DEBOUNCE = float(os.getenv('NOUS_SHARED_MODEL_DEBOUNCE', '1'))
+
 # Logging configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
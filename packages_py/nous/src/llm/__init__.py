@@ -0,0 +1,21 @@
+"""Shared LLM client management for NOUS"""
+
+from .registry import LLMClientRegistry, ModelGate, ModelStats, llm_registry
+from .routing import ModelRouter, Route, model_router
+from .scheduler import BULK, INTERACTIVE, LLMCallScheduler, TokenBucket, llm_call_context, llm_scheduler
+
+__all__ = [
+    'LLMClientRegistry',
+    'ModelGate',
+    'ModelStats',
+    'llm_registry',
+    'LLMCallScheduler',
+    'TokenBucket',
+    'llm_call_context',
+    'llm_scheduler',
+    'INTERACTIVE',
+    'BULK',
+    'ModelRouter',
+    'Route',
+    'model_router'
+]
@@ -0,0 +1,302 @@
+"""
+Registry of shared LLM chat model clients.
+
+Each provider/model/parameter combination is constructed once and reused, so
+client setup and TLS handshakes stay off the hot path. Clients of the same
+provider share one HTTP connection pool where the provider integration allows
+it. Every call goes through a per-model gate that admits it through the rate
+limiting scheduler, enforces a concurrency limit and records latency statistics.
+
+Provider clients are built without their own retries: a retry made inside the
+client would reuse the slot and reservation of the failed call, bypassing the
+rate limits. The gated client retries instead (`max_retries` times), and each
+attempt is admitted through the gate again.
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+from pydantic import PrivateAttr
+
+from src.config import LLM_CONCURRENCY_LIMITS, LLM_DEFAULT_CONCURRENCY
+from src.llm.scheduler import (
+    LLMCallScheduler,
+    estimate_tokens,
+    llm_scheduler,
+    retry_after,
+    retryable,
+    used_tokens,
+)
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Retries of a failed call when the caller does not set max_retries (the provider SDKs' default)
+DEFAULT_MAX_RETRIES = 2
+
+# provider -> (integration module, chat model class, shared async http client parameter)
+PROVIDERS: Dict[str, Tuple[str, str, Optional[str]]] = {
+    "groq": ("langchain_groq", "ChatGroq", "http_async_client"),
+    # langchain_anthropic already shares one pooled httpx client per base URL
+    "anthropic": ("langchain_anthropic", "ChatAnthropic", None),
+}
+
+
+class ModelStats:
+    """Call counters and a rolling latency window for one model"""
+
+    def __init__(self, window: int = 256):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    def record(self, latency: float, error: bool = False):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self._latencies.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = self._latencies
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p50": self.percentile(50),
+            "latency_p95": self.percentile(95),
+            "latency_max": max(latencies) if latencies else None,
+        }
+
+
+class GateCall:
+    """Handle for one call inside a gate; set `used_tokens` once the usage is known"""
+
+    def __init__(self):
+        self.used_tokens: Optional[int] = None
+
+
+class ModelGate:
+    """Rate limits, concurrency limit and statistics shared by every client of one model"""
+
+    def __init__(self, key: str, max_concurrency: int, scheduler: Optional[LLMCallScheduler] = None):
+        self.key = key
+        self.max_concurrency = max_concurrency
+        self.scheduler = scheduler
+        self.stats = ModelStats()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """Hold one of the model's concurrency slots for the duration of a call"""
+        reservation = None
+        self.stats.waiting += 1
+        try:
+            # Wait for rate limit capacity before taking a concurrency slot
+            if self.scheduler:
+                reservation = await self.scheduler.acquire(self.key, tokens)
+            await self._semaphore.acquire()
+        except BaseException:
+            # Cancelled while waiting for a slot: the call is never made
+            if reservation is not None:
+                self.scheduler.refund(reservation)
+            raise
+        finally:
+            self.stats.waiting -= 1
+        self.stats.in_flight += 1
+        call = GateCall()
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield call
+        except BaseException as e:
+            failed = True
+            backoff = retry_after(e)
+            if backoff is not None and self.scheduler:
+                self.scheduler.penalize(self.key, backoff)
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - started, error=failed)
+            self.stats.in_flight -= 1
+            self._semaphore.release()
+            if reservation is not None:
+                self.scheduler.settle(reservation, call.used_tokens)
+
+    async def backoff(self, error: BaseException, attempt: int):
+        """Wait before retrying a failed call; a rate limited model is already paused by the scheduler"""
+        self.stats.retries += 1
+        pause = retry_after(error)
+        if pause is not None and self.scheduler:
+            return
+        await asyncio.sleep(pause or min(8.0, 0.5 * 2 ** attempt))
+
+
+_gated_classes: Dict[type, type] = {}
+
+
+def _gated_class(base: type) -> type:
+    """Subclass of a chat model class whose provider calls pass through a ModelGate"""
+    if base in _gated_classes:
+        return _gated_classes[base]
+
+    class GatedChatModel(base):
+        _gate: Optional[ModelGate] = PrivateAttr(default=None)
+        _retries: int = PrivateAttr(default=0)
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            if self._gate is None:
+                return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            tokens = estimate_tokens(messages, kwargs.get("tools"))
+            for attempt in range(self._retries + 1):
+                try:
+                    async with self._gate.slot(tokens) as call:
+                        result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                        call.used_tokens = used_tokens(result)
+                        return result
+                except Exception as e:
+                    if attempt == self._retries or not retryable(e):
+                        raise
+                    await self._gate.backoff(e, attempt)
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            if self._gate is None:
+                async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    yield chunk
+                return
+            tokens = estimate_tokens(messages, kwargs.get("tools"))
+            streamed = False
+            for attempt in range(self._retries + 1):
+                try:
+                    async with self._gate.slot(tokens) as call:
+                        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                            usage = getattr(chunk.message, "usage_metadata", None)
+                            if usage and usage.get("total_tokens") is not None:
+                                call.used_tokens = (call.used_tokens or 0) + usage["total_tokens"]
+                            streamed = True
+                            yield chunk
+                    return
+                except Exception as e:
+                    # Once chunks went out the stream cannot be restarted
+                    if streamed or attempt == self._retries or not retryable(e):
+                        raise
+                    await self._gate.backoff(e, attempt)
+
+    GatedChatModel.__name__ = GatedChatModel.__qualname__ = f"Gated{base.__name__}"
+    _gated_classes[base] = GatedChatModel
+    return GatedChatModel
+
+
+def _params_key(params: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, repr(v)) for k, v in params.items()))
+
+
+class LLMClientRegistry:
+    """Creates each provider/model chat client once and hands out the shared instance"""
+
+    def __init__(
+        self,
+        default_concurrency: int = 8,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+        scheduler: Optional[LLMCallScheduler] = None,
+    ):
+        self.default_concurrency = default_concurrency
+        self.concurrency_limits = dict(concurrency_limits or {})
+        self.scheduler = scheduler
+        self._clients: Dict[Tuple, Any] = {}
+        self._gates: Dict[str, ModelGate] = {}
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+
+    @staticmethod
+    def model_key(provider: str, model: str) -> str:
+        return f"{provider}:{model}"
+
+    def gate(self, provider: str, model: str) -> ModelGate:
+        """The ModelGate shared by all clients of a provider/model"""
+        key = self.model_key(provider, model)
+        if key not in self._gates:
+            limit = self.concurrency_limits.get(key, self.default_concurrency)
+            self._gates[key] = ModelGate(key, limit, scheduler=self.scheduler)
+        return self._gates[key]
+
+    def _http_client(self, provider: str) -> httpx.AsyncClient:
+        if provider not in self._http_clients:
+            self._http_clients[provider] = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                timeout=httpx.Timeout(120.0, connect=10.0),
+            )
+        return self._http_clients[provider]
+
+    def get(self, provider: str, model: str, **params) -> Any:
+        """Get (creating on first use) the chat client for a provider, model and parameters"""
+        cache_key = (provider, model, _params_key(params))
+        client = self._clients.get(cache_key)
+        if client is not None:
+            return client
+
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider '{provider}'")
+        module_name, class_name, http_client_param = PROVIDERS[provider]
+        base_cls = getattr(importlib.import_module(module_name), class_name)
+
+        kwargs = dict(params)
+        if http_client_param and http_client_param not in kwargs:
+            kwargs[http_client_param] = self._http_client(provider)
+        # Retried through the gate rather than inside the provider client
+        retries = kwargs.pop("max_retries", DEFAULT_MAX_RETRIES)
+        if "max_retries" in base_cls.model_fields:
+            kwargs["max_retries"] = 0
+
+        client = _gated_class(base_cls)(model=model, **kwargs)
+        client._gate = self.gate(provider, model)
+        client._retries = retries
+        self._clients[cache_key] = client
+        logger.info(f"Created LLM client for {self.model_key(provider, model)}")
+        return client
+
+    def resolve(self, spec: str, **params) -> Any:
+        """Get the chat client for a 'provider:model' string"""
+        provider, _, model = spec.partition(":")
+        if not model:
+            raise ValueError(f"Model spec '{spec}' must have the form 'provider:model'")
+        return self.get(provider, model, **params)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-model concurrency limits and latency statistics"""
+        return {
+            key: {"max_concurrency": gate.max_concurrency, **gate.stats.to_dict()}
+            for key, gate in self._gates.items()
+        }
+
+    async def aclose(self):
+        """Close the shared HTTP connection pools"""
+        for client in self._http_clients.values():
+            await client.aclose()
+        self._http_clients.clear()
+        self._clients.clear()
+
+
+# Global registry instance
+llm_registry = LLMClientRegistry(
+    default_concurrency=LLM_DEFAULT_CONCURRENCY,
+    concurrency_limits=LLM_CONCURRENCY_LIMITS,
+    scheduler=llm_scheduler,
+)
+metrics.register_provider("llm", llm_registry.get_stats)
@@ -0,0 +1,217 @@
+"""
+Model routing for LLM call sites.
+
+Each call site declares a route: the kind of task it performs and how long it
+can afford to wait. The router picks the preferred model for the task whose
+observed p95 latency fits the budget, falls back to the next candidate on
+timeout or error, and keeps latency statistics per route and model.
+
+Call sites that hand a model to a multi-step workflow (the ReAct agent graph)
+take `chat_model(route)` instead of `run()`: the route's clients as one
+chat model that falls back per LLM call. A failed step is retried on the next
+model without re-running the steps, and the tool calls, before it. Latency and
+errors of those calls are recorded by the registry's per-model gates.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src.llm.registry import LLMClientRegistry, ModelStats, llm_registry
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Default client parameters per model
+MODEL_CATALOG: Dict[str, Dict[str, Any]] = {
+    "groq:llama-3.1-8b-instant": {},
+    "groq:llama-3.3-70b-versatile": {},
+    "groq:qwen-qwq-32b": {"top_p": 0.95, "reasoning_format": "parsed"},
+    "anthropic:claude-3-7-sonnet-latest": {},
+}
+
+# Candidate models per task type, in order of preference
+TASK_MODELS: Dict[str, List[str]] = {
+    # Short structured answers - small fast models first
+    "classify": ["groq:llama-3.1-8b-instant", "groq:llama-3.3-70b-versatile", "groq:qwen-qwq-32b"],
+    # Free text such as definitions
+    "generate": ["groq:llama-3.3-70b-versatile", "groq:qwen-qwq-32b"],
+    # Multi-step tool calling agent
+    "tool_use": ["anthropic:claude-3-7-sonnet-latest", "groq:llama-3.3-70b-versatile"],
+}
+
+
+class Route:
+    """A call site's task type, latency budget and client parameters"""
+
+    def __init__(
+        self,
+        name: str,
+        task: str,
+        latency_budget: float,
+        timeout: Optional[float] = None,
+        models: Optional[List[str]] = None,
+        **params,
+    ):
+        self.name = name
+        self.task = task
+        self.latency_budget = latency_budget
+        # Calls are abandoned for the next candidate after `timeout` seconds (None waits indefinitely)
+        self.timeout = timeout
+        self.models = list(models) if models is not None else list(TASK_MODELS[task])
+        self.params = params
+
+
+ROUTES: Dict[str, Route] = {
+    route.name: route
+    for route in (
+        Route("categorize", "classify", latency_budget=2.0, timeout=8.0, temperature=0.1),
+        Route("select_subtype", "classify", latency_budget=3.0, timeout=10.0, temperature=0.1),
+        Route("infer_definition", "generate", latency_budget=5.0, timeout=20.0, temperature=0.1),
+        Route("conjure_definition", "generate", latency_budget=8.0, timeout=30.0, temperature=0.1),
+        # Each LLM call of the agent graph (see chat_model); falls back on errors only
+        Route("agent", "tool_use", latency_budget=60.0),
+    )
+}
+
+
+class RouteStats:
+    """Latency statistics of one route, per model, plus fallback counters"""
+
+    def __init__(self):
+        self.models: Dict[str, ModelStats] = {}
+        self.timeouts = 0
+        self.fallbacks = 0
+
+    def model(self, spec: str) -> ModelStats:
+        if spec not in self.models:
+            self.models[spec] = ModelStats()
+        return self.models[spec]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "timeouts": self.timeouts,
+            "fallbacks": self.fallbacks,
+            "models": {spec: stats.to_dict() for spec, stats in self.models.items()},
+        }
+
+
+class ModelRouter:
+    """Chooses and calls a model per route, falling back along the route's candidates"""
+
+    def __init__(
+        self,
+        routes: Dict[str, Route],
+        registry: LLMClientRegistry,
+        catalog: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self.routes = routes
+        self.registry = registry
+        self.catalog = catalog if catalog is not None else MODEL_CATALOG
+        self._stats: Dict[str, RouteStats] = {}
+        # Fallback chains per (route, candidate order), so callers can cache what they build on them
+        self._chat_models: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+
+    def _route(self, name: str) -> Route:
+        if name not in self.routes:
+            raise ValueError(f"Unknown LLM route '{name}'")
+        return self.routes[name]
+
+    def _route_stats(self, name: str) -> RouteStats:
+        if name not in self._stats:
+            self._stats[name] = RouteStats()
+        return self._stats[name]
+
+    def _p95(self, route: Route, spec: str) -> Optional[float]:
+        """Observed p95 of a model on this route, else across all its calls"""
+        p95 = self._route_stats(route.name).model(spec).percentile(95)
+        if p95 is None:
+            provider, _, model = spec.partition(":")
+            p95 = self.registry.gate(provider, model).stats.percentile(95)
+        return p95
+
+    def candidates(self, name: str) -> List[str]:
+        """Route models in call order: those within budget first, the rest fastest first"""
+        route = self._route(name)
+        within, over = [], []
+        for spec in route.models:
+            p95 = self._p95(route, spec)
+            if p95 is None or p95 <= route.latency_budget:
+                within.append(spec)
+            else:
+                over.append((p95, spec))
+        return within + [spec for _, spec in sorted(over, key=lambda item: item[0])]
+
+    def client(self, name: str, spec: str) -> Any:
+        """The shared client for a model with the route's parameters"""
+        route = self._route(name)
+        # Fewer provider retries - the next candidate is the retry
+        params = {"max_retries": 1, **self.catalog.get(spec, {}), **route.params}
+        return self.registry.resolve(spec, **params)
+
+    def select(self, name: str) -> Any:
+        """The client the route would call first"""
+        return self.client(name, self.candidates(name)[0])
+
+    def chat_model(self, name: str) -> Any:
+        """
+        The route's clients, in call order, as one chat model that falls back
+        to the next client on each call that errors (for workflows such as
+        the agent graph; tools bound to it are bound to every client).
+        """
+        candidates = tuple(self.candidates(name))
+        key = (name, candidates)
+        if key not in self._chat_models:
+            clients = [self.client(name, spec) for spec in candidates]
+            self._chat_models[key] = clients[0].with_fallbacks(clients[1:]) if len(clients) > 1 else clients[0]
+        return self._chat_models[key]
+
+    async def run(self, name: str, call: Callable[[Any], Awaitable[T]]) -> T:
+        """Run `call(client)` on the route's best model, falling back on timeout or error"""
+        route = self._route(name)
+        stats = self._route_stats(name)
+        last_error: Optional[BaseException] = None
+
+        for attempt, spec in enumerate(self.candidates(name)):
+            if attempt:
+                stats.fallbacks += 1
+                metrics.increment("llm_route_fallbacks")
+                logger.warning(f"Route '{name}' falling back to {spec} after: {last_error!r}")
+
+            started = time.perf_counter()
+            try:
+                if route.timeout is None:
+                    result = await call(self.client(name, spec))
+                else:
+                    result = await asyncio.wait_for(call(self.client(name, spec)), route.timeout)
+            except asyncio.TimeoutError as e:
+                stats.timeouts += 1
+                stats.model(spec).record(time.perf_counter() - started, error=True)
+                last_error = e
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.model(spec).record(time.perf_counter() - started, error=True)
+                last_error = e
+                continue
+
+            stats.model(spec).record(time.perf_counter() - started)
+            return result
+
+        raise last_error if last_error else RuntimeError(f"Route '{name}' has no models")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-route budgets, fallback counters and per-model latency"""
+        return {
+            name: {"task": self.routes[name].task, "latency_budget": self.routes[name].latency_budget, **stats.to_dict()}
+            for name, stats in self._stats.items()
+        }
+
+
+# Global router instance
+model_router = ModelRouter(ROUTES, llm_registry)
+metrics.register_provider("llm_routes", model_router.get_stats)
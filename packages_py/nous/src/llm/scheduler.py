@@ -0,0 +1,329 @@
+"""
+Process-wide scheduler for LLM provider calls.
+
+Every call reserves capacity from two token buckets per model, one for
+requests/min and one for tokens/min, before it is sent. Waiting calls are
+granted in priority lanes (interactive chat ahead of bulk placement, with a
+guaranteed share for bulk so it never starves) and round-robin across users
+within a lane. Provider 429s pause the model instead of triggering retry storms.
+
+The lane and user of a call are taken from the ambient `llm_call_context`, so
+call sites only declare who they are working for; the registry's clients do
+the rest.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from src.config import LLM_DEFAULT_RPM, LLM_DEFAULT_TPM, LLM_RATE_LIMITS
+from src.llm.tokens import token_counter
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+_call_context: contextvars.ContextVar[Tuple[str, Optional[str]]] = contextvars.ContextVar(
+    "llm_call_context", default=(INTERACTIVE, None)
+)
+
+
+@contextmanager
+def llm_call_context(lane: str = INTERACTIVE, user_id: Optional[Any] = None):
+    """Declare the priority lane and user for LLM calls made within this block"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown LLM call lane '{lane}'")
+    token = _call_context.set((lane, None if user_id is None else str(user_id)))
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+
+def current_call_context() -> Tuple[str, Optional[str]]:
+    """The (lane, user_id) LLM calls are currently attributed to"""
+    return _call_context.get()
+
+
+def estimate_tokens(messages, tools: Any = None, output_allowance: int = 512) -> int:
+    """Token count of a chat call's prompt (see src.llm.tokens) plus room for the reply"""
+    tokens = 0
+    for message in messages:
+        content = getattr(message, "content", message)
+        tokens += token_counter.count(content if isinstance(content, str) else str(content))
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            tokens += token_counter.count(str(tool_calls))
+    if tools:
+        tokens += token_counter.count(str(tools))
+    return tokens + output_allowance
+
+
+def used_tokens(result: Any) -> Optional[int]:
+    """Total tokens a provider reported for a ChatResult, or None if it did not say"""
+    for generation in getattr(result, "generations", None) or []:
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage and usage.get("total_tokens") is not None:
+            return usage["total_tokens"]
+    return None
+
+
+def retryable(error: BaseException) -> bool:
+    """Whether a failed provider call may succeed if made again: rate limits, server errors, lost connections"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # The provider SDKs' connection and timeout errors carry no status
+    return any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to back off if `error` is a provider rate limit (HTTP 429), else None"""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    header = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(header) if header is not None else 0.0
+    except ValueError:
+        return 0.0
+
+
+class TokenBucket:
+    """Refills continuously at `rate_per_minute`, holding at most `capacity`"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be consumed (0 if it can be consumed now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) tokens after the fact; may go into debt"""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class Reservation:
+    """Capacity granted to one call; settled with the actual token usage afterwards"""
+
+    def __init__(self, model_key: str, tokens: int, lane: str, user_id: Optional[str]):
+        self.model_key = model_key
+        self.tokens = tokens
+        self.lane = lane
+        self.user_id = user_id
+        self.waited = 0.0
+        self.future: Optional[asyncio.Future] = None
+
+
+class _ModelLimiter:
+    """Buckets and lane queues of a single model"""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.lanes: Dict[str, "OrderedDict[Optional[str], Deque[Reservation]]"] = {
+            lane: OrderedDict() for lane in LANES
+        }
+        self.grants_since_bulk = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.wait_time = 0.0
+
+    def waiting(self, lane: str) -> int:
+        return sum(len(q) for q in self.lanes[lane].values())
+
+    def enqueue(self, reservation: Reservation):
+        users = self.lanes[reservation.lane]
+        users.setdefault(reservation.user_id, deque()).append(reservation)
+
+    def remove(self, reservation: Reservation):
+        users = self.lanes[reservation.lane]
+        queue = users.get(reservation.user_id)
+        if queue and reservation in queue:
+            queue.remove(reservation)
+            if not queue:
+                del users[reservation.user_id]
+
+    def next_lane(self, bulk_every: int) -> Optional[str]:
+        interactive = bool(self.lanes[INTERACTIVE])
+        bulk = bool(self.lanes[BULK])
+        if bulk and (not interactive or self.grants_since_bulk >= bulk_every):
+            return BULK
+        if interactive:
+            return INTERACTIVE
+        return None
+
+    def head(self, lane: str) -> Reservation:
+        # First user in rotation order, oldest call of that user
+        return next(iter(self.lanes[lane].values()))[0]
+
+    def pop_head(self, lane: str) -> Reservation:
+        users = self.lanes[lane]
+        user_id, queue = next(iter(users.items()))
+        reservation = queue.popleft()
+        # Move the user to the back of the rotation
+        del users[user_id]
+        if queue:
+            users[user_id] = queue
+        if lane == BULK:
+            self.grants_since_bulk = 0
+        else:
+            self.grants_since_bulk += 1
+        return reservation
+
+    def delay(self, tokens: int, now: float) -> float:
+        return max(
+            self.blocked_until - now,
+            self.requests.delay(1, now),
+            self.tokens.delay(tokens, now),
+        )
+
+
+class LLMCallScheduler:
+    """Token-bucket admission with priority lanes and per-user fairness, per model"""
+
+    def __init__(
+        self,
+        default_rpm: float = 50,
+        default_tpm: float = 40000,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        bulk_every: int = 4,
+        default_backoff: float = 10.0,
+    ):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.limits = dict(limits or {})
+        self.bulk_every = bulk_every
+        self.default_backoff = default_backoff
+        self._models: Dict[str, _ModelLimiter] = {}
+
+    def _limiter(self, model_key: str) -> _ModelLimiter:
+        if model_key not in self._models:
+            rpm, tpm = self.limits.get(model_key, (self.default_rpm, self.default_tpm))
+            self._models[model_key] = _ModelLimiter(rpm, tpm)
+        return self._models[model_key]
+
+    async def acquire(self, model_key: str, tokens: int) -> Reservation:
+        """Wait until the model has capacity for a call of roughly `tokens` tokens"""
+        lane, user_id = current_call_context()
+        reservation = Reservation(model_key, tokens, lane, user_id)
+        limiter = self._limiter(model_key)
+        reservation.future = asyncio.get_running_loop().create_future()
+        limiter.enqueue(reservation)
+
+        started = time.monotonic()
+        self._pump(model_key)
+        if not reservation.future.done():
+            limiter.throttled += 1
+        try:
+            await reservation.future
+        except asyncio.CancelledError:
+            if reservation.future.done() and not reservation.future.cancelled():
+                # Granted just as the caller was cancelled: give the capacity back
+                self.refund(reservation)
+            else:
+                limiter.remove(reservation)
+                self._pump(model_key)
+            raise
+        reservation.waited = time.monotonic() - started
+        limiter.wait_time += reservation.waited
+        return reservation
+
+    def settle(self, reservation: Reservation, used_tokens: Optional[int]):
+        """Correct the token bucket once the call's real usage is known"""
+        if used_tokens is None:
+            return
+        self._limiter(reservation.model_key).tokens.adjust(used_tokens - reservation.tokens)
+
+    def refund(self, reservation: Reservation):
+        """Return a granted reservation's capacity when its call is never made"""
+        limiter = self._limiter(reservation.model_key)
+        limiter.requests.adjust(-1)
+        limiter.tokens.adjust(-reservation.tokens)
+        self._pump(reservation.model_key)
+
+    def penalize(self, model_key: str, seconds: Optional[float] = None):
+        """Pause a model after the provider rate limited us"""
+        limiter = self._limiter(model_key)
+        pause = seconds if seconds else self.default_backoff
+        limiter.blocked_until = max(limiter.blocked_until, time.monotonic() + pause)
+        limiter.rate_limited += 1
+        logger.warning(f"LLM provider rate limited {model_key}, pausing for {pause:.1f}s")
+
+    def _pump(self, model_key: str):
+        """Grant queued reservations in policy order while capacity lasts"""
+        limiter = self._models[model_key]
+        if limiter.timer is not None:
+            limiter.timer.cancel()
+            limiter.timer = None
+
+        while True:
+            lane = limiter.next_lane(self.bulk_every)
+            if lane is None:
+                return
+            head = limiter.head(lane)
+            if head.future.done():
+                limiter.pop_head(lane)
+                continue
+
+            now = time.monotonic()
+            delay = limiter.delay(head.tokens, now)
+            if delay > 0:
+                limiter.timer = asyncio.get_running_loop().call_later(delay, self._pump, model_key)
+                return
+
+            limiter.pop_head(lane)
+            limiter.requests.consume(1, now)
+            limiter.tokens.consume(head.tokens, now)
+            limiter.granted += 1
+            head.future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-model bucket levels, queue depths and throttling counters"""
+        return {
+            key: {
+                "requests_available": round(limiter.requests.tokens, 2),
+                "tokens_available": round(limiter.tokens.tokens, 2),
+                "waiting": {lane: limiter.waiting(lane) for lane in LANES},
+                "granted": limiter.granted,
+                "throttled": limiter.throttled,
+                "rate_limited": limiter.rate_limited,
+                "wait_time": round(limiter.wait_time, 3),
+            }
+            for key, limiter in self._models.items()
+        }
+
+
+# Global scheduler instance
+llm_scheduler = LLMCallScheduler(
+    default_rpm=LLM_DEFAULT_RPM,
+    default_tpm=LLM_DEFAULT_TPM,
+    limits=LLM_RATE_LIMITS,
+)
+metrics.register_provider("llm_scheduler", llm_scheduler.get_stats)
@@ -0,0 +1,197 @@
+"""
+Token accounting for prompt text.
+
+Counts come from a pluggable tokenizer, any callable from text to a token
+count. The default is a cheap estimate (characters / 4), which needs nothing
+installed. With `NOUS_TOKENIZER=tiktoken:<encoding>` and tiktoken
+installed, exact BPE counts are used instead.
+
+Prompts are mostly the same fragments turn after turn: one relationship
+line per fact and one block per entity. Counts are therefore cached per
+fragment, and long texts are counted line by line so that only the lines
+not seen before reach the tokenizer; the totals of recent long texts are
+kept too. `sections()` totals a prompt by section
+(instructions, environment, history...) and returns the counts; within a
+`prompt_counts()` block (e.g. one agent run) they are also collected for
+that block alone, so concurrent runs each see their own prompts. The largest
+prompt, the number over budget and the cache hit rate are exposed through the
+metrics registry.
+"""
+
+import contextvars
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from src.config import NOUS_TOKENIZER
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Tokenizer = Callable[[str], int]
+
+# Texts longer than this are counted (and cached) line by line
+LINE_SPLIT_CHARS = 2048
+# Long texts whose totals are kept as well
+LONG_TEXTS = 32
+
+
+_prompt_counts: contextvars.ContextVar[Optional[List[Dict[str, int]]]] = contextvars.ContextVar(
+    "prompt_counts", default=None
+)
+
+
+@contextmanager
+def prompt_counts():
+    """Collect the section counts of the prompts counted within this block, in order"""
+    counts: List[Dict[str, int]] = []
+    token = _prompt_counts.set(counts)
+    try:
+        yield counts
+    finally:
+        _prompt_counts.reset(token)
+
+
+def estimate(text: str) -> int:
+    """Cheap token estimate: characters / 4"""
+    return len(text) // 4
+
+
+def tiktoken_tokenizer(encoding: str = "cl100k_base") -> Tokenizer:
+    """Exact counts with a tiktoken encoding (ImportError without tiktoken)"""
+    import tiktoken
+
+    encoder = tiktoken.get_encoding(encoding)
+    return lambda text: len(encoder.encode(text, disallowed_special=()))
+
+
+def tokenizer_from_config(spec: str) -> Tuple[str, Tokenizer]:
+    """(name, tokenizer) for 'estimate' or 'tiktoken[:encoding]', falling back to the estimate"""
+    kind, _, option = spec.partition(":")
+    if kind == "tiktoken":
+        try:
+            return spec, tiktoken_tokenizer(option or "cl100k_base")
+        except Exception as e:
+            logger.warning(f"Tokenizer '{spec}' unavailable ({e}), estimating token counts instead")
+    elif kind not in ("", "estimate"):
+        logger.warning(f"Unknown tokenizer '{spec}', estimating token counts instead")
+    return "estimate", estimate
+
+
+class TokenCounter:
+    """Token counts through a pluggable tokenizer, cached per text fragment"""
+
+    def __init__(self, tokenizer: Tokenizer = estimate, name: str = "estimate", cache_size: int = 100_000):
+        self.tokenizer = tokenizer
+        self.name = name
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        # Whole long texts, e.g. an environment re-sent unchanged on every agent step
+        self._texts: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.prompts = 0
+        self.largest_prompt = 0
+        self.oversize_prompts = 0
+
+    def set_tokenizer(self, tokenizer: Tokenizer, name: str):
+        """Count with another tokenizer from now on (cached counts are dropped)"""
+        self.tokenizer = tokenizer
+        self.name = name
+        self._cache.clear()
+        self._texts.clear()
+
+    def _fragment(self, text: str) -> int:
+        count = self._cache.get(text)
+        if count is not None:
+            self.hits += 1
+            self._cache.move_to_end(text)
+            return count
+        self.misses += 1
+        count = self.tokenizer(text)
+        self._cache[text] = count
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return count
+
+    def count(self, text: str) -> int:
+        """Tokens in `text`; long texts are counted per line (plus one per line break)"""
+        if not text:
+            return 0
+        if len(text) <= LINE_SPLIT_CHARS:
+            return self._fragment(text)
+        count = self._texts.get(text)
+        if count is None:
+            lines = text.split("\n")
+            count = sum(self._fragment(line) for line in lines if line) + len(lines) - 1
+            self._texts[text] = count
+            if len(self._texts) > LONG_TEXTS:
+                self._texts.popitem(last=False)
+        return count
+
+    def count_all(self, fragments: Iterable[str]) -> int:
+        """Total tokens of several fragments"""
+        return sum(self.count(fragment) for fragment in fragments)
+
+    def sections(self, sections: Dict[str, Union[str, Iterable[str]]], limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Tokens per prompt section plus their 'total'.
+
+        A section is a text or a list of fragments (e.g. one per entity). The
+        counts are added to the enclosing `prompt_counts()` block, if any. With
+        `limit`, a total above it is logged and counted as oversize.
+        """
+        counts = {
+            name: self.count(text) if isinstance(text, str) else self.count_all(text)
+            for name, text in sections.items()
+        }
+        counts["total"] = sum(counts.values())
+        collected = _prompt_counts.get()
+        if collected is not None:
+            collected.append(counts)
+        self.prompts += 1
+        self.largest_prompt = max(self.largest_prompt, counts["total"])
+        if limit is not None and counts["total"] > limit:
+            self.oversize_prompts += 1
+            logger.warning(f"Prompt of {counts['total']} tokens exceeds the {limit} token budget: {counts}")
+        else:
+            logger.debug(f"Prompt tokens: {counts}")
+        return counts
+
+    def get_stats(self):
+        """Tokenizer, cache use and the sizes of the prompts counted"""
+        lookups = self.hits + self.misses
+        return {
+            "tokenizer": self.name,
+            "cached_fragments": len(self._cache),
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "prompts": self.prompts,
+            "largest_prompt": self.largest_prompt,
+            "oversize_prompts": self.oversize_prompts,
+        }
+
+
+def trim_lines(text: str, budget: int, counter: "TokenCounter") -> Tuple[str, int]:
+    """
+    Leading lines of `text` that fit in `budget` tokens, and how many lines were cut.
+
+    Only the tail is cut, so the text must be ordered most relevant first
+    (e.g. relationship lines in SemanticModel.relevant_rows order, not the
+    relation-grouped format_relationships).
+    """
+    if counter.count(text) <= budget:
+        return text, 0
+    lines = text.split("\n")
+    used = 0
+    for kept, line in enumerate(lines):
+        used += counter.count(line) + 1
+        if used > budget:
+            return "\n".join(lines[:kept]), len(lines) - kept
+    return text, 0
+
+
+# Global token counter
+_name, _tokenizer = tokenizer_from_config(NOUS_TOKENIZER)
+token_counter = TokenCounter(_tokenizer, _name)
+metrics.register_provider("tokens", token_counter.get_stats)
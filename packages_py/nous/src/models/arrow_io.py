@@ -0,0 +1,228 @@
+"""
+Arrow IPC export and import of the semantic model.
+
+An export is a directory with two Arrow IPC files (Feather v2):
+
+- facts.arrow: one column per Fact field (UIDs as int64, repeated names
+  dictionary-encoded), plus `extra` with any uncommon keys as JSON. UIDs
+  given as numeric strings are stored as integers; any other UID value is an
+  error rather than turning the whole column into text
+- models.arrow: uid, name, type, nature, category and collection columns,
+  plus `data` with the remaining (nested) model fields as JSON
+
+The facts file's schema metadata holds the model version and the selected
+entity. Files are written uncompressed, so reading them back maps the file
+and the columns are views over the mapping: other processes, test fixtures
+and analysis tools (pyarrow, pandas, polars, DuckDB) get the environment
+without parsing JSON. Importing into a SemanticModel does build Fact and
+Model records and the indexes again.
+
+Needs pyarrow (an optional dependency).
+"""
+
+import json
+import os
+import sys
+from itertools import compress
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional dependency
+    pa = None
+
+from src.models.records import Fact, Model, _restore
+
+FORMAT_VERSION = 1
+FACTS_FILE = "facts.arrow"
+MODELS_FILE = "models.arrow"
+METADATA_KEY = b"nous"
+
+FACT_INTEGERS = frozenset(Fact.UIDS | {'fact_uid', 'sequence'})
+MODEL_COLUMNS = ('uid', 'name', 'type', 'nature', 'category', 'collection')
+
+PathLike = Union[str, Path]
+
+
+def _require():
+    if pa is None:
+        raise ImportError("Arrow export and import need pyarrow (pip install pyarrow)")
+
+
+def _types() -> Dict[str, Any]:
+    strings = pa.dictionary(pa.int32(), pa.string())
+    return {
+        field: pa.int64() if field in FACT_INTEGERS else strings if field in Fact.INTERNED else pa.string()
+        for field in Fact.FIELDS
+    }
+
+
+def _integer(field: str, value: Any) -> Optional[int]:
+    if value is None or type(value) is int:
+        return value
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = None
+    # Numeric strings are accepted; floats only when whole
+    if number is None or (not isinstance(value, str) and number != value):
+        raise ValueError(f"'{field}' holds {value!r}, which is not an integer")
+    return number
+
+
+def _array(field: str, values: List[Any], type_) -> "pa.Array":
+    try:
+        return pa.array(values, type=type_)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        if pa.types.is_integer(type_):
+            # UIDs must stay int64 for every reader: coerce what is numeric, reject the rest
+            try:
+                return pa.array([_integer(field, v) for v in values], type=type_)
+            except (pa.ArrowInvalid, OverflowError) as overflow:
+                raise ValueError(f"'{field}' holds a value out of the int64 range") from overflow
+        # Mixed value types in a text field: keep them, as text
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def _json(value: Optional[Dict[str, Any]]) -> Optional[str]:
+    return None if not value else json.dumps(value, separators=(",", ":"), default=str)
+
+
+def facts_table(facts: Iterable[Fact], metadata: Optional[Dict[str, Any]] = None) -> "pa.Table":
+    """Facts as an Arrow table, one column per field"""
+    _require()
+    facts = [Fact.from_wire(f) for f in facts]
+    columns = {
+        field: _array(field, [getattr(f, field, None) for f in facts], type_)
+        for field, type_ in _types().items()
+    }
+    columns['extra'] = pa.array([_json(f._extra) for f in facts], type=pa.string())
+    table = pa.table(columns)
+    if metadata is not None:
+        table = table.replace_schema_metadata({METADATA_KEY: json.dumps(metadata, default=str)})
+    return table
+
+
+def models_table(models: Iterable[Model]) -> "pa.Table":
+    """Models as an Arrow table: the scalar fields as columns, the rest as JSON"""
+    _require()
+    models = [Model.from_wire(m) for m in models]
+    strings = pa.dictionary(pa.int32(), pa.string())
+    columns = {
+        name: _array(name, [m.get(name) for m in models], pa.int64() if name == 'uid' else strings)
+        for name in MODEL_COLUMNS
+    }
+    columns['data'] = pa.array(
+        [_json({k: v for k, v in m.items() if k not in MODEL_COLUMNS}) for m in models], type=pa.string()
+    )
+    return pa.table(columns)
+
+
+def _write(table: "pa.Table", path: Path) -> int:
+    tmp = path.with_name(path.name + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+def export(model, path: PathLike) -> Dict[str, Any]:
+    """
+    Write the model's current version to the directory `path`.
+
+    Returns the version and the bytes written per file.
+    """
+    _require()
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    snapshot = model.snapshot()
+    metadata = {
+        "format": FORMAT_VERSION,
+        "version": snapshot.version,
+        "selected_entity": snapshot.selected_entity,
+    }
+    return {
+        "version": snapshot.version,
+        FACTS_FILE: _write(facts_table(snapshot.facts, metadata), path / FACTS_FILE),
+        MODELS_FILE: _write(models_table(snapshot.models.values()), path / MODELS_FILE),
+    }
+
+
+def _read(path: Path) -> "pa.Table":
+    # Uncompressed IPC: the columns are views over the mapped file
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+def read_facts(path: PathLike) -> "pa.Table":
+    """The exported facts, memory-mapped"""
+    _require()
+    return _read(Path(path) / FACTS_FILE)
+
+
+def read_models(path: PathLike) -> "pa.Table":
+    """The exported models, memory-mapped"""
+    _require()
+    return _read(Path(path) / MODELS_FILE)
+
+
+def read_metadata(table: "pa.Table") -> Dict[str, Any]:
+    """Version and selected entity stored with an exported facts table"""
+    raw = (table.schema.metadata or {}).get(METADATA_KEY)
+    return json.loads(raw) if raw else {}
+
+
+def _values(column: "pa.ChunkedArray") -> List[Any]:
+    """Python values of a column; dictionary-encoded strings come back as one interned object each"""
+    if not pa.types.is_dictionary(column.type):
+        return column.to_pylist()
+    values: List[Any] = []
+    for chunk in column.chunks:
+        dictionary = [sys.intern(s) for s in chunk.dictionary.to_pylist()]
+        values.extend(None if i is None else dictionary[i] for i in chunk.indices.to_pylist())
+    return values
+
+
+def _records(cls, fields, columns: List[List[Any]], extras: List[Optional[str]]) -> Iterator[Any]:
+    for values, extra in zip(zip(*columns), extras):
+        present = [v is not None for v in values]
+        yield _restore(
+            cls, tuple(compress(fields, present)), tuple(compress(values, present)),
+            json.loads(extra) if extra else None,
+        )
+
+
+def facts_from_table(table: "pa.Table") -> Iterator[Fact]:
+    """Fact records for an Arrow facts table"""
+    fields = [field for field in Fact.FIELDS if field in table.column_names]
+    extras = _values(table.column('extra')) if 'extra' in table.column_names else [None] * table.num_rows
+    return _records(Fact, fields, [_values(table.column(field)) for field in fields], extras)
+
+
+def models_from_table(table: "pa.Table") -> Iterator[Model]:
+    """Model records for an Arrow models table"""
+    fields = [name for name in MODEL_COLUMNS if name in table.column_names]
+    columns = [_values(table.column(name)) for name in fields]
+    for values, data in zip(zip(*columns), _values(table.column('data'))):
+        model = {name: value for name, value in zip(fields, values) if value is not None}
+        if data:
+            model.update(json.loads(data))
+        yield Model(model)
+
+
+def load(model, path: PathLike) -> Dict[str, Any]:
+    """
+    Replace a SemanticModel's facts, models and selection with an export.
+
+    Returns the export's metadata (version and selected entity at export).
+    """
+    facts = read_facts(path)
+    metadata = read_metadata(facts)
+    model.replace_records(
+        facts_from_table(facts),
+        models_from_table(read_models(path)),
+        selected_entity=metadata.get("selected_entity"),
+    )
+    return metadata
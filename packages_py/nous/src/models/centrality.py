@@ -0,0 +1,163 @@
+"""
+Graph centrality over the fact graph, for choosing what goes into prompts.
+
+Entities are the nodes and each fact an edge from its lh to its rh object,
+so specialization, classification and part-of facts point at supertypes,
+kinds and wholes. Two scores per entity are computed over the FactTable's
+edge arrays:
+
+- PageRank: power iteration where each sparse matrix-vector product is one
+  np.bincount over the edges (a COO mat-vec). Dangling entities spread
+  their rank evenly.
+- Degree: facts the entity takes part in, either side.
+
+Scores are cached per adjacency build and recomputed lazily after the facts
+change. The previous PageRank is the starting vector for the next run, so
+after a small change it converges in a few iterations.
+
+`relevance` mixes the scores with hop distance from a selected entity:
+
+    proximity_weight * decay ** distance + (1 - proximity_weight) * centrality
+
+where centrality is the mean of PageRank and degree, each scaled to [0, 1].
+Entities more than `hops` away get no proximity; the selected entity itself
+ranks first.
+"""
+
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.models.fact_table import MISSING, FactTable, _uid
+
+
+class CentralityScores(NamedTuple):
+    nodes: np.ndarray       # entity uids, sorted
+    pagerank: np.ndarray    # sums to 1 over the entities with facts
+    degree: np.ndarray      # facts per entity
+    centrality: np.ndarray  # mean of PageRank and degree scaled to [0, 1]
+    iterations: int         # power iterations the last PageRank run took
+
+
+def _scaled(values: np.ndarray) -> np.ndarray:
+    top = values.max() if values.size else 0
+    return values / top if top > 0 else np.zeros(len(values))
+
+
+def pagerank(size: int, sources: np.ndarray, targets: np.ndarray, damping: float = 0.85,
+             tol: float = 1e-8, max_iter: int = 100, start: Optional[np.ndarray] = None) -> Tuple[np.ndarray, int]:
+    """
+    PageRank of a graph given as edge arrays over node positions 0..size-1.
+
+    Returns the scores and the iterations run (until the L1 change is below `tol`).
+    """
+    if size == 0:
+        return np.zeros(0), 0
+    out_degree = np.bincount(sources, minlength=size).astype(np.float64)
+    dangling = out_degree == 0
+    # Share of each source's rank passed along each of its edges
+    weights = np.divide(1.0, out_degree, out=np.zeros(size), where=~dangling)
+    rank = np.full(size, 1.0 / size) if start is None else start / start.sum()
+    teleport = (1.0 - damping) / size
+    for iteration in range(1, max_iter + 1):
+        spread = np.bincount(targets, weights=rank[sources] * weights[sources], minlength=size)
+        updated = damping * spread + (damping * rank[dangling].sum() / size + teleport)
+        change = np.abs(updated - rank).sum()
+        rank = updated
+        if change < tol:
+            break
+    return rank, iteration
+
+
+class CentralityIndex:
+    """PageRank and degree centrality over a FactTable, with relevance to a selected entity"""
+
+    def __init__(self, damping: float = 0.85, tol: float = 1e-8, max_iter: int = 100):
+        self.damping = damping
+        self.tol = tol
+        self.max_iter = max_iter
+        self._scores: Optional[CentralityScores] = None
+
+    def __getstate__(self):
+        # Rebuilt on demand
+        return {**self.__dict__, "_scores": None}
+
+    def scores(self, table: FactTable) -> CentralityScores:
+        """Scores for the table's current facts (recomputed only after they change)"""
+        nodes, sources, targets = table.edges()
+        previous = self._scores
+        if previous is not None and previous.nodes is nodes:
+            return previous
+
+        start = None
+        if previous is not None and len(previous.nodes) and len(nodes):
+            # Warm start: carry over the ranks of entities still present
+            positions = np.minimum(np.searchsorted(previous.nodes, nodes), len(previous.nodes) - 1)
+            carried = previous.nodes[positions] == nodes
+            start = np.where(carried, previous.pagerank[positions], 1.0 / len(nodes))
+
+        degree = np.bincount(sources, minlength=len(nodes)) + np.bincount(targets, minlength=len(nodes))
+        rank, iterations = pagerank(len(nodes), sources, targets, self.damping, self.tol, self.max_iter, start)
+        # Entities without facts (a missing-UID placeholder) rank nowhere
+        rank = np.where(degree > 0, rank, 0.0)
+        centrality = (_scaled(rank) + _scaled(degree.astype(np.float64))) / 2
+        self._scores = CentralityScores(nodes, rank, degree, centrality, iterations)
+        return self._scores
+
+    def distances(self, table: FactTable, seeds: Iterable[Any], hops: int) -> np.ndarray:
+        """Hops from the nearest seed per entity (facts followed either way); -1 beyond `hops`"""
+        nodes, sources, targets = table.edges()
+        distance = np.full(len(nodes), -1, dtype=np.int64)
+        keys = np.asarray([_uid(s) for s in seeds], dtype=np.int64)
+        positions = np.searchsorted(nodes, keys)
+        found = (positions < len(nodes)) & (keys != MISSING)
+        found[found] = nodes[positions[found]] == keys[found]
+        distance[positions[found]] = 0
+
+        reached = distance == 0
+        for hop in range(1, hops + 1):
+            frontier = distance == hop - 1
+            if not frontier.any():
+                break
+            step = np.zeros(len(nodes), dtype=bool)
+            step[targets[frontier[sources]]] = True
+            step[sources[frontier[targets]]] = True
+            step &= ~reached
+            distance[step] = hop
+            reached |= step
+        return distance
+
+    def relevance(self, table: FactTable, selected: Any = None, hops: int = 3,
+                  proximity_weight: float = 0.5, decay: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+        """(entity uids, relevance) with centrality mixed with closeness to `selected` (see module docstring)"""
+        scores = self.scores(table)
+        if selected is None or proximity_weight <= 0:
+            return scores.nodes, scores.centrality
+        distance = self.distances(table, [selected], hops)
+        proximity = np.where(distance >= 0, decay ** np.maximum(distance, 0), 0.0)
+        relevance = proximity_weight * proximity + (1 - proximity_weight) * scores.centrality
+        # The selected entity itself always comes first
+        relevance[distance == 0] = np.inf
+        return scores.nodes, relevance
+
+    def ranked(self, table: FactTable, selected: Any = None, limit: Optional[int] = None,
+               candidates: Optional[Iterable[Any]] = None, **options) -> List[int]:
+        """
+        Entity uids, most relevant first.
+
+        Args:
+            selected: Entity to rank closeness to (none: centrality only)
+            limit: Return at most this many
+            candidates: Only rank these entities (e.g. the ones with models)
+            options: hops, proximity_weight and decay for `relevance`
+        """
+        nodes, relevance = self.relevance(table, selected, **options)
+        keep = nodes != MISSING
+        if candidates is not None:
+            keep &= np.isin(nodes, np.asarray([_uid(c) for c in candidates], dtype=np.int64))
+        nodes, relevance = nodes[keep], relevance[keep]
+        # Highest relevance first; ties by uid for a stable order
+        order = np.lexsort((nodes, -relevance))
+        if limit is not None:
+            order = order[:limit]
+        return nodes[order].tolist()
@@ -0,0 +1,154 @@
+"""
+Incremental index of classification facts.
+
+Tracks classification facts (rel_type_uid 1225, lh individual is classified as
+rh kind) by individual and by kind as facts arrive and leave, so an individual's
+classifiers and a kind's instances are dictionary lookups. Combined with the
+TaxonomyIndex closure, "instances of a kind or any of its subtypes" is answered
+without a round-trip per subtype.
+
+An individual's classifiers and a kind's classified individuals are answered
+locally only after a lookup returned the complete list (`learn(...,
+classifiers_of=uid)` / `learn(..., classified_of=uid)`): an individual may be
+classified as several kinds, and the facts at hand may hold only some of them.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from src.models.records import Fact
+from src.models.taxonomy_index import TaxonomyIndex
+
+CLASSIFICATION_UID = 1225
+
+ENVIRONMENT = "environment"
+LEARNED = "learned"
+
+
+class ClassificationIndex:
+    """Classification facts by individual and by kind, kept up to date incrementally"""
+
+    def __init__(self):
+        self._facts: Dict[Any, Fact] = {}
+        self._sources: Dict[Any, Set[str]] = {}
+        self._by_individual: Dict[Any, Dict[Any, Fact]] = {}
+        self._by_kind: Dict[Any, Dict[Any, Fact]] = {}
+        self._classified_complete: Set[Any] = set()
+        self._classifiers_complete: Set[Any] = set()
+        # Environment classification facts per individual, for live counts
+        self._env_individuals: Dict[Any, int] = {}
+
+    # --- Maintenance --- #
+
+    def _count_individual(self, uid: Any, delta: int):
+        count = self._env_individuals.get(uid, 0) + delta
+        if count > 0:
+            self._env_individuals[uid] = count
+        else:
+            self._env_individuals.pop(uid, None)
+
+    def _insert(self, fact: Fact, source: str):
+        fact_uid = fact['fact_uid']
+        sources = self._sources.setdefault(fact_uid, set())
+        old = self._facts.get(fact_uid)
+        if old is not None:
+            if ENVIRONMENT in sources:
+                self._count_individual(old['lh_object_uid'], -1)
+            self._unlink(old)
+        sources.add(source)
+        self._facts[fact_uid] = fact
+        self._by_individual.setdefault(fact['lh_object_uid'], {})[fact_uid] = fact
+        self._by_kind.setdefault(fact['rh_object_uid'], {})[fact_uid] = fact
+        if ENVIRONMENT in sources:
+            self._count_individual(fact['lh_object_uid'], 1)
+
+    def _unlink(self, fact: Fact):
+        for table, key in ((self._by_individual, fact['lh_object_uid']), (self._by_kind, fact['rh_object_uid'])):
+            entries = table.get(key)
+            if entries is not None:
+                entries.pop(fact['fact_uid'], None)
+                if not entries:
+                    del table[key]
+
+    def add(self, facts: Iterable[Fact]):
+        """Index the environment's classification facts among `facts`"""
+        for f in facts:
+            if f.get('rel_type_uid') == CLASSIFICATION_UID:
+                self._insert(f, ENVIRONMENT)
+
+    def remove(self, fact_uids: Iterable[Any]):
+        """Drop facts removed from the environment (unless also learned from a lookup)"""
+        for fact_uid in fact_uids:
+            sources = self._sources.get(fact_uid)
+            if not sources or ENVIRONMENT not in sources:
+                continue
+            sources.discard(ENVIRONMENT)
+            self._count_individual(self._facts[fact_uid]['lh_object_uid'], -1)
+            if not sources:
+                self._unlink(self._facts.pop(fact_uid))
+                del self._sources[fact_uid]
+
+    def learn(self, facts: Iterable[Fact], classified_of: Any = None, classifiers_of: Any = None):
+        """
+        Add classification facts obtained from a lookup outside the environment.
+
+        Args:
+            facts: Facts returned by the lookup (non-classification facts are ignored)
+            classified_of: Kind UID whose complete list of classified individuals `facts` contains
+            classifiers_of: Individual UID whose complete list of classifiers `facts` contains
+        """
+        for f in facts:
+            if f.get('rel_type_uid') == CLASSIFICATION_UID:
+                self._insert(Fact.from_wire(f), LEARNED)
+        if classified_of is not None:
+            self._classified_complete.add(classified_of)
+        if classifiers_of is not None:
+            self._classifiers_complete.add(classifiers_of)
+
+    def _in_environment(self, fact: Fact) -> bool:
+        return ENVIRONMENT in self._sources.get(fact['fact_uid'], ())
+
+    # --- Queries --- #
+
+    @property
+    def individual_count(self) -> int:
+        """Individuals classified in the environment"""
+        return len(self._env_individuals)
+
+    def classifier_facts(self, uid: Any, environment_only: bool = False) -> Optional[List[Fact]]:
+        """Classification facts of an individual, or None if they may be incomplete"""
+        if uid not in self._classifiers_complete:
+            return None
+        facts = list(self._by_individual.get(uid, {}).values())
+        if environment_only and not all(self._in_environment(f) for f in facts):
+            return None
+        return facts
+
+    def classifiers(self, uid: Any) -> List[Any]:
+        """Kinds an individual is directly classified as"""
+        return [f['rh_object_uid'] for f in self._by_individual.get(uid, {}).values()]
+
+    def classified_facts(self, kind_uid: Any, environment_only: bool = False) -> Optional[List[Fact]]:
+        """Classification facts of a kind's direct instances, or None if they may be incomplete"""
+        if kind_uid not in self._classified_complete:
+            return None
+        facts = list(self._by_kind.get(kind_uid, {}).values())
+        if environment_only and not all(self._in_environment(f) for f in facts):
+            return None
+        return facts
+
+    def instance_facts(self, kind_uid: Any, taxonomy: TaxonomyIndex, environment_only: bool = False) -> List[Fact]:
+        """Known classification facts of individuals of a kind or any of its subtypes"""
+        facts = []
+        for kind in (kind_uid, *taxonomy.descendants(kind_uid)):
+            facts.extend(self._by_kind.get(kind, {}).values())
+        if environment_only:
+            facts = [f for f in facts if self._in_environment(f)]
+        return facts
+
+    def instances_of(self, kind_uid: Any, taxonomy: TaxonomyIndex) -> Set[Any]:
+        """Known individuals of a kind or any of its subtypes"""
+        return {f['lh_object_uid'] for f in self.instance_facts(kind_uid, taxonomy)}
+
+    def is_instance_of(self, uid: Any, kind_uid: Any, taxonomy: TaxonomyIndex) -> bool:
+        """Whether an individual is classified as the kind or one of its subtypes"""
+        return any(taxonomy.is_subtype_of(kind, kind_uid) for kind in self.classifiers(uid))
@@ -0,0 +1,187 @@
+"""
+Keeps the semantic model in step with an Aperture environment.
+
+The environment is downloaded once (a full sync). After that, the facts
+loaded into and unloaded from the environment arrive as Aperture broadcast
+events and are applied to the model incrementally, together with the
+selected entity.
+
+If events carry a sequence number (`seq`), a gap (a number skipped) means an
+update was missed and triggers a full resync; stale or repeated numbers are
+ignored. A reconnect also triggers a resync, since broadcasts sent while
+disconnected are lost. Events without a sequence number are applied as they
+come. Applying an event is idempotent either way: loading replaces facts by
+uid and unloading an absent fact does nothing.
+
+Facts are applied with the sync lock held, but the entity models they need
+are loaded from Clarity afterwards, in the background and outside the lock,
+so a slow Clarity does not hold up the following events (see `wait_loading`).
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _seq(payload: Dict[str, Any]) -> Optional[int]:
+    value = payload.get('seq', payload.get('sequence'))
+    return None if value is None else int(value)
+
+
+class EnvironmentSync:
+    """Applies Aperture environment events to a SemanticModel"""
+
+    def __init__(self, client, model, environment_id: Any, user_id: Any = None):
+        self.client = client
+        self.model = model
+        self.environment_id = environment_id
+        self.user_id = user_id
+        self._last_seq: Optional[int] = None
+        # Full syncs and events are applied one at a time, in arrival order
+        self._lock = asyncio.Lock()
+        self._started = False
+        # Background model loads for applied facts
+        self._loading: Set[asyncio.Task] = set()
+        self._stats = {
+            "events_applied": 0,
+            "events_ignored": 0,
+            "gaps": 0,
+            "resyncs": 0,
+            "last_seq": None,
+        }
+
+    @property
+    def last_seq(self) -> Optional[int]:
+        """Sequence number of the last applied event or full sync, if Aperture sends them"""
+        return self._last_seq
+
+    def resume(self, seq: Optional[int]):
+        """Continue from a restored model state that was current as of `seq`"""
+        self._last_seq = seq
+        self._stats["last_seq"] = seq
+
+    async def start(self) -> Optional[Dict[str, Any]]:
+        """Subscribe to the environment's events and load it; returns the environment"""
+        if not self._started:
+            self.client.on_facts_loaded(self._on_facts_loaded)
+            self.client.on_facts_unloaded(self._on_facts_unloaded)
+            self.client.on_entity_selected(self._on_entity_selected)
+            self.client.on_entity_deselected(self._on_entity_deselected)
+            self.client.on_reconnect(self.resync)
+            self._started = True
+        return await self.resync()
+
+    async def resync(self) -> Optional[Dict[str, Any]]:
+        """Download the whole environment and make the model match it"""
+        async with self._lock:
+            return await self._resync()
+
+    async def _resync(self) -> Optional[Dict[str, Any]]:
+        try:
+            env = await self.client.retrieve_environment(self.environment_id, self.user_id)
+        except Exception as e:
+            logger.error(f"Full sync of environment {self.environment_id} failed: {e}")
+            return None
+
+        seq = _seq(env)
+        if seq is not None and seq == self._last_seq:
+            # Nothing happened since the state we hold (e.g. restored from a snapshot)
+            self._stats["resyncs"] += 1
+            logger.info(f"Environment {self.environment_id} unchanged at seq {seq}")
+            return env
+
+        facts = env.get("facts", [])
+        table = self.model.table
+        incoming = {f['fact_uid'] for f in facts}
+        stale = [f['fact_uid'] for f in self.model.facts if f['fact_uid'] not in incoming]
+        changed = [f for f in facts if table.get(f['fact_uid']) != f]
+        if stale:
+            await self.model.removeFacts(stale)
+        if changed:
+            await self._add(changed)
+        self.model.selected_entity = env.get("selected_entity_id")
+
+        self._last_seq = seq
+        self._stats["resyncs"] += 1
+        self._stats["last_seq"] = self._last_seq
+        metrics.increment("environment_resyncs")
+        logger.info(
+            f"Synced environment {self.environment_id}: {len(facts)} facts "
+            f"({len(changed)} added or changed, {len(stale)} removed)"
+        )
+        return env
+
+    async def _add(self, facts: List[Dict[str, Any]]):
+        """Apply facts (call with the lock held); their models are loaded in the background"""
+        await self.model.addFacts(facts, load_models=False)
+        task = asyncio.create_task(self._load_models(facts))
+        self._loading.add(task)
+        task.add_done_callback(self._loading.discard)
+
+    async def _load_models(self, facts):
+        try:
+            await self.model.loadModelsForFacts(facts)
+        except Exception as e:
+            logger.error(f"Error loading models for {len(facts)} facts of environment {self.environment_id}: {e}")
+
+    async def wait_loading(self):
+        """Wait for the model loads started by applied facts"""
+        while self._loading:
+            await asyncio.gather(*list(self._loading))
+
+    def _ours(self, payload: Dict[str, Any]) -> bool:
+        return str(payload.get('environmentId')) == str(self.environment_id)
+
+    async def _check_seq(self, payload: Dict[str, Any]) -> bool:
+        """Whether to apply the event; resyncs on a gap (call with the lock held)"""
+        seq = _seq(payload)
+        if seq is None:
+            return True
+        if self._last_seq is not None:
+            if seq <= self._last_seq:
+                self._stats["events_ignored"] += 1
+                return False
+            if seq > self._last_seq + 1:
+                logger.warning(
+                    f"Environment {self.environment_id} events {self._last_seq + 1}..{seq - 1} missed, resyncing"
+                )
+                self._stats["gaps"] += 1
+                metrics.increment("environment_sync_gaps")
+                await self._resync()
+                # The full sync already covers this event unless it predates the sync
+                if self._last_seq is not None and seq <= self._last_seq:
+                    return False
+        self._last_seq = seq
+        self._stats["last_seq"] = seq
+        return True
+
+    async def _apply(self, payload: Dict[str, Any], apply):
+        if not self._ours(payload):
+            return
+        async with self._lock:
+            if await self._check_seq(payload):
+                await apply()
+                self._stats["events_applied"] += 1
+
+    async def _on_facts_loaded(self, payload: Dict[str, Any]):
+        await self._apply(payload, lambda: self._add(payload.get('facts', [])))
+
+    async def _on_facts_unloaded(self, payload: Dict[str, Any]):
+        await self._apply(payload, lambda: self.model.removeFacts(list(payload.get('factUids', []))))
+
+    async def _on_entity_selected(self, payload: Dict[str, Any]):
+        async def select():
+            self.model.selected_entity = payload.get('entityUid', payload.get('uid'))
+        await self._apply(payload, select)
+
+    async def _on_entity_deselected(self, payload: Dict[str, Any]):
+        async def deselect():
+            self.model.selected_entity = None
+        await self._apply(payload, deselect)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "environment_id": self.environment_id, "model_version": self.model.version}
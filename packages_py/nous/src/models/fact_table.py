@@ -0,0 +1,481 @@
+"""
+Columnar store of the environment's facts.
+
+Each fact is a row: fact, lh, rel type and rh UIDs in int64 columns, and the
+lh, rel type and rh names as int32 ids into a shared string table. Rows are
+appended as facts arrive; removed facts leave a tombstone until enough have
+accumulated to compact the columns. The row order is the order facts were
+added, the same order SemanticModel keeps its fact list in.
+
+Filters, group-bys, degree counts and joins run over the columns with numpy.
+Neighbour queries use a CSR adjacency (row indices per entity UID), built
+lazily after a change.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.models.records import Fact
+
+MISSING = -1
+_UNKNOWN = -2
+
+UID_COLUMNS = ('fact_uid', 'lh_object_uid', 'rel_type_uid', 'rh_object_uid')
+NAME_COLUMNS = ('lh_object_name', 'rel_type_name', 'rh_object_name')
+
+# Tombstones tolerated before the columns are compacted
+_COMPACT_MIN = 1024
+
+
+def _uid(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+class StringTable:
+    """Strings to dense int ids"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+
+    def id(self, value: Optional[str]) -> int:
+        if value is None:
+            return MISSING
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = self._ids[value] = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def ids(self, values: Sequence[Optional[str]]) -> List[int]:
+        """Ids for many strings at once, adding the new ones"""
+        get = self._ids.get
+        ids = [MISSING if value is None else get(value, _UNKNOWN) for value in values]
+        for i, value in enumerate(values):
+            if ids[i] == _UNKNOWN:
+                ids[i] = self.id(value)
+        return ids
+
+    def find(self, value: str) -> int:
+        """Id of a string already in the table, or MISSING"""
+        return self._ids.get(value, MISSING)
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._ids
+
+    def __getitem__(self, string_id: int) -> Optional[str]:
+        return None if string_id == MISSING else self._strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+class FactTable:
+    """Facts as numpy columns with vectorized filter, group-by, join and neighbour queries"""
+
+    def __init__(self, capacity: int = 1024):
+        self.strings = StringTable()
+        self._columns: Dict[str, np.ndarray] = {
+            **{name: np.full(capacity, MISSING, dtype=np.int64) for name in UID_COLUMNS},
+            **{name: np.full(capacity, MISSING, dtype=np.int32) for name in NAME_COLUMNS},
+        }
+        self._live = np.zeros(capacity, dtype=bool)
+        self._records: List[Optional[Fact]] = []
+        self._row_of: Dict[Any, int] = {}
+        self._size = 0
+        self._dead = 0
+        self._csr: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def __getstate__(self):
+        # The adjacency is rebuilt on demand
+        return {**self.__dict__, "_csr": None, "_ends": None}
+
+    # --- Maintenance --- #
+
+    def _grow(self, needed: int):
+        capacity = len(self._live)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.full(capacity, MISSING, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        live = np.zeros(capacity, dtype=bool)
+        live[:self._size] = self._live[:self._size]
+        self._live = live
+
+    def add(self, facts: Iterable[Fact], columns: Optional[Dict[str, Any]] = None):
+        """
+        Append facts; a fact whose uid is already present replaces the old row.
+
+        `columns` optionally holds the facts' columns, already parsed (e.g. by
+        the columnar Gellish loader): the UID columns as int64 arrays and the
+        name columns as (codes, strings) pairs, codes indexing strings with -1
+        for no name. They are copied in directly when every uid is new and
+        distinct; otherwise the facts are read one by one as usual.
+        """
+        if columns is not None and self._add_columns(facts, columns):
+            return
+        # The last of several facts with the same uid wins
+        facts = list({f['fact_uid']: Fact.from_wire(f) for f in facts}.values())
+        self.remove(f['fact_uid'] for f in facts if f['fact_uid'] in self._row_of)
+        self._grow(self._size + len(facts))
+        start = self._size
+        rows = slice(start, start + len(facts))
+        # Column at a time: one numpy assignment per column rather than per cell.
+        # The facts are Fact records, so fields are read straight from their slots
+        for name in UID_COLUMNS:
+            values = [getattr(f, name, None) for f in facts]
+            try:
+                self._columns[name][rows] = values
+            except (TypeError, ValueError, OverflowError):
+                self._columns[name][rows] = [_uid(value) for value in values]
+        for name in NAME_COLUMNS:
+            self._columns[name][rows] = self.strings.ids([getattr(f, name, None) for f in facts])
+        self._row_of.update(zip((f['fact_uid'] for f in facts), range(start, start + len(facts))))
+        self._records.extend(facts)
+        self._live[rows] = True
+        self._size += len(facts)
+        self._csr = None
+
+    def _add_columns(self, facts: Iterable[Fact], columns: Dict[str, Any]) -> bool:
+        facts = list(facts)
+        fact_uids = np.asarray(columns['fact_uid'], dtype=np.int64)
+        if len(fact_uids) != len(facts) or len(np.unique(fact_uids)) != len(facts):
+            return False
+        if self._row_of and np.isin(fact_uids, self.column('fact_uid')[self.rows()]).any():
+            return False
+        self._grow(self._size + len(facts))
+        start = self._size
+        rows = slice(start, start + len(facts))
+        for name in UID_COLUMNS:
+            if name in columns:
+                self._columns[name][rows] = columns[name]
+        for name in NAME_COLUMNS:
+            if name in columns:
+                codes, strings = columns[name]
+                # Code -1 (no name) picks the MISSING appended at the end
+                ids = np.asarray(self.strings.ids(strings) + [MISSING], dtype=np.int32)
+                self._columns[name][rows] = ids[codes]
+        self._row_of.update(zip(fact_uids.tolist(), range(start, start + len(facts))))
+        self._records.extend(Fact.from_wire(f) for f in facts)
+        self._live[rows] = True
+        self._size += len(facts)
+        self._csr = None
+        return True
+
+    def remove(self, fact_uids: Iterable[Any]) -> List[Fact]:
+        """Drop facts by uid, returning the removed facts"""
+        removed = []
+        for fact_uid in list(fact_uids):
+            row = self._row_of.pop(fact_uid, None)
+            if row is None:
+                continue
+            removed.append(self._records[row])
+            self._records[row] = None
+            self._live[row] = False
+            self._dead += 1
+        if removed:
+            self._csr = None
+            if self._dead >= _COMPACT_MIN and self._dead > self._size // 2:
+                self._compact()
+        return removed
+
+    def _compact(self):
+        keep = np.flatnonzero(self._live[:self._size])
+        for name, column in self._columns.items():
+            column[:len(keep)] = column[keep]
+            column[len(keep):self._size] = MISSING
+        self._live[:len(keep)] = True
+        self._live[len(keep):self._size] = False
+        self._records = [self._records[row] for row in keep]
+        self._row_of = {f['fact_uid']: row for row, f in enumerate(self._records)}
+        self._size = len(keep)
+        self._dead = 0
+
+    # --- Rows --- #
+
+    def __len__(self) -> int:
+        return self._size - self._dead
+
+    def __contains__(self, fact_uid: Any) -> bool:
+        return fact_uid in self._row_of
+
+    def get(self, fact_uid: Any) -> Optional[Fact]:
+        """The fact with this uid, if present"""
+        row = self._row_of.get(fact_uid)
+        return None if row is None else self._records[row]
+
+    def column(self, name: str) -> np.ndarray:
+        """A column over all rows, live or not (index it with `rows()` or a mask)"""
+        return self._columns[name][:self._size]
+
+    def rows(self) -> np.ndarray:
+        """Live row indices, in insertion order"""
+        return np.flatnonzero(self._live[:self._size])
+
+    def facts(self, rows: Optional[Iterable[int]] = None) -> List[Fact]:
+        """Fact records for row indices (all live rows by default)"""
+        if rows is None:
+            rows = self.rows()
+        return [self._records[row] for row in rows]
+
+    # --- Vectorized queries --- #
+
+    def _values(self, name: str, value: Any) -> Any:
+        if name in NAME_COLUMNS:
+            # Strings not in the table get an id no row has
+            if isinstance(value, str):
+                return self.strings.find(value) if value in self.strings else _UNKNOWN
+            return [self.strings.find(v) if v in self.strings else _UNKNOWN for v in value]
+        if isinstance(value, (list, tuple, set, frozenset, np.ndarray)):
+            return [_uid(v) for v in value]
+        return _uid(value)
+
+    def mask(self, **where: Any) -> np.ndarray:
+        """
+        Boolean mask over the rows matching every condition.
+
+        Each keyword names a column and gives a value, or a collection of
+        values, e.g. `mask(rel_type_uid=1146, rh_object_uid=[1, 2])`.
+        """
+        mask = self._live[:self._size].copy()
+        for name, value in where.items():
+            column = self.column(name)
+            values = self._values(name, value)
+            if isinstance(values, list):
+                mask &= np.isin(column, np.asarray(values, dtype=column.dtype))
+            else:
+                mask &= column == values
+        return mask
+
+    def filter(self, **where: Any) -> np.ndarray:
+        """Row indices matching every condition (see `mask`), in insertion order"""
+        return np.flatnonzero(self.mask(**where))
+
+    def group_by(self, name: str, rows: Optional[np.ndarray] = None) -> Dict[Any, np.ndarray]:
+        """
+        Rows grouped by a column's value.
+
+        Groups appear in the order their first row does and rows keep their
+        order within a group. Name columns are keyed by the string, UID
+        columns by the int (MISSING for facts without the value).
+        """
+        rows = self.rows() if rows is None else np.asarray(rows, dtype=np.int64)
+        if rows.size == 0:
+            return {}
+        keys = self.column(name)[rows]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        groups = np.split(rows[order], starts[1:])
+        groups.sort(key=lambda group_rows: group_rows[0])
+        if name in NAME_COLUMNS:
+            return {self.strings[int(self.column(name)[g[0]])]: g for g in groups}
+        return {int(self.column(name)[g[0]]): g for g in groups}
+
+    def counts(self, name: str, rows: Optional[np.ndarray] = None) -> Dict[Any, int]:
+        """Number of rows per value of a column"""
+        return {key: len(group) for key, group in self.group_by(name, rows).items()}
+
+    def degrees(self, uids: Optional[Iterable[Any]] = None) -> Dict[int, int]:
+        """Facts each entity takes part in, as lh or rh (a self-relation counts twice)"""
+        rows = self.rows()
+        ends = np.concatenate([self.column('lh_object_uid')[rows], self.column('rh_object_uid')[rows]])
+        values, counts = np.unique(ends[ends != MISSING], return_counts=True)
+        if uids is None:
+            return dict(zip(values.tolist(), counts.tolist()))
+        wanted = np.asarray([_uid(u) for u in uids], dtype=np.int64)
+        positions = np.searchsorted(values, wanted)
+        positions[positions == len(values)] = 0
+        found = values.size > 0
+        return {
+            int(uid): int(counts[p]) if found and values[p] == uid else 0
+            for uid, p in zip(wanted, positions)
+        }
+
+    def join(self, left_rows: np.ndarray, right_rows: np.ndarray,
+             left_on: str = 'rh_object_uid', right_on: str = 'lh_object_uid') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Equi-join two sets of rows on a column each.
+
+        Returns aligned arrays (left row, right row) for every pair with
+        `left[left_on] == right[right_on]`; with the defaults, the two-step
+        paths where the first fact's rh is the second fact's lh.
+        """
+        left_rows = np.asarray(left_rows, dtype=np.int64)
+        right_rows = np.asarray(right_rows, dtype=np.int64)
+        left_keys = self.column(left_on)[left_rows]
+        right_keys = self.column(right_on)[right_rows]
+
+        order = np.argsort(right_keys, kind="stable")
+        sorted_right = right_keys[order]
+        lo = np.searchsorted(sorted_right, left_keys, side="left")
+        hi = np.searchsorted(sorted_right, left_keys, side="right")
+        counts = hi - lo
+        counts[left_keys == MISSING] = 0
+
+        left_index = np.repeat(np.arange(len(left_rows)), counts)
+        # Offset of each output pair within its left row's run of matches
+        run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+        right_index = order[np.repeat(lo, counts) + np.arange(counts.sum()) - run_starts]
+        return left_rows[left_index], right_rows[right_index]
+
+    # --- Adjacency --- #
+
+    def _adjacency(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._csr is None:
+            rows = self.rows()
+            ends = np.concatenate([self.column('lh_object_uid')[rows], self.column('rh_object_uid')[rows]])
+            edge_rows = np.concatenate([rows, rows])
+            nodes, inverse = np.unique(ends, return_inverse=True)
+            order = np.argsort(inverse, kind="stable")
+            indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(inverse, minlength=len(nodes)), out=indptr[1:])
+            self._csr = (nodes, indptr, edge_rows[order])
+        return self._csr
+
+    def _end_positions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Adjacency positions of each row's lh and rh entity (rebuilt with the adjacency)"""
+        csr = self._adjacency()
+        ends = getattr(self, '_ends', None)
+        if ends is None or ends[0] is not csr:
+            nodes = csr[0]
+            ends = (
+                csr,
+                np.searchsorted(nodes, self.column('lh_object_uid')).astype(np.int32),
+                np.searchsorted(nodes, self.column('rh_object_uid')).astype(np.int32),
+            )
+            self._ends = ends
+        return ends[1], ends[2]
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The live facts as directed lh -> rh edges.
+
+        Returns (entity uids, lh position, rh position), the positions indexing
+        the uid array. Facts with a missing end are left out. The uid array is
+        replaced whenever the facts change.
+        """
+        nodes = self._adjacency()[0]
+        lh_at, rh_at = self._end_positions()
+        rows = self.rows()
+        rows = rows[(self.column('lh_object_uid')[rows] != MISSING) & (self.column('rh_object_uid')[rows] != MISSING)]
+        return nodes, lh_at[rows], rh_at[rows]
+
+    def _edge_rows(self, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows of the entities at adjacency `positions`, concatenated, with the count per entity"""
+        _, indptr, indices = self._adjacency()
+        starts = indptr[positions]
+        counts = indptr[positions + 1] - starts
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return indices[offsets + np.arange(counts.sum())], counts
+
+    def incident_rows(self, uids: Iterable[Any]) -> np.ndarray:
+        """Rows of the facts any of the entities takes part in, in insertion order"""
+        nodes = self._adjacency()[0]
+        keys = np.unique(np.asarray([_uid(u) for u in uids], dtype=np.int64))
+        positions = np.searchsorted(nodes, keys)
+        found = positions < len(nodes)
+        found[found] = nodes[positions[found]] == keys[found]
+        found &= keys != MISSING
+        return np.unique(self._edge_rows(positions[found])[0])
+
+    def neighbor_rows(self, uid: Any) -> np.ndarray:
+        """Rows of the facts an entity takes part in, in insertion order"""
+        nodes, indptr, indices = self._adjacency()
+        key = _uid(uid)
+        position = int(np.searchsorted(nodes, key))
+        if key == MISSING or position == len(nodes) or nodes[position] != key:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(indices[indptr[position]:indptr[position + 1]])
+
+    def neighbors(self, uid: Any) -> List[int]:
+        """UIDs of the entities related to `uid` by any fact"""
+        rows = self.neighbor_rows(uid)
+        ends = np.concatenate([self.column('lh_object_uid')[rows], self.column('rh_object_uid')[rows]])
+        key = _uid(uid)
+        others = np.unique(ends[(ends != key) & (ends != MISSING)])
+        return others.tolist()
+
+    def has_entity(self, uid: Any) -> bool:
+        """Whether any fact has `uid` as its lh or rh object"""
+        return self.neighbor_rows(uid).size > 0
+
+    def subgraph(self, seeds: Iterable[Any], hops: int = 2,
+                 rel_types: Optional[Iterable[Any]] = None,
+                 exclude_rel_types: Optional[Iterable[Any]] = None,
+                 max_nodes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Entities and facts within `hops` of the seed entities.
+
+        Breadth-first over the adjacency, following only facts whose relation
+        type is in `rel_types` (if given) and not in `exclude_rel_types`.
+        With `max_nodes`, expansion stops at that many entities, nearer ones
+        first.
+
+        Returns (entity uids by distance, then by the first fact reaching them;
+        fact rows in insertion order).
+        The rows are the facts followed between entities in the result.
+        """
+        nodes = self._adjacency()[0]
+        lh, rh = self.column('lh_object_uid'), self.column('rh_object_uid')
+        rel = self.column('rel_type_uid')
+        lh_at, rh_at = self._end_positions()
+        include = None if rel_types is None else np.asarray([_uid(u) for u in rel_types], dtype=np.int64)
+        exclude = None if exclude_rel_types is None else np.asarray([_uid(u) for u in exclude_rel_types], dtype=np.int64)
+        limit = len(nodes) if max_nodes is None else max_nodes
+
+        # Entities are tracked by their position in the adjacency; the per-hop
+        # sets are small, so plain Python dedupes them faster than np.unique
+        seen = np.zeros(len(nodes), dtype=bool)
+        visited: List[int] = []
+        for seed in dict.fromkeys(_uid(s) for s in seeds):
+            position = int(np.searchsorted(nodes, seed))
+            if seed != MISSING and position < len(nodes) and nodes[position] == seed and len(visited) < limit:
+                visited.append(position)
+        frontier = np.asarray(visited, dtype=np.int64)
+        seen[frontier] = True
+        followed = []
+
+        for _ in range(hops):
+            if frontier.size == 0:
+                break
+            rows, counts = self._edge_rows(frontier)
+            sources = np.repeat(nodes[frontier], counts)
+
+            if include is not None:
+                keep = np.isin(rel[rows], include)
+                rows, sources = rows[keep], sources[keep]
+            if exclude is not None:
+                keep = ~np.isin(rel[rows], exclude)
+                rows, sources = rows[keep], sources[keep]
+            others = np.where(lh[rows] == sources, rh[rows], lh[rows])
+            positions = np.where(lh[rows] == sources, rh_at[rows], lh_at[rows])
+            keep = others != MISSING
+            rows, positions = rows[keep], positions[keep]
+            followed.append(rows)
+
+            # New entities in the insertion order of the facts reaching them
+            unseen = ~seen[positions]
+            reached_by = np.argsort(rows[unseen], kind="stable")
+            new = list(dict.fromkeys(positions[unseen][reached_by].tolist()))[:max(0, limit - len(visited))]
+            frontier = np.asarray(new, dtype=np.int64)
+            seen[frontier] = True
+            visited.extend(new)
+
+        uids = nodes[np.asarray(visited, dtype=np.int64)]
+        if not followed:
+            return uids, np.empty(0, dtype=np.int64)
+        rows = np.concatenate(followed)
+        rows.sort()
+        rows = rows[np.r_[True, rows[1:] != rows[:-1]]] if rows.size else rows
+        # Rows followed have both ends in the adjacency; keep those inside the result
+        rows = rows[seen[lh_at[rows]] & seen[rh_at[rows]]]
+        return uids, rows
@@ -0,0 +1,378 @@
+"""
+Streaming loader for Gellish table exports (CSV or TSV).
+
+Seeds a SemanticModel offline, without Aperture, e.g. for benchmarks. The
+header row holds the Gellish column ids ('1' fact UID, '2' lh object UID,
+'101' lh object name, ...), as in the files Prism imports. Files are
+processed in generator stages, so only one batch of facts is in flight at a
+time:
+
+    read_rows (csv) -> normalize (Fact records) -> batched -> model.addFacts
+
+With pyarrow installed, files are read column by column instead
+(`iter_fact_columns`): Arrow's CSV reader parses a block of rows at a time,
+UIDs are converted per column, and repeated strings are dictionary-encoded
+and interned once per block. Each batch is handed to the model with its
+columns, which are copied straight into the FactTable. Rows that do not fit
+the header (too few cells) are parsed by the csv path after their block.
+
+Rows without a fact, lh, relation type or rh UID are skipped. UIDs may use
+thousands separators ("1,234,567").
+"""
+
+import csv
+import gc
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # optional dependency
+    pa = None
+
+from src.models.fact_table import NAME_COLUMNS, UID_COLUMNS
+from src.models.records import Fact, _restore
+
+logger = logging.getLogger(__name__)
+
+# Gellish column id -> Fact field (see Prism's CSV import)
+COLUMNS: Dict[str, str] = {
+    '0': 'sequence',
+    '1': 'fact_uid',
+    '2': 'lh_object_uid',
+    '101': 'lh_object_name',
+    '60': 'rel_type_uid',
+    '3': 'rel_type_name',
+    '15': 'rh_object_uid',
+    '201': 'rh_object_name',
+    '4': 'full_definition',
+    '65': 'partial_definition',
+    '71': 'lh_context_uid',
+    '16': 'lh_context_name',
+    '72': 'lh_role_uid',
+    '73': 'lh_role_name',
+    '74': 'rh_role_uid',
+    '75': 'rh_role_name',
+    '44': 'lh_cardinalities',
+    '45': 'rh_cardinalities',
+    '69': 'language_uid',
+    '54': 'language',
+    '50': 'collection_uid',
+    '68': 'collection_name',
+    '66': 'uom_uid',
+    '7': 'uom_name',
+    '8': 'approval_status',
+    '9': 'effective_from',
+    '10': 'latest_update',
+    '12': 'author',
+    '13': 'reference',
+    '14': 'remarks',
+}
+# Snapshot metadata "source" for seeded models; the service never restores these
+SOURCE = 'gellish'
+INTEGER_FIELDS = frozenset(Fact.UIDS | {'fact_uid', 'sequence'})
+REQUIRED_FIELDS = ('fact_uid', 'lh_object_uid', 'rel_type_uid', 'rh_object_uid')
+
+PathLike = Union[str, Path]
+
+# How normalize treats a column
+_INTEGER, _INTERNED, _TEXT = 'integer', 'interned', 'text'
+# Bytes of the file Arrow's reader parses at a time
+BLOCK_SIZE = 1 << 22
+# Rough bytes per row, to size blocks from a batch size
+ROW_BYTES = 256
+
+
+def _delimiter(path: PathLike, header_line: str) -> str:
+    """Tab for .tsv files, otherwise whichever of tab or comma the header uses"""
+    if Path(path).suffix.lower() == '.tsv' or header_line.count('\t') > header_line.count(','):
+        return '\t'
+    return ','
+
+
+def read_rows(path: PathLike, delimiter: Optional[str] = None) -> Tuple[List[str], Iterator[List[str]]]:
+    """
+    The header and a lazy iterator over the rows of a Gellish table file.
+
+    The delimiter defaults to a tab for .tsv files and to whichever of tab
+    or comma the header uses otherwise.
+    """
+    f = open(path, newline='', encoding='utf-8-sig')
+    header_line = f.readline()
+    delimiter = delimiter or _delimiter(path, header_line)
+    header = next(csv.reader([header_line], delimiter=delimiter), [])
+
+    def rows() -> Iterator[List[str]]:
+        with f:
+            yield from csv.reader(f, delimiter=delimiter)
+
+    return [column.strip() for column in header], rows()
+
+
+def _integer(value: str) -> Optional[int]:
+    """A UID or sequence number, allowing thousands separators; None if empty or invalid"""
+    value = value.replace(',', '').strip()
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return int(float(value))
+        except ValueError:
+            return None
+
+
+def normalize(header: Sequence[str], rows: Iterable[List[str]], stats: Optional[Dict[str, int]] = None) -> Iterator[Fact]:
+    """Fact records for raw rows; rows missing a required UID are counted as skipped"""
+    columns = [(i, COLUMNS[column]) for i, column in enumerate(header) if column in COLUMNS]
+    fields = [field for _, field in columns]
+    missing = [field for field in REQUIRED_FIELDS if field not in fields]
+    if missing:
+        raise ValueError(f"not a Gellish table: no column for {', '.join(missing)}")
+
+    pick = itemgetter(*(i for i, _ in columns))
+    padding = [''] * (max(i for i, _ in columns) + 1)
+    kinds = [_INTEGER if field in INTEGER_FIELDS else _INTERNED if field in Fact.INTERNED else _TEXT for field in fields]
+    plan = list(zip(fields, kinds))
+    intern = sys.intern
+    stats = stats if stats is not None else {}
+    stats.setdefault('rows', 0)
+    stats.setdefault('skipped', 0)
+    # Field combinations seen so far and whether they hold all required UIDs
+    shapes: Dict[Tuple[str, ...], bool] = {}
+
+    for row in rows:
+        stats['rows'] += 1
+        try:
+            raw = pick(row)
+        except IndexError:
+            raw = pick(row + padding)
+        present = []
+        values = []
+        for (field, kind), value in zip(plan, raw):
+            if not value:
+                continue
+            if kind is _INTEGER:
+                try:
+                    value = int(value)
+                except ValueError:
+                    value = _integer(value)
+                    if value is None:
+                        continue
+            elif kind is _INTERNED:
+                value = intern(value)
+            present.append(field)
+            values.append(value)
+        present = tuple(present)
+        complete = shapes.get(present)
+        if complete is None:
+            complete = shapes[present] = all(field in present for field in REQUIRED_FIELDS)
+        if not complete:
+            stats['skipped'] += 1
+            continue
+        # Set straight into the slots, as when unpickling
+        yield _restore(Fact, present, values, None)
+
+
+def batched(facts: Iterable[Fact], size: int) -> Iterator[List[Fact]]:
+    iterator = iter(facts)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def iter_facts(path: PathLike, delimiter: Optional[str] = None, stats: Optional[Dict[str, int]] = None) -> Iterator[Fact]:
+    """Fact records from a Gellish table file, streamed"""
+    header, rows = read_rows(path, delimiter)
+    return normalize(header, rows, stats)
+
+
+def _require():
+    if pa is None:
+        raise ImportError("The columnar Gellish reader needs pyarrow (pip install pyarrow)")
+
+
+def _integers(array: "pa.Array") -> "pa.Array":
+    """int64 column for a column of UID text (thousands separators allowed; invalid values become null)"""
+    try:
+        return pc.cast(pc.replace_substring(array, ',', ''), pa.int64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.array([None if v is None else _integer(v) for v in array.to_pylist()], type=pa.int64())
+
+
+def _codes(array: "pa.Array", intern: bool) -> Tuple[np.ndarray, List[str]]:
+    """(codes, strings) for a text column: codes index strings, -1 for empty cells"""
+    encoded = pc.dictionary_encode(array)
+    strings = encoded.dictionary.to_pylist()
+    if intern:
+        strings = [sys.intern(value) for value in strings]
+    return encoded.indices.fill_null(-1).to_numpy().astype(np.int64), strings
+
+
+def _batch_facts(fields: List[str], arrays: List["pa.Array"], stats: Dict[str, int]) -> Tuple[List[Fact], Dict[str, Any]]:
+    """Fact records and FactTable columns for one block of parsed rows"""
+    values, valid, columns = [], [], {}
+    for field, array in zip(fields, arrays):
+        if field in INTEGER_FIELDS:
+            array = _integers(array)
+            values.append(array.fill_null(0).to_numpy())
+            valid.append(array.is_valid().to_numpy(zero_copy_only=False))
+        else:
+            codes, strings = _codes(array, field in Fact.INTERNED)
+            # Code -1 picks the None appended at the end
+            values.append(np.array(strings + [None], dtype=object)[codes])
+            valid.append(codes >= 0)
+            if field in NAME_COLUMNS:
+                columns[field] = (codes, strings)
+
+    complete = np.logical_and.reduce([valid[fields.index(field)] for field in REQUIRED_FIELDS])
+    stats['rows'] += len(complete)
+    if not complete.all():
+        stats['skipped'] += int((~complete).sum())
+        values = [column[complete] for column in values]
+        valid = [column[complete] for column in valid]
+        columns = {name: (codes[complete], strings) for name, (codes, strings) in columns.items()}
+    for field, column in zip(fields, values):
+        if field in UID_COLUMNS:
+            columns[field] = column
+
+    # Rows with the same fields present share a shape; build the records shape by shape
+    shapes = np.zeros(len(values[0]), dtype=np.int64)
+    for bit, column in enumerate(valid):
+        shapes |= column.astype(np.int64) << bit
+    kinds, inverse = np.unique(shapes, return_inverse=True)
+    facts: List[Any] = [None] * len(shapes)
+    for kind, shape in enumerate(kinds.tolist()):
+        bits = [bit for bit in range(len(fields)) if shape >> bit & 1]
+        present = tuple(fields[bit] for bit in bits)
+        rows = np.flatnonzero(inverse == kind) if len(kinds) > 1 else slice(None)
+        records = [_restore(Fact, present, row, None) for row in zip(*(values[bit][rows].tolist() for bit in bits))]
+        if len(kinds) == 1:
+            facts = records
+        else:
+            for row, record in zip(rows.tolist(), records):
+                facts[row] = record
+    return facts, columns
+
+
+def iter_fact_columns(path: PathLike, delimiter: Optional[str] = None, stats: Optional[Dict[str, int]] = None,
+                      block_size: int = BLOCK_SIZE) -> Iterator[Tuple[List[Fact], Optional[Dict[str, Any]]]]:
+    """
+    Fact records with their FactTable columns, one block of a Gellish table file at a time.
+
+    Yields (facts, columns) pairs (see FactTable.add). Needs pyarrow. Rows
+    with fewer cells than the header come after their block, parsed by the
+    csv path, with no columns.
+    """
+    _require()
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header_line = f.readline()
+    delimiter = delimiter or _delimiter(path, header_line)
+    header = [column.strip() for column in next(csv.reader([header_line], delimiter=delimiter), [])]
+    stats = stats if stats is not None else {}
+    stats.setdefault('rows', 0)
+    stats.setdefault('skipped', 0)
+
+    # Positional column names: the first column for each field wins, as in normalize
+    names = [f"c{i}" for i in range(len(header))]
+    included: Dict[str, str] = {}
+    for name, column in zip(names, header):
+        field = COLUMNS.get(column)
+        if field is not None and field not in included.values():
+            included[name] = field
+    missing = [field for field in REQUIRED_FIELDS if field not in included.values()]
+    if missing:
+        raise ValueError(f"not a Gellish table: no column for {', '.join(missing)}")
+
+    uneven: List[str] = []
+
+    def keep_uneven(row) -> str:
+        uneven.append(row.text)
+        return 'skip'
+
+    reader = pa_csv.open_csv(
+        str(path),
+        read_options=pa_csv.ReadOptions(column_names=names, skip_rows=1, block_size=block_size),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter, newlines_in_values=True,
+                                          invalid_row_handler=keep_uneven),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in included},
+            include_columns=list(included), strings_can_be_null=True, null_values=[''],
+        ),
+    )
+    fields = list(included.values())
+    for batch in reader:
+        if batch.num_rows:
+            yield _batch_facts(fields, [batch.column(name) for name in included], stats)
+        if uneven:
+            rows, uneven[:] = list(csv.reader(uneven, delimiter=delimiter)), []
+            facts = list(normalize(header, rows, stats))
+            if facts:
+                yield facts, None
+
+
+@contextmanager
+def _collector_paused():
+    """
+    Pause the cyclic garbage collector: every record a parse allocates
+    survives, so collections would only rescan them over and over.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+
+async def load(model, paths: Union[PathLike, Iterable[PathLike]], batch_size: int = 50_000,
+               delimiter: Optional[str] = None, load_models: bool = False,
+               columnar: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Add the facts of one or more Gellish table files to a SemanticModel.
+
+    Args:
+        model: The SemanticModel to seed
+        paths: Gellish CSV/TSV file(s)
+        batch_size: Facts added to the model at a time (roughly, for the
+            columnar path, which reads blocks of batch_size * ROW_BYTES bytes)
+        delimiter: Column delimiter (detected by default)
+        load_models: Also fetch the entity models from Clarity
+        columnar: Read with pyarrow's CSV reader (default: if pyarrow is installed)
+
+    Returns load statistics (rows, facts, skipped, seconds, facts_per_second).
+    """
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+    if columnar is None:
+        columnar = pa is not None
+    stats: Dict[str, Any] = {'rows': 0, 'skipped': 0, 'facts': 0}
+    started = time.perf_counter()
+    for path in paths:
+        if columnar:
+            batches = iter_fact_columns(path, delimiter, stats, block_size=batch_size * ROW_BYTES)
+        else:
+            batches = ((batch, None) for batch in batched(iter_facts(path, delimiter, stats), batch_size))
+        while True:
+            # Only the parse itself: other tasks run while the model takes the batch
+            with _collector_paused():
+                batch = next(batches, None)
+            if batch is None:
+                break
+            facts, columns = batch
+            if facts:
+                await model.addFacts(facts, load_models=load_models, columns=columns)
+                stats['facts'] += len(facts)
+        logger.info(f"Loaded {path}: {stats['facts']} facts so far")
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['facts_per_second'] = round(stats['facts'] / stats['seconds']) if stats['seconds'] else None
+    return stats
@@ -0,0 +1,185 @@
+"""
+In-memory index of entity names.
+
+Names come from model names and the lh/rh object names of facts, and are
+updated incrementally as facts and models arrive and leave. Lookups go from
+cheapest to most expensive: exact (dict), prefix (bisect over a lazily sorted
+name list) and fuzzy (trigram postings scored with numpy).
+"""
+
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+import numpy as np
+
+from src.models.records import Fact
+
+
+class NameMatch(NamedTuple):
+    name: str
+    uids: List[Any]
+    score: float
+    match: str  # "exact", "prefix" or "fuzzy"
+
+
+_FACT_NAMES = (('lh_object_uid', 'lh_object_name'), ('rh_object_uid', 'rh_object_name'))
+
+
+def normalize(name: str) -> str:
+    return re.sub(r"\s+", " ", str(name)).strip().casefold()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Names to entity UIDs with exact, prefix and trigram fuzzy lookup"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []  # normalized, by name id
+        self._display: List[str] = []  # as first seen, by name id
+        self._uids: List[Dict[Any, int]] = []  # uid -> reference count, by name id
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._posting_arrays: Dict[str, np.ndarray] = {}
+        # Per name id, grown by doubling: trigram count and whether any uid still has the name
+        self._trigram_counts = np.zeros(64, dtype=np.float64)
+        self._live = np.zeros(64, dtype=bool)
+        self._sorted: List[Tuple[str, int]] = []
+        self._sorted_dirty = False
+
+    def __getstate__(self):
+        # The posting arrays are a cache, rebuilt on demand
+        return {**self.__dict__, "_posting_arrays": {}}
+
+    # --- Maintenance --- #
+
+    def _name_id(self, name: str) -> int:
+        key = normalize(name)
+        name_id = self._ids.get(key)
+        if name_id is None:
+            name_id = len(self._names)
+            self._ids[key] = name_id
+            self._names.append(key)
+            self._display.append(str(name).strip())
+            self._uids.append({})
+            if name_id >= len(self._live):
+                self._trigram_counts = np.resize(self._trigram_counts, 2 * len(self._live))
+                self._live = np.resize(self._live, 2 * len(self._live))
+            grams = trigrams(key)
+            self._trigram_counts[name_id] = len(grams)
+            self._live[name_id] = False
+            for gram in grams:
+                self._postings[gram].append(name_id)
+                self._posting_arrays.pop(gram, None)
+            self._sorted_dirty = True
+        return name_id
+
+    def add(self, uid: Any, name: Any):
+        """Register one more reference from `name` to `uid`"""
+        if uid is None or not name:
+            return
+        name_id = self._name_id(name)
+        refs = self._uids[name_id]
+        refs[uid] = refs.get(uid, 0) + 1
+        self._live[name_id] = True
+
+    def remove(self, uid: Any, name: Any):
+        """Drop one reference from `name` to `uid`"""
+        if uid is None or not name:
+            return
+        name_id = self._ids.get(normalize(name))
+        if name_id is None:
+            return
+        refs = self._uids[name_id]
+        if uid in refs:
+            refs[uid] -= 1
+            if refs[uid] <= 0:
+                del refs[uid]
+                self._live[name_id] = bool(refs)
+
+    def add_facts(self, facts: Iterable[Fact]):
+        # Names repeat across facts: normalize each distinct one once per batch
+        name_ids: Dict[str, int] = {}
+        touched = set()
+        for f in facts:
+            for uid_key, name_key in _FACT_NAMES:
+                uid, name = f.get(uid_key), f.get(name_key)
+                if uid is None or not name:
+                    continue
+                name_id = name_ids.get(name)
+                if name_id is None:
+                    name_id = name_ids[name] = self._name_id(name)
+                refs = self._uids[name_id]
+                refs[uid] = refs.get(uid, 0) + 1
+                touched.add(name_id)
+        if touched:
+            self._live[list(touched)] = True
+
+    def remove_facts(self, facts: Iterable[Fact]):
+        for f in facts:
+            self.remove(f.get('lh_object_uid'), f.get('lh_object_name'))
+            self.remove(f.get('rh_object_uid'), f.get('rh_object_name'))
+
+    # --- Lookups --- #
+
+    def _match(self, name_id: int, score: float, kind: str) -> NameMatch:
+        return NameMatch(self._display[name_id], list(self._uids[name_id]), score, kind)
+
+    def exact(self, name: str) -> List[Any]:
+        """UIDs of entities with exactly this name (case and whitespace insensitive)"""
+        name_id = self._ids.get(normalize(name))
+        return [] if name_id is None else list(self._uids[name_id])
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[NameMatch]:
+        """Names starting with `prefix`, shortest first"""
+        key = normalize(prefix)
+        if not key:
+            return []
+        if self._sorted_dirty:
+            self._sorted = sorted((name, i) for i, name in enumerate(self._names))
+            self._sorted_dirty = False
+
+        matches = []
+        for name, name_id in self._sorted[bisect_left(self._sorted, (key, -1)):]:
+            if not name.startswith(key):
+                break
+            if self._uids[name_id]:
+                matches.append(name_id)
+        matches.sort(key=lambda i: len(self._names[i]))
+        return [self._match(i, len(key) / len(self._names[i]), "prefix") for i in matches[:limit]]
+
+    def _posting_array(self, gram: str) -> np.ndarray:
+        array = self._posting_arrays.get(gram)
+        if array is None:
+            array = self._posting_arrays[gram] = np.asarray(self._postings[gram], dtype=np.int64)
+        return array
+
+    def fuzzy(self, query: str, limit: int = 10, min_score: float = 0.3) -> List[NameMatch]:
+        """Names sharing the most trigrams with `query` (Dice coefficient)"""
+        grams = trigrams(normalize(query))
+        postings = [self._posting_array(g) for g in grams if g in self._postings]
+        if not postings:
+            return []
+
+        count = len(self._names)
+        shared = np.bincount(np.concatenate(postings), minlength=count)
+        scores = 2.0 * shared / (len(grams) + self._trigram_counts[:count])
+        scores[~self._live[:count]] = 0.0
+
+        candidates = np.flatnonzero(scores >= min_score)
+        if candidates.size > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [self._match(int(i), float(scores[i]), "fuzzy") for i in ordered]
+
+    def lookup(self, query: str, limit: int = 10) -> List[NameMatch]:
+        """Exact match if there is one, else prefix matches, else fuzzy matches"""
+        uids = self.exact(query)
+        if uids:
+            return [NameMatch(self._display[self._ids[normalize(query)]], uids, 1.0, "exact")]
+        return self.prefix(query, limit) or self.fuzzy(query, limit)
@@ -0,0 +1,283 @@
+"""
+On-disk snapshots of the semantic model, for fast warm restarts.
+
+A snapshot holds the model's facts, models, selection, version and derived
+indexes (fact table columns, taxonomy with learned facts, classification and
+name indexes) in one file:
+
+    magic (8 bytes) | header length (u32) | header | pickle | buffers
+
+The header is a small pickle with the format version, the model version,
+caller metadata (e.g. the environment sync sequence number) and the offset
+and length of each buffer. The main pickle uses protocol 5 with out-of-band
+buffers, so numpy columns are written raw, 64-byte aligned. Loading maps the
+file copy-on-write and hands those buffers to the unpickler as views over
+the mapping; the columns are paged in on first use instead of being read
+and copied up front.
+
+Snapshots are written to a temporary file and renamed into place, so a crash
+mid-write leaves the previous snapshot intact.
+
+The periodic writer does not pickle on the event loop. It captures the
+model there: the published ModelSnapshot's facts and models, which never
+change, and copies of the indexes' containers and columns (the fact and
+model records in them are immutable and shared). Pickling and writing that
+capture then run in a thread while the model moves on.
+"""
+
+import asyncio
+import gc
+import logging
+import mmap
+import os
+import pickle
+import struct
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"NOUSSNAP"
+FORMAT_VERSION = 1
+_ALIGN = 64
+_HEADER_LEN = struct.Struct("<I")
+
+
+def _padding(offset: int) -> int:
+    return -offset % _ALIGN
+
+
+def _copier(sample: Any) -> Optional[Callable[[Any], Any]]:
+    """How to copy a container's items, judged by its first item (None: shared as they are)"""
+    if isinstance(sample, np.ndarray):
+        return np.copy
+    if isinstance(sample, (dict, list)):
+        items = sample.values() if isinstance(sample, dict) else sample
+        return type(sample).copy if _copier(next(iter(items), None)) is None else _detached
+    if isinstance(sample, set):
+        return set.copy
+    if hasattr(sample, '__dict__') and not isinstance(sample, type):
+        return _detached
+    # Records, persistent fact lists and model maps, strings, numbers: immutable
+    return None
+
+
+def _detached(value: Any) -> Any:
+    """
+    Copy of the containers, arrays and index objects in `value`, sharing everything else.
+
+    A container's items are taken to be of one kind (as in the indexes), so the
+    first item decides how all of them are copied; an object's attributes are
+    copied one by one.
+    """
+    if isinstance(value, (dict, list)):
+        items = value.values() if isinstance(value, dict) else value
+        copier = _copier(next(iter(items), None))
+        if copier is None:
+            return value.copy()  # keeps Counter/defaultdict
+        if isinstance(value, list):
+            return list(map(copier, value))
+        copy = value.copy()
+        copy.update(zip(value.keys(), map(copier, value.values())))
+        return copy
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        # An index object: a shell holding copies of what it pickles, without running __init__/__setstate__
+        copy = object.__new__(type(value))
+        copy.__dict__.update((name, _detached(item)) for name, item in value.__getstate__().items())
+        return copy
+    copier = _copier(value)
+    return value if copier is None else copier(value)
+
+
+def capture(model) -> Dict[str, Any]:
+    """The model's state as of now, unaffected by later changes, for serializing on another thread"""
+    snapshot = model.snapshot()
+    # Every copy survives, so cyclic collections would only rescan them (they form no cycles)
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        state = {
+            name: _detached(value) for name, value in model.export_state().items()
+            if name not in ('_facts', '_models', '_selected_entity', '_version')
+        }
+    finally:
+        if collecting:
+            gc.enable()
+    state.update(
+        _facts=snapshot.facts,
+        _models=snapshot.models,
+        _selected_entity=snapshot.selected_entity,
+        _version=snapshot.version,
+    )
+    return state
+
+
+def dumps(model, meta: Optional[Dict[str, Any]] = None) -> Tuple[bytes, list]:
+    """Serialize a model to (prefix, buffers); write the prefix followed by the buffers"""
+    return dumps_state(model.export_state(), meta)
+
+
+def dumps_state(state: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> Tuple[bytes, list]:
+    """Serialize an exported (or captured) model state to (prefix, buffers)"""
+    buffers = []
+    body = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    # Views over the state's arrays, which must not change until they are written
+    raw = [b.raw() for b in buffers]
+
+    # Buffer offsets are relative to the end of the body
+    layout = []
+    offset = 0
+    for buf in raw:
+        offset += _padding(offset)
+        layout.append((offset, len(buf)))
+        offset += len(buf)
+    header = pickle.dumps({
+        "format": FORMAT_VERSION,
+        "version": state['_version'],
+        "meta": meta or {},
+        "body": len(body),
+        "buffers": layout,
+    }, protocol=5)
+    prefix = MAGIC + _HEADER_LEN.pack(len(header)) + header + body
+    return prefix, list(zip(layout, raw))
+
+
+def save(model, path: Path, meta: Optional[Dict[str, Any]] = None) -> int:
+    """Write a snapshot of `model` to `path`; returns the number of bytes written"""
+    return _write(path, *dumps(model, meta))
+
+
+def save_state(state: Dict[str, Any], path: Path, meta: Optional[Dict[str, Any]] = None) -> int:
+    """Write a snapshot of a captured state to `path` (safe to run in a thread); returns the bytes written"""
+    return _write(path, *dumps_state(state, meta))
+
+
+def _write(path: Path, prefix: bytes, buffers: list) -> int:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    start = len(prefix) + _padding(len(prefix))
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        f.write(b"\0" * _padding(len(prefix)))
+        position = 0
+        for (offset, _), buf in buffers:
+            f.write(b"\0" * (offset - position))
+            f.write(buf)
+            position = offset + len(buf)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return start + position
+
+
+def read_header(mapped) -> Tuple[Dict[str, Any], int]:
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a NOUS semantic model snapshot")
+    at = len(MAGIC)
+    (length,) = _HEADER_LEN.unpack_from(mapped, at)
+    at += _HEADER_LEN.size
+    header = pickle.loads(mapped[at:at + length])
+    if header["format"] != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format {header['format']}")
+    return header, at + length
+
+
+def load(model, path: Path, match: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Restore `model` from the snapshot at `path`.
+
+    Args:
+        model: SemanticModel to restore into
+        path: Snapshot file
+        match: Metadata the snapshot must have been saved with (e.g. its environment)
+
+    Returns the snapshot header (with "version" and "meta"), or None if there
+    is no usable snapshot.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            # Copy-on-write: restored columns stay writable without touching the file
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        header, at = read_header(mapped)
+        if match and any(header["meta"].get(key) != value for key, value in match.items()):
+            logger.info(f"Ignoring semantic model snapshot {path}: saved for {header['meta']}")
+            return None
+        view = memoryview(mapped)
+        body = view[at:at + header["body"]]
+        base = at + header["body"]
+        base += _padding(base)
+        buffers = [view[base + offset:base + offset + length] for offset, length in header["buffers"]]
+        model.restore_state(pickle.loads(body, buffers=buffers))
+    except Exception as e:
+        logger.error(f"Ignoring unreadable semantic model snapshot {path}: {e}")
+        return None
+    logger.info(
+        f"Restored semantic model version {header['version']} from {path} "
+        f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+    return header
+
+
+class SnapshotWriter:
+    """Writes a model snapshot periodically when the model has changed"""
+
+    def __init__(self, model, path: Path, interval: float = 60.0, meta=None):
+        self.model = model
+        self.path = Path(path)
+        self.interval = interval
+        # Callable returning metadata to store with each snapshot
+        self.meta = meta or (lambda: {})
+        self.saved_version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"writes": 0, "bytes": 0, "last_ms": None}
+
+    async def save(self, force: bool = False) -> bool:
+        """Snapshot the model if it changed since the last write"""
+        version = self.model.version
+        if not force and version == self.saved_version:
+            return False
+        started = time.perf_counter()
+        # Capture on the event loop, where the model is consistent; pickle and write in a thread
+        state = capture(self.model)
+        written = await asyncio.to_thread(save_state, state, self.path, self.meta())
+        self.saved_version = version
+        self._stats.update(
+            writes=self._stats["writes"] + 1,
+            bytes=written,
+            last_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except Exception as e:
+                logger.error(f"Failed to write semantic model snapshot to {self.path}: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic writes and write a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "path": str(self.path), "saved_version": self.saved_version}
@@ -0,0 +1,323 @@
+"""
+Conjunctive triple-pattern queries over the semantic model's fact table.
+
+A query is a list of (lh, rel, rh) patterns, all of which must match. Each
+term of a pattern is one of:
+
+- a UID (int), or a collection of UIDs matching any of them
+- a name (str), matched exactly against the fact's name in that position
+- a variable (str starting with '?'), binding the same UID wherever it is used
+- a wildcard (None or '_')
+
+For example, the kinds the individuals classified as a pump are also
+classified as:
+
+    [('?x', 1225, 'pump'), ('?x', 1225, '?kind')]
+
+Patterns are evaluated one at a time against the columns of the FactTable,
+joining each one's matching rows to the bindings so far. The planner starts
+with the most selective pattern (constants looked up through the adjacency
+are cheapest) and then prefers patterns sharing a variable with what is
+already bound, so intermediate results stay small. Where a pattern's lh or
+rh variable is already bound to few entities, its candidate rows are taken
+from those entities' adjacency instead of scanning the table.
+
+Every pattern with variables must be connected to the others through shared
+variables; a query that would join unrelated patterns by their cross product
+is rejected, as is one whose intermediate solutions pass `max_rows`. Patterns
+without variables only check that a matching fact exists. With a `limit`,
+the last pattern's solutions are collected only until `limit` distinct ones
+are found.
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.models.fact_table import MISSING, FactTable
+
+# Fact table columns for each pattern position
+POSITIONS = (
+    ('lh_object_uid', 'lh_object_name'),
+    ('rel_type_uid', 'rel_type_name'),
+    ('rh_object_uid', 'rh_object_name'),
+)
+_ENTITY_POSITIONS = (0, 2)
+# Bound entities (as a share of the facts) up to which candidates come from the adjacency
+_INDEX_LOOKUP_SHARE = 0.1
+# Intermediate solutions above which a query is rejected
+MAX_ROWS = 1_000_000
+# Solutions of the last pattern collected at a time when a limit applies
+_LIMIT_BATCH = 1024
+
+
+class QueryError(ValueError):
+    """Raised for a malformed query"""
+
+
+class Term(NamedTuple):
+    kind: str  # "uid", "name", "var" or "any"
+    value: Any = None
+
+
+class QueryResult(NamedTuple):
+    variables: List[str]
+    rows: List[Tuple[int, ...]]
+    names: Dict[int, str]  # names seen for the bound UIDs
+
+    def as_dicts(self) -> List[Dict[str, int]]:
+        return [dict(zip(self.variables, row)) for row in self.rows]
+
+
+def term(value: Any) -> Term:
+    """Classify one pattern term"""
+    if isinstance(value, Term):
+        return value
+    if value is None or value == '_':
+        return Term('any')
+    if isinstance(value, str):
+        if value.startswith('?'):
+            if len(value) == 1:
+                return Term('any')
+            return Term('var', value[1:])
+        return Term('name', value)
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return Term('uid', (int(value),))
+    if isinstance(value, (list, tuple, set, frozenset)) and all(
+        isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in value
+    ):
+        return Term('uid', tuple(int(v) for v in value))
+    raise QueryError(f"invalid pattern term {value!r}")
+
+
+def parse(patterns: Iterable[Sequence[Any]]) -> List[Tuple[Term, Term, Term]]:
+    parsed = []
+    for pattern in patterns:
+        if len(pattern) != 3:
+            raise QueryError(f"pattern {pattern!r} is not an (lh, rel, rh) triple")
+        parsed.append(tuple(term(value) for value in pattern))
+    if not parsed:
+        raise QueryError("empty query")
+    return parsed
+
+
+def _variables(pattern) -> List[str]:
+    return [t.value for t in pattern if t.kind == 'var']
+
+
+def check_connected(patterns):
+    """Raise QueryError if the patterns with variables do not all share variables, directly or through others"""
+    groups: List[set] = []
+    for pattern in patterns:
+        variables = set(_variables(pattern))
+        if not variables:
+            continue
+        joined = [group for group in groups if group & variables]
+        for group in joined:
+            groups.remove(group)
+            variables |= group
+        groups.append(variables)
+    if len(groups) > 1:
+        listed = "; ".join(", ".join(f"?{v}" for v in sorted(group)) for group in groups)
+        raise QueryError(f"patterns share no variables between {listed}; join them through a common variable")
+
+
+def _constant_rows(table: FactTable, pattern, rows: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """Rows (of `rows`, by default all) matching a pattern's constants, or None if it has none"""
+    if all(t.kind in ('var', 'any') for t in pattern):
+        return None
+    if rows is None:
+        entity_uids = [pattern[p].value for p in _ENTITY_POSITIONS if pattern[p].kind == 'uid']
+        rows = table.incident_rows(entity_uids[0]) if entity_uids else table.rows()
+    for position, t in enumerate(pattern):
+        uid_column, name_column = POSITIONS[position]
+        if t.kind == 'uid':
+            values = table.column(uid_column)[rows]
+            if len(t.value) == 1:
+                rows = rows[values == t.value[0]]
+            else:
+                rows = rows[np.isin(values, np.asarray(t.value, dtype=np.int64))]
+        elif t.kind == 'name':
+            name_id = table.strings.find(t.value)
+            if name_id == MISSING:
+                return rows[:0]
+            rows = rows[table.column(name_column)[rows] == name_id]
+    return rows
+
+
+def plan(table: FactTable, patterns) -> Tuple[List[int], Dict[int, np.ndarray]]:
+    """
+    Evaluation order for parsed patterns.
+
+    Returns the order (pattern indices) and the rows matching each pattern's
+    constants, for the patterns that have any.
+    """
+    constant_rows = {}
+    estimates = []
+    for i, pattern in enumerate(patterns):
+        rows = _constant_rows(table, pattern)
+        if rows is not None:
+            constant_rows[i] = rows
+        estimates.append(len(table) if rows is None else len(rows))
+
+    order: List[int] = []
+    bound = set()
+    remaining = set(range(len(patterns)))
+    while remaining:
+        connected = [i for i in remaining if bound & set(_variables(patterns[i]))]
+        candidates = connected or remaining
+        best = min(candidates, key=lambda i: (estimates[i], i))
+        order.append(best)
+        bound.update(_variables(patterns[best]))
+        remaining.remove(best)
+    return order, constant_rows
+
+
+def _candidate_rows(table: FactTable, pattern, constant_rows, uids: Dict[str, np.ndarray]) -> np.ndarray:
+    rows = constant_rows
+    for position in _ENTITY_POSITIONS:
+        t = pattern[position]
+        if t.kind == 'var' and t.value in uids:
+            distinct = np.unique(uids[t.value])
+            limit = len(table) if rows is None else len(rows)
+            if len(distinct) <= _INDEX_LOOKUP_SHARE * limit:
+                # Fewer bound entities than matching facts: start from their adjacency
+                rows = table.incident_rows(distinct)
+                rows = _constant_rows(table, pattern, rows) if constant_rows is not None else rows
+                break
+    if rows is None:
+        rows = table.rows()
+    # A variable used twice in a pattern needs the same UID in both places
+    seen = {}
+    for position, t in enumerate(pattern):
+        if t.kind != 'var':
+            continue
+        column = table.column(POSITIONS[position][0])
+        if t.value in seen:
+            rows = rows[column[rows] == table.column(POSITIONS[seen[t.value]][0])[rows]]
+        else:
+            seen[t.value] = position
+    return rows
+
+
+def _too_many(max_rows: int) -> QueryError:
+    return QueryError(f"query has more than {max_rows} intermediate solutions; add constants to narrow it down")
+
+
+def _join(left_keys: np.ndarray, right_keys: np.ndarray, max_rows: int = MAX_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """Index pairs (left, right) with equal keys"""
+    order = np.argsort(right_keys, kind="stable")
+    sorted_right = right_keys[order]
+    lo = np.searchsorted(sorted_right, left_keys, side="left")
+    counts = np.searchsorted(sorted_right, left_keys, side="right") - lo
+    if counts.sum() > max_rows:
+        raise _too_many(max_rows)
+    left_index = np.repeat(np.arange(len(left_keys)), counts)
+    run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    right_index = order[np.repeat(lo, counts) + np.arange(counts.sum()) - run_starts]
+    return left_index, right_index
+
+
+def _distinct_prefix(bound: List[np.ndarray], new_columns: List[np.ndarray], left: np.ndarray,
+                     matched: np.ndarray, limit: int) -> int:
+    """How many of the (left, matched) pairs it takes to see `limit` distinct solutions"""
+    seen = set()
+    end = 0
+    while end < len(left) and len(seen) < limit:
+        batch = slice(end, end + max(_LIMIT_BATCH, limit))
+        columns = [column[left[batch]] for column in bound] + [column[matched[batch]] for column in new_columns]
+        seen.update(zip(*(column.tolist() for column in columns)))
+        end = min(len(left), batch.stop)
+    return end
+
+
+def run(table: FactTable, patterns: Iterable[Sequence[Any]], limit: Optional[int] = None,
+        max_rows: int = MAX_ROWS) -> QueryResult:
+    """
+    Evaluate a conjunctive query.
+
+    Args:
+        table: The facts to query
+        patterns: (lh, rel, rh) triples of terms (see the module docstring)
+        limit: Return at most this many solutions
+        max_rows: Intermediate solutions above which the query is rejected
+
+    Returns the variables (in order of first use), the distinct solutions as
+    tuples of UIDs, and the names of the bound UIDs. Raises QueryError for
+    malformed or disconnected queries and for ones over `max_rows`.
+    """
+    patterns = parse(patterns)
+    check_connected(patterns)
+    order, constant_rows = plan(table, patterns)
+    joined = [i for i in order if _variables(patterns[i])]
+
+    # Bindings so far: a column of UIDs and of name ids per variable, one entry per solution
+    uids: Dict[str, np.ndarray] = {}
+    names: Dict[str, np.ndarray] = {}
+    size = 1
+    for i in order:
+        pattern = patterns[i]
+        rows = _candidate_rows(table, pattern, constant_rows.get(i), uids)
+        if not _variables(pattern):
+            # Nothing to bind: only whether a matching fact exists
+            if len(rows) == 0:
+                size = 0
+                break
+            continue
+        new_vars = {}
+        shared = []
+        for position, t in enumerate(pattern):
+            if t.kind != 'var':
+                continue
+            if t.value in uids:
+                shared.append((t.value, position))
+            elif t.value not in new_vars:
+                new_vars[t.value] = position
+
+        if shared:
+            name, position = shared[0]
+            left, right = _join(uids[name], table.column(POSITIONS[position][0])[rows], max_rows)
+            for name, position in shared[1:]:
+                keep = uids[name][left] == table.column(POSITIONS[position][0])[rows[right]]
+                left, right = left[keep], right[keep]
+        else:
+            # The first pattern with variables (the query is connected, so only that one)
+            if len(rows) > max_rows:
+                raise _too_many(max_rows)
+            left = np.zeros(len(rows), dtype=np.int64)
+            right = np.arange(len(rows))
+
+        if limit is not None and i == joined[-1]:
+            # Last pattern: only as many pairs as it takes to reach `limit` distinct solutions
+            new_columns = [table.column(POSITIONS[position][0]) for position in new_vars.values()]
+            end = _distinct_prefix(list(uids.values()), new_columns, left, rows[right], limit)
+            left, right = left[:end], right[:end]
+
+        uids = {name: column[left] for name, column in uids.items()}
+        names = {name: column[left] for name, column in names.items()}
+        matched = rows[right]
+        for name, position in new_vars.items():
+            uid_column, name_column = POSITIONS[position]
+            uids[name] = table.column(uid_column)[matched]
+            names[name] = table.column(name_column)[matched]
+        size = len(matched)
+        if size == 0:
+            break
+
+    variables = list(dict.fromkeys(v for pattern in patterns for v in _variables(pattern)))
+    if size == 0 or not variables:
+        solutions = [()] if size and not variables else []
+        return QueryResult(variables, solutions, {})
+
+    columns = [uids[v].tolist() for v in variables]
+    solutions = list(dict.fromkeys(zip(*columns)))
+    if limit is not None:
+        solutions = solutions[:limit]
+
+    returned = {uid for solution in solutions for uid in solution}
+    found: Dict[int, str] = {}
+    for v in variables:
+        for uid, name_id in zip(uids[v].tolist(), names[v].tolist()):
+            if uid in returned and uid not in found and name_id != MISSING:
+                found[uid] = table.strings[name_id]
+    return QueryResult(variables, solutions, found)
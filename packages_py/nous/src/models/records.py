@@ -0,0 +1,179 @@
+"""
+Compact records for facts and models.
+
+Facts and models arrive as JSON objects. Kept as dicts, each one carries a hash
+table and its own copy of every repeated string (names, relation types,
+collections, authors). These records store known keys in `__slots__`, intern
+repeated strings, and fall back to a small dict only for keys outside the
+schema. UIDs are not pooled: a shared pool of int objects would outlive the
+facts that used them, and saves little per record.
+
+Records implement the read-only Mapping protocol (`r['key']`, `r.get()`,
+`in`, `keys()`, `**r`), so code written against the wire dicts works unchanged.
+"""
+
+import sys
+from collections.abc import Mapping
+from operator import attrgetter
+from typing import Any, Callable, Dict, FrozenSet, Iterator, Optional, Tuple
+
+def _interned(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Record(Mapping):
+    """Slotted mapping over a fixed set of field names, with an overflow dict"""
+
+    # _present: names of the fields that are set, as a tuple shared by records of the same shape
+    __slots__ = ('_extra', '_present')
+
+    FIELDS: Tuple[str, ...] = ()
+    # Fields whose string values repeat across records and are worth interning
+    INTERNED: FrozenSet[str] = frozenset()
+    # Fields holding entity UIDs (integers on the wire)
+    UIDS: FrozenSet[str] = frozenset()
+    _FIELD_SET: FrozenSet[str] = frozenset()
+    _SHAPES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+    _GETTERS: Dict[Tuple[str, ...], Callable[[Any], Tuple[Any, ...]]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+        cls._SHAPES = {}
+        cls._GETTERS = {}
+
+    def __init__(self, data: Mapping):
+        extra: Optional[Dict[str, Any]] = None
+        fields = self._FIELD_SET
+        present = []
+        for key, value in data.items():
+            if key in fields:
+                if key in self.INTERNED:
+                    value = _interned(value)
+                object.__setattr__(self, key, value)
+                present.append(key)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        object.__setattr__(self, "_extra", extra)
+        object.__setattr__(self, "_present", self._shape(tuple(present)))
+
+    @classmethod
+    def _shape(cls, present: Tuple[str, ...]) -> Tuple[str, ...]:
+        return cls._SHAPES.setdefault(present, present)
+
+    @classmethod
+    def from_wire(cls, data: Mapping) -> "Record":
+        """Record for a decoded payload object (returned as is if it already is one)"""
+        return data if isinstance(data, cls) else cls(data)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELD_SET:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._FIELD_SET:
+            # An unset slot raises AttributeError, which getattr turns into the default
+            return getattr(self, key, default)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._FIELD_SET:
+            return key in self._present
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._present
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(self._present) + (len(self._extra) if self._extra is not None else 0)
+
+    def __setattr__(self, key: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} records are read-only")
+
+    def __reduce__(self):
+        # The shape and the values in shape order: smaller and faster than a dict
+        present = self._present
+        getter = self._GETTERS.get(present)
+        if getter is None:
+            getter = self._GETTERS[present] = (
+                attrgetter(*present) if len(present) > 1
+                else (lambda record: tuple(getattr(record, key) for key in present))
+            )
+        return (_restore, (type(self), present, getter(self), self._extra))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+_SETTERS: Dict[Tuple[type, Tuple[str, ...]], list] = {}
+
+
+def _restore(cls, present: Tuple[str, ...], values: Tuple[Any, ...], extra: Optional[Dict[str, Any]]) -> Record:
+    setters = _SETTERS.get((cls, present))
+    if setters is None:
+        # Slot descriptors for the shape
+        setters = _SETTERS[(cls, present)] = [getattr(cls, key).__set__ for key in present]
+    record = cls.__new__(cls)
+    for set_value, value in zip(setters, values):
+        set_value(record, value)
+    object.__setattr__(record, "_extra", extra)
+    object.__setattr__(record, "_present", cls._shape(present))
+    return record
+
+
+class Fact(Record):
+    """A Gellish fact"""
+
+    FIELDS = (
+        'fact_uid',
+        'lh_object_uid', 'lh_object_name',
+        'rel_type_uid', 'rel_type_name',
+        'rh_object_uid', 'rh_object_name',
+        'full_definition', 'partial_definition',
+        'lh_context_uid', 'lh_context_name',
+        'lh_role_uid', 'lh_role_name', 'rh_role_uid', 'rh_role_name',
+        'lh_cardinalities', 'rh_cardinalities',
+        'language_uid', 'language',
+        'collection_uid', 'collection_name',
+        'uom_uid', 'uom_name',
+        'approval_status', 'effective_from', 'latest_update',
+        'author', 'reference', 'remarks', 'sequence',
+    )
+    INTERNED = frozenset({
+        'lh_object_name', 'rel_type_name', 'rh_object_name',
+        'lh_context_name', 'lh_role_name', 'rh_role_name',
+        'lh_cardinalities', 'rh_cardinalities',
+        'language', 'collection_name', 'uom_name',
+        'approval_status', 'effective_from', 'latest_update',
+        'author', 'reference',
+    })
+    UIDS = frozenset({
+        'lh_object_uid', 'rel_type_uid', 'rh_object_uid',
+        'lh_context_uid', 'lh_role_uid', 'rh_role_uid',
+        'language_uid', 'collection_uid', 'uom_uid',
+    })
+    __slots__ = FIELDS
+
+
+class Model(Record):
+    """An entity model as served by Clarity; uncommon keys go to the overflow dict"""
+
+    FIELDS = ('uid', 'name', 'type', 'nature', 'category', 'definition', 'collection', 'facts')
+    INTERNED = frozenset({'name', 'type', 'nature', 'category', 'collection'})
+    UIDS = frozenset({'uid'})
+    __slots__ = FIELDS
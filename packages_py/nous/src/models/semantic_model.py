@@ -1,12 +1,144 @@
 # from src.relica_nous_langchain.services.NOUSServer import nous_server
 
+import weakref
+from collections import Counter
+
+import numpy as np
+
+from src.models.centrality import CentralityIndex
+from src.models.classification_index import ClassificationIndex
+from src.models.fact_table import FactTable, _uid
+from src.models.name_index import NameIndex
+from src.models import query as triple_query
+from src.models.records import Fact, Model
+from src.models.snapshot import FactDiff, FactList, ModelMap, ModelSnapshot, current_pin, diff, pinned
+from src.models.taxonomy_index import TaxonomyIndex
+
 class SemanticModel:
     def __init__(self) -> None:
-        self._facts = []
-        self._models = {}
-        self.selected_entity = None
+        # Persistent structures: every write replaces them, published snapshots keep the old ones
+        self._facts = FactList()
+        self._models = ModelMap()
+        self._selected_entity = None
+        self._version = 0
+        self._snapshot = None
+        self._relationships = (None, "")
+        self._taxonomy = TaxonomyIndex()
+        self._classification = ClassificationIndex()
+        self._names = NameIndex()
+        self._table = FactTable()
+        # PageRank and degree over the fact table, recomputed lazily after changes
+        self._centrality = CentralityIndex()
+        # Live model counters for the ontology metadata
+        self._model_types = Counter()
+        self._model_categories = Counter()
+        # Read-only copies of earlier versions, by version, while a pinned run reads one
+        self._views = weakref.WeakValueDictionary()
         pass
 
+    def _publish(self):
+        """Start a new version; the next snapshot() reflects the writes so far"""
+        pin = current_pin()
+        # A run's own write (or one from a task it started) moves its pin along, if nothing else came between
+        follow = pin is not None and pin.owner is self and pin.snapshot.version == self._version
+        self._version += 1
+        self._snapshot = None
+        if follow:
+            pin.advance(self.snapshot())
+
+    @property
+    def version(self) -> int:
+        """Monotonically increasing version, bumped by every change to facts, models or selection"""
+        return self._version
+
+    def snapshot(self) -> ModelSnapshot:
+        """Immutable view of the current version, safe to hold across awaits"""
+        if self._snapshot is None:
+            self._snapshot = ModelSnapshot(self._version, self._facts, self._models, self._selected_entity)
+        return self._snapshot
+
+    def pinned(self, snapshot: ModelSnapshot = None):
+        """
+        Context manager pinning `snapshot` (default: the current version) for
+        the code run inside the block: reader() there returns the model as of
+        that version. Writes made inside the block move the pin along with them.
+        """
+        return pinned(self, snapshot or self.snapshot())
+
+    def reader(self) -> "SemanticModel":
+        """The model as the enclosing pinned run sees it (see at()); this model outside a run"""
+        pin = current_pin()
+        if pin is None or pin.owner is not self or pin.snapshot.version == self._version:
+            return self
+        if pin.view is None:
+            pin.view = self.at(pin.snapshot)
+        return pin.view
+
+    def at(self, snapshot: ModelSnapshot) -> "SemanticModel":
+        """
+        The model as of `snapshot`, for reads: this model while it is still at
+        that version, else a copy rebuilt from the snapshot's facts and models
+        (with its own fact table and indexes, so later writes here do not
+        reach it). Readers of the same version share the copy. Facts learned
+        from lookups are not carried over, so the copy answers those from
+        lookups again.
+        """
+        if snapshot.version == self._version:
+            return self
+        view = self._views.get(snapshot.version)
+        if view is None:
+            view = SemanticModel()
+            view.replace_records(snapshot.facts, snapshot.models.values(), snapshot.selected_entity)
+            view._version = snapshot.version
+            view._snapshot = snapshot
+            self._views[snapshot.version] = view
+        return view
+
+    def diff_since(self, snapshot: ModelSnapshot) -> FactDiff:
+        """Facts added and removed between an earlier snapshot and the current version"""
+        return diff(snapshot, self.snapshot())
+
+    _STATE = (
+        '_facts', '_models', '_selected_entity', '_version',
+        '_table', '_taxonomy', '_classification', '_names',
+        '_model_types', '_model_categories',
+    )
+
+    def export_state(self):
+        """Facts, models, version and derived indexes, for on-disk snapshots"""
+        return {name: getattr(self, name) for name in self._STATE}
+
+    def restore_state(self, state):
+        """Replace the model's contents with a previously exported state"""
+        for name in self._STATE:
+            setattr(self, name, state[name])
+        self._snapshot = None
+        self._relationships = (None, "")
+
+    def replace_records(self, facts, models=(), selected_entity=None):
+        """Replace all facts and models at once (e.g. from an export), rebuilding the indexes; nothing is fetched from Clarity"""
+        self.restore_state({**SemanticModel().export_state(), '_version': self._version})
+        facts = [Fact.from_wire(f) for f in facts]
+        self._facts = self._facts.extend(facts)
+        models = [Model.from_wire(m) for m in models]
+        self._models = self._models.update((m['uid'], m) for m in models)
+        for model in models:
+            self._index_model(model, 1)
+        self._selected_entity = selected_entity
+        self._facts_changed(added=facts)
+
+    def _facts_changed(self, added=(), removed=(), columns=None):
+        """Keep the derived indexes in step with a change to the fact list"""
+        self._table.remove(f['fact_uid'] for f in removed)
+        self._table.add(added, columns)
+        self._classification.remove(f['fact_uid'] for f in removed)
+        self._classification.add(added)
+        self._names.remove_facts(removed)
+        self._names.add_facts(added)
+        self._taxonomy.remove_environment_facts(f['fact_uid'] for f in removed)
+        self._taxonomy.add_environment_facts(added)
+        self._publish()
+
     async def loadModelsForFacts(self, facts):
         """
         Load models for all entity UIDs referenced in the provided facts.
@@ -32,31 +164,25 @@ class SemanticModel:
             uids_to_load.add(fact['rh_object_uid'])
 
         # Filter out UIDs we already have models for
-        uids_to_load = [uid for uid in uids_to_load if uid not in self._models]
+        uids_to_load = [uid for uid in uids_to_load if uid is not None and uid not in self._models]
 
         if not uids_to_load:
             return  # No new models to load
 
+        def add_models(models):
+            # Each chunk is added as soon as it arrives
+            self.addModels(models)
+
         try:
             # Import here to avoid circular imports
             from src.clients.clarity import clarity_client
 
-            # Call the external API to get the models
-            models_result = await clarity_client.retrieveModels(uids_to_load)
-
-            if models_result and 'payload' in models_result:
-                models_payload = models_result['payload']
-                if 'models' in models_payload:
-                    models = models_payload['models']
-
-                    # Add each model to our store
-                    for model in models:
-                        self.addModel(model)
-
-                    return models
-
-            print(f"Failed to load models for UIDs: {uids_to_load}")
-            return None
+            # Chunked and fetched concurrently; UIDs already being fetched are not requested twice
+            models = await clarity_client.retrieve_models(uids_to_load, on_models=add_models)
+            if not models:
+                print(f"Failed to load models for {len(uids_to_load)} UIDs")
+                return None
+            return models
 
         except Exception as e:
             print(f"Error loading models for facts: {e}")
@@ -88,7 +214,8 @@ class SemanticModel:
 
         print(self._facts)
         # First, collect all the entity UIDs from the removed facts
-        removed_facts = [f for f in self._facts if f['fact_uid'] in removed_fact_uids]
+        removed_fact_uids = set(removed_fact_uids)
+        removed_facts = self._table.facts(self._table.filter(fact_uid=list(removed_fact_uids)))
         potentially_orphaned_uids = set()
         for fact in removed_facts:
             potentially_orphaned_uids.add(fact['lh_object_uid'])
@@ -99,17 +226,12 @@ class SemanticModel:
         print("########################")
 
         # # Now remove the facts
-        self._facts = [f for f in self._facts if f['fact_uid'] not in removed_fact_uids]
+        self._facts = self._facts.remove_where(lambda f: f['fact_uid'] in removed_fact_uids)
+        self._facts_changed(removed=removed_facts)
 
-        # Get all UIDs still referenced in the remaining facts
-        active_uids = set()
-        for f in self._facts:
-            active_uids.add(f['lh_object_uid'])
-            active_uids.add(f['rh_object_uid'])
-
-        # Find models that are no longer referenced
+        # Find models that are no longer referenced by the remaining facts
         orphaned_models = [uid for uid in potentially_orphaned_uids
-                          if uid in self._models and uid not in active_uids]
+                          if uid in self._models and not self._table.has_entity(uid)]
 
         print("########################")
         print("ORPHANED MODELS")
@@ -132,21 +254,51 @@ class SemanticModel:
         return orphaned_models
 
     async def addFact(self, fact):
+        fact = Fact.from_wire(fact)
         # check if the fact is already in the list
         # if it is, remove it first
-        self._facts = [f for f in self._facts if f['fact_uid'] != fact['fact_uid']]
-        self._facts.append(fact)
+        replaced = self._table.facts(self._table.filter(fact_uid=fact['fact_uid']))
+        facts = self._facts
+        if replaced:
+            facts = facts.remove_where(lambda f: f['fact_uid'] == fact['fact_uid'])
+        self._facts = facts.extend([fact])
+        self._facts_changed(added=[fact], removed=replaced)
         # await self.removeOrphanedModelsForRemovedFacts(fact['fact_uid'])
         await self.loadModelsForFacts(fact)
 
-    async def addFacts(self, facts):
+    async def addFacts(self, facts, load_models: bool = True, columns=None):
+        """
+        Add (or replace) facts; load_models=False skips fetching their entity
+        models from Clarity. `columns` are the facts' parsed columns, if at
+        hand (see FactTable.add).
+        """
+        facts = [Fact.from_wire(f) for f in facts]
         # check if the facts are already in the list
         # if they are, remove them first
-        factUIDs = [f['fact_uid'] for f in facts]
-        self._facts = [f for f in self._facts if f['fact_uid'] not in factUIDs]
-        self._facts.extend(facts)
+        factUIDs = {f['fact_uid'] for f in facts}
+        replaced = self._table.facts(self._table.filter(fact_uid=list(factUIDs)))
+        current = self._facts
+        if replaced:
+            current = current.remove_where(lambda f: f['fact_uid'] in factUIDs)
+        self._facts = current.extend(facts)
+        self._facts_changed(added=facts, removed=replaced, columns=columns)
         # await self.removeOrphanedModelsForRemovedFacts(factUIDs)
-        await self.loadModelsForFacts(facts)
+        if load_models:
+            await self.loadModelsForFacts(facts)
+
+    async def ingestFacts(self, facts, load_models: bool = True):
+        """
+        Add the facts not in the model yet (by fact_uid), e.g. from a tool's
+        lookup; facts already present are left as they are. Returns the added facts.
+        """
+        new = {}
+        for fact in facts:
+            fact_uid = fact.get('fact_uid')
+            if fact_uid is not None and fact_uid not in self._table and fact_uid not in new:
+                new[fact_uid] = fact
+        if new:
+            await self.addFacts(list(new.values()), load_models=load_models)
+        return list(new.values())
 
     async def removeFact(self, factUID):
         await self.removeOrphanedModelsForRemovedFacts(factUID)
@@ -160,15 +312,45 @@ class SemanticModel:
     def facts(self):
         return self._facts
 
+    @property
+    def table(self) -> FactTable:
+        """Columnar view of the facts, for vectorized filters, group-bys and neighbour queries"""
+        return self._table
+
+    @property
+    def taxonomy(self) -> TaxonomyIndex:
+        """Specialization hierarchy index over the environment (and learned) facts"""
+        return self._taxonomy
+
+    @property
+    def classification(self) -> ClassificationIndex:
+        """Classification facts by individual and kind"""
+        return self._classification
+
+    @property
+    def names(self) -> NameIndex:
+        """Entity names from facts and models, for local name resolution"""
+        return self._names
+
+    def instances_of(self, kind_uid):
+        """Known individuals classified as a kind or any of its subtypes"""
+        return self._classification.instances_of(kind_uid, self.taxonomy)
+
+    @property
+    def selected_entity(self):
+        return self._selected_entity
+
+    @selected_entity.setter
+    def selected_entity(self, uid):
+        self._selected_entity = uid
+        self._publish()
+
     @property
     def selectedEntity(self):
         return self.selected_entity
 
     def hasFactInvolvingUID(self, uid):
-        for f in self._facts:
-            if uid in [f['lh_object_uid'], f['rh_object_uid']]:
-                return True
-        return False
+        return self._table.has_entity(uid)
 
     @property
     def semanticContext(self):
@@ -180,17 +362,41 @@ class SemanticModel:
     def addModel(self, model):
         print("ADDING MODEL")
         print(model)
-        # does it even have a uid key?
-        if 'uid' not in model:
-            return
-        self._models[model['uid']] = model
+        self.addModels([model])
 
     def addModels(self, models):
+        """Add (or replace) models as one write: each shard of the model map is copied once"""
+        # does it even have a uid key?
+        added = {}
         for model in models:
-            self.addModel(model)
+            if 'uid' in model:
+                model = Model.from_wire(model)
+                added[model['uid']] = model
+        if not added:
+            return
+        for uid in added:
+            if uid in self._models:
+                self._index_model(self._models[uid], -1)
+        self._models = self._models.update(added.items())
+        for model in added.values():
+            self._index_model(model, 1)
+        self._publish()
 
     def removeModel(self, modelUID):
-        del self._models[modelUID]
+        model = self._models[modelUID]
+        self._models = self._models.delete(modelUID)
+        self._index_model(model, -1)
+        self._publish()
+
+    def _index_model(self, model, delta):
+        self._model_types[model.get('type')] += delta
+        category = model.get('category')
+        if category:
+            self._model_categories[category] += delta
+        if delta > 0:
+            self._names.add(model['uid'], model.get('name'))
+        else:
+            self._names.remove(model['uid'], model.get('name'))
 
     @property
     def models(self):
@@ -200,47 +406,88 @@ class SemanticModel:
     @property
     def context(self):
         """Generate a comprehensive context representation of the semantic model for the LLM."""
-        # Generate metadata about the ontology
-        metadata = self.generate_ontology_metadata()
-
-        # Generate entity descriptions
-        entity_descriptions = []
-        for uid, model in self._models.items():
-            entity_descriptions.append(self.format_entity(model))
-
-        # Generate relationships section
-        relationships = self.format_relationships()
+        sections = self.context_sections()
 
         # Combine everything into a structured context
         return (
-            f"[ONTOLOGY_METADATA]\n{metadata}\n\n"
-            f"[ENTITIES]\n" + "\n\n".join(entity_descriptions) + "\n\n"
-            f"[RELATIONSHIPS]\n{relationships}\n"
+            f"[ONTOLOGY_METADATA]\n{sections['metadata']}\n\n"
+            f"[ENTITIES]\n" + "\n\n".join(sections['entities']) + "\n\n"
+            f"[RELATIONSHIPS]\n{sections['relationships']}\n"
         )
 
+    def context_sections(self):
+        """
+        The parts of `context`: the metadata text, one fragment per entity (most
+        relevant first) and the relationships text (one line per fact), e.g.
+        for token accounting per section.
+        """
+        return {
+            'metadata': self.generate_ontology_metadata(),
+            'entities': self.format_entities(),
+            'relationships': self.format_relationships(),
+        }
+
     def generate_ontology_metadata(self):
         """Generate metadata about the ontology."""
-        # Count entities by type
-        kinds_count = sum(1 for m in self._models.values() if m.get('type') == 'kind')
-        individuals_count = sum(1 for m in self._models.values() if m.get('type') == 'individual')
+        # Counts are maintained as models are added and removed
+        kinds_count = self._model_types['kind']
+        individuals_count = self._model_types['individual']
+        categories = [category for category, count in self._model_categories.items() if count > 0]
 
-        # Get unique categories if available
-        categories = set()
-        for model in self._models.values():
-            category = model.get('category')
-            if category:
-                categories.add(category)
+        central = [f"{self.entity_name(uid)} ({uid})" for uid in self.ranked_entities(limit=self.CENTRAL_ENTITIES)]
 
         # Format metadata
         return (
             f"TOTAL ENTITIES: {len(self._models)}\n"
             f"KINDS: {kinds_count}\n"
             f"INDIVIDUALS: {individuals_count}\n"
+            f"CLASSIFIED INDIVIDUALS: {self._classification.individual_count}\n"
             f"ENTITY TYPES: {', '.join(categories) if categories else 'Not specified'}\n"
             f"FACTS COUNT: {len(self._facts)}\n"
+            f"CENTRAL ENTITIES: {', '.join(central) if central else 'None'}\n"
             f"SELECTED ENTITY: {self.selected_entity if self.selected_entity else 'None'}"
         )
 
+    # Most central entities listed in the ontology metadata
+    CENTRAL_ENTITIES = 5
+
+    @property
+    def centrality(self) -> CentralityIndex:
+        """PageRank and degree centrality over the fact graph"""
+        return self._centrality
+
+    def ranked_entities(self, selected=None, limit=None, candidates=None, hops=3):
+        """
+        Entity UIDs in the facts, most relevant first.
+
+        Relevance is PageRank and degree centrality, mixed with closeness
+        (within `hops`) to `selected` when one is given; see
+        src.models.centrality. `candidates` restricts the ranking to those UIDs.
+        """
+        return self._centrality.ranked(self._table, selected, limit=limit, candidates=candidates, hops=hops)
+
+    def format_entities(self, limit=None, selected=None):
+        """
+        format_entity for the models, most relevant to `selected` (default: the
+        selected entity) first; with `limit`, only that many. Models without
+        facts come last.
+        """
+        selected = self._selected_entity if selected is None else selected
+        order = {uid: i for i, uid in enumerate(self.ranked_entities(selected, candidates=list(self._models)))}
+        uids = sorted(self._models, key=lambda uid: order.get(_uid(uid), len(order)))
+        if limit is not None:
+            uids = uids[:limit]
+        return [self.format_entity(self._models[uid]) for uid in uids]
+
+    def entity_name(self, uid):
+        """Name of an entity from its model, or else from a fact it takes part in"""
+        if uid in self._models and self._models[uid].get('name'):
+            return self._models[uid]['name']
+        for fact in self._table.facts(self._table.neighbor_rows(uid)[:1]):
+            side = 'lh' if fact.get('lh_object_uid') == uid else 'rh'
+            return fact.get(f'{side}_object_name', f"Entity {uid}")
+        return f"Entity {uid}"
+
     def format_entity(self, model):
         print("/////////////////////////////// FORMATTING ENTITY ///////////////////////////////")
         print(model)
@@ -326,10 +573,10 @@ class SemanticModel:
                         result += "\nINVOLVED:\n" + "\n".join(involvements)
 
         # Add facts related to this entity
-        entity_facts = self.get_facts_for_entity(uid)
-        if entity_facts:
+        entity_rows = self._table.neighbor_rows(uid)
+        if entity_rows.size:
             result += "\nRELATED FACTS:\n"
-            result += self.facts_to_categorized_facts_str(entity_facts)
+            result += self._rows_to_categorized_facts_str(entity_rows)
 
         print(result)
         print("/////////////////////////////// DONE FORMATTING ENTITY ///////////////////////////////")
@@ -344,34 +591,117 @@ class SemanticModel:
 
     def get_facts_for_entity(self, uid):
         """Get all facts that involve a specific entity."""
-        return [f for f in self._facts if uid in [f.get('lh_object_uid'), f.get('rh_object_uid')]]
-
-    def format_relationships(self):
-        """Format relationships in a natural language style."""
+        return self._table.facts(self._table.neighbor_rows(uid))
+
+    def format_relationships(self, rows=None):
+        """Format relationships (of all facts, or the fact table `rows`) in a natural language style."""
+        if rows is not None:
+            return self._format_relationships(np.asarray(rows, dtype=np.int64))
+        version, text = self._relationships
+        if version != self._version:
+            text = self._format_relationships()
+            self._relationships = (self._version, text)
+        return text
+
+    def _format_relationships(self, rows=None):
         relationship_lines = []
 
         # Group facts by relation type for better organization
-        rel_types = {}
-        for fact in self._facts:
-            rel_type = fact.get('rel_type_name', 'unknown relation')
-            if rel_type not in rel_types:
-                rel_types[rel_type] = []
+        for rel_type, rows in self._table.group_by('rel_type_name', rows).items():
+            for fact in self._table.facts(rows):
+                relationship_lines.append(self.format_fact(fact, rel_type))
+
+        return "\n".join(relationship_lines)
+
+    @staticmethod
+    def format_fact(fact, rel_type=None):
+        """One relationship line, as in format_relationships"""
+        if rel_type is None:
+            rel_type = fact.get('rel_type_name')
+        rel_type = rel_type if rel_type is not None else 'unknown relation'
+        lh_name = fact.get('lh_object_name', f"Entity {fact.get('lh_object_uid')}")
+        lh_uid = fact.get('lh_object_uid')
+        rh_name = fact.get('rh_object_name', f"Entity {fact.get('rh_object_uid')}")
+        rh_uid = fact.get('rh_object_uid')
+        return f"- {lh_name}({lh_uid}) -> {rel_type} -> {rh_name}({rh_uid})"
+
+    def format_changes(self, changes: FactDiff):
+        """Added and removed facts of a diff as relationship lines"""
+        sections = []
+        for title, facts in (("Added", changes.added), ("Removed", changes.removed)):
+            if facts:
+                sections.append(f"{title}:\n" + "\n".join(self.format_fact(f) for f in facts))
+        return "\n".join(sections)
+
+    def subgraph(self, uids, hops=2, rel_types=None, exclude_rel_types=None, max_nodes=None):
+        """
+        The entities and facts within `hops` of one or more entities, from the local adjacency.
 
-            lh_name = fact.get('lh_object_name', f"Entity {fact.get('lh_object_uid')}")
-            lh_uid = fact.get('lh_object_uid')
-            rh_name = fact.get('rh_object_name', f"Entity {fact.get('rh_object_uid')}")
-            rh_uid = fact.get('rh_object_uid')
+        Args:
+            uids: Entity UID, or UIDs, to start from
+            hops: Facts to follow outwards from the start entities
+            rel_types: Only follow facts with these relation type UIDs
+            exclude_rel_types: Never follow facts with these relation type UIDs
+            max_nodes: Stop expanding at this many entities (nearer entities first)
 
+        Returns:
+            (entity UIDs in order of distance, facts between them)
+        """
+        if not isinstance(uids, (list, tuple, set, frozenset)):
+            uids = [uids]
+        nodes, rows = self._table.subgraph(uids, hops, rel_types, exclude_rel_types, max_nodes)
+        return nodes.tolist(), self._table.facts(rows)
 
-            rel_types[rel_type].append(f"- {lh_name}({lh_uid}) -> {rel_type} -> {rh_name}({rh_uid})")
+    def neighborhood_rows(self, uid, hops=2, rel_types=None, max_nodes=None):
+        """
+        Fact table rows within `hops` of an entity.
 
-        # Add each relation type group
-        for rel_type, lines in rel_types.items():
-            # relationship_lines.append(f"{rel_type.upper()}:")
-            relationship_lines.extend(lines)
-            # relationship_lines.append("")  # Empty line for spacing
+        With `max_nodes`, a larger neighbourhood is cut down to the entity and
+        the most relevant others (by ranked_entities), not simply the first
+        ones reached.
+        """
+        nodes, rows = self._table.subgraph([uid], hops, rel_types)
+        if max_nodes is not None and len(nodes) > max_nodes:
+            keep = self.ranked_entities(uid, limit=max_nodes, candidates=nodes.tolist(), hops=hops)
+            keep = np.asarray(keep, dtype=np.int64)
+            lh, rh = self._table.column('lh_object_uid')[rows], self._table.column('rh_object_uid')[rows]
+            rows = rows[np.isin(lh, keep) & np.isin(rh, keep)]
+        return rows
+
+    def format_neighborhood(self, uid, hops=2, rel_types=None, max_nodes=None):
+        """Relationships (as in format_relationships) within `hops` of an entity; see neighborhood_rows"""
+        return self._format_relationships(self.neighborhood_rows(uid, hops, rel_types, max_nodes))
+
+    def relevant_rows(self, selected=None, rows=None):
+        """
+        Fact table rows (all facts, or `rows`), most relevant first: ordered by
+        the rank (see ranked_entities) of the more relevant of their two
+        entities. Ties keep their order. Cutting the tail of this order drops
+        the facts about the least relevant entities first.
+        """
+        rows = self._table.rows() if rows is None else np.asarray(rows, dtype=np.int64)
+        ranked = np.asarray(self.ranked_entities(selected), dtype=np.int64)
+        if rows.size == 0 or ranked.size == 0:
+            return rows
+        sorter = np.argsort(ranked)
 
-        return "\n".join(relationship_lines)
+        def rank(uids):
+            at = sorter[np.searchsorted(ranked, uids, sorter=sorter).clip(max=ranked.size - 1)]
+            return np.where(ranked[at] == uids, at, ranked.size)
+
+        lh = rank(self._table.column('lh_object_uid')[rows])
+        rh = rank(self._table.column('rh_object_uid')[rows])
+        return rows[np.argsort(np.minimum(lh, rh), kind="stable")]
+
+    def query(self, patterns, limit=None):
+        """
+        Answer a conjunctive (lh, rel, rh) triple-pattern query from the local facts.
+
+        Terms are UIDs (or lists of UIDs), exact names, '?variables' or '_'
+        wildcards; see src.models.query. Returns a QueryResult with the
+        distinct variable bindings.
+        """
+        return triple_query.run(self._table, patterns, limit)
 
     def getModelRepresentation(self, uid):
         """Get a detailed representation of a specific model."""
@@ -427,6 +757,17 @@ class SemanticModel:
             result += f"# {rel_type}:\n{facts_str}\n"
         return result.rstrip()
 
+    def _rows_to_categorized_facts_str(self, rows) -> str:
+        """facts_to_categorized_facts_str for rows of the fact table"""
+        result = ""
+        for rel_type, group in self._table.group_by('rel_type_uid', rows).items():
+            facts_str = "\n".join(
+                f"{f['lh_object_name']} -> {f['rel_type_name']} -> {f['rh_object_name']}"
+                for f in self._table.facts(group)
+            )
+            result += f"# {rel_type}:\n{facts_str}\n"
+        return result.rstrip()
+
 
     # def facts_to_taxonomy_str(self, facts) -> str:
     #         # # Extract and format taxonomic relationships
@@ -0,0 +1,383 @@
+"""
+Read-only semantic model shared between processes.
+
+One loader process (the one that syncs with Aperture) publishes each version
+of its SemanticModel as a columnar image in a memory-mapped file, by default
+on a shared-memory filesystem such as /dev/shm. Worker processes map the image
+read-only and query it in place. The pages are shared through the page cache
+and each worker adds only small per-process objects, so memory use does not
+grow with the number of workers.
+
+An image holds:
+
+- the fact table columns (fact, lh, rel type and rh UIDs; name ids)
+- the string table, sorted so a name can be found by binary search
+- the CSR adjacency
+- each fact and model as a JSON document, decoded when accessed
+
+The image is built from an immutable ModelSnapshot in a worker thread, so the
+event loop keeps serving while a large model is encoded and written. A burst
+of changes is published once: a new version waits until the model has stopped
+changing for `debounce` seconds (or at most `interval` seconds).
+
+Each version is written to a temporary file and renamed over the image.
+Readers check the file on each `current()` call and map the new version when
+it has been replaced. A caller still holding an older view keeps a
+consistent view of that version until it lets go of it; the reader only drops
+its own reference, and the old mapping (and the replaced file's storage) is
+released once the last holder is gone.
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.models.fact_table import MISSING, NAME_COLUMNS, UID_COLUMNS, FactTable
+from src.models.records import Fact, Model
+from src.models.snapshot import ModelSnapshot
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"NOUSSHM1"
+_ALIGN = 64
+_HEADER_LEN = struct.Struct("<8sI")  # magic, header length
+
+
+def _pack(items: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """Byte strings as (offsets, blob); item i is blob[offsets[i]:offsets[i + 1]]"""
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, items), dtype=np.int64, count=len(items)), out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(items), dtype=np.uint8)
+
+
+def _encode(records) -> Tuple[np.ndarray, np.ndarray]:
+    """Records as JSON documents"""
+    return _pack([json.dumps(dict(r), separators=(",", ":"), default=str).encode() for r in records])
+
+
+def build_image(snapshot: ModelSnapshot) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Metadata and arrays for a columnar image of a model snapshot"""
+    # A table of its own: the model's table keeps changing while the image is built
+    table = FactTable(capacity=max(1, len(snapshot.facts)))
+    table.add(snapshot.facts)
+    rows = table.rows()
+    arrays: Dict[str, np.ndarray] = {}
+    for name in UID_COLUMNS:
+        arrays[name] = np.ascontiguousarray(table.column(name)[rows])
+
+    # Sorted strings, with the name columns remapped to the sorted ids
+    strings = [table.strings[i] for i in range(len(table.strings))]
+    order = sorted(range(len(strings)), key=strings.__getitem__)
+    remap = np.full(len(strings) + 1, MISSING, dtype=np.int32)
+    remap[np.asarray(order, dtype=np.int64)] = np.arange(len(order), dtype=np.int32)
+    for name in NAME_COLUMNS:
+        # MISSING (-1) maps through the extra last slot
+        arrays[name] = remap[table.column(name)[rows]]
+    arrays["string_offsets"], arrays["string_blob"] = _pack([strings[i].encode() for i in order])
+
+    arrays["fact_offsets"], arrays["fact_blob"] = _encode(table.facts(rows))
+    arrays["fact_order"] = np.argsort(arrays["fact_uid"], kind="stable")
+
+    compact = FactTable()
+    compact._columns = {name: arrays[name] for name in (*UID_COLUMNS, *NAME_COLUMNS)}
+    compact._live = np.ones(len(rows), dtype=bool)
+    compact._size = len(rows)
+    arrays["csr_nodes"], arrays["csr_indptr"], arrays["csr_indices"] = compact._adjacency()
+
+    models = sorted(snapshot.models.values(), key=lambda m: m['uid'])
+    arrays["model_uids"] = np.asarray([m['uid'] for m in models], dtype=np.int64)
+    arrays["model_offsets"], arrays["model_blob"] = _encode(models)
+
+    meta = {"version": snapshot.version, "selected_entity": snapshot.selected_entity}
+    return meta, arrays
+
+
+def _data_start(header_length: int) -> int:
+    start = _HEADER_LEN.size + header_length
+    return start + -start % _ALIGN
+
+
+def _layout(meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> Tuple[bytes, List[Tuple[int, np.ndarray]], int]:
+    specs = {}
+    placed = []
+    offset = 0
+    for name, array in arrays.items():
+        offset += -offset % _ALIGN
+        specs[name] = (offset, array.dtype.str, len(array))
+        placed.append((offset, array))
+        offset += array.nbytes
+    header = json.dumps({**meta, "arrays": specs}).encode()
+    start = _data_start(len(header))
+    return header, [(start + o, a) for o, a in placed], start + offset
+
+
+def write_image(snapshot: ModelSnapshot, path: Path) -> int:
+    """Publish a model snapshot at `path`; returns the image size"""
+    meta, arrays = build_image(snapshot)
+    header, placed, size = _layout(meta, arrays)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER_LEN.pack(MAGIC, len(header)))
+        f.write(header)
+        for offset, array in placed:
+            f.seek(offset)
+            f.write(array.tobytes())
+        f.truncate(size)
+    os.replace(tmp, path)
+    return size
+
+
+class SharedModelPublisher:
+    """Publishes versions of a SemanticModel for worker processes"""
+
+    def __init__(self, model, path: Path, interval: float = 5.0, debounce: float = 1.0):
+        self.model = model
+        self.path = Path(path)
+        self.interval = interval
+        self.debounce = debounce
+        self.published_version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None
+        self._stats = {"publishes": 0, "bytes": 0, "last_ms": None}
+
+    def _published(self, version: int, size: int, started: float):
+        self.published_version = version
+        self._stats.update(
+            publishes=self._stats["publishes"] + 1,
+            bytes=size,
+            last_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+
+    def publish(self, force: bool = False) -> bool:
+        """Publish the model's current version (if not already published), in this thread"""
+        snapshot = self.model.snapshot()
+        if not force and snapshot.version == self.published_version:
+            return False
+        started = time.perf_counter()
+        self._published(snapshot.version, write_image(snapshot, self.path), started)
+        return True
+
+    async def publish_async(self, force: bool = False) -> bool:
+        """Publish the model's current version (if not already published) from a worker thread"""
+        snapshot = self.model.snapshot()
+        if not force and snapshot.version == self.published_version:
+            return False
+        started = time.perf_counter()
+        self._writing = asyncio.ensure_future(asyncio.to_thread(write_image, snapshot, self.path))
+        # Shielded: a cancelled publisher still lets the write finish (see stop())
+        size = await asyncio.shield(self._writing)
+        self._published(snapshot.version, size, started)
+        return True
+
+    async def _settle(self):
+        """Wait until the model stops changing for `debounce` seconds, or `interval` at most"""
+        version = self.model.version
+        waited = 0.0
+        while waited < self.interval:
+            await asyncio.sleep(self.debounce)
+            waited += self.debounce
+            if self.model.version == version:
+                return
+            version = self.model.version
+
+    async def _run(self):
+        while True:
+            if self.model.version != self.published_version:
+                await self._settle()
+                try:
+                    await self.publish_async()
+                except Exception as e:
+                    logger.error(f"Failed to publish shared semantic model {self.path}: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop publishing and withdraw the shared model"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writing is not None:
+            # An image still being written would be renamed into place after close()
+            try:
+                await self._writing
+            except Exception:
+                pass
+            self._writing = None
+        self.close()
+
+    def close(self):
+        """Withdraw the published image (readers keep their current mapping)"""
+        self.path.unlink(missing_ok=True)
+        self.published_version = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "path": str(self.path), "published_version": self.published_version}
+
+
+class SharedStrings(Sequence):
+    """Sorted string table over a shared blob"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, string_id):
+        if string_id == MISSING:
+            return None
+        start, end = self._offsets[string_id], self._offsets[string_id + 1]
+        return self._blob[start:end].tobytes().decode()
+
+    def find(self, value: str) -> int:
+        i = bisect_left(self, value)
+        return i if i < len(self) and self[i] == value else MISSING
+
+    def __contains__(self, value: object) -> bool:
+        return isinstance(value, str) and self.find(value) != MISSING
+
+
+class SharedFactTable(FactTable):
+    """FactTable queries over a shared image (read-only)"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.strings = SharedStrings(arrays["string_offsets"], arrays["string_blob"])
+        self._columns = {name: arrays[name] for name in (*UID_COLUMNS, *NAME_COLUMNS)}
+        self._size = len(arrays["fact_uid"])
+        self._live = np.ones(self._size, dtype=bool)
+        self._dead = 0
+        self._csr = (arrays["csr_nodes"], arrays["csr_indptr"], arrays["csr_indices"])
+        self._fact_offsets = arrays["fact_offsets"]
+        self._fact_blob = arrays["fact_blob"]
+        self._fact_order = arrays["fact_order"]
+
+    def add(self, facts):
+        raise TypeError("shared fact tables are read-only")
+
+    def remove(self, fact_uids):
+        raise TypeError("shared fact tables are read-only")
+
+    def _row(self, fact_uid: Any) -> Optional[int]:
+        uids = self._columns['fact_uid']
+        position = int(np.searchsorted(uids, fact_uid, sorter=self._fact_order))
+        if position < self._size and uids[self._fact_order[position]] == fact_uid:
+            return int(self._fact_order[position])
+        return None
+
+    def __contains__(self, fact_uid: Any) -> bool:
+        return self._row(fact_uid) is not None
+
+    def get(self, fact_uid: Any) -> Optional[Fact]:
+        row = self._row(fact_uid)
+        return None if row is None else self._fact(row)
+
+    def _fact(self, row: int) -> Fact:
+        start, end = self._fact_offsets[row], self._fact_offsets[row + 1]
+        return Fact(json.loads(self._fact_blob[start:end].tobytes()))
+
+    def facts(self, rows=None) -> List[Fact]:
+        if rows is None:
+            rows = range(self._size)
+        return [self._fact(int(row)) for row in rows]
+
+
+class SharedModelView:
+    """One published version of the model, mapped read-only"""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.inode = os.fstat(f.fileno()).st_ino
+        magic, length = _HEADER_LEN.unpack_from(self._mapped, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a shared semantic model image")
+        header = json.loads(self._mapped[_HEADER_LEN.size:_HEADER_LEN.size + length])
+        self.version: int = header["version"]
+        self.selected_entity = header["selected_entity"]
+        # Array offsets are relative to the aligned end of the header
+        base = _data_start(length)
+        arrays = {
+            name: np.frombuffer(self._mapped, dtype=np.dtype(dtype), count=count, offset=base + offset)
+            for name, (offset, dtype, count) in header["arrays"].items()
+        }
+        self.table = SharedFactTable(arrays)
+        self._model_uids = arrays["model_uids"]
+        self._model_offsets = arrays["model_offsets"]
+        self._model_blob = arrays["model_blob"]
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @property
+    def facts(self) -> List[Fact]:
+        return self.table.facts()
+
+    def model(self, uid: Any) -> Optional[Model]:
+        """The model with this uid, if present"""
+        i = int(np.searchsorted(self._model_uids, uid))
+        if i == len(self._model_uids) or self._model_uids[i] != uid:
+            return None
+        start, end = self._model_offsets[i], self._model_offsets[i + 1]
+        return Model(json.loads(self._model_blob[start:end].tobytes()))
+
+    @property
+    def model_uids(self) -> np.ndarray:
+        return self._model_uids
+
+    def close(self):
+        # The numpy views must be released before the mapping can be closed
+        self.table = None
+        self._model_uids = self._model_offsets = self._model_blob = None
+        try:
+            self._mapped.close()
+        except BufferError:
+            # Arrays handed out by queries still refer to it; it is unmapped once they go
+            logger.debug("Shared semantic model view still referenced; left mapped")
+
+
+class SharedModelReader:
+    """Maps the latest version published at a path"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._view: Optional[SharedModelView] = None
+
+    def current(self) -> Optional[SharedModelView]:
+        """View of the latest published version (re-mapping if it was replaced)"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            # Not published yet, or withdrawn; keep serving the last version seen
+            return self._view
+        if self._view is None or self._view.inode != inode:
+            try:
+                view = SharedModelView(self.path)
+            except FileNotFoundError:
+                return self._view
+            # Callers may still hold the previous view: it is unmapped when they let it go
+            self._view = view
+        return self._view
+
+    def close(self):
+        """Stop following the image (views already handed out stay usable)"""
+        self._view = None
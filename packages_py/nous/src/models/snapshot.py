@@ -0,0 +1,233 @@
+"""
+Immutable, versioned snapshots of the semantic model.
+
+The fact list and the model map are persistent structures: an update returns
+a new value that shares every untouched part with the old one. The fact list
+is a tuple of chunks, and appending copies at most the last chunk. The model
+map is split into shards, and setting a model copies one shard (a batch of
+models copies each shard it touches once). Writers
+publish a new snapshot with the next version number. Readers keep whatever
+snapshot they took, without locks, for as long as they need a consistent
+view.
+
+An agent run pins its snapshot with `SemanticModel.pinned(snapshot)`. Code
+running inside the run, including the tasks it starts, finds the pin with
+`current_pin()` and reads the model through `SemanticModel.reader()`.
+
+`diff(old, new)` gives the facts added and removed between two snapshots.
+Chunks the two fact lists share are skipped unread, so the cost follows the
+number of changed chunks rather than the size of the model.
+"""
+
+import contextvars
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+from itertools import accumulate, chain
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from src.models.records import Fact, Model
+
+CHUNK_SIZE = 256
+SHARDS = 64
+
+
+class FactList(Sequence):
+    """Persistent list of facts stored in chunks"""
+
+    __slots__ = ('_chunks', '_len', '_offsets')
+
+    def __init__(self, chunks: Tuple[Tuple[Fact, ...], ...] = ()):
+        self._chunks = chunks
+        self._len = sum(len(c) for c in chunks)
+        self._offsets: Optional[list] = None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Fact]:
+        return chain.from_iterable(self._chunks)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("fact index out of range")
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(len(c) for c in self._chunks)]
+        chunk = bisect_right(self._offsets, index) - 1
+        return self._chunks[chunk][index - self._offsets[chunk]]
+
+    def __repr__(self) -> str:
+        return f"FactList({list(self)!r})"
+
+    def extend(self, facts: Iterable[Fact]) -> "FactList":
+        """New list with `facts` appended (only the last chunk is copied)"""
+        facts = tuple(facts)
+        if not facts:
+            return self
+        chunks = list(self._chunks)
+        tail: Tuple[Fact, ...] = ()
+        if chunks and len(chunks[-1]) < CHUNK_SIZE:
+            tail = chunks.pop()
+        pending = tail + facts
+        for start in range(0, len(pending), CHUNK_SIZE):
+            chunks.append(pending[start:start + CHUNK_SIZE])
+        return FactList(tuple(chunks))
+
+    def remove_where(self, predicate: Callable[[Fact], bool]) -> "FactList":
+        """New list without the facts matching `predicate` (untouched chunks are shared)"""
+        chunks = []
+        changed = False
+        for chunk in self._chunks:
+            if any(predicate(f) for f in chunk):
+                changed = True
+                chunk = tuple(f for f in chunk if not predicate(f))
+                if not chunk:
+                    continue
+            chunks.append(chunk)
+        return FactList(tuple(chunks)) if changed else self
+
+
+class ModelMap(Mapping):
+    """Persistent map of model UIDs to models, split into copy-on-write shards"""
+
+    __slots__ = ('_shards', '_len')
+
+    def __init__(self, shards: Optional[Tuple[dict, ...]] = None, length: int = 0):
+        self._shards = shards if shards is not None else tuple({} for _ in range(SHARDS))
+        self._len = length
+
+    def _shard(self, uid: Any) -> int:
+        return hash(uid) % SHARDS
+
+    def __getitem__(self, uid: Any) -> Model:
+        return self._shards[self._shard(uid)][uid]
+
+    def __contains__(self, uid: object) -> bool:
+        return uid in self._shards[self._shard(uid)]
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._shards)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __repr__(self) -> str:
+        return f"ModelMap({dict(self)!r})"
+
+    def set(self, uid: Any, model: Model) -> "ModelMap":
+        """New map with `uid` set to `model`"""
+        i = self._shard(uid)
+        shard = dict(self._shards[i])
+        length = self._len + (uid not in shard)
+        shard[uid] = model
+        return ModelMap(self._shards[:i] + (shard,) + self._shards[i + 1:], length)
+
+    def update(self, items: Iterable[Tuple[Any, Model]]) -> "ModelMap":
+        """New map with every (uid, model) of `items` set, copying each touched shard once"""
+        shards = list(self._shards)
+        copied = set()
+        length = self._len
+        for uid, model in items:
+            i = self._shard(uid)
+            if i not in copied:
+                shards[i] = dict(shards[i])
+                copied.add(i)
+            length += uid not in shards[i]
+            shards[i][uid] = model
+        return ModelMap(tuple(shards), length) if copied else self
+
+    def delete(self, uid: Any) -> "ModelMap":
+        """New map without `uid` (KeyError if absent)"""
+        i = self._shard(uid)
+        shard = dict(self._shards[i])
+        del shard[uid]
+        return ModelMap(self._shards[:i] + (shard,) + self._shards[i + 1:], self._len - 1)
+
+
+class ModelSnapshot:
+    """One published version of the semantic model's facts, models and selection"""
+
+    __slots__ = ('version', 'facts', 'models', 'selected_entity')
+
+    def __init__(self, version: int, facts: FactList, models: ModelMap, selected_entity: Any):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'facts', facts)
+        object.__setattr__(self, 'models', models)
+        object.__setattr__(self, 'selected_entity', selected_entity)
+
+    def __setattr__(self, key: str, value: Any):
+        raise AttributeError("snapshots are read-only")
+
+    def __repr__(self) -> str:
+        return f"ModelSnapshot(version={self.version}, facts={len(self.facts)}, models={len(self.models)})"
+
+
+class FactDiff(NamedTuple):
+    from_version: int
+    to_version: int
+    added: Tuple[Fact, ...]
+    removed: Tuple[Fact, ...]
+
+    @property
+    def changes(self) -> int:
+        return len(self.added) + len(self.removed)
+
+
+def diff(old: ModelSnapshot, new: ModelSnapshot) -> FactDiff:
+    """
+    Facts in `new` but not `old` (added) and in `old` but not `new` (removed).
+
+    Facts are matched by fact_uid; a fact whose content changed counts as
+    removed in its old form and added in its new one.
+    """
+    old_chunks, new_chunks = old.facts._chunks, new.facts._chunks
+    shared = {id(c) for c in old_chunks} & {id(c) for c in new_chunks}
+    before = {f['fact_uid']: f for c in old_chunks if id(c) not in shared for f in c}
+    after = {f['fact_uid']: f for c in new_chunks if id(c) not in shared for f in c}
+
+    def unchanged(fact: Fact, other: Optional[Fact]) -> bool:
+        # Facts carried over by extend/remove_where are the same record
+        return other is not None and (other is fact or other == fact)
+
+    added = tuple(f for uid, f in after.items() if not unchanged(f, before.get(uid)))
+    removed = tuple(f for uid, f in before.items() if not unchanged(f, after.get(uid)))
+    return FactDiff(old.version, new.version, added, removed)
+
+
+class Pin:
+    """The snapshot a run reads a model at, and the read-only copy of the model built for it (if any)"""
+
+    __slots__ = ('owner', 'snapshot', 'view')
+
+    def __init__(self, owner: Any, snapshot: ModelSnapshot):
+        self.owner = owner
+        self.snapshot = snapshot
+        self.view = None
+
+    def advance(self, snapshot: ModelSnapshot):
+        """Move the pin to a later snapshot (e.g. after the run's own write)"""
+        self.snapshot = snapshot
+        self.view = None
+
+
+_pin: contextvars.ContextVar[Optional[Pin]] = contextvars.ContextVar("model_pin", default=None)
+
+
+@contextmanager
+def pinned(owner: Any, snapshot: ModelSnapshot):
+    """Pin `snapshot` of the model `owner` for the code run inside the block"""
+    pin = Pin(owner, snapshot)
+    token = _pin.set(pin)
+    try:
+        yield pin
+    finally:
+        _pin.reset(token)
+
+
+def current_pin() -> Optional[Pin]:
+    """The pin of the enclosing run, if any"""
+    return _pin.get()
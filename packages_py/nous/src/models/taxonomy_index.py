@@ -0,0 +1,308 @@
+"""
+In-process index of the specialization hierarchy.
+
+Built from specialization facts (rel_type_uid 1146, lh is a subtype of rh): the
+environment's facts plus those learned from Archivist/Aperture lookups. The
+index keeps only each kind's direct parents and children, updated fact by fact
+as facts are added, removed or learned. Ancestor and descendant sets and depths
+are computed on demand and memoized per kind. A changed edge drops the memoized
+ancestors and depths of the subtype and everything below it, and the
+descendants of the supertype and everything above it; large batches of changes
+drop them all. Memory therefore follows the number of specialization facts plus
+the closures actually asked for, rather than the square of the number of kinds.
+
+A kind's direct subtypes are answered locally only after a lookup returned the
+complete list (`learn(..., subtypes_of=uid)`), and only until a specialization
+fact under that kind is added or removed. Direct supertypes likewise
+(`learn(..., supertypes_of=uid)`): a kind may have several, and the facts at
+hand may hold only some of them.
+"""
+
+import logging
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from src.models.records import Fact
+
+logger = logging.getLogger(__name__)
+
+SPECIALIZATION_UID = 1146
+ROOT_UID = 730000
+# Changed facts above which every memoized closure is dropped rather than walking each subtree
+_BULK_CHANGES = 64
+
+
+class TaxonomyIndex:
+    """Parent/child maps over the known specialization facts, with memoized closures"""
+
+    def __init__(self):
+        self._env_facts: Dict[Any, Fact] = {}
+        self._learned_facts: Dict[Any, Fact] = {}
+        self._subtypes_complete: Set[Any] = set()
+        self._supertypes_complete: Set[Any] = set()
+
+        # The fact linked into the maps per fact_uid (an environment fact wins over a learned one)
+        self._linked: Dict[Any, Fact] = {}
+        # Facts per (subtype, supertype) edge; several facts may state the same edge
+        self._edges: Dict[Tuple[Any, Any], Dict[Any, Fact]] = {}
+        self._parents: Dict[Any, Dict[Any, Fact]] = {}
+        self._children: Dict[Any, Dict[Any, Fact]] = {}
+        # Linked facts naming each kind; a kind leaves the index when none is left
+        self._mentions: Dict[Any, int] = {}
+        # Memoized per kind, dropped when an edge that can change them changes
+        self._ancestors: Dict[Any, FrozenSet[Any]] = {}
+        self._descendants: Dict[Any, FrozenSet[Any]] = {}
+        self._depth: Dict[Any, int] = {}
+
+    def __getstate__(self):
+        # Only the facts; the maps are relinked on load
+        return {
+            "_env_facts": self._env_facts,
+            "_learned_facts": self._learned_facts,
+            "_subtypes_complete": self._subtypes_complete,
+            "_supertypes_complete": self._supertypes_complete,
+        }
+
+    def __setstate__(self, state):
+        self.__init__()
+        complete = state["_subtypes_complete"]
+        supertypes_complete = state.get("_supertypes_complete", set())
+        self._env_facts = state["_env_facts"]
+        self._learned_facts = state["_learned_facts"]
+        self._update({**self._learned_facts, **self._env_facts})
+        self._subtypes_complete = complete
+        self._supertypes_complete = supertypes_complete
+
+    # --- Maintenance --- #
+
+    def set_environment_facts(self, facts: Iterable[Fact]):
+        """Replace the environment's specialization facts (other facts are ignored)"""
+        facts = {f['fact_uid']: f for f in facts if f.get('rel_type_uid') == SPECIALIZATION_UID}
+        changed = [uid for uid in self._env_facts if uid not in facts]
+        changed += [uid for uid, f in facts.items() if self._env_facts.get(uid) is not f]
+        self._env_facts = facts
+        self._update(changed)
+
+    def add_environment_facts(self, facts: Iterable[Fact]):
+        """Add (or replace) environment facts (other than specialization facts are ignored)"""
+        changed = []
+        for f in facts:
+            if f.get('rel_type_uid') == SPECIALIZATION_UID:
+                self._env_facts[f['fact_uid']] = f
+                changed.append(f['fact_uid'])
+        self._update(changed)
+
+    def remove_environment_facts(self, fact_uids: Iterable[Any]):
+        """Drop facts removed from the environment (learned copies stay)"""
+        changed = [uid for uid in fact_uids if self._env_facts.pop(uid, None) is not None]
+        self._update(changed)
+
+    def learn(self, facts: Iterable[Fact], subtypes_of: Any = None, supertypes_of: Any = None):
+        """
+        Add specialization facts obtained from a lookup outside the environment.
+
+        Args:
+            facts: Facts returned by the lookup (non-specialization facts are ignored)
+            subtypes_of: UID whose complete list of direct subtypes `facts` contains
+            supertypes_of: UID whose complete list of direct supertypes `facts` contains
+        """
+        changed = []
+        for f in facts:
+            if f.get('rel_type_uid') == SPECIALIZATION_UID:
+                self._learned_facts[f['fact_uid']] = Fact.from_wire(f)
+                changed.append(f['fact_uid'])
+        self._update(changed)
+        if subtypes_of is not None:
+            self._subtypes_complete.add(subtypes_of)
+        if supertypes_of is not None:
+            self._supertypes_complete.add(supertypes_of)
+
+    def _update(self, fact_uids: Iterable[Any]):
+        """Relink the given facts after their environment or learned entries changed"""
+        fact_uids = list(fact_uids)
+        bulk = len(fact_uids) > _BULK_CHANGES
+        for fact_uid in fact_uids:
+            old = self._linked.get(fact_uid)
+            new = self._env_facts.get(fact_uid) or self._learned_facts.get(fact_uid)
+            if old is new or (old is not None and new is not None and old == new):
+                continue
+            if old is not None:
+                self._unlink(old, bulk)
+                del self._linked[fact_uid]
+            if new is not None:
+                self._linked[fact_uid] = new
+                self._link(new, bulk)
+        if bulk:
+            self._ancestors.clear()
+            self._descendants.clear()
+            self._depth.clear()
+
+    def _representative(self, edge: Dict[Any, Fact]) -> Fact:
+        # An environment fact if the edge has one, so environment_only queries find it
+        return next((f for uid, f in edge.items() if uid in self._env_facts), next(iter(edge.values())))
+
+    def _link(self, f: Fact, bulk: bool):
+        sub, sup = f['lh_object_uid'], f['rh_object_uid']
+        for uid in (sub, sup):
+            self._mentions[uid] = self._mentions.get(uid, 0) + 1
+            self._parents.setdefault(uid, {})
+            self._children.setdefault(uid, {})
+        if sub == sup:
+            return
+        edge = self._edges.setdefault((sub, sup), {})
+        edge[f['fact_uid']] = f
+        self._parents[sub][sup] = self._children[sup][sub] = self._representative(edge)
+        self._subtypes_complete.discard(sup)
+        self._supertypes_complete.discard(sub)
+        if not bulk:
+            self._invalidate(sub, sup)
+
+    def _unlink(self, f: Fact, bulk: bool):
+        sub, sup = f['lh_object_uid'], f['rh_object_uid']
+        edge = self._edges.get((sub, sup))
+        if edge is not None and sub != sup:
+            # Before the edge goes, so the walks still reach what it connected
+            if not bulk:
+                self._invalidate(sub, sup)
+            self._subtypes_complete.discard(sup)
+            self._supertypes_complete.discard(sub)
+            edge.pop(f['fact_uid'], None)
+            if edge:
+                self._parents[sub][sup] = self._children[sup][sub] = self._representative(edge)
+            else:
+                del self._edges[(sub, sup)]
+                del self._parents[sub][sup]
+                del self._children[sup][sub]
+        for uid in (sub, sup):
+            self._mentions[uid] -= 1
+            if not self._mentions[uid]:
+                # No specialization fact names the kind any more
+                del self._mentions[uid]
+                del self._parents[uid]
+                del self._children[uid]
+
+    def _invalidate(self, sub: Any, sup: Any):
+        if self._ancestors or self._depth:
+            for uid in self._walk(sub, self._children):
+                self._ancestors.pop(uid, None)
+                self._depth.pop(uid, None)
+        if self._descendants:
+            for uid in self._walk(sup, self._parents):
+                self._descendants.pop(uid, None)
+
+    @staticmethod
+    def _walk(start: Any, edges: Dict[Any, Dict[Any, Fact]]) -> Set[Any]:
+        """`start` and every kind reachable from it over `edges`"""
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            for uid in edges.get(queue.popleft(), ()):
+                if uid not in seen:
+                    seen.add(uid)
+                    queue.append(uid)
+        return seen
+
+    def _closure(self, uid: Any, edges: Dict[Any, Dict[Any, Fact]], memo: Dict[Any, FrozenSet[Any]]) -> FrozenSet[Any]:
+        closure = memo.get(uid)
+        if closure is None:
+            closure = memo[uid] = frozenset(self._walk(uid, edges) - {uid})
+        return closure
+
+    # --- Queries --- #
+
+    def __contains__(self, uid: Any) -> bool:
+        return uid in self._parents
+
+    def __len__(self) -> int:
+        return len(self._parents)
+
+    def is_subtype_of(self, uid: Any, supertype_uid: Any) -> bool:
+        """Whether `uid` is `supertype_uid` or one of its (indirect) subtypes"""
+        if uid == supertype_uid or uid not in self._parents or supertype_uid not in self._parents:
+            return uid == supertype_uid
+        return supertype_uid in self._closure(uid, self._parents, self._ancestors)
+
+    def ancestors(self, uid: Any) -> Set[Any]:
+        """All known (indirect) supertypes of a kind"""
+        if uid not in self._parents:
+            return set()
+        return set(self._closure(uid, self._parents, self._ancestors))
+
+    def descendants(self, uid: Any) -> Set[Any]:
+        """All known (indirect) subtypes of a kind"""
+        if uid not in self._children:
+            return set()
+        return set(self._closure(uid, self._children, self._descendants))
+
+    def depth(self, uid: Any) -> Optional[int]:
+        """Longest known specialization path from a top kind down to `uid`"""
+        if uid not in self._parents:
+            return None
+        if uid not in self._depth:
+            # Depth-first up the parents; a parent still on the path closes a cycle and is skipped
+            path, on_path = [uid], {uid}
+            while path:
+                node = path[-1]
+                parent = next((p for p in self._parents[node] if p not in self._depth and p not in on_path), None)
+                if parent is not None:
+                    path.append(parent)
+                    on_path.add(parent)
+                    continue
+                path.pop()
+                on_path.discard(node)
+                self._depth[node] = max(
+                    (self._depth[p] + 1 for p in self._parents[node] if p in self._depth), default=0
+                )
+        return self._depth[uid]
+
+    def supertypes(self, uid: Any) -> List[Any]:
+        """Known direct supertypes of a kind"""
+        return list(self._parents.get(uid, {}))
+
+    def subtypes(self, uid: Any) -> List[Any]:
+        """Known direct subtypes of a kind"""
+        return list(self._children.get(uid, {}))
+
+    def supertype_facts(self, uid: Any, environment_only: bool = False) -> Optional[List[Fact]]:
+        """Specialization facts of a kind's direct supertypes, or None if they may be incomplete"""
+        if uid not in self._supertypes_complete:
+            return None
+        facts = list(self._parents.get(uid, {}).values())
+        if environment_only and not all(f['fact_uid'] in self._env_facts for f in facts):
+            return None
+        return facts
+
+    def subtype_facts(self, uid: Any) -> Optional[List[Fact]]:
+        """Specialization facts of a kind's direct subtypes, or None if they may be incomplete"""
+        if uid not in self._subtypes_complete:
+            return None
+        return list(self._children.get(uid, {}).values())
+
+    def lineage_facts(self, uid: Any, environment_only: bool = False) -> Optional[List[Fact]]:
+        """
+        Specialization facts from a kind up to the root, nearest first.
+
+        Returns None unless every path upwards reaches the root (the lineage may be incomplete).
+        """
+        if uid not in self._parents:
+            return None
+        chain = sorted([uid, *self._closure(uid, self._parents, self._ancestors)], key=lambda k: -self.depth(k))
+        facts = []
+        for node in chain:
+            parents = self._parents.get(node, {})
+            if not parents and node != ROOT_UID:
+                return None
+            for f in parents.values():
+                if environment_only and f['fact_uid'] not in self._env_facts:
+                    return None
+                facts.append(f)
+        return facts
+
+    def lca(self, uid_a: Any, uid_b: Any) -> Optional[Any]:
+        """Deepest kind that both `uid_a` and `uid_b` specialize (None if unrelated or unknown)"""
+        if uid_a not in self._parents or uid_b not in self._parents:
+            return None
+        common = ({uid_a} | self._closure(uid_a, self._parents, self._ancestors)) & (
+            {uid_b} | self._closure(uid_b, self._parents, self._ancestors)
+        )
+        return max(common, key=self.depth, default=None)
@@ -2,23 +2,80 @@
 """
 Proxy wrapper for Socket.IO Aperture client to match the interface expected by NOUS tools.
 This bridges the Socket.IO client with the tool interface.
+
+Facts returned by the lookups are also added to the semantic model (facts
+already there, by fact_uid, are skipped), so the next turn's context has
+them and repeat lookups are answered locally. The lookup returns as soon as
+the facts are in; their entity models are fetched from Clarity in the
+background.
+
+Only lookups made in the environment the semantic model follows are
+ingested. The load actions add the facts to that Aperture environment too,
+so they survive the next full sync (EnvironmentSync._resync), which drops
+every fact the environment no longer holds. A fact a lookup returns without
+Aperture keeping it, or one unloaded later, is dropped again at that point.
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Set
+
+from src.config import DEFAULT_ENVIRONMENT_ID
+from src.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 class ApertureSocketIOProxy:
     """
     Proxy that wraps the Socket.IO aperture client to provide the interface expected by tools.
-    Automatically injects user_id and env_id into all calls.
+    Automatically injects user_id and env_id into all calls, and ingests the
+    facts they return into `semantic_model` (if given) when env_id is the
+    model's environment (`model_environment_id`).
     """
     
-    def __init__(self, socketio_client, user_id: str, env_id: str):
+    def __init__(self, socketio_client, user_id: str, env_id: str, semantic_model=None,
+                 model_environment_id: Optional[str] = DEFAULT_ENVIRONMENT_ID):
         self.client = socketio_client
         self.user_id = user_id
         self.env_id = env_id
+        self.semantic_model = semantic_model
+        self.model_environment_id = model_environment_id
+        # Background model loads, referenced until done
+        self._loading: Set[asyncio.Task] = set()
+
+    @property
+    def ingests(self) -> bool:
+        """Whether lookups are added to the semantic model (it follows this proxy's environment)"""
+        return self.semantic_model is not None and str(self.env_id) == str(self.model_environment_id)
+
+    async def _ingest(self, payload: Any) -> Any:
+        """Add the facts in a lookup's payload to the semantic model, then return the payload"""
+        facts = payload.get('facts') if isinstance(payload, dict) else None
+        if not self.ingests or not isinstance(facts, list) or not facts:
+            return payload
+        try:
+            added = await self.semantic_model.ingestFacts(facts, load_models=False)
+            metrics.increment("tool_facts_ingested", len(added))
+            metrics.increment("tool_facts_already_known", len(facts) - len(added))
+        except Exception as e:
+            logger.error(f"Error ingesting {len(facts)} facts into the semantic model: {e}")
+            return payload
+        if added:
+            task = asyncio.create_task(self._load_models(added))
+            self._loading.add(task)
+            task.add_done_callback(self._loading.discard)
+        return payload
+
+    async def _load_models(self, facts):
+        try:
+            await self.semantic_model.loadModelsForFacts(facts)
+        except Exception as e:
+            logger.error(f"Error loading models for {len(facts)} ingested facts: {e}")
+
+    async def wait_loading(self):
+        """Wait for the model loads started by earlier lookups"""
+        while self._loading:
+            await asyncio.gather(*list(self._loading))
         
     async def textSearchLoad(self, search_term: str) -> Dict[str, Any]:
         """Search for entities by text and load them into the environment"""
@@ -33,7 +90,7 @@ class ApertureSocketIOProxy:
             
             logger.info(f"textSearchLoad result: {result}")
             environment = result.get('environment', result)
-            return environment #result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(environment) #result.get('payload', result) if result else {"facts": []}
             
         except Exception as e:
             logger.error(f"Error in textSearchLoad: {e}")
@@ -49,7 +106,7 @@ class ApertureSocketIOProxy:
                 "uid": search_uid
             })
             
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
             
         except Exception as e:
             logger.error(f"Error in uidSearchLoad: {e}")
@@ -63,7 +120,7 @@ class ApertureSocketIOProxy:
                 "environmentId": self.env_id,
                 "uid": uid
             })
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
         except Exception as e:
             logger.error(f"Error in loadSpecializationFact: {e}")
             return {"error": str(e)}
@@ -76,7 +133,7 @@ class ApertureSocketIOProxy:
                 "environmentId": self.env_id,
                 "uid": uid
             })
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
         except Exception as e:
             logger.error(f"Error in loadSpecializationHierarchy: {e}")
             return {"error": str(e)}
@@ -91,7 +148,7 @@ class ApertureSocketIOProxy:
                 "uid": uid
             })
             print("LOADED SUPTYPES", result)
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
         except Exception as e:
             logger.error(f"Error in loadSubtypes: {e}")
             return {"error": str(e)}
@@ -104,7 +161,7 @@ class ApertureSocketIOProxy:
                 "environmentId": self.env_id,
                 "uid": uid
             })
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
         except Exception as e:
             logger.error(f"Error in loadClassificationFact: {e}")
             return {"error": str(e)}
@@ -117,7 +174,7 @@ class ApertureSocketIOProxy:
                 "environmentId": self.env_id,
                 "uid": uid
             })
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
         except Exception as e:
             logger.error(f"Error in loadClassified: {e}")
             return {"error": str(e)}
@@ -130,7 +187,7 @@ class ApertureSocketIOProxy:
                 "environmentId": self.env_id,
                 "uid": uid
             })
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
         except Exception as e:
             logger.error(f"Error in loadAllRelatedFacts: {e}")
             return {"error": str(e)}
@@ -143,7 +200,7 @@ class ApertureSocketIOProxy:
                 "environmentId": self.env_id,
                 "uid": uid
             })
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
         except Exception as e:
             logger.error(f"Error in loadRequiredRoles: {e}")
             return {"error": str(e)}
@@ -156,7 +213,7 @@ class ApertureSocketIOProxy:
                 "environmentId": self.env_id,
                 "uid": uid
             })
-            return result.get('payload', result) if result else {"facts": []}
+            return await self._ingest(result.get('payload', result) if result else {"facts": []})
         except Exception as e:
             logger.error(f"Error in loadRolePlayers: {e}")
             return {"error": str(e)}
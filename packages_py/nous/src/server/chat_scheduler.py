@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""
+Admission control for chat input processing.
+
+Agent runs are serialized per session, capped by a global concurrency limit
+and queued in a bounded, per-user fair queue. Runs are tracked as tasks so
+they can be cancelled when their client disconnects or a newer message in
+the same session supersedes them. The sessions each client has used are
+tracked too, so that a session's state can be dropped once the last client
+using it disconnects.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a chat run cannot be admitted because the queue is full"""
+
+
+class ChatRun:
+    """A single queued or running agent invocation"""
+
+    def __init__(
+        self,
+        session_id: str,
+        user_id: str,
+        sid: str,
+        job: Callable[[], Awaitable[Any]],
+    ):
+        self.run_id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.user_id = user_id
+        self.sid = sid
+        self.job = job
+        self.status = "queued"
+        self.position: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.enqueued_at = asyncio.get_event_loop().time()
+        self.started_at: Optional[float] = None
+        self.cancel_reason: Optional[str] = None
+        self.finished = asyncio.Event()
+
+    async def wait(self):
+        """Wait until the run has finished, whatever its outcome"""
+        await self.finished.wait()
+
+
+class ChatScheduler:
+    """
+    Schedules chat runs so that:
+    - at most one run per session executes at a time
+    - at most `max_concurrent` runs execute globally
+    - at most `max_queued` runs wait (and `max_queued_per_user` per user)
+    - waiting users are served round-robin, so one busy user cannot starve others
+    - with `supersede` enabled, a new message cancels the session's earlier runs
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        max_queued: int = 64,
+        max_queued_per_user: int = 8,
+        notify: Optional[Callable[[ChatRun, str, Dict[str, Any]], Awaitable[None]]] = None,
+        supersede: bool = True,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.notify = notify
+        self.supersede = supersede
+
+        # Pending runs per user; OrderedDict order is the round-robin order
+        self._pending: "OrderedDict[str, Deque[ChatRun]]" = OrderedDict()
+        self._running: Dict[str, ChatRun] = {}  # session_id -> run
+        self._queued_count = 0
+        self._client_sessions: Dict[str, Set[str]] = {}  # sid -> sessions it submitted to
+
+    @property
+    def queued_count(self) -> int:
+        return self._queued_count
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    async def submit(
+        self,
+        session_id: str,
+        user_id: str,
+        sid: str,
+        job: Callable[[], Awaitable[Any]],
+    ) -> ChatRun:
+        """Queue a run and dispatch it as soon as capacity allows"""
+        # Queued runs of the session that this one would supersede free their places
+        superseded = [r for r in self.queued_runs() if r.session_id == session_id] if self.supersede else []
+        user_queue = self._pending.get(user_id)
+        user_queued = len(user_queue or ()) - sum(r.user_id == user_id for r in superseded)
+        # Checked before superseding anything, so a rejected message leaves the session's runs alone
+        if self._queued_count - len(superseded) >= self.max_queued:
+            metrics.increment("chat_runs_rejected")
+            raise QueueFullError("NOUS is busy, please try again shortly")
+        if user_queued >= self.max_queued_per_user:
+            metrics.increment("chat_runs_rejected")
+            raise QueueFullError("Too many pending requests, please wait for earlier ones to finish")
+
+        run = ChatRun(session_id, user_id, sid, job)
+        self._client_sessions.setdefault(sid, set()).add(session_id)
+        metrics.increment("chat_runs_submitted")
+        if user_queue is None:
+            user_queue = self._pending[user_id] = deque()
+        user_queue.append(run)
+        self._queued_count += 1
+
+        if self.supersede:
+            await self._cancel(lambda r: r.session_id == session_id and r is not run, "superseded")
+        self._dispatch()
+        await self._publish_positions()
+        return run
+
+    def queued_runs(self) -> List[ChatRun]:
+        """Queued runs in the order they are expected to be dispatched"""
+        queues = [list(q) for q in self._pending.values()]
+        ordered = []
+        depth = 0
+        while True:
+            layer = [q[depth] for q in queues if depth < len(q)]
+            if not layer:
+                return ordered
+            ordered.extend(layer)
+            depth += 1
+
+    def _next_runnable(self) -> Optional[ChatRun]:
+        """Pick the next run round-robin across users, skipping busy sessions"""
+        for user_id in list(self._pending.keys()):
+            user_queue = self._pending[user_id]
+            for run in user_queue:
+                if run.session_id not in self._running:
+                    user_queue.remove(run)
+                    # Move the user to the back of the rotation
+                    self._pending.move_to_end(user_id)
+                    if not user_queue:
+                        del self._pending[user_id]
+                    return run
+        return None
+
+    def _dispatch(self):
+        while len(self._running) < self.max_concurrent:
+            run = self._next_runnable()
+            if run is None:
+                return
+            self._queued_count -= 1
+            self._start(run)
+
+    def _start(self, run: ChatRun):
+        run.status = "running"
+        run.position = None
+        run.started_at = asyncio.get_event_loop().time()
+        self._running[run.session_id] = run
+        run.task = asyncio.create_task(self._execute(run))
+        # Bookkeeping runs as a done callback so it also happens when the
+        # task is cancelled before it ever got to run
+        run.task.add_done_callback(lambda _: self._on_done(run))
+
+    async def _execute(self, run: ChatRun):
+        await self._notify(run, "processing", {})
+        try:
+            await run.job()
+            run.status = "completed"
+        except asyncio.CancelledError:
+            logger.info(f"Chat run {run.run_id} for session {run.session_id} cancelled ({run.cancel_reason})")
+            raise
+        except Exception as e:
+            run.status = "failed"
+            logger.error(f"Chat run {run.run_id} for session {run.session_id} failed: {e}")
+
+    def _on_done(self, run: ChatRun):
+        if run.task.cancelled():
+            run.status = "cancelled"
+            metrics.increment(f"chat_runs_cancelled_{run.cancel_reason or 'unknown'}")
+        else:
+            metrics.increment(f"chat_runs_{run.status}")
+        if self._running.get(run.session_id) is run:
+            del self._running[run.session_id]
+        run.finished.set()
+        self._dispatch()
+        asyncio.ensure_future(self._publish_positions())
+
+    def _remove_queued(self, predicate: Callable[[ChatRun], bool]) -> List[ChatRun]:
+        removed = []
+        for user_id in list(self._pending.keys()):
+            user_queue = self._pending[user_id]
+            for run in [r for r in user_queue if predicate(r)]:
+                user_queue.remove(run)
+                removed.append(run)
+            if not user_queue:
+                del self._pending[user_id]
+        self._queued_count -= len(removed)
+        return removed
+
+    async def _cancel(self, predicate: Callable[[ChatRun], bool], reason: str) -> int:
+        """Cancel queued and running runs matching the predicate"""
+        cancelled = 0
+        for run in self._remove_queued(predicate):
+            run.status = "cancelled"
+            run.cancel_reason = reason
+            run.finished.set()
+            metrics.increment(f"chat_runs_cancelled_{reason}")
+            cancelled += 1
+            if reason != "disconnect":
+                await self._notify(run, "cancelled", {"reason": reason})
+
+        for run in [r for r in self._running.values() if predicate(r)]:
+            if run.task is not None and not run.task.done():
+                run.cancel_reason = reason
+                run.task.cancel()
+                cancelled += 1
+                if reason != "disconnect":
+                    await self._notify(run, "cancelled", {"reason": reason})
+
+        if cancelled:
+            await self._publish_positions()
+        return cancelled
+
+    async def cancel_session(self, session_id: str, reason: str = "cancelled") -> int:
+        """Cancel every queued or running run of a session"""
+        return await self._cancel(lambda r: r.session_id == session_id, reason)
+
+    async def cancel_client(self, sid: str, reason: str = "disconnect") -> int:
+        """Cancel every queued or running run submitted by a client connection"""
+        return await self._cancel(lambda r: r.sid == sid, reason)
+
+    def forget_client(self, sid: str) -> List[str]:
+        """Stop tracking a disconnected client; returns its sessions that no other client has used"""
+        sessions = self._client_sessions.pop(sid, set())
+        in_use = set().union(*self._client_sessions.values())
+        return sorted(sessions - in_use)
+
+    async def _publish_positions(self):
+        """Send position updates to every queued run whose position changed"""
+        ordered = self.queued_runs()
+        for position, run in enumerate(ordered, start=1):
+            if run.position != position:
+                run.position = position
+                await self._notify(
+                    run, "queued", {"position": position, "queueLength": len(ordered)}
+                )
+
+    async def _notify(self, run: ChatRun, status: str, data: Dict[str, Any]):
+        if self.notify is None:
+            return
+        try:
+            await self.notify(run, status, data)
+        except Exception as e:
+            logger.warning(f"Failed to notify client {run.sid} of run status: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current scheduler state"""
+        return {
+            "running": self.running_count,
+            "queued": self.queued_count,
+            "maxConcurrent": self.max_concurrent,
+            "maxQueued": self.max_queued,
+            "cancelled": {
+                reason: metrics.get(f"chat_runs_cancelled_{reason}")
+                for reason in ("disconnect", "superseded", "cancelled")
+            },
+        }
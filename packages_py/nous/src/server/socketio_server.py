@@ -11,6 +11,14 @@ import socketio
 from typing import Dict, Any, Optional
 import time
 
+from src.config import (
+    NOUS_MAX_CONCURRENT_RUNS,
+    NOUS_MAX_QUEUED_RUNS,
+    NOUS_MAX_QUEUED_RUNS_PER_USER,
+)
+from src.utils.metrics import metrics
+from .chat_scheduler import ChatScheduler, ChatRun, QueueFullError
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +37,15 @@ class NOUSSocketIOServer:
         # Message handler registry
         self.message_handlers: Dict[str, Any] = {}
 
+        # Admission control for agent runs
+        self.chat_scheduler = ChatScheduler(
+            max_concurrent=NOUS_MAX_CONCURRENT_RUNS,
+            max_queued=NOUS_MAX_QUEUED_RUNS,
+            max_queued_per_user=NOUS_MAX_QUEUED_RUNS_PER_USER,
+            notify=self.send_run_status,
+        )
+        metrics.register_provider("chat_scheduler", self.chat_scheduler.get_stats)
+
         # Register event handlers
         self.sio.on("connect", self.handle_connect)
         self.sio.on("disconnect", self.handle_disconnect)
@@ -38,6 +55,7 @@ class NOUSSocketIOServer:
         self.sio.on("ping", self.handle_ping_direct)
         self.sio.on("process-chat-input", self.handle_process_chat_input_direct)
         self.sio.on("generate-response", self.handle_generate_response_direct)
+        self.sio.on("get-metrics", self.handle_get_metrics_direct)
 
         # Register standard handlers for backwards compatibility
         # self.register_handler('ping', self.handle_ping)
@@ -73,6 +91,17 @@ class NOUSSocketIOServer:
             del self.connected_clients[sid]
         logger.info(f"Client disconnected: {sid}")
 
+        # Nobody is left to read the answers of this client's runs
+        cancelled = await self.chat_scheduler.cancel_client(sid, reason="disconnect")
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} chat run(s) for disconnected client {sid}")
+
+        # Drop the state of the sessions no other client has used
+        closed = self.chat_scheduler.forget_client(sid)
+        if closed and hasattr(self, "_session_closed_handler"):
+            for session_id in closed:
+                self._session_closed_handler(session_id)
+
     async def handle_message(self, sid: str, data: Dict[str, Any]):
         """Handle incoming messages"""
         print("HANDLE THE MESSAGE", sid, data)
@@ -148,18 +177,39 @@ class NOUSSocketIOServer:
         try:
             # Use the async NOUS user input handler if available
             if hasattr(self, "_nous_user_input_handler"):
-                # Call the async handler - this will send the final answer via send_final_answer()
-                await self._nous_user_input_handler(
-                    user_id, context.get("environmentId", 1), message, sid
-                )
+                env_id = context.get("environmentId", 1)
+                session_id = payload.get("sessionId") or f"{user_id}:{env_id}"
+
+                # Queue the run - the handler sends the final answer via send_final_answer()
+                try:
+                    run = await self.chat_scheduler.submit(
+                        session_id,
+                        user_id,
+                        sid,
+                        lambda: self._nous_user_input_handler(
+                            user_id, env_id, message, sid, session_id=session_id
+                        ),
+                    )
+                except QueueFullError as e:
+                    await self.send_error_message(sid, str(e))
+                    return {
+                        "response": str(e),
+                        "metadata": {
+                            "user_id": user_id,
+                            "processed_at": asyncio.get_event_loop().time(),
+                            "status": "rejected",
+                        },
+                    }
 
                 # Return simple processing acknowledgment
                 return {
                     "response": "Processing your request...",
                     "metadata": {
                         "user_id": user_id,
+                        "run_id": run.run_id,
                         "processed_at": asyncio.get_event_loop().time(),
-                        "status": "processing",
+                        "status": "processing" if run.status == "running" else "queued",
+                        "position": run.position,
                     },
                 }
             else:
@@ -190,6 +240,10 @@ class NOUSSocketIOServer:
                 },
             }
 
+    async def handle_get_metrics(self, payload: Dict[str, Any], sid: str) -> Dict[str, Any]:
+        """Handle metrics requests"""
+        return {"metrics": metrics.snapshot(), "timestamp": asyncio.get_event_loop().time()}
+
     async def handle_generate_response(
         self, payload: Dict[str, Any], sid: str
     ) -> Dict[str, Any]:
@@ -247,6 +301,14 @@ class NOUSSocketIOServer:
                 "timestamp": asyncio.get_event_loop().time(),
             }
 
+    async def handle_get_metrics_direct(self, sid: str, data=None):
+        """Handle direct get-metrics events with acknowledgment"""
+        try:
+            return await self.handle_get_metrics(data or {}, sid)
+        except Exception as e:
+            logger.error(f"Error handling direct get-metrics: {e}")
+            return {"error": str(e)}
+
     async def handle_generate_response_direct(self, sid: str, data):
         """Handle direct generate-response events with acknowledgment"""
         logger.debug(f"Direct generate-response from {sid}: {data}")
@@ -293,6 +355,10 @@ class NOUSSocketIOServer:
         self._nous_user_input_handler = handler
         logger.info("NOUS user input handler registered with Socket.IO server")
 
+    def set_session_closed_handler(self, handler):
+        """Set the handler called with each session left without clients"""
+        self._session_closed_handler = handler
+
     async def send_final_answer(self, client_id: str, answer: str):
         """Send final answer to client"""
         await self.send_to_client(
@@ -305,6 +371,19 @@ class NOUSSocketIOServer:
         )
         logger.info(f"Sent final answer to client {client_id}")
 
+    async def send_run_status(self, run: ChatRun, status: str, data: Dict[str, Any]):
+        """Send queue/processing status of a chat run to its client"""
+        await self.send_to_client(
+            run.sid,
+            f"nous.chat/{status}",
+            {
+                "runId": run.run_id,
+                "sessionId": run.session_id,
+                **data,
+                "timestamp": int(asyncio.get_event_loop().time() * 1000),
+            },
+        )
+
     async def send_error_message(self, client_id: str, error: str):
         """Send error message to client"""
         await self.send_to_client(
@@ -1,7 +1,10 @@
 """Utility modules for NOUS service"""
 
 from .event_emitter import EventEmitter
+from .metrics import Metrics, metrics
 
 __all__ = [
-    'EventEmitter'
+    'EventEmitter',
+    'Metrics',
+    'metrics'
 ]
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+Process-wide metrics registry for NOUS.
+
+Counters are incremented by the components that own them; live gauges are
+exposed by registering a provider callable that returns a dict snapshot.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    def __init__(self):
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def increment(self, name: str, value: int = 1):
+        """Increment a named counter"""
+        self._counters[name] += value
+
+    def get(self, name: str) -> int:
+        """Current value of a named counter"""
+        return self._counters.get(name, 0)
+
+    def register_provider(self, name: str, provider: Callable[[], Dict[str, Any]]):
+        """Register a callable whose result is included in snapshots under `name`"""
+        self._providers[name] = provider
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus the current output of every registered provider"""
+        result: Dict[str, Any] = {"counters": dict(self._counters)}
+        for name, provider in self._providers.items():
+            try:
+                result[name] = provider()
+            except Exception as e:
+                logger.warning(f"Metrics provider '{name}' failed: {e}")
+                result[name] = {"error": str(e)}
+        return result
+
+    def reset(self):
+        """Reset all counters (providers are kept)"""
+        self._counters.clear()
+
+
+# Global metrics instance
+metrics = Metrics()
@@ -236,6 +236,29 @@ def suppress_logs():
     logging.getLogger("websockets").setLevel(logging.WARNING)
 
 
+# Fact records
+RELATION_NAMES = {1146: 'is a specialization of', 1225: 'is classified as a', 1190: 'is a part of'}
+
+
+def fact(fact_uid, lh=10, rh=20, rel=1146, rel_name=None, lh_name=None, rh_name=None, **extra) -> Dict[str, Any]:
+    """
+    A fact as Aperture sends it: `lh` related to `rh` by `rel`.
+
+    Entities are named "entity <uid>" and the relation after its type unless
+    names are given; `extra` adds further fields.
+    """
+    return {
+        'fact_uid': fact_uid,
+        'lh_object_uid': lh,
+        'lh_object_name': lh_name or f"entity {lh}",
+        'rel_type_uid': rel,
+        'rel_type_name': rel_name or RELATION_NAMES.get(rel, f"relation {rel}"),
+        'rh_object_uid': rh,
+        'rh_object_name': rh_name or f"entity {rh}",
+        **extra,
+    }
+
+
 # Async test utilities
 class AsyncTestUtils:
     """Utility class for async testing helpers."""
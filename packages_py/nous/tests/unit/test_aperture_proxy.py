@@ -0,0 +1,147 @@
+"""
+Unit tests for ApertureSocketIOProxy.
+
+Tests the Aperture proxy including:
+- Facts returned by lookups ingested into the semantic model
+- Facts already in the model skipped by fact_uid
+- Entity models loaded in the background, after the lookup returns
+- Lookups in another environment than the model's left out
+- Payloads without facts, errors and proxies without a model
+"""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from src.models.semantic_model import SemanticModel
+from src.proxies.aperture_proxy import ApertureSocketIOProxy
+from src.utils.metrics import metrics
+from tests.conftest import fact
+
+
+class FakeClient:
+    """Answers requests from a table of action -> response"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    async def send_request(self, action, payload):
+        self.requests.append((action, payload))
+        response = self.responses[action]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest_asyncio.fixture
+async def model(monkeypatch):
+    semantic_model = SemanticModel()
+    loaded = []
+
+    async def record_models(facts):
+        loaded.extend(f['fact_uid'] for f in facts)
+
+    monkeypatch.setattr(semantic_model, "loadModelsForFacts", record_models)
+    semantic_model.models_loaded_for = loaded
+    await semantic_model.addFacts([fact(1, 2, rh=1)])
+    loaded.clear()
+    return semantic_model
+
+
+@pytest.mark.unit
+class TestFactIngestion:
+    """Test that lookup results reach the semantic model."""
+
+    @pytest.mark.asyncio
+    async def test_lookup_facts_ingested(self, model):
+        """Test that new facts are added (with their models) and known ones skipped by fact_uid."""
+        metrics.reset()
+        client = FakeClient({"aperture.specialization/load": {"payload": {"facts": [
+            fact(1, 2, rh=99), fact(2, 3, rh=1), fact(3, 4, rh=3), fact(3, 4, rh=3),
+        ]}}})
+        proxy = ApertureSocketIOProxy(client, "7", "env-1", model, "env-1")
+        version = model.version
+
+        result = await proxy.loadSpecializationHierarchy(4)
+
+        assert len(result["facts"]) == 4
+        assert sorted(f['fact_uid'] for f in model.facts) == [1, 2, 3]
+        assert model.table.get(1)['rh_object_uid'] == 1
+        await proxy.wait_loading()
+        assert model.models_loaded_for == [2, 3]
+        assert model.version == version + 1
+        assert metrics.get("tool_facts_ingested") == 2
+        assert metrics.get("tool_facts_already_known") == 2
+
+        # Repeating the lookup changes nothing
+        await proxy.loadSpecializationHierarchy(4)
+        assert model.version == version + 1
+        assert model.taxonomy.supertypes(4) == [3]
+
+    @pytest.mark.asyncio
+    async def test_text_search_environment(self, model):
+        """Test that the environment returned by a text search is ingested too."""
+        client = FakeClient({"aperture.search/load-text": {"environment": {"facts": [fact(5, 6, rh=1)]}}})
+
+        await ApertureSocketIOProxy(client, "7", "env-1", model, "env-1").textSearchLoad("entity 6")
+
+        assert 5 in model.table
+
+    @pytest.mark.asyncio
+    async def test_models_loaded_in_background(self, model, monkeypatch):
+        """Test that a lookup returns before the models of its facts are fetched."""
+        release = asyncio.Event()
+        loaded = []
+
+        async def slow_models(facts):
+            await release.wait()
+            loaded.extend(f['fact_uid'] for f in facts)
+
+        monkeypatch.setattr(model, "loadModelsForFacts", slow_models)
+        client = FakeClient({"aperture.specialization/load": {"payload": {"facts": [fact(2, 3, rh=1)]}}})
+        proxy = ApertureSocketIOProxy(client, "7", "env-1", model, "env-1")
+
+        await asyncio.wait_for(proxy.loadSpecializationHierarchy(3), timeout=1)
+        assert 2 in model.table
+        assert loaded == []
+
+        release.set()
+        await proxy.wait_loading()
+        assert loaded == [2]
+
+    @pytest.mark.asyncio
+    async def test_other_environment_not_ingested(self, model):
+        """Test that lookups in an environment the model does not follow leave it unchanged."""
+        client = FakeClient({"aperture.specialization/load": {"payload": {"facts": [fact(2, 3, rh=1)]}}})
+        proxy = ApertureSocketIOProxy(client, "7", "env-2", model, "env-1")
+        version = model.version
+
+        result = await proxy.loadSpecializationHierarchy(3)
+
+        assert result["facts"][0]['fact_uid'] == 2
+        assert not proxy.ingests
+        assert 2 not in model.table
+        assert model.version == version
+
+    @pytest.mark.asyncio
+    async def test_nothing_to_ingest(self, model):
+        """Test errors, empty payloads, selections and proxies without a model."""
+        client = FakeClient({
+            "aperture.subtype/load": RuntimeError("down"),
+            "aperture.classification/load": None,
+            "aperture.entity/select": {"payload": {"facts": [fact(8, 9, rh=1)]}},
+            "aperture.facts/load-all-related": {"payload": {"facts": [fact(9, 10, rh=1)]}},
+        })
+        proxy = ApertureSocketIOProxy(client, "7", "env-1", model, "env-1")
+        version = model.version
+
+        assert await proxy.loadSubtypes(4) == {"error": "down"}
+        assert await proxy.loadClassified(4) == {"facts": []}
+        await proxy.selectEntity(9)
+        assert model.version == version
+
+        result = await ApertureSocketIOProxy(client, "7", "env-1").loadAllRelatedFacts(10)
+        assert result["facts"][0]['fact_uid'] == 9
+        assert 9 not in model.table
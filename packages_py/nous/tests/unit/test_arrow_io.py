@@ -0,0 +1,111 @@
+"""
+Unit tests for Arrow IPC export and import.
+
+Tests the Arrow files including:
+- Round trips of facts, models and the selected entity
+- Memory-mapped, typed columns for analysis without Python records
+- Uncommon fact keys and nested model fields
+- Replacing the contents of a model already in use
+- UID columns kept as integers when values are mixed
+"""
+
+import pytest
+import pytest_asyncio
+
+pa = pytest.importorskip("pyarrow")
+
+from src.models import arrow_io
+from src.models.records import Fact, Model
+from src.models.semantic_model import SemanticModel
+from tests.conftest import fact
+
+
+MODEL = {
+    'uid': 10, 'name': 'pump', 'type': 'kind', 'category': 'physical object',
+    'definition': [{'fact_uid': 7, 'full_definition': 'a machine that moves fluid'}],
+    'facts': [7], 'icon': 'pump.svg',
+}
+
+
+@pytest_asyncio.fixture
+async def model(monkeypatch):
+    semantic_model = SemanticModel()
+
+    async def no_models(facts):
+        return None
+
+    monkeypatch.setattr(semantic_model, "loadModelsForFacts", no_models)
+    await semantic_model.addFacts([
+        fact(7, 10, 20, full_definition='a machine that moves fluid', author='Relica'),
+        fact(3, 20, 730000, status='draft'),
+        fact(5, 30, 10, rel=1225, rel_name='is classified as a'),
+    ])
+    semantic_model.addModel(MODEL)
+    semantic_model.selected_entity = 10
+    return semantic_model
+
+
+@pytest.mark.unit
+class TestArrowIO:
+    """Test exporting and importing the semantic model."""
+
+    def test_round_trip(self, model, tmp_path):
+        """Test that a loaded export has the same facts, models, selection and indexes."""
+        written = arrow_io.export(model, tmp_path / "env")
+        loaded = SemanticModel()
+
+        metadata = arrow_io.load(loaded, tmp_path / "env")
+
+        assert metadata == {'format': 1, 'version': model.version, 'selected_entity': 10}
+        assert written['version'] == model.version and written['facts.arrow'] > 0
+        assert list(loaded.facts) == list(model.facts)
+        assert all(isinstance(f, Fact) for f in loaded.facts)
+        assert loaded.facts[1]['status'] == 'draft'
+        assert loaded.models[10] == model.models[10]
+        assert isinstance(loaded.models[10], Model)
+        assert loaded.selected_entity == 10
+        assert loaded.table.neighbors(10) == [20, 30]
+        assert loaded.names.exact('pump') == [10]
+
+    def test_columns_for_analysis(self, model, tmp_path):
+        """Test that the facts file reads back as typed, memory-mapped columns."""
+        arrow_io.export(model, tmp_path / "env")
+
+        facts = arrow_io.read_facts(tmp_path / "env")
+
+        assert facts.num_rows == 3
+        assert facts.column('fact_uid').type == pa.int64()
+        assert pa.types.is_dictionary(facts.column('rel_type_name').type)
+        assert facts.column('rh_object_uid').to_pylist() == [20, 730000, 10]
+        assert arrow_io.read_models(tmp_path / "env").column('name').to_pylist() == ['pump']
+
+    def test_numeric_string_uids_stay_integers(self):
+        """Test that UIDs sent as numeric strings are stored as int64 with the rest of the column."""
+        table = arrow_io.facts_table([fact(1, 10, 20), fact(2, "30", 20)])
+
+        assert table.column('lh_object_uid').type == pa.int64()
+        assert table.column('lh_object_uid').to_pylist() == [10, 30]
+
+    def test_non_integer_uid_is_rejected(self):
+        """Test that a UID that is not an integer raises instead of turning the column into text."""
+        with pytest.raises(ValueError, match="lh_object_uid"):
+            arrow_io.facts_table([fact(1, 10, 20), fact(2, "pump", 20)])
+
+    @pytest.mark.asyncio
+    async def test_load_replaces_contents(self, model, tmp_path):
+        """Test that loading into a model in use replaces what it held and bumps its version."""
+        arrow_io.export(model, tmp_path / "env")
+        target = SemanticModel()
+
+        async def no_models(facts):
+            return None
+
+        target.loadModelsForFacts = no_models
+        await target.addFacts([fact(99, 1, 2)])
+        version = target.version
+
+        arrow_io.load(target, tmp_path / "env")
+
+        assert sorted(f['fact_uid'] for f in target.facts) == [3, 5, 7]
+        assert not target.hasFactInvolvingUID(1)
+        assert target.version > version
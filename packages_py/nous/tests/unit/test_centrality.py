@@ -0,0 +1,166 @@
+"""
+Unit tests for graph centrality and relevance ranking.
+
+Tests the centrality index including:
+- PageRank against a dense reference, and degree centrality
+- Recomputing after changes, warm-started from the previous scores
+- Hop distances and relevance to a selected entity
+- Ordering entities for the prompt context and the ontology metadata
+- Cutting large neighbourhoods down to the most relevant entities
+- Ordering fact rows by the relevance of their entities
+"""
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from src.models.centrality import CentralityIndex, pagerank
+from src.models.fact_table import FactTable
+from src.models.semantic_model import SemanticModel
+from tests.conftest import fact
+
+
+# A taxonomy under 1, a chain 10 -> 11 -> 12 -> 13 and a part 20 of 10
+FACTS = [
+    fact(1, 2, 1), fact(2, 3, 1), fact(3, 4, 1), fact(4, 5, 2),
+    fact(5, 10, 11), fact(6, 11, 12), fact(7, 12, 13),
+    fact(8, 20, 10, rel=1190, rel_name='is a part of'),
+]
+
+
+def dense_pagerank(size, sources, targets, damping=0.85):
+    matrix = np.zeros((size, size))
+    for s, t in zip(sources, targets):
+        matrix[t, s] += 1
+    out = matrix.sum(axis=0)
+    matrix[:, out == 0] = 1.0 / size
+    matrix[:, out > 0] /= out[out > 0]
+    rank = np.full(size, 1.0 / size)
+    for _ in range(500):
+        rank = damping * matrix @ rank + (1 - damping) / size
+    return rank
+
+
+@pytest.fixture
+def table():
+    facts = FactTable()
+    facts.add(FACTS)
+    return facts
+
+
+@pytest_asyncio.fixture
+async def model(monkeypatch):
+    semantic_model = SemanticModel()
+
+    async def no_models(facts):
+        return None
+
+    monkeypatch.setattr(semantic_model, "loadModelsForFacts", no_models)
+    await semantic_model.addFacts(FACTS)
+    return semantic_model
+
+
+@pytest.mark.unit
+class TestScores:
+    """Test PageRank and degree centrality."""
+
+    def test_pagerank_matches_dense_reference(self, table):
+        """Test the edge-list PageRank against dense power iteration, with dangling entities."""
+        nodes, sources, targets = table.edges()
+        rank, iterations = pagerank(len(nodes), sources, targets)
+
+        assert rank.sum() == pytest.approx(1.0)
+        assert rank == pytest.approx(dense_pagerank(len(nodes), sources, targets), abs=1e-6)
+        assert iterations < 100
+
+    def test_scores(self, table):
+        """Test that the root of the taxonomy ranks highest and degrees match the table."""
+        scores = CentralityIndex().scores(table)
+        by_uid = dict(zip(scores.nodes.tolist(), scores.centrality.tolist()))
+
+        assert max(by_uid, key=by_uid.get) == 1
+        assert dict(zip(scores.nodes.tolist(), scores.degree.tolist())) == table.degrees()
+
+    def test_recomputed_after_changes(self, table):
+        """Test that scores are cached until the facts change, then warm-started."""
+        index = CentralityIndex()
+        first = index.scores(table)
+        assert index.scores(table) is first
+
+        table.add([fact(9, 6, 1)])
+        second = index.scores(table)
+
+        assert second is not first
+        assert 6 in second.nodes.tolist()
+        assert second.iterations < first.iterations
+        cold = CentralityIndex().scores(table)
+        assert second.pagerank == pytest.approx(cold.pagerank, abs=1e-6)
+
+
+@pytest.mark.unit
+class TestRelevance:
+    """Test distances and relevance to a selected entity."""
+
+    def test_distances(self, table):
+        """Test hops from the seed, following facts either way, up to the limit."""
+        index = CentralityIndex()
+        nodes = index.scores(table).nodes.tolist()
+        distance = dict(zip(nodes, index.distances(table, [11], hops=2).tolist()))
+
+        assert distance[11] == 0
+        assert distance[10] == distance[12] == 1
+        assert distance[20] == distance[13] == 2
+        assert distance[1] == -1
+
+    def test_ranked(self, table):
+        """Test the selected entity first, near entities before far ones, and candidates."""
+        index = CentralityIndex()
+
+        ranked = index.ranked(table, selected=13)
+
+        assert ranked[:2] == [13, 12]
+        assert ranked.index(11) < ranked.index(20)
+        assert index.ranked(table)[0] == 1
+        # The root of the taxonomy is far away but central enough to beat a weakly connected neighbour
+        assert index.ranked(table, selected=13, limit=3, candidates=[1, 11, 20, 99]) == [1, 11, 20]
+
+
+@pytest.mark.unit
+class TestSemanticModelRanking:
+    """Test ranking in the semantic model's context rendering."""
+
+    @pytest.mark.asyncio
+    async def test_entities_and_metadata(self, model):
+        """Test that entities render by relevance and the metadata lists the central ones."""
+        model.addModels([{'uid': uid, 'name': f"entity {uid}", 'nature': 'kind'} for uid in (20, 1, 13, 77)])
+        model.selected_entity = 13
+
+        rendered = model.format_entities()
+        assert [entity.split('\n')[0] for entity in rendered] == [
+            '[ENTITY: 13]', '[ENTITY: 1]', '[ENTITY: 20]', '[ENTITY: 77]',
+        ]
+        assert len(model.format_entities(limit=2)) == 2
+        assert "CENTRAL ENTITIES: entity 1 (1), " in model.generate_ontology_metadata()
+
+    @pytest.mark.asyncio
+    async def test_neighborhood_keeps_most_relevant(self, model):
+        """Test that a capped neighbourhood keeps the entity and its most relevant neighbours."""
+        await model.addFacts([fact(100 + i, 30 + i, 1) for i in range(5)])
+
+        text = model.format_neighborhood(2, hops=1, max_nodes=3)
+
+        assert text.splitlines() == [
+            "- entity 2(2) -> is a specialization of -> entity 1(1)",
+            "- entity 5(5) -> is a specialization of -> entity 2(2)",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_relevant_rows(self, model):
+        """Test that facts about the entities nearest the selection come first, ties in table order."""
+        rows = model.relevant_rows(13)
+        facts = [f['fact_uid'] for f in model.table.facts(rows)]
+
+        assert facts[:2] == [7, 6]
+        assert sorted(facts) == [1, 2, 3, 4, 5, 6, 7, 8]
+        subset = model.neighborhood_rows(11, hops=1)
+        assert sorted(model.relevant_rows(13, subset).tolist()) == sorted(subset.tolist())
@@ -0,0 +1,296 @@
+"""
+Unit tests for ChatScheduler.
+
+Tests admission control for agent runs including:
+- Per-session serialization
+- Global concurrency limit
+- Bounded queue and per-user caps
+- Round-robin fairness across users
+- Queue position notifications
+- Cancellation on disconnect and superseding messages
+- Sessions left without clients on disconnect
+"""
+
+import asyncio
+
+import pytest
+
+from src.server.chat_scheduler import ChatScheduler, QueueFullError
+from src.utils.metrics import metrics
+
+
+def make_job(log, name, gate=None):
+    async def job():
+        log.append(("start", name))
+        if gate is not None:
+            await gate.wait()
+        log.append(("end", name))
+    return job
+
+
+@pytest.mark.unit
+class TestChatScheduler:
+    """Test ChatScheduler admission and ordering."""
+
+    @pytest.mark.asyncio
+    async def test_runs_in_same_session_are_serialized(self):
+        """Test that a second run for a session waits for the first."""
+        scheduler = ChatScheduler(max_concurrent=4, supersede=False)
+        log = []
+        gate = asyncio.Event()
+
+        first = await scheduler.submit("s1", "u1", "sid1", make_job(log, "a", gate))
+        second = await scheduler.submit("s1", "u1", "sid1", make_job(log, "b"))
+        await asyncio.sleep(0)
+
+        assert first.status == "running"
+        assert second.status == "queued"
+        assert second.position == 1
+
+        gate.set()
+        await first.wait()
+        await second.wait()
+        assert log == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")]
+
+    @pytest.mark.asyncio
+    async def test_global_concurrency_limit(self):
+        """Test that no more than max_concurrent runs execute at once."""
+        scheduler = ChatScheduler(max_concurrent=2)
+        gate = asyncio.Event()
+        log = []
+
+        runs = [
+            await scheduler.submit(f"s{i}", f"u{i}", f"sid{i}", make_job(log, i, gate))
+            for i in range(4)
+        ]
+        await asyncio.sleep(0)
+
+        assert scheduler.running_count == 2
+        assert scheduler.queued_count == 2
+        assert [r.status for r in runs] == ["running", "running", "queued", "queued"]
+
+        gate.set()
+        await asyncio.gather(*[r.wait() for r in runs])
+        assert scheduler.running_count == 0
+        assert scheduler.queued_count == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_is_bounded(self):
+        """Test that submissions beyond the queue limits are rejected."""
+        scheduler = ChatScheduler(max_concurrent=1, max_queued=2, max_queued_per_user=1)
+        gate = asyncio.Event()
+
+        await scheduler.submit("s0", "u0", "sid0", make_job([], 0, gate))
+        await scheduler.submit("s1", "u1", "sid1", make_job([], 1))
+
+        with pytest.raises(QueueFullError):
+            await scheduler.submit("s1b", "u1", "sid1", make_job([], 2))
+
+        await scheduler.submit("s2", "u2", "sid2", make_job([], 3))
+        with pytest.raises(QueueFullError):
+            await scheduler.submit("s3", "u3", "sid3", make_job([], 4))
+        gate.set()
+
+    @pytest.mark.asyncio
+    async def test_round_robin_across_users(self):
+        """Test that a user with many queued runs cannot starve another user."""
+        scheduler = ChatScheduler(max_concurrent=1, max_queued_per_user=8)
+        gate = asyncio.Event()
+        log = []
+
+        blocker = await scheduler.submit("s0", "u0", "sid0", make_job(log, "blocker", gate))
+        heavy = [
+            await scheduler.submit(f"heavy{i}", "heavy", "sidh", make_job(log, f"heavy{i}"))
+            for i in range(3)
+        ]
+        light = await scheduler.submit("light", "light", "sidl", make_job(log, "light"))
+
+        assert [r.session_id for r in scheduler.queued_runs()] == [
+            "heavy0", "light", "heavy1", "heavy2"
+        ]
+        assert light.position == 2
+
+        gate.set()
+        for run in [blocker, *heavy, light]:
+            await run.wait()
+        starts = [name for event, name in log if event == "start"]
+        assert starts == ["blocker", "heavy0", "light", "heavy1", "heavy2"]
+
+    @pytest.mark.asyncio
+    async def test_position_notifications(self):
+        """Test that queued clients are notified of their position."""
+        events = []
+
+        async def notify(run, status, data):
+            events.append((run.session_id, status, data.get("position")))
+
+        scheduler = ChatScheduler(max_concurrent=1, notify=notify)
+        gate = asyncio.Event()
+
+        first = await scheduler.submit("s1", "u1", "sid1", make_job([], 1, gate))
+        second = await scheduler.submit("s2", "u2", "sid2", make_job([], 2))
+        await asyncio.sleep(0)
+
+        assert ("s2", "queued", 1) in events
+        assert ("s1", "processing", None) in events
+
+        gate.set()
+        await first.wait()
+        await second.wait()
+        assert ("s2", "processing", None) in events
+
+    @pytest.mark.asyncio
+    async def test_failed_run_releases_slot(self):
+        """Test that a failing job does not block the session."""
+        scheduler = ChatScheduler(max_concurrent=1, supersede=False)
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        failed = await scheduler.submit("s1", "u1", "sid1", failing)
+        follow_up = await scheduler.submit("s1", "u1", "sid1", make_job([], "ok"))
+        await failed.wait()
+        await follow_up.wait()
+
+        assert failed.status == "failed"
+        assert follow_up.status == "completed"
+
+
+@pytest.mark.unit
+class TestChatSchedulerCancellation:
+    """Test cooperative cancellation of chat runs."""
+
+    @pytest.fixture(autouse=True)
+    def reset_metrics(self):
+        metrics.reset()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_running_and_queued_runs(self):
+        """Test that a disconnect cancels every run of that client."""
+        scheduler = ChatScheduler(max_concurrent=1, supersede=False)
+        gate = asyncio.Event()
+        log = []
+
+        running = await scheduler.submit("s1", "u1", "sid1", make_job(log, "a", gate))
+        queued = await scheduler.submit("s2", "u1", "sid1", make_job(log, "b"))
+        other = await scheduler.submit("s3", "u2", "sid2", make_job(log, "c"))
+        await asyncio.sleep(0)
+
+        cancelled = await scheduler.cancel_client("sid1")
+        await running.wait()
+        await other.wait()
+
+        assert cancelled == 2
+        assert running.status == "cancelled"
+        assert queued.status == "cancelled"
+        assert other.status == "completed"
+        assert ("end", "a") not in log
+        assert ("start", "b") not in log
+        assert metrics.get("chat_runs_cancelled_disconnect") == 2
+
+    @pytest.mark.asyncio
+    async def test_forget_client_returns_unused_sessions(self):
+        """Test that a disconnected client's sessions are released unless another client uses them."""
+        scheduler = ChatScheduler(max_concurrent=4, supersede=False)
+        log = []
+
+        await scheduler.submit("s1", "u1", "sid1", make_job(log, "a"))
+        await scheduler.submit("s2", "u1", "sid1", make_job(log, "b"))
+        await scheduler.submit("s2", "u1", "sid2", make_job(log, "c"))
+
+        assert scheduler.forget_client("sid1") == ["s1"]
+        assert scheduler.forget_client("sid1") == []
+        assert scheduler.forget_client("sid2") == ["s2"]
+
+    @pytest.mark.asyncio
+    async def test_new_message_supersedes_running_run(self):
+        """Test that a new message in a session cancels the in-flight run."""
+        scheduler = ChatScheduler(max_concurrent=2)
+        gate = asyncio.Event()
+        log = []
+
+        first = await scheduler.submit("s1", "u1", "sid1", make_job(log, "first", gate))
+        await asyncio.sleep(0)
+        second = await scheduler.submit("s1", "u1", "sid1", make_job(log, "second"))
+        await first.wait()
+        await second.wait()
+
+        assert first.status == "cancelled"
+        assert first.cancel_reason == "superseded"
+        assert second.status == "completed"
+        assert log == [("start", "first"), ("start", "second"), ("end", "second")]
+        assert scheduler.get_stats()["cancelled"]["superseded"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_message_does_not_supersede(self):
+        """Test that a message rejected by the queue limits leaves the session's run going."""
+        scheduler = ChatScheduler(max_concurrent=1, max_queued=1)
+        gate = asyncio.Event()
+        log = []
+
+        first = await scheduler.submit("s1", "u1", "sid1", make_job(log, "first", gate))
+        await scheduler.submit("s2", "u2", "sid2", make_job(log, "other"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(QueueFullError):
+            await scheduler.submit("s1", "u1", "sid1", make_job(log, "second"))
+        assert first.status == "running"
+
+        gate.set()
+        await first.wait()
+        assert first.status == "completed"
+        assert scheduler.get_stats()["cancelled"]["superseded"] == 0
+
+    @pytest.mark.asyncio
+    async def test_superseded_queued_run_frees_its_place(self):
+        """Test that a new message may take the queue place of the queued run it supersedes."""
+        scheduler = ChatScheduler(max_concurrent=1, max_queued=1)
+        gate = asyncio.Event()
+        log = []
+
+        await scheduler.submit("s0", "u0", "sid0", make_job(log, "blocker", gate))
+        queued = await scheduler.submit("s1", "u1", "sid1", make_job(log, "first"))
+        second = await scheduler.submit("s1", "u1", "sid1", make_job(log, "second"))
+
+        assert queued.status == "cancelled"
+        assert second.status == "queued"
+        assert scheduler.queued_count == 1
+        gate.set()
+        await second.wait()
+        assert ("start", "first") not in log
+
+    @pytest.mark.asyncio
+    async def test_cancellation_propagates_into_awaited_calls(self):
+        """Test that awaited work inside a run (e.g. a tool call) is cancelled too."""
+        scheduler = ChatScheduler(max_concurrent=1)
+        tool_cancelled = asyncio.Event()
+
+        async def tool_call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                tool_cancelled.set()
+                raise
+
+        async def job():
+            await tool_call()
+
+        run = await scheduler.submit("s1", "u1", "sid1", job)
+        await asyncio.sleep(0.01)
+        await scheduler.cancel_session("s1")
+        await run.wait()
+
+        assert tool_cancelled.is_set()
+        assert scheduler.running_count == 0
+
+    @pytest.mark.asyncio
+    async def test_cancel_before_start_releases_session(self):
+        """Test that a run cancelled before its task started still frees its session."""
+        scheduler = ChatScheduler(max_concurrent=1)
+
+        run = await scheduler.submit("s1", "u1", "sid1", make_job([], "a"))
+        await scheduler.cancel_session("s1")
+        await run.wait()
+
+        assert run.status == "cancelled"
+        assert scheduler.running_count == 0
@@ -0,0 +1,151 @@
+"""
+Unit tests for batched model retrieval from Clarity.
+
+Tests ClarityClient.retrieve_models including:
+- Splitting UIDs into chunks and capping concurrent requests
+- Sharing UIDs already in flight between callers
+- Delivering each chunk's models as it arrives
+- Failed chunks and cancelled callers
+- Loading the models for new facts into the semantic model
+"""
+
+import asyncio
+
+import pytest
+
+from src.clients.clarity import MODEL_GET_BATCH, ClarityClient
+from src.models.semantic_model import SemanticModel
+
+
+class FakeClarity(ClarityClient):
+    """ClarityClient answering get-batch requests locally"""
+
+    def __init__(self, batch_size=2, concurrency=2, fail=()):
+        super().__init__()
+        self.connected = True
+        self.model_batch_size = batch_size
+        self._model_requests = asyncio.Semaphore(concurrency)
+        self.fail = set(fail)
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def send_request(self, action, payload, timeout=30.0):
+        assert action == MODEL_GET_BATCH
+        self.requests.append(list(payload['uids']))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            await self.release.wait()
+        finally:
+            self.active -= 1
+        if self.fail & set(payload['uids']):
+            raise Exception("clarity error: boom")
+        return [{'uid': uid, 'name': f"entity {uid}", 'type': 'kind'} for uid in payload['uids']]
+
+
+@pytest.mark.unit
+class TestRetrieveModels:
+    """Test ClarityClient.retrieve_models."""
+
+    @pytest.mark.asyncio
+    async def test_chunks_and_concurrency_cap(self):
+        """Test that UIDs are chunked and at most `concurrency` chunks run at once."""
+        client = FakeClarity(batch_size=2, concurrency=2)
+
+        models = await client.retrieve_models([1, 2, 3, 4, 5, 5, None])
+
+        assert sorted(m['uid'] for m in models) == [1, 2, 3, 4, 5]
+        assert sorted(client.requests) == [[1, 2], [3, 4], [5]]
+        assert client.peak == 2
+        assert client._models_in_flight == {}
+
+    @pytest.mark.asyncio
+    async def test_in_flight_uids_are_shared(self):
+        """Test that a second caller waits for UIDs already being fetched."""
+        client = FakeClarity(batch_size=10)
+        client.release.clear()
+
+        first = asyncio.create_task(client.retrieve_models([1, 2, 3]))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(client.retrieve_models([2, 3, 4]))
+        await asyncio.sleep(0.02)
+        client.release.set()
+
+        assert sorted(m['uid'] for m in await first) == [1, 2, 3]
+        assert sorted(m['uid'] for m in await second) == [2, 3, 4]
+        assert client.requests == [[1, 2, 3], [4]]
+
+    @pytest.mark.asyncio
+    async def test_models_delivered_per_chunk(self):
+        """Test that on_models receives each chunk's models."""
+        client = FakeClarity(batch_size=2)
+        chunks = []
+
+        await client.retrieve_models([1, 2, 3], on_models=chunks.append)
+
+        assert sorted(len(chunk) for chunk in chunks) == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk(self):
+        """Test that a failed chunk is skipped and its UIDs can be retried."""
+        client = FakeClarity(batch_size=2, fail={3})
+
+        models = await client.retrieve_models([1, 2, 3, 4])
+
+        assert sorted(m['uid'] for m in models) == [1, 2]
+        assert client._models_in_flight == {}
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_releases_uids(self):
+        """Test that cancelling a caller frees its UIDs without cancelling other callers."""
+        client = FakeClarity(batch_size=10)
+        client.release.clear()
+
+        first = asyncio.create_task(client.retrieve_models([1, 2]))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(client.retrieve_models([2, 3]))
+        await asyncio.sleep(0.02)
+        waiting.cancel()
+        # Cancelled before its chunk tasks started
+        cancelled = asyncio.create_task(client.retrieve_models([5, 6]))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        client.release.set()
+
+        assert sorted(m['uid'] for m in await first) == [1, 2]
+        assert sorted(m['uid'] for m in await asyncio.wait_for(client.retrieve_models([5, 6]), 5)) == [5, 6]
+        assert client._models_in_flight == {}
+
+    @pytest.mark.asyncio
+    async def test_not_connected(self):
+        """Test that nothing is requested while disconnected."""
+        client = FakeClarity()
+        client.connected = False
+
+        assert await client.retrieve_models([1]) == []
+        assert client.requests == []
+
+
+@pytest.mark.unit
+class TestLoadModelsForFacts:
+    """Test SemanticModel.loadModelsForFacts against the batched client."""
+
+    @pytest.mark.asyncio
+    async def test_loads_missing_models(self, monkeypatch):
+        """Test that models for new entities are fetched and added once."""
+        client = FakeClarity(batch_size=2)
+        monkeypatch.setattr("src.clients.clarity.clarity_client", client)
+        model = SemanticModel()
+        fact = {'fact_uid': 1, 'lh_object_uid': 10, 'rel_type_uid': 1146, 'rh_object_uid': 20}
+
+        await model.addFacts([fact, {**fact, 'fact_uid': 2, 'lh_object_uid': 30}])
+        await model.addFacts([{**fact, 'fact_uid': 3}])
+
+        assert sorted(model.models) == [10, 20, 30]
+        assert sorted(uid for chunk in client.requests for uid in chunk) == [10, 20, 30]
@@ -0,0 +1,143 @@
+"""
+Unit tests for ClassificationIndex.
+
+Tests the incremental classification index including:
+- Classifier and instance lookups
+- Transitive instances through the specialization hierarchy
+- Environment vs learned facts
+- Local answers only for complete classifier and classified lists
+- Live ontology metadata counters in SemanticModel
+"""
+
+import pytest
+
+from src.models.classification_index import ClassificationIndex
+from src.models.semantic_model import SemanticModel
+from src.models.taxonomy_index import TaxonomyIndex
+from tests.conftest import fact
+
+
+# kinds: 10 <- 11 <- 12 ; individuals: 100 is a 10, 101 is a 11, 102 is a 12
+SPECIALIZATIONS = [fact(1, 11, 10), fact(2, 12, 11)]
+CLASSIFICATIONS = [fact(3, 100, 10, rel=1225), fact(4, 101, 11, rel=1225), fact(5, 102, 12, rel=1225)]
+
+
+@pytest.fixture
+def taxonomy():
+    index = TaxonomyIndex()
+    index.set_environment_facts(SPECIALIZATIONS)
+    return index
+
+
+@pytest.fixture
+def index():
+    classification = ClassificationIndex()
+    classification.add(SPECIALIZATIONS + CLASSIFICATIONS)
+    return classification
+
+
+@pytest.mark.unit
+class TestClassificationIndex:
+    """Test classification queries."""
+
+    def test_classifiers(self, index):
+        """Test direct classifiers of an individual."""
+        assert index.classifiers(101) == [11]
+        assert index.classifiers(999) == []
+
+    def test_transitive_instances(self, index, taxonomy):
+        """Test instances of a kind include those of its subtypes."""
+        assert index.instances_of(10, taxonomy) == {100, 101, 102}
+        assert index.instances_of(11, taxonomy) == {101, 102}
+        assert index.instances_of(12, taxonomy) == {102}
+
+    def test_is_instance_of(self, index, taxonomy):
+        """Test membership through supertypes."""
+        assert index.is_instance_of(102, 10, taxonomy)
+        assert not index.is_instance_of(100, 11, taxonomy)
+
+    def test_individual_count_is_incremental(self, index):
+        """Test that the individual count follows additions and removals."""
+        assert index.individual_count == 3
+
+        index.add([fact(6, 100, 11, rel=1225)])
+        assert index.individual_count == 3
+
+        index.remove([3, 6])
+        assert index.individual_count == 2
+        assert index.classifiers(100) == []
+
+    def test_replaced_fact_moves_between_kinds(self, index, taxonomy):
+        """Test that re-adding a fact uid reindexes it."""
+        index.add([fact(4, 101, 12, rel=1225)])
+
+        assert index.classifiers(101) == [12]
+        assert index.instances_of(12, taxonomy) == {101, 102}
+
+
+@pytest.mark.unit
+class TestLearnedClassifications:
+    """Test facts learned from lookups."""
+
+    def test_classified_only_local_when_complete(self, index):
+        """Test that a kind's instances require a complete lookup."""
+        assert index.classified_facts(11) is None
+
+        index.learn([fact(7, 103, 11, rel=1225)], classified_of=11)
+
+        assert {f['lh_object_uid'] for f in index.classified_facts(11)} == {101, 103}
+        assert index.classified_facts(11, environment_only=True) is None
+
+    def test_classifiers_only_local_when_complete(self, index):
+        """Test that an individual's classifiers require a complete lookup."""
+        assert index.classifier_facts(101) is None
+
+        index.learn([fact(8, 101, 10, rel=1225)], classifiers_of=101)
+
+        assert {f['rh_object_uid'] for f in index.classifier_facts(101)} == {10, 11}
+        assert index.classifier_facts(101, environment_only=True) is None
+
+    def test_learned_fact_survives_environment_removal(self, index):
+        """Test that a fact known from a lookup stays after it leaves the environment."""
+        index.learn([CLASSIFICATIONS[0]])
+        index.remove([3])
+
+        assert index.classifiers(100) == [10]
+        assert index.individual_count == 2
+
+
+@pytest.mark.unit
+class TestSemanticModelCounters:
+    """Test ontology metadata counters."""
+
+    def test_model_counters_are_live(self):
+        """Test that kind and individual counts follow model changes."""
+        model = SemanticModel()
+        model.addModels([
+            {'uid': 10, 'type': 'kind', 'category': 'physical object'},
+            {'uid': 100, 'type': 'individual', 'category': 'physical object'},
+        ])
+        model.addModel({'uid': 100, 'type': 'individual', 'category': 'aspect'})
+
+        metadata = model.generate_ontology_metadata()
+        assert "KINDS: 1" in metadata
+        assert "INDIVIDUALS: 1" in metadata
+
+        model.removeModel(10)
+        metadata = model.generate_ontology_metadata()
+        assert "KINDS: 0" in metadata
+        assert "ENTITY TYPES: aspect" in metadata
+
+    @pytest.mark.asyncio
+    async def test_instances_of_uses_taxonomy(self, monkeypatch):
+        """Test transitive instances through the model's own indexes."""
+        model = SemanticModel()
+
+        async def no_models(facts):
+            return None
+
+        monkeypatch.setattr(model, "loadModelsForFacts", no_models)
+        await model.addFacts(SPECIALIZATIONS + CLASSIFICATIONS)
+
+        assert model.instances_of(11) == {101, 102}
+        assert "CLASSIFIED INDIVIDUALS: 3" in model.generate_ontology_metadata()
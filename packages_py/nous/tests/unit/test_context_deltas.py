@@ -0,0 +1,111 @@
+"""
+Unit tests for environment context deltas.
+
+Tests delta-mode agent context including:
+- The first turn sending the whole environment as the base
+- Later turns adding only the changes since the previous turn
+- Turns without changes leaving the history untouched
+- Rebasing after too many changes, or when the selection moves
+"""
+
+import pytest
+import pytest_asyncio
+
+from src.agent.context_deltas import EnvironmentDeltas
+from src.models.semantic_model import SemanticModel
+from tests.conftest import fact
+
+
+@pytest_asyncio.fixture
+async def model(monkeypatch):
+    semantic_model = SemanticModel()
+
+    async def no_models(facts):
+        return None
+
+    monkeypatch.setattr(semantic_model, "loadModelsForFacts", no_models)
+    await semantic_model.addFacts([fact(uid, uid, rh=1) for uid in range(2, 12)])
+    return semantic_model
+
+
+def render(model):
+    return lambda selected: model.format_relationships()
+
+
+def run_turn(deltas, model, messages, text, **options):
+    """One completed turn: the user's message, the context for it, then the answer"""
+    messages.append({"role": "user", "content": text})
+    turn = deltas.prepare(model, model.snapshot(), messages, render(model), "2025-01-01 12:00", **options)
+    deltas.commit(turn, messages)
+    messages.append({"role": "assistant", "content": "ok"})
+    return turn
+
+
+@pytest.mark.unit
+class TestEnvironmentDeltas:
+    """Test the base context and per-turn changes."""
+
+    @pytest.mark.asyncio
+    async def test_base_then_changes(self, model):
+        """Test that the base stays put and only the latest changes are added."""
+        deltas, messages = EnvironmentDeltas(), []
+
+        first = run_turn(deltas, model, messages, "hello")
+        assert first.rebased and first.delta is None
+        assert "entity 9(9)" in first.environment
+
+        await model.addFacts([fact(100, 100, rh=1)])
+        await model.removeFacts([3])
+        second = run_turn(deltas, model, messages, "what changed?")
+
+        assert second.environment is first.environment and not second.rebased
+        assert second.messages[-2] is second.delta
+        content = second.delta["content"]
+        assert "Added:\n- entity 100(100) -> is a specialization of -> entity 1(1)" in content
+        assert "Removed:\n- entity 3(3)" in content
+        assert "entity 9(9)" not in content
+        assert [m["content"] for m in messages][:2] == ["hello", "ok"]
+        assert messages[2] is second.delta and messages[3]["content"] == "what changed?"
+        assert deltas.changes == 2
+
+    @pytest.mark.asyncio
+    async def test_no_changes(self, model):
+        """Test that a turn without changes adds nothing to the history."""
+        deltas, messages = EnvironmentDeltas(), []
+        run_turn(deltas, model, messages, "hello")
+
+        turn = run_turn(deltas, model, messages, "again")
+
+        assert turn.delta is None
+        assert [m["content"] for m in messages] == ["hello", "ok", "again", "ok"]
+
+    @pytest.mark.asyncio
+    async def test_selection_change(self, model):
+        """Test that a new selection is reported, or rebases when following the selection."""
+        deltas, messages = EnvironmentDeltas(), []
+        run_turn(deltas, model, messages, "hello")
+
+        model.selected_entity = 4
+        turn = run_turn(deltas, model, messages, "this one")
+        assert "Selected Entity: 4" in turn.delta["content"]
+        assert turn.selected_entity is None
+
+        model.selected_entity = 5
+        turn = run_turn(deltas, model, messages, "that one", follow_selection=True)
+        assert turn.rebased and turn.selected_entity == 5
+
+    @pytest.mark.asyncio
+    async def test_rebase_after_too_many_changes(self, model):
+        """Test that the accumulated changes are folded into a new base and dropped from the history."""
+        deltas, messages = EnvironmentDeltas(max_changes=3), []
+        run_turn(deltas, model, messages, "hello")
+        await model.addFacts([fact(100, 100, rh=1), fact(101, 101, rh=1)])
+        run_turn(deltas, model, messages, "two")
+        assert len(messages) == 5
+
+        await model.addFacts([fact(102, 102, rh=1), fact(103, 103, rh=1)])
+        turn = run_turn(deltas, model, messages, "four")
+
+        assert turn.rebased and "entity 103(103)" in turn.environment
+        assert [m["content"] for m in messages] == ["hello", "ok", "two", "ok", "four", "ok"]
+        assert deltas.changes == 0
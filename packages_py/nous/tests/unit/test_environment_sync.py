@@ -0,0 +1,165 @@
+"""
+Unit tests for EnvironmentSync.
+
+Tests event-driven environment sync including:
+- Initial full sync and reconciliation on resync
+- Incremental fact and selection events
+- Sequence gap detection with fallback to a full resync
+- Events for other environments and stale sequence numbers
+- Entity models loaded in the background, outside the sync lock
+"""
+
+import asyncio
+
+import pytest
+
+from src.models.environment_sync import EnvironmentSync
+from src.models.semantic_model import SemanticModel
+from tests.conftest import fact
+
+
+class FakeApertureClient:
+    """Serves a fixed environment and records subscriptions"""
+
+    def __init__(self, env):
+        self.env = env
+        self.handlers = {}
+        self.reconnect_handlers = []
+        self.requests = 0
+
+    async def retrieve_environment(self, environment_id, user_id=None):
+        self.requests += 1
+        return self.env
+
+    def on_facts_loaded(self, handler):
+        self.handlers['loaded'] = handler
+
+    def on_facts_unloaded(self, handler):
+        self.handlers['unloaded'] = handler
+
+    def on_entity_selected(self, handler):
+        self.handlers['selected'] = handler
+
+    def on_entity_deselected(self, handler):
+        self.handlers['deselected'] = handler
+
+    def on_reconnect(self, handler):
+        self.reconnect_handlers.append(handler)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    semantic_model = SemanticModel()
+
+    async def no_models(facts):
+        return None
+
+    monkeypatch.setattr(semantic_model, "loadModelsForFacts", no_models)
+    return semantic_model
+
+
+def fact_uids(model):
+    return [f['fact_uid'] for f in model.facts]
+
+
+@pytest.mark.unit
+class TestEnvironmentSync:
+    """Test applying Aperture events to the model."""
+
+    @pytest.mark.asyncio
+    async def test_start_loads_environment(self, model):
+        """Test the initial full sync and subscriptions."""
+        client = FakeApertureClient({'facts': [fact(1), fact(2)], 'selected_entity_id': 10, 'seq': 5})
+        sync = EnvironmentSync(client, model, 7)
+
+        await sync.start()
+
+        assert fact_uids(model) == [1, 2]
+        assert model.selected_entity == 10
+        assert set(client.handlers) == {'loaded', 'unloaded', 'selected', 'deselected'}
+        assert sync.get_stats()["last_seq"] == 5
+
+    @pytest.mark.asyncio
+    async def test_events_apply_incrementally(self, model):
+        """Test fact and selection events for our environment."""
+        client = FakeApertureClient({'facts': [fact(1)]})
+        sync = EnvironmentSync(client, model, 7)
+        await sync.start()
+
+        await client.handlers['loaded']({'facts': [fact(2)], 'userId': 1, 'environmentId': 7})
+        await client.handlers['unloaded']({'factUids': [1], 'modelUids': [], 'userId': 1, 'environmentId': 7})
+        await client.handlers['selected']({'uid': 20, 'userId': 1, 'environmentId': 7})
+
+        assert fact_uids(model) == [2]
+        assert model.selected_entity == 20
+        await client.handlers['deselected']({'userId': 1, 'environmentId': 7})
+        assert model.selected_entity is None
+        assert client.requests == 1
+
+    @pytest.mark.asyncio
+    async def test_other_environments_ignored(self, model):
+        """Test that events for another environment do not touch the model."""
+        client = FakeApertureClient({'facts': []})
+        sync = EnvironmentSync(client, model, 7)
+        await sync.start()
+
+        await client.handlers['loaded']({'facts': [fact(1)], 'userId': 1, 'environmentId': 8})
+
+        assert fact_uids(model) == []
+
+    @pytest.mark.asyncio
+    async def test_gap_triggers_resync(self, model):
+        """Test that a skipped sequence number reloads the environment."""
+        client = FakeApertureClient({'facts': [fact(1)], 'seq': 1})
+        sync = EnvironmentSync(client, model, 7)
+        await sync.start()
+
+        await client.handlers['loaded']({'facts': [fact(2)], 'environmentId': 7, 'seq': 2})
+        # Aperture moved on to seq 4: fact 2 was unloaded and fact 3 loaded (seq 3 was lost)
+        client.env = {'facts': [fact(1), fact(3)], 'seq': 4}
+        await client.handlers['loaded']({'facts': [fact(3)], 'environmentId': 7, 'seq': 4})
+
+        assert fact_uids(model) == [1, 3]
+        assert client.requests == 2
+        assert sync.get_stats()["gaps"] == 1
+
+        # Repeats of already applied events are dropped
+        await client.handlers['loaded']({'facts': [fact(2)], 'environmentId': 7, 'seq': 3})
+        assert fact_uids(model) == [1, 3]
+
+    @pytest.mark.asyncio
+    async def test_resync_reconciles(self, model):
+        """Test that a resync removes stale facts and keeps unchanged ones."""
+        client = FakeApertureClient({'facts': [fact(1), fact(2)]})
+        sync = EnvironmentSync(client, model, 7)
+        await sync.start()
+        version = model.version
+
+        client.env = {'facts': [fact(1), fact(2, rh=30)]}
+        await client.reconnect_handlers[0]()
+
+        assert fact_uids(model) == [1, 2]
+        assert model.table.get(2)['rh_object_uid'] == 30
+        assert model.version > version
+
+    @pytest.mark.asyncio
+    async def test_models_load_outside_lock(self, model, monkeypatch):
+        """Test that a slow model load does not hold up the following events."""
+        client = FakeApertureClient({'facts': [fact(1)]})
+        sync = EnvironmentSync(client, model, 7)
+        release = asyncio.Event()
+        loaded = []
+
+        async def slow_models(facts):
+            await release.wait()
+            loaded.extend(f['fact_uid'] for f in facts)
+
+        monkeypatch.setattr(model, "loadModelsForFacts", slow_models)
+        await asyncio.wait_for(sync.start(), 1)
+        await asyncio.wait_for(client.handlers['loaded']({'facts': [fact(2)], 'environmentId': 7}), 1)
+
+        assert fact_uids(model) == [1, 2]
+        assert loaded == []
+        release.set()
+        await sync.wait_loading()
+        assert sorted(loaded) == [1, 2]
@@ -0,0 +1,187 @@
+"""
+Unit tests for FactTable.
+
+Tests the columnar fact store including:
+- Appending, replacing, removing and compacting rows
+- Appending parsed columns
+- Vectorized filters, group-bys, degree counts and joins
+- CSR neighbour queries
+- k-hop subgraphs with relation filters and node caps
+- The table kept by SemanticModel
+"""
+
+import numpy as np
+import pytest
+
+from src.models import fact_table
+from src.models.fact_table import FactTable
+from src.models.semantic_model import SemanticModel
+from tests.conftest import fact
+
+
+@pytest.fixture
+def table():
+    facts = FactTable(capacity=2)
+    facts.add([
+        fact(1, 10, 20),
+        fact(2, 11, 20),
+        fact(3, 10, 30, rel=1225),
+        fact(4, 20, 40),
+        fact(5, 30, 10, rel=1190),
+    ])
+    return facts
+
+
+@pytest.mark.unit
+class TestFactTableRows:
+    """Test row maintenance."""
+
+    def test_add_grows_past_capacity(self, table):
+        """Test that columns grow and keep insertion order."""
+        assert len(table) == 5
+        assert [f['fact_uid'] for f in table.facts()] == [1, 2, 3, 4, 5]
+
+    def test_add_parsed_columns(self, table):
+        """Test that parsed columns are copied in, and ignored when a uid is already present."""
+        new = [fact(6, 50, 20), fact(7, 51, 20)]
+        columns = {
+            'fact_uid': np.array([6, 7]), 'lh_object_uid': np.array([50, 51]),
+            'rel_type_uid': np.array([1146, 1146]), 'rh_object_uid': np.array([20, 20]),
+            'rh_object_name': (np.array([0, 0]), ['entity 20']),
+        }
+        table.add(new, columns)
+
+        assert table.filter(lh_object_uid=51).size == 1
+        assert table.filter(rh_object_name='entity 20').size == 4
+        assert table.get(7)['lh_object_uid'] == 51
+
+        table.add([fact(6, 52, 20)], {'fact_uid': np.array([6]), 'lh_object_uid': np.array([99])})
+        assert table.filter(lh_object_uid=52).size == 1 and table.filter(lh_object_uid=99).size == 0
+
+    def test_replace_moves_fact_to_the_end(self, table):
+        """Test that re-adding a uid replaces its row."""
+        table.add([fact(1, 10, 40)])
+
+        assert len(table) == 5
+        assert [f['fact_uid'] for f in table.facts()] == [2, 3, 4, 5, 1]
+        assert table.facts(table.filter(fact_uid=1))[0]['rh_object_uid'] == 40
+
+    def test_remove_and_compact(self, monkeypatch, table):
+        """Test removal, and that compaction keeps queries correct."""
+        monkeypatch.setattr(fact_table, "_COMPACT_MIN", 1)
+
+        removed = table.remove([2, 3, 4, 99])
+
+        assert [f['fact_uid'] for f in removed] == [2, 3, 4]
+        assert [f['fact_uid'] for f in table.facts()] == [1, 5]
+        assert table.filter(rel_type_uid=1146).tolist() == [0]
+        assert 3 not in table
+
+
+@pytest.mark.unit
+class TestFactTableQueries:
+    """Test vectorized queries."""
+
+    def test_filter_by_values(self, table):
+        """Test filters on single values, collections and names."""
+        assert table.filter(rel_type_uid=1146).tolist() == [0, 1, 3]
+        assert table.filter(rel_type_uid=1146, rh_object_uid=[40, 99]).tolist() == [3]
+        assert table.filter(rel_type_name="is classified as a").tolist() == [2]
+        assert table.filter(rel_type_name="no such relation").size == 0
+
+    def test_group_by_keeps_first_appearance_order(self, table):
+        """Test group order and row order within groups."""
+        groups = table.group_by('rel_type_uid')
+
+        assert list(groups) == [1146, 1225, 1190]
+        assert groups[1146].tolist() == [0, 1, 3]
+        assert table.counts('rel_type_name') == {'is a specialization of': 3, 'is classified as a': 1, 'is a part of': 1}
+
+    def test_degrees(self, table):
+        """Test per-entity fact counts."""
+        assert table.degrees()[20] == 3
+        assert table.degrees([10, 99]) == {10: 3, 99: 0}
+
+    def test_join_finds_two_step_paths(self, table):
+        """Test joining rh of one fact to lh of another."""
+        specializations = table.filter(rel_type_uid=1146)
+        left, right = table.join(specializations, specializations)
+
+        assert sorted(zip(left.tolist(), right.tolist())) == [(0, 3), (1, 3)]
+
+    def test_neighbours(self, table):
+        """Test CSR neighbour rows and uids, and rebuild after changes."""
+        assert table.neighbor_rows(10).tolist() == [0, 2, 4]
+        assert table.neighbors(20) == [10, 11, 40]
+        assert not table.has_entity(99)
+
+        table.add([fact(6, 99, 10)])
+        assert table.neighbors(99) == [10]
+
+    def test_subgraph_hops(self, table):
+        """Test that entities come in order of distance with the facts followed."""
+        nodes, rows = table.subgraph([10], hops=1)
+        assert nodes.tolist() == [10, 20, 30]
+        assert rows.tolist() == [0, 2, 4]
+
+        nodes, rows = table.subgraph([10], hops=2)
+        assert nodes.tolist() == [10, 20, 30, 11, 40]
+        assert rows.tolist() == [0, 1, 2, 3, 4]
+
+    def test_subgraph_filters_and_cap(self, table):
+        """Test relation type filters, the node cap and unknown seeds."""
+        nodes, rows = table.subgraph([10], hops=2, rel_types=[1146])
+        assert nodes.tolist() == [10, 20, 11, 40]
+        assert rows.tolist() == [0, 1, 3]
+
+        nodes, rows = table.subgraph([10], hops=2, exclude_rel_types=[1146])
+        assert nodes.tolist() == [10, 30]
+
+        nodes, rows = table.subgraph([10], hops=2, max_nodes=3)
+        assert nodes.tolist() == [10, 20, 30]
+        assert rows.tolist() == [0, 2, 4]
+
+        nodes, rows = table.subgraph([99], hops=2)
+        assert nodes.size == 0 and rows.size == 0
+
+    def test_empty_table(self):
+        """Test queries on a table with no facts."""
+        empty = FactTable()
+
+        assert empty.group_by('rel_type_uid') == {}
+        assert empty.degrees([1]) == {1: 0}
+        assert empty.neighbor_rows(1).size == 0
+        assert empty.filter(rel_type_uid=1146).dtype == np.int64
+        assert empty.subgraph([1])[0].size == 0
+
+
+@pytest.mark.unit
+class TestSemanticModelTable:
+    """Test the table kept by SemanticModel."""
+
+    @pytest.mark.asyncio
+    async def test_table_follows_facts(self, monkeypatch):
+        """Test that the table mirrors the fact list and drives the formatting."""
+        model = SemanticModel()
+
+        async def no_models(facts):
+            return None
+
+        monkeypatch.setattr(model, "loadModelsForFacts", no_models)
+        await model.addFacts([
+            fact(1, 10, 20, lh_name="pump", rh_name="device"),
+            fact(2, 10, 30, rel=1225, lh_name="pump", rh_name="machine"),
+            fact(3, 11, 20, lh_name="valve", rh_name="device"),
+        ])
+        await model.removeFacts([2])
+
+        assert [f['fact_uid'] for f in model.table.facts()] == [f['fact_uid'] for f in model.facts]
+        assert model.hasFactInvolvingUID(10)
+        assert not model.hasFactInvolvingUID(30)
+        assert model.format_relationships() == (
+            "- pump(10) -> is a specialization of -> device(20)\n"
+            "- valve(11) -> is a specialization of -> device(20)"
+        )
+        assert [f['fact_uid'] for f in model.get_facts_for_entity(20)] == [1, 3]
+        assert model.subgraph(10, hops=2)[0] == [10, 20, 11]
+        assert model.format_neighborhood(11, hops=1) == "- valve(11) -> is a specialization of -> device(20)"
@@ -0,0 +1,153 @@
+"""
+Unit tests for the Gellish table loader.
+
+Tests loading Gellish exports including:
+- Column mapping, UID parsing and delimiter detection
+- Skipping rows without the required UIDs
+- Streaming records lazily
+- The columnar (pyarrow) reader and its table columns
+- Seeding a semantic model without fetching models from Clarity
+- Seeded snapshots, which the service does not restore
+- Rejecting files that are not Gellish tables
+"""
+
+import pytest
+
+from src.models import gellish, persistence
+from src.models.records import Fact
+from src.models.semantic_model import SemanticModel
+
+HEADER = ['1', '2', '101', '60', '3', '15', '201', '4', '9', '999']
+ROWS = [
+    ['100', '10', 'P-101', '1225', 'is classified as a', '1', 'pump', '', '2024-01-01', 'unmapped'],
+    ['101', '1', 'pump', '1146', 'is a specialization of', '2', 'machine', 'a machine that moves fluid', ''],
+    ['102', '', 'no lh object', '1146', 'is a specialization of', '2', 'machine', '', '', ''],
+    ['103', '3', 'impeller', '1,190', 'is a part of', '1', 'pump'],
+]
+
+
+def write(path, rows=ROWS, header=HEADER, delimiter='\t'):
+    with open(path, 'w') as f:
+        for row in [header] + rows:
+            f.write(delimiter.join(f'"{v}"' if delimiter in v else v for v in row) + '\n')
+    return path
+
+
+@pytest.mark.unit
+class TestParsing:
+    """Test turning table rows into Fact records."""
+
+    def test_rows_to_facts(self, tmp_path):
+        """Test the column mapping, UID parsing and skipped rows."""
+        stats = {}
+        facts = list(gellish.iter_facts(write(tmp_path / 'facts.tsv'), stats=stats))
+
+        assert [f['fact_uid'] for f in facts] == [100, 101, 103]
+        assert all(isinstance(f, Fact) for f in facts)
+        assert facts[0] == {
+            'fact_uid': 100, 'lh_object_uid': 10, 'lh_object_name': 'P-101',
+            'rel_type_uid': 1225, 'rel_type_name': 'is classified as a',
+            'rh_object_uid': 1, 'rh_object_name': 'pump', 'effective_from': '2024-01-01',
+        }
+        assert facts[1]['full_definition'] == 'a machine that moves fluid'
+        assert facts[2]['rel_type_uid'] == 1190
+        assert stats == {'rows': 4, 'skipped': 1}
+
+    def test_csv_with_quoted_separators(self, tmp_path):
+        """Test comma-separated files and UIDs written with thousands separators."""
+        rows = [['1,000,001', '10', 'P-101', '1225', 'is classified as a', '1', 'pump, centrifugal', '', '', '']]
+        path = write(tmp_path / 'facts.csv', rows=rows, delimiter=',')
+
+        fact, = gellish.iter_facts(path)
+
+        assert fact['fact_uid'] == 1_000_001
+        assert fact['rh_object_name'] == 'pump, centrifugal'
+
+    def test_streams_lazily(self, tmp_path):
+        """Test that records are produced one at a time as the file is read."""
+        facts = gellish.iter_facts(write(tmp_path / 'facts.tsv'))
+
+        assert next(facts)['fact_uid'] == 100
+        assert [len(batch) for batch in gellish.batched(facts, 1)] == [1, 1]
+
+    def test_not_a_gellish_table(self, tmp_path):
+        """Test that a file without the required columns is rejected."""
+        path = write(tmp_path / 'other.csv', rows=[['a', 'b']], header=['name', 'value'], delimiter=',')
+
+        with pytest.raises(ValueError, match='not a Gellish table'):
+            list(gellish.iter_facts(path))
+
+
+@pytest.mark.unit
+class TestColumnar:
+    """Test the pyarrow reader."""
+
+    def test_same_facts_as_csv_path(self, tmp_path):
+        """Test that the columnar reader yields the csv path's records, with table columns."""
+        pytest.importorskip("pyarrow")
+        rows = ROWS + [['1,000,001', '11', 'P-102', '1225', 'is classified as a', '1', 'pump, centrifugal', '', '', '']]
+        path = write(tmp_path / 'facts.csv', rows=rows, delimiter=',')
+        stats = {}
+
+        batches = list(gellish.iter_fact_columns(path, stats=stats))
+        facts = [f for batch, _ in batches for f in batch]
+
+        assert sorted(facts, key=lambda f: f['fact_uid']) == sorted(gellish.iter_facts(path), key=lambda f: f['fact_uid'])
+        assert all(isinstance(f, Fact) for f in facts)
+        assert stats == {'rows': 5, 'skipped': 1}
+        # Short rows are parsed by the csv path, after their block and without columns
+        (block, columns), (uneven, no_columns) = batches
+        assert [f['fact_uid'] for f in uneven] == [101, 103] and no_columns is None
+        assert columns['fact_uid'].tolist() == [f['fact_uid'] for f in block]
+        codes, strings = columns['rh_object_name']
+        assert [strings[code] for code in codes] == [f['rh_object_name'] for f in block]
+
+    @pytest.mark.asyncio
+    async def test_columns_fill_the_table(self, tmp_path):
+        """Test that a columnar load builds the same table as the csv path."""
+        pytest.importorskip("pyarrow")
+        path = write(tmp_path / 'facts.tsv')
+        columnar, rows = SemanticModel(), SemanticModel()
+
+        await gellish.load(columnar, path, columnar=True)
+        await gellish.load(rows, path, columnar=False)
+
+        for model in (columnar, rows):
+            assert model.table.neighbors(1) == [2, 3, 10]
+            assert model.table.filter(rh_object_name='pump').size == 2
+            assert model.names.exact('P-101') == [10]
+        assert [f['fact_uid'] for f in columnar.facts] == [f['fact_uid'] for f in rows.facts]
+
+
+@pytest.mark.unit
+class TestLoad:
+    """Test seeding a semantic model."""
+
+    @pytest.mark.asyncio
+    async def test_load_into_model(self, tmp_path, monkeypatch):
+        """Test that facts are indexed without loading models, and reloads replace them."""
+        model = SemanticModel()
+
+        async def fail(facts):
+            raise AssertionError("models should not be loaded")
+
+        monkeypatch.setattr(model, "loadModelsForFacts", fail)
+        path = write(tmp_path / 'facts.tsv')
+
+        stats = await gellish.load(model, path, batch_size=2)
+        await gellish.load(model, [path])
+
+        assert stats['facts'] == 3 and stats['skipped'] == 1
+        assert len(model.facts) == 3
+        assert model.table.neighbors(1) == [2, 3, 10]
+        assert model.names.exact('P-101') == [10]
+
+    @pytest.mark.asyncio
+    async def test_seeded_snapshot_not_restored_by_service(self, tmp_path):
+        """Test that seeded snapshots are readable offline but skipped by the service's restore."""
+        model = SemanticModel()
+        await gellish.load(model, write(tmp_path / 'facts.tsv'))
+        persistence.save(model, tmp_path / 'seeded.snapshot', meta={"source": gellish.SOURCE})
+
+        assert persistence.load(SemanticModel(), tmp_path / 'seeded.snapshot') is not None
+        assert persistence.load(SemanticModel(), tmp_path / 'seeded.snapshot', match={"source": None}) is None
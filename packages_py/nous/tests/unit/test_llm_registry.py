@@ -0,0 +1,193 @@
+"""
+Unit tests for LLMClientRegistry.
+
+Tests shared LLM client management including:
+- One client per provider/model/parameters
+- Shared HTTP connection pools per provider
+- Per-model concurrency limits
+- Latency statistics
+- Retrying failed calls through the gate instead of inside the provider client
+"""
+
+import asyncio
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.llm import registry as registry_module
+from src.llm.registry import LLMClientRegistry, ModelGate, _gated_class
+from src.llm.scheduler import LLMCallScheduler
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FlakyChatModel(FakeListChatModel):
+    """Rate limited on its first `failures` calls"""
+
+    failures: int = 1
+
+    async def _agenerate(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise RateLimitError()
+        return await super()._agenerate(*args, **kwargs)
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    monkeypatch.setitem(
+        registry_module.PROVIDERS,
+        "fake",
+        ("langchain_core.language_models.fake_chat_models", "FakeListChatModel", None),
+    )
+
+
+@pytest.fixture
+def groq_key(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+
+
+@pytest.mark.unit
+class TestLLMClientRegistry:
+    """Test client reuse and statistics."""
+
+    def test_same_spec_returns_same_client(self, fake_provider):
+        """Test that a client is constructed once per provider/model/params."""
+        registry = LLMClientRegistry()
+
+        first = registry.get("fake", "m1", responses=["ok"])
+        again = registry.get("fake", "m1", responses=["ok"])
+        other = registry.get("fake", "m2", responses=["ok"])
+
+        assert first is again
+        assert first is not other
+
+    def test_resolve_model_spec(self, fake_provider):
+        """Test resolving 'provider:model' strings."""
+        registry = LLMClientRegistry()
+
+        assert registry.resolve("fake:m1", responses=["ok"]) is registry.get("fake", "m1", responses=["ok"])
+        with pytest.raises(ValueError):
+            registry.resolve("no-provider-given")
+
+    def test_unknown_provider(self):
+        """Test that unknown providers are rejected."""
+        with pytest.raises(ValueError):
+            LLMClientRegistry().get("nope", "m1")
+
+    def test_provider_clients_share_http_pool(self, groq_key):
+        """Test that clients of the same provider share one HTTP connection pool."""
+        registry = LLMClientRegistry()
+
+        first = registry.get("groq", "model-a", temperature=0.1)
+        second = registry.get("groq", "model-b", temperature=0.6)
+
+        assert first.http_async_client is second.http_async_client
+        asyncio.run(registry.aclose())
+
+    @pytest.mark.asyncio
+    async def test_calls_record_latency_stats(self, fake_provider):
+        """Test that calls through a client are counted per model."""
+        registry = LLMClientRegistry()
+        client = registry.get("fake", "m1", responses=["a", "b"])
+
+        await client.ainvoke("hello")
+        await client.ainvoke("again")
+
+        stats = registry.get_stats()["fake:m1"]
+        assert stats["calls"] == 2
+        assert stats["errors"] == 0
+        assert stats["in_flight"] == 0
+        assert stats["latency_p95"] is not None
+
+    def test_provider_clients_do_not_retry(self, groq_key):
+        """Test that provider clients are built without their own retries, which the gate takes over."""
+        registry = LLMClientRegistry()
+
+        client = registry.get("groq", "model-a", max_retries=3)
+
+        assert client.max_retries == 0
+        assert client._retries == 3
+        asyncio.run(registry.aclose())
+
+    def test_concurrency_limits_per_model(self):
+        """Test that configured limits override the default."""
+        registry = LLMClientRegistry(default_concurrency=8, concurrency_limits={"fake:m1": 2})
+
+        assert registry.gate("fake", "m1").max_concurrency == 2
+        assert registry.gate("fake", "m2").max_concurrency == 8
+        assert registry.gate("fake", "m1") is registry.gate("fake", "m1")
+
+
+@pytest.mark.unit
+class TestModelGate:
+    """Test the per-model concurrency gate."""
+
+    @pytest.mark.asyncio
+    async def test_gate_limits_concurrency(self):
+        """Test that no more than max_concurrency calls run at once."""
+        gate = ModelGate("fake:m1", max_concurrency=2)
+        active = 0
+        peak = 0
+
+        async def call():
+            nonlocal active, peak
+            async with gate.slot():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*[call() for _ in range(6)])
+
+        assert peak == 2
+        assert gate.stats.calls == 6
+
+    @pytest.mark.asyncio
+    async def test_gate_releases_slot_on_cancellation(self):
+        """Test that a cancelled call gives its slot back."""
+        gate = ModelGate("fake:m1", max_concurrency=1)
+
+        async def slow():
+            async with gate.slot():
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(slow())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        async with gate.slot():
+            pass
+        assert gate.stats.errors == 1
+        assert gate.stats.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_call_is_retried_through_scheduler(self):
+        """Test that each retry of a rate limited call is admitted by the scheduler again."""
+        scheduler = LLMCallScheduler(default_rpm=100, default_tpm=100000, default_backoff=0.01)
+        client = _gated_class(FlakyChatModel)(responses=["ok"], failures=2)
+        client._gate = ModelGate("fake:m1", max_concurrency=1, scheduler=scheduler)
+        client._retries = 2
+
+        result = await client.ainvoke("hello")
+
+        assert result.content == "ok"
+        assert scheduler.get_stats()["fake:m1"]["granted"] == 3
+        assert scheduler.get_stats()["fake:m1"]["rate_limited"] == 2
+        assert client._gate.stats.retries == 2
+
+    @pytest.mark.asyncio
+    async def test_retries_are_limited(self):
+        """Test that the error is raised once the retries are used up."""
+        client = _gated_class(FlakyChatModel)(responses=["ok"], failures=2)
+        client._gate = ModelGate("fake:m1", max_concurrency=1, scheduler=LLMCallScheduler(default_backoff=0.01))
+        client._retries = 1
+
+        with pytest.raises(RateLimitError):
+            await client.ainvoke("hello")
+        assert client._gate.stats.errors == 2
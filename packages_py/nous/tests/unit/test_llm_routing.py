@@ -0,0 +1,122 @@
+"""
+Unit tests for ModelRouter.
+
+Tests per call site model routing including:
+- Candidate ordering by latency budget
+- Fallback on errors and timeouts
+- Per-call fallback chat models for multi-step workflows
+- Per-route latency statistics
+"""
+
+import asyncio
+
+import pytest
+
+from src.llm import registry as registry_module
+from src.llm.registry import LLMClientRegistry
+from src.llm.routing import ModelRouter, Route
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    monkeypatch.setitem(
+        registry_module.PROVIDERS,
+        "fake",
+        ("langchain_core.language_models.fake_chat_models", "FakeListChatModel", None),
+    )
+
+
+@pytest.fixture
+def router(fake_provider):
+    routes = {
+        "classify": Route("classify", "classify", latency_budget=1.0, timeout=0.1, models=["fake:small", "fake:large"]),
+    }
+    catalog = {"fake:small": {"responses": ["small"]}, "fake:large": {"responses": ["large"]}}
+    return ModelRouter(routes, LLMClientRegistry(), catalog=catalog)
+
+
+@pytest.mark.unit
+class TestModelRouter:
+    """Test model choice and fallback."""
+
+    @pytest.mark.asyncio
+    async def test_uses_preferred_model(self, router):
+        """Test that the first candidate answers when it is healthy."""
+        result = await router.run("classify", lambda llm: llm.ainvoke("hi"))
+
+        assert result.content == "small"
+        stats = router.get_stats()["classify"]
+        assert stats["models"]["fake:small"]["calls"] == 1
+        assert stats["fallbacks"] == 0
+
+    @pytest.mark.asyncio
+    async def test_falls_back_on_error(self, router):
+        """Test that an error moves the call to the next candidate."""
+        async def call(llm):
+            if llm.responses == ["small"]:
+                raise RuntimeError("provider down")
+            return await llm.ainvoke("hi")
+
+        result = await router.run("classify", call)
+
+        assert result.content == "large"
+        stats = router.get_stats()["classify"]
+        assert stats["fallbacks"] == 1
+        assert stats["models"]["fake:small"]["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_falls_back_on_timeout(self, router):
+        """Test that a call exceeding the route timeout is abandoned for the next candidate."""
+        async def call(llm):
+            if llm.responses == ["small"]:
+                await asyncio.sleep(10)
+            return await llm.ainvoke("hi")
+
+        result = await router.run("classify", call)
+
+        assert result.content == "large"
+        assert router.get_stats()["classify"]["timeouts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_raises_when_all_candidates_fail(self, router):
+        """Test that the last error surfaces when every model fails."""
+        async def call(llm):
+            raise RuntimeError("all down")
+
+        with pytest.raises(RuntimeError, match="all down"):
+            await router.run("classify", call)
+
+    def test_slow_model_moves_behind_budget(self, router):
+        """Test that a model whose p95 exceeds the budget is tried last."""
+        stats = router._route_stats("classify")
+        for _ in range(10):
+            stats.model("fake:small").record(2.5)
+            stats.model("fake:large").record(0.4)
+
+        assert router.candidates("classify") == ["fake:large", "fake:small"]
+
+    def test_registry_latency_used_before_route_history(self, router):
+        """Test that model-wide latency informs routes that have not called it yet."""
+        for _ in range(10):
+            router.registry.gate("fake", "small").stats.record(3.0)
+
+        assert router.candidates("classify") == ["fake:large", "fake:small"]
+
+    @pytest.mark.asyncio
+    async def test_chat_model_falls_back_per_call(self, fake_provider):
+        """Test that each call to a route's chat model starts at the preferred model and falls back on its own."""
+        routes = {"agent": Route("agent", "tool_use", latency_budget=60.0, models=["fake:down", "fake:large"])}
+        catalog = {"fake:down": {"responses": []}, "fake:large": {"responses": ["first", "second"]}}
+        router = ModelRouter(routes, LLMClientRegistry(), catalog=catalog)
+        llm = router.chat_model("agent")
+
+        assert (await llm.ainvoke("step 1")).content == "first"
+        assert (await llm.ainvoke("step 2")).content == "second"
+        assert router.chat_model("agent") is llm
+        assert router.registry.gate("fake", "down").stats.errors == 2
+        assert router.registry.gate("fake", "large").stats.calls == 2
+
+    def test_unknown_route(self, router):
+        """Test that unknown routes are rejected."""
+        with pytest.raises(ValueError):
+            router.candidates("nope")
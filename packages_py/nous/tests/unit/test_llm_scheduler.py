@@ -0,0 +1,269 @@
+"""
+Unit tests for LLMCallScheduler.
+
+Tests rate limited LLM call admission including:
+- Token buckets for requests/min and tokens/min
+- Priority lanes with a guaranteed bulk share
+- Round-robin fairness across users
+- Backing off after provider rate limits
+- Refunding capacity granted to calls that are never made
+"""
+
+import asyncio
+
+import pytest
+
+from src.llm.registry import ModelGate
+from src.llm.scheduler import (
+    BULK,
+    INTERACTIVE,
+    LLMCallScheduler,
+    TokenBucket,
+    estimate_tokens,
+    llm_call_context,
+)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+async def queue_calls(scheduler, specs, order):
+    """Queue calls given as (lane, user, tag) while the model is exhausted, then return their tasks"""
+
+    async def call(lane, user, tag):
+        with llm_call_context(lane, user_id=user):
+            await scheduler.acquire("fake:m1", 1)
+        order.append(tag)
+
+    tasks = []
+    for spec in specs:
+        tasks.append(asyncio.create_task(call(*spec)))
+        await asyncio.sleep(0)
+    return tasks
+
+
+@pytest.mark.unit
+class TestTokenBucket:
+    """Test token bucket refill and debt."""
+
+    def test_delay_until_refilled(self):
+        """Test that an empty bucket reports the refill time."""
+        bucket = TokenBucket(rate_per_minute=60)
+        bucket.consume(60, now=bucket._updated)
+
+        assert bucket.delay(1, now=bucket._updated) == pytest.approx(1.0)
+        assert bucket.delay(1, now=bucket._updated + 1.0) == 0.0
+
+    def test_oversized_amount_is_clamped(self):
+        """Test that a request larger than capacity does not wait forever."""
+        bucket = TokenBucket(rate_per_minute=100)
+
+        assert bucket.delay(1000, now=bucket._updated) == 0.0
+
+    def test_adjust_charges_actual_usage(self):
+        """Test that under-estimated calls put the bucket into debt."""
+        bucket = TokenBucket(rate_per_minute=100)
+        bucket.adjust(150)
+
+        assert bucket.tokens == -50
+
+
+@pytest.mark.unit
+class TestLLMCallScheduler:
+    """Test admission order and limits."""
+
+    @pytest.mark.asyncio
+    async def test_requests_per_minute_limit(self):
+        """Test that calls beyond the request budget wait for a refill."""
+        scheduler = LLMCallScheduler(default_rpm=2, default_tpm=1000)
+
+        await scheduler.acquire("fake:m1", 10)
+        await scheduler.acquire("fake:m1", 10)
+        waiter = asyncio.create_task(scheduler.acquire("fake:m1", 10))
+        await asyncio.sleep(0.05)
+
+        assert not waiter.done()
+        assert scheduler.get_stats()["fake:m1"]["throttled"] == 1
+        waiter.cancel()
+
+    @pytest.mark.asyncio
+    async def test_tokens_per_minute_limit(self):
+        """Test that a call waits when the token budget is exhausted."""
+        scheduler = LLMCallScheduler(default_rpm=100, default_tpm=600)
+
+        await scheduler.acquire("fake:m1", 595)
+        waiter = asyncio.create_task(scheduler.acquire("fake:m1", 20))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+        # ~10 tokens/s refill makes room within a couple of seconds
+        reservation = await asyncio.wait_for(waiter, timeout=3)
+        assert reservation.waited > 0
+
+    @pytest.mark.asyncio
+    async def test_limits_are_per_model(self):
+        """Test that configured limits apply to their model only."""
+        scheduler = LLMCallScheduler(default_rpm=100, default_tpm=1000, limits={"fake:slow": (1, 1000)})
+
+        await scheduler.acquire("fake:slow", 1)
+        await asyncio.wait_for(scheduler.acquire("fake:fast", 1), timeout=1)
+        blocked = asyncio.create_task(scheduler.acquire("fake:slow", 1))
+        await asyncio.sleep(0.05)
+
+        assert not blocked.done()
+        blocked.cancel()
+
+    @pytest.mark.asyncio
+    async def test_interactive_lane_goes_first(self):
+        """Test that interactive calls are granted before earlier bulk calls."""
+        scheduler = LLMCallScheduler(default_rpm=600, default_tpm=1000, bulk_every=4)
+        scheduler._limiter("fake:m1").requests.tokens = 0
+        order = []
+
+        tasks = await queue_calls(
+            scheduler,
+            [(BULK, "u1", "bulk"), (INTERACTIVE, "u1", "chat1"), (INTERACTIVE, "u1", "chat2")],
+            order,
+        )
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+
+        assert order == ["chat1", "chat2", "bulk"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_lane_is_not_starved(self):
+        """Test that bulk gets a turn after bulk_every interactive grants."""
+        scheduler = LLMCallScheduler(default_rpm=600, default_tpm=1000, bulk_every=2)
+        scheduler._limiter("fake:m1").requests.tokens = 0
+        order = []
+
+        specs = [(BULK, "u1", "bulk")] + [(INTERACTIVE, "u1", f"chat{i}") for i in range(4)]
+        tasks = await queue_calls(scheduler, specs, order)
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+
+        assert order == ["chat0", "chat1", "bulk", "chat2", "chat3"]
+
+    @pytest.mark.asyncio
+    async def test_users_alternate_within_a_lane(self):
+        """Test that one user's burst does not hold back another user."""
+        scheduler = LLMCallScheduler(default_rpm=600, default_tpm=1000)
+        scheduler._limiter("fake:m1").requests.tokens = 0
+        order = []
+
+        specs = [(INTERACTIVE, "u1", "a1"), (INTERACTIVE, "u1", "a2"), (INTERACTIVE, "u1", "a3"), (INTERACTIVE, "u2", "b1")]
+        tasks = await queue_calls(scheduler, specs, order)
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+
+        assert order == ["a1", "b1", "a2", "a3"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Test that cancelling a waiting call removes it from the queue."""
+        scheduler = LLMCallScheduler(default_rpm=1, default_tpm=1000)
+        await scheduler.acquire("fake:m1", 1)
+
+        waiter = asyncio.create_task(scheduler.acquire("fake:m1", 1))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert scheduler.get_stats()["fake:m1"]["waiting"] == {INTERACTIVE: 0, BULK: 0}
+
+    @pytest.mark.asyncio
+    async def test_granted_then_cancelled_is_refunded(self):
+        """Test that a waiter cancelled right after its grant gives the capacity back."""
+        scheduler = LLMCallScheduler(default_rpm=1, default_tpm=1000)
+        await scheduler.acquire("fake:m1", 1)
+
+        waiter = asyncio.create_task(scheduler.acquire("fake:m1", 100))
+        await asyncio.sleep(0.01)
+        # Capacity frees up and the waiter is granted, but cancelled before it resumes
+        scheduler._limiter("fake:m1").requests.tokens = 1
+        scheduler._pump("fake:m1")
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        stats = scheduler.get_stats()["fake:m1"]
+        assert stats["requests_available"] == pytest.approx(1, abs=0.01)
+        assert stats["tokens_available"] == pytest.approx(999, abs=1)
+
+    @pytest.mark.asyncio
+    async def test_settle_charges_actual_tokens(self):
+        """Test that real usage replaces the estimate in the token bucket."""
+        scheduler = LLMCallScheduler(default_rpm=100, default_tpm=1000)
+
+        reservation = await scheduler.acquire("fake:m1", 100)
+        scheduler.settle(reservation, 400)
+
+        assert scheduler.get_stats()["fake:m1"]["tokens_available"] == pytest.approx(600, abs=1)
+
+    def test_unknown_lane_is_rejected(self):
+        """Test that call contexts only accept known lanes."""
+        with pytest.raises(ValueError):
+            with llm_call_context("urgent"):
+                pass
+
+
+@pytest.mark.unit
+class TestGateScheduling:
+    """Test that model gates go through the scheduler."""
+
+    @pytest.mark.asyncio
+    async def test_provider_rate_limit_pauses_model(self):
+        """Test that a 429 blocks further calls instead of retrying immediately."""
+        scheduler = LLMCallScheduler(default_rpm=100, default_tpm=1000, default_backoff=5)
+        gate = ModelGate("fake:m1", max_concurrency=4, scheduler=scheduler)
+
+        with pytest.raises(RateLimitError):
+            async with gate.slot(10):
+                raise RateLimitError()
+
+        blocked = asyncio.create_task(scheduler.acquire("fake:m1", 10))
+        await asyncio.sleep(0.05)
+
+        assert not blocked.done()
+        assert scheduler.get_stats()["fake:m1"]["rate_limited"] == 1
+        blocked.cancel()
+
+    @pytest.mark.asyncio
+    async def test_gate_settles_reported_usage(self):
+        """Test that usage recorded on the gate call is charged to the bucket."""
+        scheduler = LLMCallScheduler(default_rpm=100, default_tpm=1000)
+        gate = ModelGate("fake:m1", max_concurrency=4, scheduler=scheduler)
+
+        async with gate.slot(50) as call:
+            call.used_tokens = 300
+
+        assert scheduler.get_stats()["fake:m1"]["tokens_available"] == pytest.approx(700, abs=1)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_before_slot_is_refunded(self):
+        """Test that a call cancelled while waiting for a concurrency slot refunds its reservation."""
+        scheduler = LLMCallScheduler(default_rpm=100, default_tpm=1000)
+        gate = ModelGate("fake:m1", max_concurrency=1, scheduler=scheduler)
+        release = asyncio.Event()
+
+        async def call(tokens, wait):
+            async with gate.slot(tokens) as handle:
+                handle.used_tokens = tokens
+                if wait:
+                    await release.wait()
+
+        running = asyncio.create_task(call(100, True))
+        await asyncio.sleep(0.01)
+        waiting = asyncio.create_task(call(300, False))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        release.set()
+        await running
+
+        assert scheduler.get_stats()["fake:m1"]["tokens_available"] == pytest.approx(900, abs=1)
+        assert gate.stats.waiting == 0
+
+    def test_estimate_tokens(self):
+        """Test the character based estimate includes the reply allowance."""
+        assert estimate_tokens(["x" * 400], output_allowance=100) == 200
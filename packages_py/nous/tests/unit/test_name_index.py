@@ -0,0 +1,108 @@
+"""
+Unit tests for NameIndex.
+
+Tests local entity name resolution including:
+- Exact, prefix and trigram fuzzy matching
+- Reference counted incremental updates
+- Names maintained by SemanticModel from facts and models
+"""
+
+import pytest
+
+from src.models.name_index import NameIndex
+from src.models.semantic_model import SemanticModel
+from tests.conftest import fact
+
+
+@pytest.fixture
+def index():
+    names = NameIndex()
+    names.add_facts([
+        fact(1, 10, 11, lh_name="centrifugal pump", rh_name="pump"),
+        fact(2, 12, 13, lh_name="pump house", rh_name="building"),
+        fact(3, 14, 15, lh_name="Centrifugal  Compressor", rh_name="compressor"),
+    ])
+    return names
+
+
+@pytest.mark.unit
+class TestNameIndex:
+    """Test name lookups."""
+
+    def test_exact_is_case_and_space_insensitive(self, index):
+        """Test exact matching after normalization."""
+        assert index.exact("Pump") == [11]
+        assert index.exact("centrifugal compressor") == [14]
+        assert index.exact("pumps") == []
+
+    def test_prefix_shortest_first(self, index):
+        """Test prefix matches ordered by name length."""
+        matches = index.prefix("pump")
+
+        assert [m.name for m in matches] == ["pump", "pump house"]
+        assert all(m.match == "prefix" for m in matches)
+
+    def test_fuzzy_tolerates_typos(self, index):
+        """Test trigram matching of misspelled names."""
+        matches = index.fuzzy("centrifugl pump")
+
+        assert matches[0].name == "centrifugal pump"
+        assert matches[0].uids == [10]
+        assert [m.score for m in matches] == sorted((m.score for m in matches), reverse=True)
+
+    def test_fuzzy_respects_limit(self, index):
+        """Test that only the best `limit` fuzzy matches are returned."""
+        assert len(index.fuzzy("pump", limit=1, min_score=0.0)) == 1
+
+    def test_lookup_prefers_exact(self, index):
+        """Test that lookup falls through exact, prefix and fuzzy."""
+        assert index.lookup("pump")[0].match == "exact"
+        assert index.lookup("pump h")[0].match == "prefix"
+        assert index.lookup("compresor")[0].match == "fuzzy"
+
+    def test_references_are_counted(self, index):
+        """Test that a name stays while another fact still uses it."""
+        index.add_facts([fact(4, 16, 11, lh_name="impeller", rh_name="pump")])
+        index.remove_facts([fact(1, 10, 11, lh_name="centrifugal pump", rh_name="pump")])
+
+        assert index.exact("pump") == [11]
+        assert index.exact("centrifugal pump") == []
+        assert all(m.name != "centrifugal pump" for m in index.fuzzy("centrifugal pump"))
+
+    def test_many_names_grow_arrays(self):
+        """Test that the per-name arrays grow past their initial capacity."""
+        names = NameIndex()
+        for i in range(200):
+            names.add(i, f"kind number {i}")
+
+        assert names.exact("kind number 199") == [199]
+        assert names.fuzzy("kind numbr 150")[0].uids == [150]
+
+
+@pytest.mark.unit
+class TestSemanticModelNames:
+    """Test the name index kept by SemanticModel."""
+
+    @pytest.mark.asyncio
+    async def test_names_follow_facts_and_models(self, monkeypatch):
+        """Test incremental updates from fact and model changes."""
+        model = SemanticModel()
+
+        async def no_models(facts):
+            return None
+
+        monkeypatch.setattr(model, "loadModelsForFacts", no_models)
+        await model.addFacts([fact(1, 10, 11, lh_name="valve", rh_name="device")])
+        model.addModel({'uid': 20, 'name': 'Gate Valve', 'type': 'kind'})
+
+        assert model.names.exact("valve") == [10]
+        assert model.names.exact("gate valve") == [20]
+
+        # Re-adding a fact under the same uid replaces its names
+        await model.addFact(fact(1, 10, 11, lh_name="ball valve", rh_name="device"))
+        assert model.names.exact("valve") == []
+        assert model.names.exact("ball valve") == [10]
+
+        await model.removeFacts([1])
+        model.removeModel(20)
+        assert model.names.lookup("valve") == []
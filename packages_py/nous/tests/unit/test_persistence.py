@@ -0,0 +1,173 @@
+"""
+Unit tests for semantic model snapshots on disk.
+
+Tests warm restart persistence including:
+- Round trip of facts, models, version and indexes
+- Restored models accepting further changes
+- Rejecting snapshots of other environments and unreadable files
+- Periodic writer skipping unchanged versions
+- Captured state unaffected by changes made while it is written
+- Environment sync resuming from a snapshot's sequence number
+"""
+
+import pytest
+import pytest_asyncio
+
+from src.models import persistence
+from src.models.environment_sync import EnvironmentSync
+from src.models.records import Fact
+from src.models.semantic_model import SemanticModel
+from tests.conftest import fact
+
+
+def new_model(monkeypatch):
+    model = SemanticModel()
+
+    async def no_models(facts):
+        return None
+
+    monkeypatch.setattr(model, "loadModelsForFacts", no_models)
+    return model
+
+
+@pytest_asyncio.fixture
+async def model(monkeypatch):
+    semantic_model = new_model(monkeypatch)
+    await semantic_model.addFacts([fact(1, 10, 20, custom='kept'), fact(2, 20, 730000), fact(3, 30, 10, rel=1225)])
+    semantic_model.addModel({'uid': 10, 'name': 'pump', 'type': 'kind', 'category': 'physical object'})
+    semantic_model.selected_entity = 10
+    return semantic_model
+
+
+@pytest.mark.unit
+class TestSnapshotFile:
+    """Test writing and restoring snapshots."""
+
+    @pytest.mark.asyncio
+    async def test_round_trip(self, model, monkeypatch, tmp_path):
+        """Test that a restored model matches the saved one."""
+        path = tmp_path / "model.snap"
+        persistence.save(model, path, {"environment_id": "env", "seq": 4})
+
+        restored = new_model(monkeypatch)
+        header = persistence.load(restored, path, match={"environment_id": "env"})
+
+        assert header["version"] == model.version == restored.version
+        assert header["meta"]["seq"] == 4
+        assert list(restored.facts) == list(model.facts)
+        assert all(isinstance(f, Fact) for f in restored.facts)
+        assert restored.facts[0]['custom'] == 'kept'
+        assert dict(restored.models) == dict(model.models)
+        assert restored.selected_entity == 10
+        assert restored.format_relationships() == model.format_relationships()
+        assert restored.taxonomy.ancestors(10) == {20, 730000}
+        assert restored.instances_of(10) == {30}
+        assert restored.names.exact("pump") == [10]
+        assert restored.generate_ontology_metadata() == model.generate_ontology_metadata()
+
+    @pytest.mark.asyncio
+    async def test_restored_model_accepts_changes(self, model, monkeypatch, tmp_path):
+        """Test that memory-mapped columns are writable after a restore."""
+        path = tmp_path / "model.snap"
+        persistence.save(model, path)
+        restored = new_model(monkeypatch)
+        persistence.load(restored, path)
+
+        await restored.addFacts([fact(4, 40, 10)])
+        await restored.removeFacts([1])
+
+        assert [f['fact_uid'] for f in restored.table.facts()] == [2, 3, 4]
+        assert restored.version > model.version
+        assert restored.taxonomy.ancestors(40) == {10}
+
+    @pytest.mark.asyncio
+    async def test_rejects_other_environment(self, model, monkeypatch, tmp_path):
+        """Test that a snapshot saved for another environment is not loaded."""
+        path = tmp_path / "model.snap"
+        persistence.save(model, path, {"environment_id": "other"})
+        restored = new_model(monkeypatch)
+
+        assert persistence.load(restored, path, match={"environment_id": "env"}) is None
+        assert len(restored.facts) == 0
+
+    def test_missing_or_unreadable(self, monkeypatch, tmp_path):
+        """Test that missing and corrupt files are ignored."""
+        restored = new_model(monkeypatch)
+        path = tmp_path / "model.snap"
+
+        assert persistence.load(restored, path) is None
+        path.write_bytes(b"not a snapshot")
+        assert persistence.load(restored, path) is None
+
+
+@pytest.mark.unit
+class TestSnapshotWriter:
+    """Test the periodic snapshot writer."""
+
+    @pytest.mark.asyncio
+    async def test_writes_only_changed_versions(self, model, tmp_path):
+        """Test that an unchanged model is not written again."""
+        writer = persistence.SnapshotWriter(model, tmp_path / "model.snap", meta=lambda: {"seq": 1})
+
+        assert await writer.save()
+        assert not await writer.save()
+        model.selected_entity = 20
+        assert await writer.save()
+        assert writer.get_stats()["writes"] == 2
+
+    @pytest.mark.asyncio
+    async def test_stop_writes_final_snapshot(self, model, monkeypatch, tmp_path):
+        """Test that stopping writes the latest version."""
+        path = tmp_path / "model.snap"
+        writer = persistence.SnapshotWriter(model, path, interval=3600)
+        writer.start()
+        await writer.stop()
+
+        restored = new_model(monkeypatch)
+        assert persistence.load(restored, path)["version"] == model.version
+
+    @pytest.mark.asyncio
+    async def test_capture_detached_from_changes(self, model, monkeypatch, tmp_path):
+        """Test that changes made after the capture (e.g. while the writer thread runs) are not written."""
+        path = tmp_path / "model.snap"
+        version = model.version
+        state = persistence.capture(model)
+
+        await model.addFacts([fact(4, 40, 10)])
+        await model.removeFacts([1])
+        model.addModel({'uid': 40, 'name': 'impeller', 'type': 'kind', 'category': 'physical object'})
+        persistence.save_state(state, path)
+
+        restored = new_model(monkeypatch)
+        assert persistence.load(restored, path)["version"] == version
+        assert [f['fact_uid'] for f in restored.facts] == [1, 2, 3]
+        assert [f['fact_uid'] for f in restored.table.facts()] == [1, 2, 3]
+        assert restored.taxonomy.ancestors(10) == {20, 730000}
+        assert 40 not in restored.taxonomy
+        assert 40 not in restored.models
+        assert restored.names.exact("impeller") == []
+        assert restored.generate_ontology_metadata() != model.generate_ontology_metadata()
+        # The live model kept its changes
+        assert [f['fact_uid'] for f in model.table.facts()] == [2, 3, 4]
+
+
+@pytest.mark.unit
+class TestResumeSync:
+    """Test reconciling a restored model with Aperture."""
+
+    @pytest.mark.asyncio
+    async def test_unchanged_seq_skips_reconcile(self, model):
+        """Test that a full sync at the snapshot's seq leaves the model alone."""
+
+        class Client:
+            async def retrieve_environment(self, environment_id, user_id=None):
+                return {'facts': [], 'seq': 7}
+
+        sync = EnvironmentSync(Client(), model, "env")
+        sync.resume(7)
+        version = model.version
+
+        await sync.resync()
+
+        assert model.version == version
+        assert len(model.facts) == 3
@@ -0,0 +1,127 @@
+"""
+Unit tests for triple-pattern queries.
+
+Tests the local query engine including:
+- Constants, names, UID lists, variables and wildcards
+- Joins over shared variables and repeated variables
+- Join ordering by selectivity and connectivity
+- Malformed and disconnected queries, and the intermediate row cap
+- Parsing the agent tool's query text
+"""
+
+import pytest
+
+from src.agent.tools import parse_query_patterns
+from src.models import query
+from src.models.fact_table import FactTable
+from src.models.query import QueryError
+from tests.conftest import fact
+
+
+NAMES = {1: 'pump', 2: 'machine', 3: 'impeller', 4: 'casing', 10: 'P-101', 11: 'P-102', 20: 'I-1', 21: 'C-1'}
+
+
+@pytest.fixture
+def table():
+    facts = FactTable()
+    facts.add(fact(uid, lh, rh, rel, lh_name=NAMES.get(lh), rh_name=NAMES.get(rh)) for uid, lh, rel, rh in [
+        (100, 1, 1146, 2),     # pump is a machine
+        (101, 10, 1225, 1),    # P-101 is a pump
+        (102, 11, 1225, 1),    # P-102 is a pump
+        (103, 20, 1225, 3),    # I-1 is an impeller
+        (104, 21, 1225, 4),    # C-1 is a casing
+        (105, 20, 1190, 10),   # I-1 is part of P-101
+        (106, 21, 1190, 10),   # C-1 is part of P-101
+        (107, 3, 1146, 2),     # impeller is a machine (for the sake of the test)
+    ])
+    return facts
+
+
+@pytest.mark.unit
+class TestQueries:
+    """Test evaluating queries."""
+
+    def test_single_pattern(self, table):
+        """Test a pattern with a constant and a variable."""
+        result = query.run(table, [('?x', 1225, 1)])
+
+        assert result.variables == ['x']
+        assert sorted(result.rows) == [(10,), (11,)]
+        assert result.names == {10: 'P-101', 11: 'P-102'}
+
+    def test_join_on_shared_variable(self, table):
+        """Test the parts of a pump and the kinds they are classified as."""
+        result = query.run(table, [('?part', 1190, '?pump'), ('?pump', 1225, 'pump'), ('?part', 1225, '?kind')])
+
+        assert sorted(result.as_dicts(), key=lambda r: r['part']) == [
+            {'part': 20, 'pump': 10, 'kind': 3},
+            {'part': 21, 'pump': 10, 'kind': 4},
+        ]
+        assert result.names[3] == 'impeller'
+
+    def test_uid_lists_wildcards_and_distinct(self, table):
+        """Test UID lists, wildcards and duplicate solutions."""
+        assert sorted(query.run(table, [([10, 11, 20], 1225, '?k')]).rows) == [(1,), (3,)]
+        assert query.run(table, [('?x', '_', 10)]).rows == [(20,), (21,)]
+        assert query.run(table, [('_', 1225, '?k'), ('?k', 1146, 2)]).rows == [(1,), (3,)]
+
+    def test_repeated_variable_and_ask(self, table):
+        """Test a variable used twice in one pattern and queries without variables."""
+        table.add([fact(108, 30, 30, rel=1190)])
+
+        assert query.run(table, [('?x', 1190, '?x')]).rows == [(30,)]
+        assert query.run(table, [(10, 1225, 1)]).rows == [()]
+        assert query.run(table, [(10, 1225, 2)]).rows == []
+
+    def test_unknown_name_and_limit(self, table):
+        """Test names not in the table and the result limit."""
+        assert query.run(table, [('?x', 1225, 'no such kind')]).rows == []
+        assert len(query.run(table, [('?x', 1225, '?k')], limit=2).rows) == 2
+
+    def test_disconnected_patterns_rejected(self, table):
+        """Test that patterns without shared variables are rejected rather than cross-joined."""
+        with pytest.raises(QueryError):
+            query.run(table, [('?a', 1146, 2), ('?b', 1190, 10)])
+
+        # Constant-only patterns are existence checks and need no shared variable
+        assert sorted(query.run(table, [('?a', 1146, 2), (10, 1225, 1)]).rows) == [(1,), (3,)]
+        assert query.run(table, [('?a', 1146, 2), (10, 1225, 2)]).rows == []
+
+    def test_row_cap_and_limit(self, table):
+        """Test that joins above max_rows fail and a limit stops at enough distinct solutions."""
+        table.add([fact(200 + i, 40 + i, 10, rel=1190) for i in range(20)])
+
+        with pytest.raises(QueryError):
+            query.run(table, [('?part', 1190, '?whole'), ('?whole', 1225, '?k')], max_rows=5)
+        result = query.run(table, [('?part', 1190, '?whole'), ('?whole', 1225, '?k')], limit=3)
+        assert len(result.rows) == 3
+        assert all(row[1:] == (10, 1) for row in result.rows)
+
+
+@pytest.mark.unit
+class TestPlanning:
+    """Test join ordering and malformed queries."""
+
+    def test_most_selective_then_connected(self, table):
+        """Test that the plan starts selective and follows shared variables."""
+        patterns = query.parse([('?x', 1225, '?k'), ('?k', '_', '?s'), ('?x', 1190, 10), ('?y', 1146, 2)])
+        order, constant_rows = query.plan(table, patterns)
+
+        assert order == [2, 0, 1, 3]
+        assert sorted(constant_rows) == [0, 2, 3]
+
+    def test_malformed(self, table):
+        """Test that malformed queries raise QueryError."""
+        with pytest.raises(QueryError):
+            query.run(table, [])
+        with pytest.raises(QueryError):
+            query.run(table, [('?x', 1225)])
+        with pytest.raises(QueryError):
+            query.run(table, [('?x', 1.5, '?y')])
+
+    def test_tool_query_text(self):
+        """Test parsing the queryFacts tool's query text."""
+        assert parse_query_patterns('?x 1225 "centrifugal pump"; 1,2 _ ?y') == [
+            ('?x', 1225, 'centrifugal pump'),
+            ([1, 2], '_', '?y'),
+        ]
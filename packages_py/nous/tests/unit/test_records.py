@@ -0,0 +1,108 @@
+"""
+Unit tests for compact Fact and Model records.
+
+Tests the record types including:
+- Mapping behaviour and equality with wire dicts
+- Overflow storage for keys outside the schema
+- Interning of repeated strings
+- Records stored by SemanticModel
+"""
+
+import pickle
+
+import pytest
+
+from src.models.records import Fact, Model
+from src.models.semantic_model import SemanticModel
+
+
+def wire_fact(fact_uid=1, lh=10, lh_name="pump", rh=11, rh_name="device"):
+    return {
+        'fact_uid': fact_uid,
+        'lh_object_uid': lh,
+        'lh_object_name': lh_name,
+        'rel_type_uid': 1146,
+        'rel_type_name': 'is a specialization of',
+        'rh_object_uid': rh,
+        'rh_object_name': rh_name,
+    }
+
+
+@pytest.mark.unit
+class TestRecord:
+    """Test the record Mapping protocol."""
+
+    def test_behaves_like_the_wire_dict(self):
+        """Test item access, get, membership and equality with the source dict."""
+        data = wire_fact()
+        fact = Fact(data)
+
+        assert fact == data
+        assert dict(fact) == data
+        assert {**fact} == data
+        assert fact['lh_object_name'] == "pump"
+        assert fact.get('remarks') is None
+        assert fact.get('remarks', "") == ""
+        assert 'rh_object_uid' in fact
+        assert 'remarks' not in fact
+        assert len(fact) == len(data)
+        with pytest.raises(KeyError):
+            fact['remarks']
+
+    def test_unknown_keys_overflow(self):
+        """Test that keys outside the schema are kept."""
+        fact = Fact({**wire_fact(), 'custom': [1, 2]})
+
+        assert fact['custom'] == [1, 2]
+        assert list(fact)[-1] == 'custom'
+
+    def test_read_only_and_slotted(self):
+        """Test that records cannot be modified and carry no instance dict."""
+        fact = Fact(wire_fact())
+
+        with pytest.raises(AttributeError):
+            fact.lh_object_name = "valve"
+        assert not hasattr(fact, '__dict__')
+
+    def test_from_wire_keeps_records(self):
+        """Test that converting a record again returns it unchanged."""
+        fact = Fact(wire_fact())
+
+        assert Fact.from_wire(fact) is fact
+
+    def test_repeated_values_are_shared(self):
+        """Test interning of names across records."""
+        name = "".join(["centrifugal ", "pump"])
+        a = Fact(wire_fact(fact_uid=1, lh_name=name))
+        b = Fact(wire_fact(fact_uid=2, lh_name="".join(["centrifugal ", "pump"])))
+
+        assert a['lh_object_name'] is b['lh_object_name']
+
+    def test_pickle_round_trip(self):
+        """Test that records survive pickling."""
+        model = Model({'uid': 5, 'name': 'pump', 'type': 'kind', 'extra': True})
+
+        restored = pickle.loads(pickle.dumps(model))
+
+        assert isinstance(restored, Model)
+        assert restored == model
+
+
+@pytest.mark.unit
+class TestSemanticModelRecords:
+    """Test that SemanticModel stores records."""
+
+    @pytest.mark.asyncio
+    async def test_facts_and_models_are_records(self, monkeypatch):
+        """Test conversion at the model's ingestion boundary."""
+        model = SemanticModel()
+
+        async def no_models(facts):
+            return None
+
+        monkeypatch.setattr(model, "loadModelsForFacts", no_models)
+        await model.addFacts([wire_fact()])
+        model.addModel({'uid': 10, 'name': 'pump', 'type': 'kind'})
+
+        assert all(isinstance(f, Fact) for f in model.facts)
+        assert isinstance(model.models[10], Model)
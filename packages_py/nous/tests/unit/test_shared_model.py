@@ -0,0 +1,171 @@
+"""
+Unit tests for the semantic model shared between processes.
+
+Tests the shared-memory model including:
+- Fact table queries over an attached image matching the local model
+- Fact and model lookup, decoded on access
+- Readers following newly published versions
+- Older views staying usable after a reader moves on
+- Debounced publishing from a worker thread
+- Attaching from another process
+- Rejecting writes
+- Readers outliving the published image
+"""
+
+import asyncio
+import multiprocessing
+
+import pytest
+import pytest_asyncio
+
+from src.models.records import Fact, Model
+from src.models.semantic_model import SemanticModel
+from src.models.shared_model import SharedModelPublisher, SharedModelReader
+from tests.conftest import fact
+
+
+@pytest_asyncio.fixture
+async def model(monkeypatch):
+    semantic_model = SemanticModel()
+
+    async def no_models(facts):
+        return None
+
+    monkeypatch.setattr(semantic_model, "loadModelsForFacts", no_models)
+    await semantic_model.addFacts([
+        fact(7, 10, 20),
+        fact(3, 20, 730000),
+        fact(5, 30, 10, rel=1225, rel_name='is classified as a'),
+    ])
+    semantic_model.addModel({'uid': 10, 'name': 'pump', 'type': 'kind'})
+    semantic_model.selected_entity = 10
+    return semantic_model
+
+
+@pytest.fixture
+def publisher(model, tmp_path):
+    return SharedModelPublisher(model, tmp_path / "model.nous")
+
+
+def count_facts(path, results):
+    reader = SharedModelReader(path)
+    view = reader.current()
+    results.put((len(view), view.table.neighbors(10)))
+    reader.close()
+
+
+@pytest.mark.unit
+class TestSharedModel:
+    """Test publishing and attaching to the shared model."""
+
+    def test_queries_match_local_model(self, model, publisher):
+        """Test that table queries on the view match the local table."""
+        publisher.publish()
+        reader = SharedModelReader(publisher.path)
+        view = reader.current()
+
+        assert view.version == model.version
+        assert view.selected_entity == 10
+        assert len(view) == 3
+        assert view.table.neighbors(10) == model.table.neighbors(10)
+        assert list(view.table.counts('rel_type_name')) == ['is a specialization of', 'is classified as a']
+        assert view.table.filter(lh_object_name='unknown').size == 0
+        assert [f['fact_uid'] for f in view.table.facts(view.table.filter(rel_type_uid=1146))] == [7, 3]
+        reader.close()
+
+    def test_lookup(self, publisher):
+        """Test fact and model lookup by uid."""
+        publisher.publish()
+        reader = SharedModelReader(publisher.path)
+        view = reader.current()
+
+        assert 5 in view.table and 6 not in view.table
+        assert view.table.get(5) == fact(5, 30, 10, rel=1225, rel_name='is classified as a')
+        assert isinstance(view.table.get(5), Fact)
+        assert view.model(10)['name'] == 'pump'
+        assert isinstance(view.model(10), Model)
+        assert view.model(20) is None
+        reader.close()
+
+    @pytest.mark.asyncio
+    async def test_reader_follows_new_versions(self, model, publisher):
+        """Test that readers switch to the latest published version."""
+        publisher.publish()
+        reader = SharedModelReader(publisher.path)
+        first = reader.current().version
+
+        await model.addFacts([fact(9, 40, 10)])
+        assert publisher.publish()
+        assert not publisher.publish()
+
+        view = reader.current()
+        assert view.version == model.version > first
+        assert view.table.neighbors(10) == [20, 30, 40]
+        reader.close()
+
+    @pytest.mark.asyncio
+    async def test_old_view_stays_usable(self, model, publisher):
+        """Test that a view held across a new version keeps serving its own version."""
+        publisher.publish()
+        reader = SharedModelReader(publisher.path)
+        old = reader.current()
+        version = old.version
+
+        await model.addFacts([fact(9, 40, 10)])
+        publisher.publish()
+        assert reader.current().version > version
+        reader.close()
+
+        assert old.version == version
+        assert old.table.neighbors(10) == [20, 30]
+        assert old.model(10)['name'] == 'pump'
+
+    @pytest.mark.asyncio
+    async def test_publish_async_debounced(self, model, tmp_path):
+        """Test that a burst of changes is published once, from a snapshot, off the event loop."""
+        publisher = SharedModelPublisher(model, tmp_path / "model.nous", interval=0.5, debounce=0.05)
+        publisher.start()
+        for uid in range(40, 45):
+            await model.addFacts([fact(uid, uid, 10)])
+        await asyncio.sleep(0.3)
+        await publisher.stop()
+
+        assert publisher.get_stats()["publishes"] == 1
+        snapshot = model.snapshot()
+        assert await publisher.publish_async()
+        await model.addFacts([fact(50, 50, 10)])
+        reader = SharedModelReader(publisher.path)
+        assert reader.current().version == snapshot.version
+        assert len(reader.current()) == len(snapshot.facts)
+        reader.close()
+
+    def test_other_process(self, publisher):
+        """Test that another process attaches to the published model."""
+        publisher.publish()
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        worker = context.Process(target=count_facts, args=(publisher.path, results))
+        worker.start()
+        worker.join(60)
+
+        assert results.get(timeout=5) == (3, [20, 30])
+
+    def test_read_only(self, publisher):
+        """Test that the shared table rejects changes."""
+        publisher.publish()
+        reader = SharedModelReader(publisher.path)
+
+        with pytest.raises(TypeError):
+            reader.current().table.add([Fact(fact(11, 1, 2))])
+        reader.close()
+
+    def test_nothing_published(self, publisher):
+        """Test that a reader sees no model before the first publish and keeps the last one after."""
+        reader = SharedModelReader(publisher.path)
+        assert reader.current() is None
+
+        publisher.publish()
+        view = reader.current()
+        publisher.close()
+        assert reader.current() is view
+        reader.close()
@@ -0,0 +1,229 @@
+"""
+Unit tests for semantic model snapshots.
+
+Tests versioned copy-on-write snapshots including:
+- Persistent fact lists and model maps with structural sharing
+- Version numbers bumped by writes
+- Snapshots unaffected by later writes
+- Runs pinned to a version, reading it through later writes
+- Diffing two snapshots into added and removed facts
+"""
+
+import asyncio
+import contextvars
+
+import pytest
+
+from src.models import snapshot as snapshot_module
+from src.models.semantic_model import SemanticModel
+from src.models.snapshot import FactList, ModelMap, diff
+from tests.conftest import fact
+
+
+@pytest.fixture
+def model(monkeypatch):
+    semantic_model = SemanticModel()
+
+    async def no_models(facts):
+        return None
+
+    monkeypatch.setattr(semantic_model, "loadModelsForFacts", no_models)
+    return semantic_model
+
+
+@pytest.mark.unit
+class TestFactList:
+    """Test the persistent fact list."""
+
+    def test_extend_shares_full_chunks(self, monkeypatch):
+        """Test that appending copies only the last chunk."""
+        monkeypatch.setattr(snapshot_module, "CHUNK_SIZE", 2)
+        old = FactList().extend([1, 2, 3])
+        new = old.extend([4, 5])
+
+        assert list(old) == [1, 2, 3]
+        assert list(new) == [1, 2, 3, 4, 5]
+        assert new._chunks[0] is old._chunks[0]
+        assert new[3] == 4 and new[-1] == 5 and new[1:3] == [2, 3]
+
+    def test_remove_where_shares_untouched_chunks(self, monkeypatch):
+        """Test that removal rebuilds only the chunks it changes."""
+        monkeypatch.setattr(snapshot_module, "CHUNK_SIZE", 2)
+        old = FactList().extend([1, 2, 3, 4, 5])
+        new = old.remove_where(lambda f: f in (3, 4))
+
+        assert list(new) == [1, 2, 5]
+        assert new._chunks[0] is old._chunks[0]
+        assert old.remove_where(lambda f: False) is old
+
+
+@pytest.mark.unit
+class TestModelMap:
+    """Test the persistent model map."""
+
+    def test_set_and_delete_leave_old_map(self):
+        """Test that updates return new maps sharing other shards."""
+        old = ModelMap().set(1, "a")
+        new = old.set(2, "b").delete(1)
+
+        assert dict(old) == {1: "a"}
+        assert dict(new) == {2: "b"}
+        assert len(new) == 1
+        with pytest.raises(KeyError):
+            new.delete(1)
+
+    def test_update_copies_touched_shards_once(self, monkeypatch):
+        """Test that a batch sets every model, sharing the shards it does not touch."""
+        monkeypatch.setattr(snapshot_module, "SHARDS", 4)
+        old = ModelMap().set(1, "a")
+        new = old.update([(1, "A"), (5, "e"), (2, "b")])
+
+        assert dict(old) == {1: "a"}
+        assert dict(new) == {1: "A", 5: "e", 2: "b"}
+        assert len(new) == 3
+        assert new._shards[3] is old._shards[3]
+        assert old.update([]) is old
+
+
+@pytest.mark.unit
+class TestSemanticModelSnapshots:
+    """Test snapshots taken from SemanticModel."""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_is_isolated_from_writes(self, model):
+        """Test that a held snapshot keeps its version's facts and models."""
+        await model.addFacts([fact(1), fact(2)])
+        model.addModel({'uid': 10, 'name': 'pump', 'type': 'kind'})
+        before = model.snapshot()
+
+        await model.addFact(fact(2, rh=30))
+        await model.removeFacts([1])
+        model.selected_entity = 10
+
+        after = model.snapshot()
+        assert after.version > before.version
+        assert [f['fact_uid'] for f in before.facts] == [1, 2]
+        assert before.facts[1]['rh_object_uid'] == 20
+        assert [f['fact_uid'] for f in after.facts] == [2]
+        assert 10 in before.models
+        assert before.selected_entity is None and after.selected_entity == 10
+        with pytest.raises(AttributeError):
+            before.version = 0
+
+    def test_models_added_as_one_version(self, model):
+        """Test that a batch of models is one write, and replacing a model keeps the counts right."""
+        version = model.version
+        model.addModels([{'uid': 10, 'name': 'pump', 'type': 'kind'}, {'uid': 11, 'name': 'valve', 'type': 'kind'}])
+        model.addModels([{'uid': 10, 'name': 'pump', 'type': 'individual'}, {'name': 'no uid'}])
+
+        assert model.version == version + 2
+        assert len(model.models) == 2
+        assert model.models[10]['type'] == 'individual'
+        assert model._model_types['kind'] == 1 and model._model_types['individual'] == 1
+
+    @pytest.mark.asyncio
+    async def test_snapshot_reused_until_a_write(self, model):
+        """Test that reads without writes share one snapshot and version."""
+        first = model.snapshot()
+        assert model.snapshot() is first
+
+        await model.addFacts([fact(1)])
+        assert model.snapshot() is not first
+        assert model.version == first.version + 1
+
+    @pytest.mark.asyncio
+    async def test_relationships_cached_per_version(self, model):
+        """Test that formatted relationships are recomputed only after a change."""
+        await model.addFacts([fact(1)])
+        text = model.format_relationships()
+
+        assert model.format_relationships() is text
+        await model.addFacts([fact(2, lh=11)])
+        assert "entity 11(11)" in model.format_relationships()
+
+
+@pytest.mark.unit
+class TestPinnedReads:
+    """Test reading a pinned version of the model."""
+
+    @staticmethod
+    async def elsewhere(write):
+        # A write from outside the pinned run, e.g. an Aperture broadcast
+        await asyncio.create_task(write, context=contextvars.Context())
+
+    @pytest.mark.asyncio
+    async def test_reader_keeps_the_pinned_version(self, model):
+        """Test that other writers' changes stay out of a pinned run's reads, indexes included."""
+        await model.addFacts([fact(1), fact(2, lh=11)])
+
+        with model.pinned():
+            assert model.reader() is model
+            await self.elsewhere(model.addFacts([fact(3, lh=12)]))
+            await self.elsewhere(model.removeFacts([2]))
+
+            reader = model.reader()
+            assert reader is not model and model.reader() is reader
+            assert [f['fact_uid'] for f in reader.facts] == [1, 2]
+            assert reader.table.has_entity(11) and not reader.table.has_entity(12)
+            assert sorted(reader.taxonomy.subtypes(20)) == [10, 11]
+            assert reader.query([("?x", 1146, 20)]).rows == [(10,), (11,)]
+
+        assert model.reader() is model
+        assert sorted(model.taxonomy.subtypes(20)) == [10, 12]
+
+    @pytest.mark.asyncio
+    async def test_own_writes_move_the_pin(self, model):
+        """Test that a run sees its own writes, but not once another writer came between."""
+        await model.addFacts([fact(1)])
+
+        with model.pinned():
+            await model.addFacts([fact(2, lh=11)])
+            assert model.reader() is model
+
+            await self.elsewhere(model.addFacts([fact(3, lh=12)]))
+            await model.addFacts([fact(4, lh=13)])
+            assert [f['fact_uid'] for f in model.reader().facts] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_readers_share_a_version(self, model):
+        """Test that runs pinned to the same version share one rebuilt copy."""
+        await model.addFacts([fact(1)])
+        snapshot = model.snapshot()
+        await model.addFacts([fact(2, lh=11)])
+
+        assert model.at(snapshot) is model.at(snapshot)
+        assert model.at(snapshot).version == snapshot.version
+        assert model.at(model.snapshot()) is model
+
+
+@pytest.mark.unit
+class TestDiff:
+    """Test diffing snapshots."""
+
+    @pytest.mark.asyncio
+    async def test_added_and_removed(self, model):
+        """Test that additions, removals and changed facts show up, and nothing else."""
+        await model.addFacts([fact(uid, lh=uid) for uid in range(1, 600)])
+        before = model.snapshot()
+
+        await model.addFacts([fact(600, lh=600), fact(5, lh=5, rh=30)])
+        await model.removeFacts([7])
+        changes = model.diff_since(before)
+
+        assert (changes.from_version, changes.to_version) == (before.version, model.version)
+        assert sorted(f['fact_uid'] for f in changes.added) == [5, 600]
+        assert sorted((f['fact_uid'], f['rh_object_uid']) for f in changes.removed) == [(5, 20), (7, 20)]
+        assert changes.changes == 4
+        assert "- entity 600(600) -> is a specialization of -> entity 20(20)" in model.format_changes(changes)
+
+    @pytest.mark.asyncio
+    async def test_unchanged(self, model):
+        """Test that re-adding identical facts and selection changes are not fact changes."""
+        await model.addFacts([fact(1), fact(2)])
+        before = model.snapshot()
+
+        await model.addFacts([fact(2)])
+        model.selected_entity = 10
+
+        assert diff(before, model.snapshot()).changes == 0
+        assert diff(before, before) == (before.version, before.version, (), ())
@@ -0,0 +1,188 @@
+"""
+Unit tests for TaxonomyIndex.
+
+Tests the local specialization hierarchy index including:
+- Subtype checks, ancestors and descendants
+- Lineage completeness up to the root
+- Lowest common ancestors with multiple inheritance
+- Memoized closures and complete subtype lists after changes
+- Learned lookups and incremental updates in SemanticModel
+"""
+
+import pytest
+
+from src.models.semantic_model import SemanticModel
+from src.models.taxonomy_index import ROOT_UID, TaxonomyIndex
+
+
+def spec(fact_uid, sub, sup):
+    return {
+        'fact_uid': fact_uid,
+        'lh_object_uid': sub,
+        'lh_object_name': f"kind {sub}",
+        'rel_type_uid': 1146,
+        'rel_type_name': 'is a specialization of',
+        'rh_object_uid': sup,
+        'rh_object_name': f"kind {sup}",
+    }
+
+
+# 730000 <- 1 <- 2 <- 4
+#             <- 3 <- 4   (4 has two supertypes)
+#                  <- 5
+HIERARCHY = [
+    spec(101, 1, ROOT_UID),
+    spec(102, 2, 1),
+    spec(103, 3, 1),
+    spec(104, 4, 2),
+    spec(105, 4, 3),
+    spec(106, 5, 3),
+]
+
+
+@pytest.fixture
+def index():
+    taxonomy = TaxonomyIndex()
+    taxonomy.set_environment_facts(HIERARCHY + [{**spec(200, 9, 8), 'rel_type_uid': 1225}])
+    return taxonomy
+
+
+@pytest.mark.unit
+class TestTaxonomyIndex:
+    """Test hierarchy queries."""
+
+    def test_is_subtype_of(self, index):
+        """Test transitive and reflexive subtype checks."""
+        assert index.is_subtype_of(4, ROOT_UID)
+        assert index.is_subtype_of(4, 3)
+        assert index.is_subtype_of(2, 2)
+        assert not index.is_subtype_of(2, 3)
+        assert not index.is_subtype_of(1, 4)
+        assert not index.is_subtype_of(9, 8)  # classification facts are not specializations
+
+    def test_ancestors_and_descendants(self, index):
+        """Test closure queries in both directions."""
+        assert index.ancestors(4) == {1, 2, 3, ROOT_UID}
+        assert index.descendants(3) == {4, 5}
+        assert index.ancestors(999) == set()
+
+    def test_direct_neighbours(self, index):
+        """Test direct supertypes and subtypes."""
+        assert sorted(index.supertypes(4)) == [2, 3]
+        assert sorted(index.subtypes(1)) == [2, 3]
+
+    def test_lineage_nearest_first(self, index):
+        """Test that the lineage runs from the kind up to the root."""
+        lineage = index.lineage_facts(4)
+
+        assert {f['fact_uid'] for f in lineage} == {101, 102, 103, 104, 105}
+        assert lineage[-1]['fact_uid'] == 101
+
+    def test_lineage_incomplete_without_root(self):
+        """Test that a lineage not reaching the root is not answered locally."""
+        index = TaxonomyIndex()
+        index.set_environment_facts([spec(1, 20, 10)])
+
+        assert index.lineage_facts(20) is None
+
+    def test_lca(self, index):
+        """Test lowest common ancestors."""
+        assert index.lca(4, 5) == 3
+        assert index.lca(2, 5) == 1
+        assert index.lca(4, 4) == 4
+        assert index.lca(4, 999) is None
+
+    def test_depth(self, index):
+        """Test longest path depth from the root."""
+        assert index.depth(ROOT_UID) == 0
+        assert index.depth(4) == 3
+
+    def test_memoized_closures_follow_changes(self, index):
+        """Test that memoized closures are dropped for the kinds an edge change affects."""
+        assert index.descendants(1) == {2, 3, 4, 5}
+        assert index.depth(5) == 3
+
+        index.add_environment_facts([spec(110, 6, 5), spec(111, 5, 4)])
+        assert index.descendants(1) == {2, 3, 4, 5, 6}
+        assert index.ancestors(6) == {1, 2, 3, 4, 5, ROOT_UID}
+        assert index.depth(6) == 5
+
+        index.remove_environment_facts([111, 110])
+        assert index.descendants(1) == {2, 3, 4, 5}
+        assert index.depth(5) == 3
+        assert 6 not in index
+
+    def test_cycle_does_not_break_rebuild(self):
+        """Test that a cyclic hierarchy is tolerated."""
+        index = TaxonomyIndex()
+        index.set_environment_facts([spec(1, 1, 2), spec(2, 2, 1)])
+
+        assert len(index) == 2
+
+
+@pytest.mark.unit
+class TestLearnedFacts:
+    """Test facts learned from lookups."""
+
+    def test_subtypes_only_local_when_complete(self, index):
+        """Test that direct subtypes require a complete lookup."""
+        assert index.subtype_facts(3) is None
+
+        index.learn([spec(107, 6, 3)], subtypes_of=3)
+
+        assert {f['lh_object_uid'] for f in index.subtype_facts(3)} == {4, 5, 6}
+
+    def test_subtypes_incomplete_after_change(self, index):
+        """Test that a change under a kind drops its complete subtype list."""
+        index.learn([spec(107, 6, 3)], subtypes_of=3)
+        index.learn([spec(107, 6, 3)])
+        assert index.subtype_facts(3) is not None
+
+        index.add_environment_facts([spec(109, 8, 3)])
+        assert index.subtype_facts(3) is None
+
+        index.learn([spec(107, 6, 3)], subtypes_of=3)
+        index.remove_environment_facts([106])
+        assert index.subtype_facts(3) is None
+
+    def test_supertypes_only_local_when_complete(self, index):
+        """Test that direct supertypes require a complete lookup, which a change under the kind drops."""
+        assert index.supertype_facts(4) is None
+
+        index.learn([spec(104, 4, 2), spec(105, 4, 3)], supertypes_of=4)
+        assert {f['fact_uid'] for f in index.supertype_facts(4, environment_only=True)} == {104, 105}
+
+        index.add_environment_facts([spec(110, 4, 5)])
+        assert index.supertype_facts(4) is None
+
+        index.learn([spec(111, 6, 5)], supertypes_of=6)
+        assert [f['fact_uid'] for f in index.supertype_facts(6)] == [111]
+        assert index.supertype_facts(6, environment_only=True) is None
+
+    def test_environment_only_lineage(self, index):
+        """Test that learned facts do not count as loaded into the environment."""
+        index.learn([spec(108, 7, 5)])
+
+        assert index.lineage_facts(7) is not None
+        assert index.lineage_facts(7, environment_only=True) is None
+
+
+@pytest.mark.unit
+class TestSemanticModelTaxonomy:
+    """Test the index kept by SemanticModel."""
+
+    @pytest.mark.asyncio
+    async def test_index_follows_fact_changes(self, monkeypatch):
+        """Test that added and removed facts are reflected on the next query."""
+        model = SemanticModel()
+
+        async def no_models(facts):
+            return None
+
+        monkeypatch.setattr(model, "loadModelsForFacts", no_models)
+        await model.addFacts(HIERARCHY)
+        assert model.taxonomy.is_subtype_of(4, ROOT_UID)
+
+        await model.removeFacts([101])
+        assert not model.taxonomy.is_subtype_of(4, ROOT_UID)
+        assert model.taxonomy.is_subtype_of(4, 1)
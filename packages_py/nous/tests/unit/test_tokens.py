@@ -0,0 +1,177 @@
+"""
+Unit tests for prompt token accounting.
+
+Tests the token counter including:
+- The default estimate and pluggable tokenizers
+- Counts cached per fragment, long texts counted per line
+- Per-section totals, metrics and oversize prompts
+- Prompt counts collected per run, apart from concurrent runs
+- Trimming line-oriented text to a token budget
+- Agent prompts fitted to the budget: the most relevant environment facts, the latest turns
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.agent import nous_agent
+from src.llm.tokens import TokenCounter, estimate, prompt_counts, tokenizer_from_config, trim_lines
+from src.models.semantic_model import SemanticModel
+
+
+def words(text):
+    return len(text.split())
+
+
+@pytest.mark.unit
+class TestTokenCounter:
+    """Test counting and caching."""
+
+    def test_estimate_and_config(self):
+        """Test the characters / 4 estimate and the fallback for unknown tokenizers."""
+        assert estimate("x" * 401) == 100
+        assert tokenizer_from_config("estimate") == ("estimate", estimate)
+        assert tokenizer_from_config("sentencepiece") == ("estimate", estimate)
+
+    def test_cached_per_fragment(self):
+        """Test that each fragment reaches the tokenizer once, and long texts go line by line."""
+        seen = []
+        counter = TokenCounter(lambda text: seen.append(text) or words(text), "words")
+
+        assert counter.count("one two three") == 3
+        assert counter.count("one two three") == 3
+        assert seen == ["one two three"]
+
+        lines = [f"- entity {i}({i}) -> is a part of -> entity 1(1)" for i in range(100)]
+        assert counter.count("\n".join(lines)) == 100 * 11 + 99
+        assert counter.count("\n".join(lines[:50] + ["- new line"])) == 50 * 11 + 3 + 50
+        assert seen[-1] == "- new line" and len(seen) == 102
+        assert counter.get_stats()["cached_fragments"] == 102
+
+        counter.set_tokenizer(len, "chars")
+        assert counter.count("one two three") == 13
+
+    def test_sections(self):
+        """Test per-section totals, the prompt sizes in the metrics and oversize prompts."""
+        counter = TokenCounter(words, "words")
+
+        counts = counter.sections({"instructions": "be brief", "entities": ["a b", "c d e"]}, limit=10)
+        assert counts == {"instructions": 2, "entities": 5, "total": 7}
+        assert counter.get_stats()["oversize_prompts"] == 0
+
+        counter.sections({"history": "x " * 20}, limit=10)
+        stats = counter.get_stats()
+        assert stats["oversize_prompts"] == 1
+        assert stats["prompts"] == 2
+        assert stats["largest_prompt"] == 20
+
+    @pytest.mark.asyncio
+    async def test_prompt_counts_per_run(self):
+        """Test that concurrent runs each collect only their own prompts."""
+        counter = TokenCounter(words, "words")
+
+        async def run(text):
+            with prompt_counts() as prompts:
+                for _ in range(3):
+                    counter.sections({"history": text})
+                    await asyncio.sleep(0)
+            return prompts
+
+        short, long = await asyncio.gather(run("a b"), run("a b c d e"))
+
+        assert short == [{"history": 2, "total": 2}] * 3
+        assert long == [{"history": 5, "total": 5}] * 3
+        assert counter.get_stats()["prompts"] == 6
+
+    def test_trim_lines(self):
+        """Test keeping the leading lines that fit the budget."""
+        counter = TokenCounter(words, "words")
+        text = "\n".join(["a b c"] * 5)
+
+        assert trim_lines(text, 100, counter) == (text, 0)
+        assert trim_lines(text, 9, counter) == ("a b c\na b c", 3)
+        assert trim_lines(text, 0, counter) == ("", 5)
+
+    @pytest.mark.asyncio
+    async def test_semantic_model_context_sections(self, monkeypatch):
+        """Test that the context's sections count the same as the context itself."""
+        model = SemanticModel()
+
+        async def no_models(facts):
+            return None
+
+        monkeypatch.setattr(model, "loadModelsForFacts", no_models)
+        await model.addFacts([{
+            'fact_uid': 1, 'lh_object_uid': 2, 'lh_object_name': 'pump', 'rel_type_uid': 1146,
+            'rel_type_name': 'is a specialization of', 'rh_object_uid': 3, 'rh_object_name': 'machine',
+        }])
+        model.addModel({'uid': 2, 'name': 'pump', 'nature': 'kind'})
+        counter = TokenCounter(words, "words")
+
+        counts = counter.sections(model.context_sections())
+
+        assert set(counts) == {"metadata", "entities", "relationships", "total"}
+        assert counts["relationships"] == words("- pump(2) -> is a specialization of -> machine(3)")
+        assert counts["total"] + 3 == words(model.context)  # the three section headers
+
+
+def spec(fact_uid, lh, rh):
+    return {
+        'fact_uid': fact_uid, 'lh_object_uid': lh, 'lh_object_name': f"e{lh}", 'rel_type_uid': 1146,
+        'rel_type_name': 'is a specialization of', 'rh_object_uid': rh, 'rh_object_name': f"e{rh}",
+    }
+
+
+def part(fact_uid, lh, rh):
+    return {**spec(fact_uid, lh, rh), 'rel_type_uid': 1190, 'rel_type_name': 'is a part of'}
+
+
+@pytest.mark.unit
+class TestPromptBudget:
+    """Test fitting agent prompts to NOUS_PROMPT_MAX_TOKENS."""
+
+    @pytest.mark.asyncio
+    async def test_environment_keeps_most_relevant(self, monkeypatch):
+        """Test that an oversize environment keeps the facts about the selection's most relevant entities, grouped as usual."""
+        model = SemanticModel()
+
+        async def no_models(facts):
+            return None
+
+        monkeypatch.setattr(model, "loadModelsForFacts", no_models)
+        # A part 20 of 10 listed first, then a chain 10 -> 11 -> 12 -> 13 and an unrelated pair
+        await model.addFacts([part(1, 20, 10), spec(2, 10, 11), spec(3, 11, 12), spec(4, 12, 13), spec(5, 30, 31)])
+        monkeypatch.setattr(nous_agent, "token_counter", TokenCounter(words, "words"))
+        monkeypatch.setattr(nous_agent, "environment_budget", lambda: 20)
+        agent = SimpleNamespace(semantic_model=model)
+
+        text = nous_agent.NOUSAgent.environment_context(agent, 13)
+
+        assert text.splitlines() == [
+            "- e11(11) -> is a specialization of -> e12(12)",
+            "- e12(12) -> is a specialization of -> e13(13)",
+            "... (3 less relevant facts omitted to fit the prompt budget)",
+        ]
+        assert nous_agent.NOUSAgent.environment_context(agent, 13) == text
+        # Within the budget the environment is sent as it is
+        monkeypatch.setattr(nous_agent, "environment_budget", lambda: None)
+        assert nous_agent.NOUSAgent.environment_context(agent, 13) == model.format_relationships()
+
+    def test_history_dropped_by_turns(self, monkeypatch):
+        """Test that the oldest whole turns are dropped, the system prompt and current turn kept."""
+        monkeypatch.setattr(nous_agent, "token_counter", TokenCounter(words, "words"))
+        messages = [
+            {"role": "user", "content": "one two three"},
+            {"role": "assistant", "content": "four five"},
+            {"role": "user", "content": "six"},
+            {"role": "assistant", "content": "seven eight"},
+            {"role": "user", "content": "nine ten"},
+            {"role": "tool", "content": "eleven"},
+        ]
+        system_msg = "instructions env"
+
+        assert nous_agent.fit_history(system_msg, "env", messages, limit=100) is messages
+        assert nous_agent.fit_history(system_msg, "env", messages, limit=8) == messages[2:]
+        assert nous_agent.fit_history(system_msg, "env", messages, limit=3) == messages[4:]
+        assert nous_agent.fit_history(system_msg, "env", messages, limit=0) is messages
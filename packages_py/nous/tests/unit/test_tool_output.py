@@ -0,0 +1,107 @@
+"""
+Unit tests for compact tool output.
+
+Tests the tool output encoder including:
+- An entity legend and triples grouped by relation type
+- Duplicate facts and entities removed
+- Pages capped by facts and characters, with cursors to continue
+- De-duplicated, capped UID lists with names
+- Results kept for their continuation pages
+"""
+
+import pytest
+
+from src.agent.tool_output import ResultPages, encode_facts, encode_uids, unique_facts
+from tests.conftest import fact
+
+
+def part(fact_uid, lh, rh):
+    return fact(fact_uid, lh, rh, rel=1190, rel_name='is a part of')
+
+
+@pytest.mark.unit
+class TestEncodeFacts:
+    """Test encoding fact lists."""
+
+    def test_legend_and_groups(self):
+        """Test that names appear once and triples are grouped by relation type."""
+        facts = [fact(1, 2, 3), part(2, 10, 2), fact(3, 4, 3), fact(1, 2, 3)]
+
+        assert encode_facts(facts).splitlines() == [
+            "Entities (uid: name):",
+            "10: entity 10",
+            "2: entity 2",
+            "3: entity 3",
+            "4: entity 4",
+            "Facts by relation (lh uid -> rh uid):",
+            "is a part of (1190): 10->2",
+            "is a specialization of (1146): 2->3, 4->3",
+        ]
+        assert [f['fact_uid'] for f in unique_facts(facts)] == [2, 1, 3]
+        assert encode_facts([], empty="nothing") == "nothing"
+
+    def test_pages(self):
+        """Test that pages stop at the fact cap and cursors walk through the rest."""
+        facts = [fact(uid, uid, 1) for uid in range(10, 35)]
+
+        first = encode_facts(facts, max_facts=10)
+        assert first.endswith("Facts 1-10 of 25; call again with cursor=10 for more")
+        assert "10->1, 11->1" in first and "20->1" not in first
+
+        last = encode_facts(facts, cursor=20, max_facts=10)
+        assert last.endswith("Facts 21-25 of 25")
+        assert "30->1" in last
+        assert encode_facts(facts, cursor=25) == "No more facts: all 25 were shown (cursor=25)"
+
+    def test_character_cap(self):
+        """Test that a page is cut to fit the character cap, keeping at least one fact."""
+        facts = [fact(uid, uid, 1) for uid in range(100, 200)]
+
+        page = encode_facts(facts, max_facts=100, max_chars=300)
+        assert len(page.rsplit("\n", 1)[0]) <= 300
+        cursor = int(page.rsplit("cursor=", 1)[1].split()[0])
+        assert 1 < cursor < 100
+
+        assert "Facts 1-1 of 100" in encode_facts(facts, max_chars=10)
+
+    def test_shorter_than_verbose_format(self):
+        """Test that a hub entity's relations come out much shorter than one line per fact."""
+        facts = [part(uid, uid, 1) for uid in range(2, 40)]
+        verbose = "\n".join(
+            f"- {f['lh_object_name']} (UID: {f['lh_object_uid']}) {f['rel_type_name']} (UID: {f['rel_type_uid']}) "
+            f"{f['rh_object_name']} (UID: {f['rh_object_uid']})"
+            for f in facts
+        )
+
+        assert len(encode_facts(facts, max_facts=100)) < len(verbose) / 2
+
+
+@pytest.mark.unit
+class TestEncodeUids:
+    """Test encoding UID lists."""
+
+    def test_unique_named_capped(self):
+        """Test that repeats are dropped, names added and long lists capped."""
+        assert encode_uids([5, 6, 5, 5], {5: "pump"}) == "5 (pump), 6"
+        assert encode_uids(range(10), max_items=3) == "0, 1, 2 and 7 more"
+
+
+@pytest.mark.unit
+class TestResultPages:
+    """Test keeping results for paging."""
+
+    def test_keep_and_limit(self):
+        """Test that kept results are ordered for paging and the least recently used is dropped."""
+        pages = ResultPages(max_results=2)
+
+        kept = pages.keep(("loadRelations", 1), [part(2, 10, 2), fact(1, 2, 3), part(2, 10, 2)])
+        assert [f['fact_uid'] for f in kept] == [2, 1]
+        assert pages.get(("loadRelations", 1)) is kept
+
+        pages.keep(("loadLineage", 1), [])
+        pages.get(("loadRelations", 1))
+        pages.keep(("loadLineage", 2), [fact(3, 4, 3)])
+
+        assert len(pages) == 2
+        assert pages.get(("loadLineage", 1)) is None
+        assert pages.get(("loadRelations", 1)) is kept
@@ -0,0 +1,139 @@
+"""
+Unit tests for the conversation working set.
+
+Tests remembered load tool calls including:
+- Repeats answered from the facts still loaded, at the same or a later version
+- Entries dropped once any of their facts is unloaded
+- Calls whose facts never reached the model, and the size limit
+- Load tools short-circuiting repeats without an Aperture round-trip
+- Continuation pages served from the first page's result
+"""
+
+import functools
+
+import pytest
+import pytest_asyncio
+
+from src.agent import tools as tools_module
+from src.agent.tool_output import ResultPages, encode_facts
+from src.agent.tools import create_agent_tools
+from src.agent.working_set import WorkingSet
+from src.models.semantic_model import SemanticModel
+from src.proxies.aperture_proxy import ApertureSocketIOProxy
+from tests.conftest import fact
+
+
+async def no_models(facts):
+    return None
+
+
+@pytest_asyncio.fixture
+async def model(monkeypatch):
+    semantic_model = SemanticModel()
+    monkeypatch.setattr(semantic_model, "loadModelsForFacts", no_models)
+    await semantic_model.addFacts([fact(1, 2, rh=1), fact(2, 3, rh=1), fact(3, 4, rh=1)])
+    return semantic_model
+
+
+@pytest.mark.unit
+class TestWorkingSet:
+    """Test recording and recalling load calls."""
+
+    @pytest.mark.asyncio
+    async def test_recall(self, model):
+        """Test that a repeat returns the current facts until one is unloaded."""
+        working_set = WorkingSet()
+        working_set.record("loadLineage", 2, [fact(1, 2, rh=1), fact(2, 3, rh=1)], model)
+
+        assert [f['fact_uid'] for f in working_set.recall("loadLineage", 2, model)] == [1, 2]
+        assert working_set.recall("loadRelations", 2, model) is None
+
+        await model.addFacts([fact(2, 3, rh=9)])
+        assert working_set.recall("loadLineage", 2, model)[1]['rh_object_uid'] == 9
+
+        await model.removeFacts([1])
+        assert working_set.recall("loadLineage", 2, model) is None
+        assert ("loadLineage", 2) not in working_set
+
+    def test_not_loaded_and_limit(self, model):
+        """Test that calls with facts missing from the model are not kept, and old entries go first."""
+        working_set = WorkingSet(max_entries=2)
+        working_set.record("loadRelations", 5, [fact(1, 2, rh=1), fact(50, 5, rh=1)], model)
+        assert len(working_set) == 0
+
+        for uid in (2, 3, 4):
+            working_set.record("loadRelations", uid, [], model)
+        assert working_set.recall("loadRelations", 2, model) is None
+        assert working_set.recall("loadRelations", 4, model) == []
+        assert len(working_set) == 2
+
+
+class FakeClient:
+    """Counts requests and answers every one with the same facts"""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.requests = []
+
+    async def send_request(self, action, payload):
+        self.requests.append(action)
+        return {"payload": {"facts": self.facts}}
+
+
+@pytest.mark.unit
+class TestLoadTools:
+    """Test load tools with a working set."""
+
+    @pytest.mark.asyncio
+    async def test_repeat_answered_locally(self, model, monkeypatch):
+        """Test that a repeated loadRelations is answered without a second request."""
+        monkeypatch.setattr(tools_module, "semantic_model", model)
+        client = FakeClient([fact(701, 700, rh=702, rel=1190), fact(703, 704, rh=700, rel=1190)])
+        proxy = ApertureSocketIOProxy(client, "7", "env-1", model, "env-1")
+        tools = {t.__name__: t for t in create_agent_tools(proxy, None, WorkingSet())["tools"]}
+
+        first = await tools["loadRelations"](700)
+        repeat = await tools["loadRelations"](700)
+
+        assert client.requests == ["aperture.facts/load-all-related"]
+        assert first.startswith("Entities (uid: name):")
+        assert repeat.startswith("loadRelations(700) was already called in this conversation; its 2 facts are loaded")
+        assert "704: entity 704" in repeat
+
+        tools = {t.__name__: t for t in create_agent_tools(proxy, None)["tools"]}
+        await tools["loadRelations"](700)
+        assert len(client.requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_pages_continue_first_result(self, model, monkeypatch):
+        """Test that cursor calls page through the first call's result, with no new lookup or repeat notice."""
+        monkeypatch.setattr(tools_module, "semantic_model", model)
+        monkeypatch.setattr(tools_module, "encode_facts", functools.partial(encode_facts, max_facts=2))
+        lineage = [fact(801, 800, rh=810), fact(802, 810, rh=820), fact(803, 820, rh=730000),
+                   fact(804, 800, rh=830), fact(805, 830, rh=730000)]
+        client = FakeClient(lineage)
+        proxy = ApertureSocketIOProxy(client, "7", "env-1", model, "env-1")
+        pages = ResultPages()
+        # No working set (NOUS_WORKING_SET_SIZE=0); the lineage is local once ingested
+        tools = {t.__name__: t for t in create_agent_tools(proxy, None, WorkingSet(0), pages)["tools"]}
+
+        shown = []
+        cursor = 0
+        while cursor is not None:
+            page = await tools["loadLineage"](800, cursor=cursor)
+            assert "already called" not in page
+            shown += [line for line in page.splitlines()[1:] if "->" in line and not line.startswith("Facts by")]
+            cursor = int(page.rsplit("cursor=", 1)[1].split()[0]) if "cursor=" in page else None
+
+        assert client.requests == ["aperture.specialization/load"]
+        pairs = [pair for line in shown for pair in line.split(": ", 1)[1].split(", ")]
+        assert sorted(pairs) == sorted(f"{f['lh_object_uid']}->{f['rh_object_uid']}" for f in lineage)
+
+        # A continuation the pages no longer hold is recalled from the working set, without the notice
+        working_set = WorkingSet()
+        working_set.record("loadRelations", 800, lineage, model)
+        tools = {t.__name__: t for t in create_agent_tools(proxy, None, working_set)["tools"]}
+        page = await tools["loadRelations"](800, cursor=2)
+        assert page.startswith("Entities (uid: name):")
+        assert "Facts 3-4 of 5" in page
+        assert len(client.requests) == 1